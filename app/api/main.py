@@ -8,8 +8,9 @@ from loguru import logger
 
 from app.config import settings
 from app.api.routes import search, health, products, metrics
-from app.models.clip_model import CLIPEmbedder
-from app.db.qdrant import QdrantManager
+from app.models.sidecar_client import SidecarClient
+from app.models.embedding_cache import create_embedding_cache
+from app.db.vector_store import create_vector_store
 from app.middleware.logging import LoggingMiddleware
 from app.utils.logger import setup_logging
 from app.utils.metrics import set_clip_model_status, set_api_health
@@ -28,28 +29,50 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 60)
     
     try:
-        # Инициализация CLIP embedder
-        logger.info("Initializing CLIP embedder...")
-        search.clip_embedder = CLIPEmbedder(device="auto")
-        logger.success(f"✅ CLIP embedder initialized (device={search.clip_embedder.device})")
+        if settings.clip_sidecar_socket:
+            # Модель и батчинг живут в общем sidecar процессе, воркер только подключается
+            logger.info(f"Connecting to embedding sidecar at {settings.clip_sidecar_socket}...")
+            sidecar = SidecarClient()
+            await sidecar.start()
+            search.clip_embedder = sidecar
+            search.inference_scheduler = sidecar
+        else:
+            # torch загружается только здесь: воркеры с sidecar его не импортируют
+            from app.models.batching import InferenceScheduler
+            from app.models.clip_model import CLIPEmbedder
+
+            # Инициализация CLIP embedder
+            logger.info("Initializing CLIP embedder...")
+            search.clip_embedder = CLIPEmbedder(device="auto")
+            logger.success(f"✅ CLIP embedder initialized (device={search.clip_embedder.device})")
+            
+            # Планировщик батчей для онлайн-запросов
+            search.inference_scheduler = InferenceScheduler(search.clip_embedder)
+            await search.inference_scheduler.start()
         
         # Обновить метрику загрузки модели
         set_clip_model_status(loaded=True)
         
-        # Инициализация Qdrant manager
-        logger.info("Initializing Qdrant manager...")
-        search.qdrant_manager = QdrantManager(
-            host=settings.qdrant_host,
-            port=settings.qdrant_port,
-            collection_name=settings.qdrant_collection_name
-        )
+        # Кэш эмбеддингов запросов (текст и загруженные изображения)
+        if settings.embedding_cache_enabled:
+            search.text_embedding_cache = create_embedding_cache(
+                "text", search.clip_embedder.model_key
+            )
+            if settings.embedding_cache_images_enabled:
+                search.image_embedding_cache = create_embedding_cache(
+                    "image", search.clip_embedder.model_key
+                )
+        
+        # Инициализация векторного хранилища (Qdrant или memmap)
+        logger.info(f"Initializing vector store ({settings.vector_store})...")
+        search.qdrant_manager = create_vector_store(collection_name=settings.qdrant_collection_name)
         
         # Проверка коллекции
         if await search.qdrant_manager.collection_exists():
             info = await search.qdrant_manager.get_collection_info()
-            logger.success(f"✅ Qdrant connected: {info['points_count']} vectors in collection")
+            logger.success(f"✅ Vector store ready: {info['points_count']} vectors in collection")
         else:
-            logger.warning("⚠️  Qdrant collection does not exist. Please run load_demo_products.py first.")
+            logger.warning("⚠️  Vector collection does not exist. Please run load_demo_products.py first.")
         
         # Установить API как здоровый
         set_api_health(healthy=True)
@@ -76,8 +99,17 @@ async def lifespan(app: FastAPI):
     set_clip_model_status(loaded=False)
     
     # Cleanup if needed
+    if search.inference_scheduler:
+        await search.inference_scheduler.stop()
+    
+    if search.text_embedding_cache is not None:
+        await search.text_embedding_cache.close()
+    
+    if search.image_embedding_cache is not None:
+        await search.image_embedding_cache.close()
+    
     if search.qdrant_manager:
-        search.qdrant_manager.close()
+        await search.qdrant_manager.close()
     
     logger.info("✅ Shutdown complete")
 
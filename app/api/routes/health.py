@@ -8,7 +8,8 @@ from loguru import logger
 
 from app.config import settings
 from app.db.postgres import get_session, Product
-from app.db.qdrant import QdrantManager
+from app.db.vector_store import create_vector_store
+from app.api.routes import search
 from app.utils.metrics import update_active_products, update_qdrant_vectors, set_api_health
 
 router = APIRouter()
@@ -77,17 +78,20 @@ async def detailed_health_check() -> Dict[str, Any]:
     
     # Check Qdrant
     try:
-        qdrant_manager = QdrantManager(
-            host=settings.qdrant_host,
-            port=settings.qdrant_port,
-            collection_name=settings.qdrant_collection_name
-        )
-        
-        info = await qdrant_manager.get_collection_info()
+        # Переиспользовать постоянное соединение приложения, если оно уже создано
+        qdrant_manager = search.qdrant_manager
+        if qdrant_manager is not None:
+            info = await qdrant_manager.get_collection_info()
+        else:
+            async with create_vector_store(
+                collection_name=settings.qdrant_collection_name
+            ) as qdrant_manager:
+                info = await qdrant_manager.get_collection_info()
         vectors_count = info.get("points_count", 0)
         
         health_status["components"]["qdrant"] = {
             "status": "healthy",
+            "backend": settings.vector_store,
             "vectors_count": vectors_count,
             "collection": info.get("name")
         }
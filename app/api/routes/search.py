@@ -1,32 +1,60 @@
 """
 Search endpoints for visual and text search.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Body, Path
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Body, Path
 from fastapi.responses import JSONResponse
-from typing import Optional, List
+from starlette.concurrency import run_in_threadpool
+from typing import TYPE_CHECKING, Optional, List, Tuple
 from PIL import Image
-import tempfile
+import asyncio
 import time
-from pathlib import Path as FilePath
 import io
+import numpy as np
 from loguru import logger
 
-from app.schemas.search import SearchResponse, SearchResult, TextSearchRequest
-from app.models.clip_model import CLIPEmbedder
-from app.db.qdrant import QdrantManager
-from app.db.postgres import get_session, get_product_by_external_id
+from app.schemas.search import (
+    SearchResponse,
+    SearchResult,
+    TextSearchRequest,
+    BatchQueryResult,
+    BatchSearchResponse,
+)
+from app.models.embedding_cache import EmbeddingCache, content_key, normalize_query
+from app.models.executor import InferenceQueueFull
+from app.db.qdrant import build_filter
+from app.db.vector_store import VectorStore
+from app.db.postgres import (
+    get_session,
+    get_products_by_external_ids,
+    get_product_neighbors,
+)
 from app.config import settings
 from app.utils.metrics import record_search, record_clip_inference, record_qdrant_search
 
+if TYPE_CHECKING:
+    # Только для аннотаций: воркер с sidecar не загружает torch
+    from app.models.batching import InferenceScheduler
+    from app.models.clip_model import CLIPEmbedder
+
 router = APIRouter(prefix="/api/v1/search", tags=["search"])
 
 # Глобальные инстансы (инициализируются при старте приложения)
-clip_embedder: Optional[CLIPEmbedder] = None
-qdrant_manager: Optional[QdrantManager] = None
+clip_embedder: Optional["CLIPEmbedder"] = None
+inference_scheduler: Optional["InferenceScheduler"] = None
+text_embedding_cache: Optional[EmbeddingCache] = None
+image_embedding_cache: Optional[EmbeddingCache] = None
+qdrant_manager: Optional[VectorStore] = None
 
 # Максимальный размер файла (10MB)
 MAX_FILE_SIZE = 10 * 1024 * 1024
 
+# Через сколько секунд клиенту стоит повторить запрос, отклонённый из-за перегрузки
+OVERLOAD_RETRY_AFTER = 1
+
+# Порог близости в /similar: остаются только оценки строго выше него, как у
+# score_threshold в Qdrant (одинаково для таблицы соседей и поиска по вектору)
+SIMILAR_SCORE_THRESHOLD = 0.0
+
 def prepare_image_url(image_url: Optional[str]) -> Optional[str]:
     """
     Подготовить URL изображения, добавляя базовый URL если нужно.
@@ -48,7 +76,48 @@ def prepare_image_url(image_url: Optional[str]) -> Optional[str]:
     return image_url
 
 
-def get_clip_embedder() -> CLIPEmbedder:
+def product_to_result(product, score: float) -> SearchResult:
+    """
+    Построить результат поиска из продукта PostgreSQL и оценки Qdrant.
+    
+    Args:
+        product: Продукт из PostgreSQL
+        score: Оценка сходства
+        
+    Returns:
+        SearchResult
+    """
+    return SearchResult(
+        product_id=str(product.id),
+        external_id=product.external_id,
+        title=product.title,
+        description=product.description,
+        category=product.category,
+        price=product.price,
+        currency=product.currency,
+        image_url=prepare_image_url(product.image_url),
+        similarity_score=score
+    )
+
+
+def overloaded_error(error: InferenceQueueFull) -> HTTPException:
+    """
+    Построить быстрый 503 ответ для запроса, отклонённого из-за перегрузки CLIP.
+    
+    Args:
+        error: Исключение переполненной очереди inference
+        
+    Returns:
+        HTTPException с заголовком Retry-After
+    """
+    return HTTPException(
+        status_code=503,
+        detail=f"Search is overloaded, please retry later: {error}",
+        headers={"Retry-After": str(OVERLOAD_RETRY_AFTER)}
+    )
+
+
+def get_clip_embedder() -> "CLIPEmbedder":
     """Get CLIP embedder instance."""
     global clip_embedder
     if clip_embedder is None:
@@ -59,8 +128,19 @@ def get_clip_embedder() -> CLIPEmbedder:
     return clip_embedder
 
 
-def get_qdrant_manager() -> QdrantManager:
-    """Get Qdrant manager instance."""
+def get_inference_scheduler() -> "InferenceScheduler":
+    """Get inference scheduler instance."""
+    global inference_scheduler
+    if inference_scheduler is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Inference scheduler not initialized. Please restart the application."
+        )
+    return inference_scheduler
+
+
+def get_qdrant_manager() -> VectorStore:
+    """Get vector store instance (Qdrant or memmap, see settings.vector_store)."""
     global qdrant_manager
     if qdrant_manager is None:
         raise HTTPException(
@@ -70,6 +150,178 @@ def get_qdrant_manager() -> QdrantManager:
     return qdrant_manager
 
 
+async def embed_query_text(query: str) -> np.ndarray:
+    """
+    Получить эмбеддинг текстового запроса: из кэша или через CLIP.
+    
+    Args:
+        query: Текст запроса
+        
+    Returns:
+        Нормализованный эмбеддинг
+    """
+    normalized = normalize_query(query)
+    
+    if text_embedding_cache is not None:
+        cached = await text_embedding_cache.get(normalized)
+        if cached is not None:
+            return cached
+    
+    # Генерировать через CLIP (батчится с параллельными запросами)
+    scheduler = get_inference_scheduler()
+    
+    clip_start = time.time()
+    embedding = await scheduler.embed_text(normalized)
+    record_clip_inference(time.time() - clip_start)
+    
+    if text_embedding_cache is not None:
+        await text_embedding_cache.set(normalized, embedding)
+    
+    return embedding
+
+
+async def embed_query_image(image_data: bytes, filename: Optional[str] = None) -> np.ndarray:
+    """
+    Получить эмбеддинг загруженного изображения: из кэша по хэшу содержимого или через CLIP.
+    
+    При попадании в кэш изображение не декодируется и не проходит через модель.
+    
+    Args:
+        image_data: Байты загруженного файла
+        filename: Имя файла (для логов)
+        
+    Returns:
+        Нормализованный эмбеддинг
+        
+    Raises:
+        HTTPException: 400 если изображение не удалось декодировать
+    """
+    key = content_key(image_data)
+    
+    if image_embedding_cache is not None:
+        cached = await image_embedding_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    # Декодировать изображение в памяти (вне event loop)
+    embedder = get_clip_embedder()
+    try:
+        query_image = await run_in_threadpool(embedder.load_image, image_data)
+    except Exception as e:
+        logger.warning(f"Failed to decode uploaded image {filename}: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail="Failed to generate embedding. Image may be corrupted."
+        )
+    
+    # Генерировать эмбеддинг через CLIP (батчится с параллельными запросами)
+    scheduler = get_inference_scheduler()
+    
+    clip_start = time.time()
+    embedding = await scheduler.embed_image(query_image)
+    record_clip_inference(time.time() - clip_start)
+    
+    if image_embedding_cache is not None:
+        await image_embedding_cache.set(key, embedding)
+    
+    return embedding
+
+
+async def embed_query_texts(queries: List[str]) -> List[np.ndarray]:
+    """
+    Получить эмбеддинги нескольких текстовых запросов: из кэша или одним батчем через CLIP.
+    
+    Повторяющиеся запросы внутри пакета кодируются один раз.
+    
+    Args:
+        queries: Тексты запросов
+        
+    Returns:
+        Нормализованные эмбеддинги в порядке запросов
+    """
+    normalized = [normalize_query(query) for query in queries]
+    embeddings: List[Optional[np.ndarray]] = [None] * len(normalized)
+    
+    if text_embedding_cache is not None:
+        for i, query in enumerate(normalized):
+            embeddings[i] = await text_embedding_cache.get(query)
+    
+    missing = list(dict.fromkeys(q for q, e in zip(normalized, embeddings) if e is None))
+    if missing:
+        # Все промахи ставятся в очередь вместе и попадают в общий forward
+        scheduler = get_inference_scheduler()
+        
+        clip_start = time.time()
+        computed = dict(zip(missing, await scheduler.embed_texts(missing)))
+        record_clip_inference(time.time() - clip_start)
+        
+        embeddings = [e if e is not None else computed[q] for q, e in zip(normalized, embeddings)]
+        
+        if text_embedding_cache is not None:
+            for query, embedding in computed.items():
+                await text_embedding_cache.set(query, embedding)
+    
+    return embeddings
+
+
+async def embed_query_images(images: List[Tuple[bytes, Optional[str]]]) -> List[np.ndarray]:
+    """
+    Получить эмбеддинги нескольких изображений: из кэша по хэшу или одним батчем через CLIP.
+    
+    Одинаковые файлы внутри пакета декодируются и кодируются один раз.
+    
+    Args:
+        images: Пары (байты файла, имя файла)
+        
+    Returns:
+        Нормализованные эмбеддинги в порядке изображений
+        
+    Raises:
+        HTTPException: 400 если какое-либо изображение не удалось декодировать
+    """
+    keys = [content_key(data) for data, _ in images]
+    embeddings: List[Optional[np.ndarray]] = [None] * len(keys)
+    
+    if image_embedding_cache is not None:
+        for i, key in enumerate(keys):
+            embeddings[i] = await image_embedding_cache.get(key)
+    
+    missing = {}
+    for key, (data, filename), embedding in zip(keys, images, embeddings):
+        if embedding is None and key not in missing:
+            missing[key] = (data, filename)
+    
+    if missing:
+        embedder = get_clip_embedder()
+        
+        async def decode(data: bytes, filename: Optional[str]):
+            try:
+                return await run_in_threadpool(embedder.load_image, data)
+            except Exception as e:
+                logger.warning(f"Failed to decode uploaded image {filename}: {e}")
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Failed to generate embedding for {filename}. Image may be corrupted."
+                )
+        
+        # Декодировать параллельно вне event loop
+        decoded = await asyncio.gather(*(decode(data, name) for data, name in missing.values()))
+        
+        scheduler = get_inference_scheduler()
+        
+        clip_start = time.time()
+        computed = dict(zip(missing, await scheduler.embed_images(list(decoded))))
+        record_clip_inference(time.time() - clip_start)
+        
+        embeddings = [e if e is not None else computed[k] for k, e in zip(keys, embeddings)]
+        
+        if image_embedding_cache is not None:
+            for key, embedding in computed.items():
+                await image_embedding_cache.set(key, embedding)
+    
+    return embeddings
+
+
 @router.post("/by-text", response_model=SearchResponse)
 async def search_by_text(
     request: TextSearchRequest = Body(..., description="Text search request")
@@ -93,13 +345,8 @@ async def search_by_text(
     try:
         logger.info(f"Text search: '{request.query}' (limit={request.limit}, min_sim={request.min_similarity})")
         
-        # 1. Генерировать текстовый эмбеддинг через CLIP
-        embedder = get_clip_embedder()
-        
-        clip_start = time.time()
-        query_embedding = embedder.encode_text(request.query)
-        clip_duration = time.time() - clip_start
-        record_clip_inference(clip_duration)
+        # 1. Получить текстовый эмбеддинг (кэш или CLIP)
+        query_embedding = await embed_query_text(request.query)
         
         # 2. Искать похожие векторы в Qdrant
         qdrant = get_qdrant_manager()
@@ -108,35 +355,27 @@ async def search_by_text(
         vector_results = await qdrant.search_similar(
             query_vector=query_embedding.tolist(),
             top_k=request.limit,
-            score_threshold=request.min_similarity
+            score_threshold=request.min_similarity,
+            oversampling=request.oversampling,
+            rescore=request.rescore,
+            hnsw_ef=request.hnsw_ef,
+            exact=request.exact,
+            query_filter=build_filter(request.category, request.min_price, request.max_price, request.source)
         )
         qdrant_duration = time.time() - qdrant_start
         record_qdrant_search(qdrant_duration)
         
-        # 3. Получить метаданные из PostgreSQL
-        results = []
+        # 3. Метаданные найденных товаров одним запросом в PostgreSQL
         async with get_session() as session:
-            for vector_result in vector_results:
-                product_id = vector_result["id"]
-                
-                # Получить продукт из PostgreSQL
-                product = await get_product_by_external_id(session, product_id)
-                
-                if product:
-                    results.append(
-                        SearchResult(
-                            product_id=str(product.id),
-                            external_id=product.external_id,
-                            title=product.title,
-                            description=product.description,
-                            category=product.category,
-                            price=product.price,
-                            currency=product.currency,
-                            #image_url=product.image_url,
-                            image_url=prepare_image_url(product.image_url),
-                            similarity_score=vector_result["score"]
-                        )
-                    )
+            products = await get_products_by_external_ids(
+                session, [hit["id"] for hit in vector_results]
+            )
+        
+        results = [
+            product_to_result(products[hit["id"]], hit["score"])
+            for hit in vector_results
+            if hit["id"] in products
+        ]
         
         query_time_ms = int((time.time() - start_time) * 1000)
         
@@ -153,6 +392,10 @@ async def search_by_text(
         
     except HTTPException:
         raise
+    except InferenceQueueFull as e:
+        record_search("by-text", time.time() - start_time, success=False)
+        logger.warning(f"Text search rejected: {e}")
+        raise overloaded_error(e)
     except Exception as e:
         # Record failed search
         record_search("by-text", time.time() - start_time, success=False)
@@ -164,7 +407,15 @@ async def search_by_text(
 async def search_by_image(
     image: UploadFile = File(..., description="Query image file"),
     limit: int = Query(default=10, ge=1, le=50, description="Maximum number of results"),
-    min_similarity: float = Query(default=0.0, ge=0.0, le=1.0, description="Minimum similarity threshold")
+    min_similarity: float = Query(default=0.0, ge=0.0, le=1.0, description="Minimum similarity threshold"),
+    oversampling: Optional[float] = Query(default=None, ge=1.0, le=10.0, description="Quantized candidates per result (quantized collections)"),
+    rescore: Optional[bool] = Query(default=None, description="Re-rank quantized candidates with original vectors"),
+    hnsw_ef: Optional[int] = Query(default=None, ge=4, le=4096, description="HNSW search beam size (lower = faster, less precise)"),
+    exact: bool = Query(default=False, description="Exact full-scan search (slow; for offline jobs)"),
+    category: Optional[List[str]] = Query(default=None, description="Only these categories (repeat for several)"),
+    min_price: Optional[float] = Query(default=None, ge=0.0, description="Minimum price (inclusive)"),
+    max_price: Optional[float] = Query(default=None, ge=0.0, description="Maximum price (inclusive)"),
+    source: Optional[str] = Query(default=None, description="Only products from this source")
 ) -> SearchResponse:
     """
     Search products by uploaded image.
@@ -175,6 +426,14 @@ async def search_by_image(
         image: Uploaded image file (JPEG, PNG, etc.)
         limit: Maximum number of results to return
         min_similarity: Minimum similarity threshold (0.0-1.0)
+        oversampling: Quantized candidates per result (defaults to settings)
+        rescore: Re-rank quantized candidates with original vectors (defaults to settings)
+        hnsw_ef: HNSW search beam size (defaults to settings)
+        exact: Exact full-scan search instead of HNSW
+        category: Only these categories
+        min_price: Minimum price (inclusive)
+        max_price: Maximum price (inclusive)
+        source: Only products from this source
         
     Returns:
         Search results with product information and similarity scores
@@ -183,7 +442,7 @@ async def search_by_image(
         HTTPException: If image is invalid or search fails
     """
     start_time = time.time()
-    temp_file = None
+    query_filter = build_filter(category, min_price, max_price, source)
     
     try:
         logger.info(f"Image search: {image.filename} (limit={limit}, min_sim={min_similarity})")
@@ -205,24 +464,8 @@ async def search_by_image(
                 detail=f"File too large: {len(image_data)} bytes. Maximum: {MAX_FILE_SIZE} bytes (10MB)"
             )
         
-        # 1. Сохранить временный файл
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-            temp_file.write(image_data)
-            temp_file_path = temp_file.name
-        
-        # 2. Генерировать эмбеддинг через CLIP
-        embedder = get_clip_embedder()
-        
-        clip_start = time.time()
-        embedding = await embedder.generate_embedding(temp_file_path)
-        clip_duration = time.time() - clip_start
-        record_clip_inference(clip_duration)
-        
-        if embedding is None:
-            raise HTTPException(
-                status_code=400,
-                detail="Failed to generate embedding. Image may be corrupted."
-            )
+        # 1-2. Получить эмбеддинг изображения (кэш по хэшу или декодирование + CLIP)
+        embedding = await embed_query_image(image_data, image.filename)
         
         # 3. Искать похожие векторы в Qdrant
         qdrant = get_qdrant_manager()
@@ -231,35 +474,27 @@ async def search_by_image(
         vector_results = await qdrant.search_similar(
             query_vector=embedding.tolist(),
             top_k=limit,
-            score_threshold=min_similarity
+            score_threshold=min_similarity,
+            oversampling=oversampling,
+            rescore=rescore,
+            hnsw_ef=hnsw_ef,
+            exact=exact,
+            query_filter=query_filter
         )
         qdrant_duration = time.time() - qdrant_start
         record_qdrant_search(qdrant_duration)
         
-        # 4. Получить метаданные из PostgreSQL
-        results = []
+        # 4. Метаданные найденных товаров одним запросом в PostgreSQL
         async with get_session() as session:
-            for vector_result in vector_results:
-                product_id = vector_result["id"]
-                
-                # Получить продукт из PostgreSQL
-                product = await get_product_by_external_id(session, product_id)
-                
-                if product:
-                    results.append(
-                        SearchResult(
-                            product_id=str(product.id),
-                            external_id=product.external_id,
-                            title=product.title,
-                            description=product.description,
-                            category=product.category,
-                            price=product.price,
-                            currency=product.currency,
-                            #image_url=product.image_url,
-                            image_url=prepare_image_url(product.image_url),
-                            similarity_score=vector_result["score"]
-                        )
-                    )
+            products = await get_products_by_external_ids(
+                session, [hit["id"] for hit in vector_results]
+            )
+        
+        results = [
+            product_to_result(products[hit["id"]], hit["score"])
+            for hit in vector_results
+            if hit["id"] in products
+        ]
         
         query_time_ms = int((time.time() - start_time) * 1000)
         
@@ -276,131 +511,287 @@ async def search_by_image(
         
     except HTTPException:
         raise
+    except InferenceQueueFull as e:
+        record_search("by-image", time.time() - start_time, success=False)
+        logger.warning(f"Image search rejected: {e}")
+        raise overloaded_error(e)
     except Exception as e:
         # Record failed search
         record_search("by-image", time.time() - start_time, success=False)
         logger.error(f"Image search failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
-    finally:
-        # 5. Удаление временного файла
-        if temp_file and FilePath(temp_file_path).exists():
-            try:
-                FilePath(temp_file_path).unlink()
-                logger.debug(f"Temporary file deleted: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"Failed to delete temporary file: {e}")
+
+
+@router.post("/batch", response_model=BatchSearchResponse)
+async def search_batch(
+    texts: List[str] = Form(default=[], description="Text queries (repeat the field for several)"),
+    images: List[UploadFile] = File(default=[], description="Query image files"),
+    limit: int = Query(default=10, ge=1, le=50, description="Maximum number of results per query"),
+    min_similarity: float = Query(default=0.0, ge=0.0, le=1.0, description="Minimum similarity threshold"),
+    oversampling: Optional[float] = Query(default=None, ge=1.0, le=10.0, description="Quantized candidates per result (quantized collections)"),
+    rescore: Optional[bool] = Query(default=None, description="Re-rank quantized candidates with original vectors"),
+    hnsw_ef: Optional[int] = Query(default=None, ge=4, le=4096, description="HNSW search beam size (lower = faster, less precise)"),
+    exact: bool = Query(default=False, description="Exact full-scan search (slow; for offline jobs)"),
+    category: Optional[List[str]] = Query(default=None, description="Only these categories (repeat for several)"),
+    min_price: Optional[float] = Query(default=None, ge=0.0, description="Minimum price (inclusive)"),
+    max_price: Optional[float] = Query(default=None, ge=0.0, description="Maximum price (inclusive)"),
+    source: Optional[str] = Query(default=None, description="Only products from this source")
+) -> BatchSearchResponse:
+    """
+    Search products for many text and/or image queries in one request.
+    
+    All queries are embedded together (batched CLIP forward passes), searched in
+    one Qdrant batch request and hydrated with a single PostgreSQL query.
+    
+    Args:
+        texts: Text queries
+        images: Uploaded query images
+        limit: Maximum number of results per query
+        min_similarity: Minimum similarity threshold (0.0-1.0)
+        oversampling: Quantized candidates per result (defaults to settings)
+        rescore: Re-rank quantized candidates with original vectors (defaults to settings)
+        hnsw_ef: HNSW search beam size (defaults to settings)
+        exact: Exact full-scan search instead of HNSW
+        category: Only these categories
+        min_price: Minimum price (inclusive)
+        max_price: Maximum price (inclusive)
+        source: Only products from this source
+        
+    Returns:
+        Per-query results: text queries first, then images, in request order
+        
+    Raises:
+        HTTPException: If the batch or any of its queries is invalid, or search fails
+    """
+    start_time = time.time()
+    query_filter = build_filter(category, min_price, max_price, source)
+    
+    try:
+        total = len(texts) + len(images)
+        logger.info(f"Batch search: {len(texts)} texts, {len(images)} images (limit={limit})")
+        
+        # Валидация пакета
+        if total == 0:
+            raise HTTPException(status_code=400, detail="Provide at least one text or image query")
+        
+        if total > settings.search_batch_max_queries:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many queries: {total}. Maximum: {settings.search_batch_max_queries}"
+            )
+        
+        for text in texts:
+            if not 1 <= len(text.strip()) <= 500:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Text queries must be 1-500 characters long"
+                )
+        
+        image_inputs = []
+        for image in images:
+            if not image.content_type or not image.content_type.startswith("image/"):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid file type for {image.filename}: {image.content_type}. Must be an image."
+                )
+            
+            image_data = await image.read()
+            if len(image_data) > MAX_FILE_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File too large: {image.filename} ({len(image_data)} bytes). Maximum: {MAX_FILE_SIZE} bytes (10MB)"
+                )
+            image_inputs.append((image_data, image.filename))
+        
+        # 1. Эмбеддинги всех запросов (текст и изображения в своих очередях параллельно)
+        text_embeddings, image_embeddings = await asyncio.gather(
+            embed_query_texts(texts) if texts else asyncio.sleep(0, result=[]),
+            embed_query_images(image_inputs) if image_inputs else asyncio.sleep(0, result=[])
+        )
+        
+        queries = (
+            [("text", text) for text in texts]
+            + [("image", image.filename or f"image_{i}") for i, image in enumerate(images)]
+        )
+        embeddings = list(text_embeddings) + list(image_embeddings)
+        
+        # 2. Один пакетный запрос в Qdrant
+        qdrant = get_qdrant_manager()
+        
+        qdrant_start = time.time()
+        vector_results = await qdrant.search_similar_batch(
+            query_vectors=[embedding.tolist() for embedding in embeddings],
+            top_k=limit,
+            score_threshold=min_similarity,
+            oversampling=oversampling,
+            rescore=rescore,
+            hnsw_ef=hnsw_ef,
+            exact=exact,
+            query_filter=query_filter
+        )
+        record_qdrant_search(time.time() - qdrant_start)
+        
+        # 3. Метаданные всех найденных товаров одним запросом в PostgreSQL
+        async with get_session() as session:
+            products = await get_products_by_external_ids(
+                session, [hit["id"] for hits in vector_results for hit in hits]
+            )
+        
+        query_results = []
+        for (query_type, query), hits in zip(queries, vector_results):
+            results = [
+                product_to_result(products[hit["id"]], hit["score"])
+                for hit in hits
+                if hit["id"] in products
+            ]
+            query_results.append(
+                BatchQueryResult(
+                    query_type=query_type,
+                    query=query,
+                    results_count=len(results),
+                    results=results
+                )
+            )
+        
+        query_time_ms = int((time.time() - start_time) * 1000)
+        
+        # Record metrics
+        record_search("batch", time.time() - start_time, success=True)
+        
+        logger.info(f"Batch search completed: {total} queries in {query_time_ms}ms")
+        
+        return BatchSearchResponse(
+            query_time_ms=query_time_ms,
+            queries_count=total,
+            queries=query_results
+        )
+        
+    except HTTPException:
+        raise
+    except InferenceQueueFull as e:
+        record_search("batch", time.time() - start_time, success=False)
+        logger.warning(f"Batch search rejected: {e}")
+        raise overloaded_error(e)
+    except Exception as e:
+        record_search("batch", time.time() - start_time, success=False)
+        logger.error(f"Batch search failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
 @router.get("/similar/{product_id}", response_model=SearchResponse)
 async def search_similar_products(
     product_id: str = Path(..., description="Product external ID"),
-    limit: int = Query(default=10, ge=1, le=50, description="Maximum number of results")
+    limit: int = Query(default=10, ge=1, le=50, description="Maximum number of results"),
+    oversampling: Optional[float] = Query(default=None, ge=1.0, le=10.0, description="Quantized candidates per result (quantized collections)"),
+    rescore: Optional[bool] = Query(default=None, description="Re-rank quantized candidates with original vectors"),
+    hnsw_ef: Optional[int] = Query(default=None, ge=4, le=4096, description="HNSW search beam size (lower = faster, less precise)"),
+    exact: bool = Query(default=False, description="Exact full-scan search (slow; for offline jobs)"),
+    category: Optional[List[str]] = Query(default=None, description="Only these categories (repeat for several)"),
+    min_price: Optional[float] = Query(default=None, ge=0.0, description="Minimum price (inclusive)"),
+    max_price: Optional[float] = Query(default=None, ge=0.0, description="Maximum price (inclusive)"),
+    source: Optional[str] = Query(default=None, description="Only products from this source")
 ) -> SearchResponse:
     """
     Find similar products to a given product.
     
-    Retrieves the product's vector from Qdrant and searches for similar products.
+    Served from the precomputed neighbour table when it is enabled, has an
+    entry for the product and the request has no filter and no search tuning
+    (exact, hnsw_ef, oversampling, rescore); otherwise searches Qdrant with the
+    product's stored vector (no CLIP inference). Both paths keep only results
+    scoring above SIMILAR_SCORE_THRESHOLD (exclusive, as Qdrant's
+    score_threshold). The product itself is never returned.
     
     Args:
         product_id: External product ID
         limit: Maximum number of results to return
+        oversampling: Quantized candidates per result (defaults to settings)
+        rescore: Re-rank quantized candidates with original vectors (defaults to settings)
+        hnsw_ef: HNSW search beam size (defaults to settings)
+        exact: Exact full-scan search instead of HNSW
+        category: Only these categories
+        min_price: Minimum price (inclusive)
+        max_price: Maximum price (inclusive)
+        source: Only products from this source
         
     Returns:
         Search results with similar products
         
     Raises:
-        HTTPException: If product not found or search fails
+        HTTPException: If product is not indexed or search fails
     """
     start_time = time.time()
+    query_filter = build_filter(category, min_price, max_price, source)
     
     try:
         logger.info(f"Similar products search: {product_id} (limit={limit})")
         
-        # 1. Получить продукт и его эмбеддинг
-        qdrant = get_qdrant_manager()
-        
         async with get_session() as session:
-            product = await get_product_by_external_id(session, product_id)
-            
-            if not product:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Product not found: {product_id}"
-                )
+            # 1. Предрасчитанные соседи (поиск по ключу); таблица не знает о фильтрах
+            # и параметрах поиска, поэтому запросы с ними идут в Qdrant
+            vector_results = None
+            tuned = exact or any(param is not None for param in (oversampling, rescore, hnsw_ef))
+            if (
+                settings.similar_neighbors_enabled
+                and query_filter is None
+                and not tuned
+                and limit <= settings.similar_neighbors_top_k
+            ):
+                entries = await get_product_neighbors(session, [product_id])
+                if product_id in entries:
+                    entry = entries[product_id]
+                    vector_results = [
+                        {"id": neighbor_id, "score": score}
+                        for neighbor_id, score in zip(entry.neighbor_ids[:limit], entry.scores)
+                        if score > SIMILAR_SCORE_THRESHOLD
+                    ]
             
-            # Получить изображение и сгенерировать эмбеддинг
-            if product.image_url and product.image_url.startswith("file://"):
-                image_path = product.image_url.replace("file://", "")
-                
-                embedder = get_clip_embedder()
-                
-                clip_start = time.time()
-                embedding = await embedder.generate_embedding(image_path)
-                clip_duration = time.time() - clip_start
-                record_clip_inference(clip_duration)
-                
-                if embedding is None:
-                    raise HTTPException(
-                        status_code=500,
-                        detail="Failed to generate embedding for product image"
-                    )
+            # 2. Иначе искать похожие по сохранённому вектору товара
+            if vector_results is None:
+                qdrant = get_qdrant_manager()
                 
-                # 2. Искать похожие
                 qdrant_start = time.time()
-                vector_results = await qdrant.search_similar(
-                    query_vector=embedding.tolist(),
-                    top_k=limit + 1,
-                    score_threshold=0.0
+                vector_results = await qdrant.search_similar_to_product(
+                    product_id=product_id,
+                    top_k=limit,
+                    score_threshold=SIMILAR_SCORE_THRESHOLD,
+                    oversampling=oversampling,
+                    rescore=rescore,
+                    hnsw_ef=hnsw_ef,
+                    exact=exact,
+                    query_filter=query_filter
                 )
                 qdrant_duration = time.time() - qdrant_start
                 record_qdrant_search(qdrant_duration)
                 
-                # 3. Получить метаданные из PostgreSQL (исключая сам товар)
-                results = []
-                for vector_result in vector_results:
-                    result_product_id = vector_result["id"]
-                    
-                    # Пропустить сам товар
-                    if result_product_id == product_id:
-                        continue
-                    
-                    similar_product = await get_product_by_external_id(session, result_product_id)
-                    
-                    if similar_product:
-                        results.append(
-                            SearchResult(
-                                product_id=str(similar_product.id),
-                                external_id=similar_product.external_id,
-                                title=similar_product.title,
-                                description=similar_product.description,
-                                category=similar_product.category,
-                                price=similar_product.price,
-                                currency=similar_product.currency,
-                                image_url=similar_product.image_url,
-                                similarity_score=vector_result["score"]
-                            )
-                        )
-                    
-                    if len(results) >= limit:
-                        break
-                
-                query_time_ms = int((time.time() - start_time) * 1000)
-                
-                # Record metrics
-                record_search("similar", time.time() - start_time, success=True)
-                
-                logger.info(f"Similar products search completed: {len(results)} results in {query_time_ms}ms")
-                
-                return SearchResponse(
-                    query_time_ms=query_time_ms,
-                    results_count=len(results),
-                    results=results
-                )
-            else:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Product has no valid image URL"
-                )
+                if vector_results is None:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Product not found or not indexed: {product_id}"
+                    )
+            
+            # 3. Метаданные найденных товаров одним запросом в PostgreSQL
+            products = await get_products_by_external_ids(
+                session, [hit["id"] for hit in vector_results]
+            )
+        
+        results = [
+            product_to_result(products[hit["id"]], hit["score"])
+            for hit in vector_results
+            if hit["id"] in products
+        ]
+        
+        query_time_ms = int((time.time() - start_time) * 1000)
+        
+        # Record metrics
+        record_search("similar", time.time() - start_time, success=True)
+        
+        logger.info(f"Similar products search completed: {len(results)} results in {query_time_ms}ms")
+        
+        return SearchResponse(
+            query_time_ms=query_time_ms,
+            results_count=len(results),
+            results=results
+        )
         
     except HTTPException:
         raise
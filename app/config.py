@@ -2,7 +2,7 @@
 Configuration module using pydantic-settings for environment variable validation.
 """
 from typing import List
-from pydantic import Field, field_validator
+from pydantic import Field, ValidationInfo, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -64,11 +64,98 @@ class Settings(BaseSettings):
     qdrant_host: str = Field(default="localhost", description="Qdrant host")
     qdrant_port: int = Field(default=6333, description="Qdrant HTTP port")
     qdrant_grpc_port: int = Field(default=6334, description="Qdrant gRPC port")
+    qdrant_prefer_grpc: bool = Field(
+        default=False,
+        description="Talk to Qdrant over gRPC (qdrant_grpc_port) instead of REST"
+    )
+    qdrant_timeout: int = Field(default=5, description="Qdrant request timeout in seconds")
+    qdrant_pool_size: int = Field(
+        default=20,
+        description="Keep-alive REST connections per Qdrant client"
+    )
     qdrant_collection_name: str = Field(
         default="product_embeddings", 
         description="Qdrant collection name"
     )
     qdrant_vector_size: int = Field(default=512, description="Vector embedding size")
+    qdrant_quantization: str = Field(
+        default="none",
+        description="Quantization of new collections: 'none', 'int8' (4x less RAM) or 'binary' (32x)"
+    )
+    qdrant_on_disk_vectors: bool = Field(
+        default=False,
+        description="Keep original float32 vectors of new collections on disk (quantized stay in RAM)"
+    )
+    qdrant_search_oversampling: float = Field(
+        default=1.0,
+        description="Default candidates fetched from quantized vectors per requested result"
+    )
+    qdrant_search_rescore: bool = Field(
+        default=True,
+        description="Default re-ranking of quantized candidates with the original vectors"
+    )
+    qdrant_hnsw_m: int = Field(
+        default=16,
+        description="HNSW graph edges per node of new collections (more = better recall, more RAM)"
+    )
+    qdrant_hnsw_ef_construct: int = Field(
+        default=100,
+        description="HNSW beam size while building the graph of new collections"
+    )
+    qdrant_search_hnsw_ef: int = Field(
+        default=0,
+        description="Default HNSW search beam size (0 = Qdrant default)"
+    )
+    qdrant_upload_batch_size: int = Field(
+        default=256,
+        description="Points per request of bulk uploads (upload_vectors)"
+    )
+    qdrant_upload_parallel: int = Field(
+        default=4,
+        description="Parallel upload processes of bulk uploads (1 = upload from the calling thread)"
+    )
+    
+    @field_validator("qdrant_quantization")
+    @classmethod
+    def validate_quantization(cls, v: str) -> str:
+        """Validate Qdrant quantization setting."""
+        if v not in ["none", "int8", "binary"]:
+            raise ValueError("qdrant_quantization must be 'none', 'int8' or 'binary'")
+        return v
+    
+    # Vector Store Settings
+    vector_store: str = Field(
+        default="qdrant",
+        description="Vector index: 'qdrant' (server) or 'memmap' (in-process, memory-mapped files)"
+    )
+    vector_store_path: str = Field(
+        default="data/vector_store",
+        description="Directory of memmap collections"
+    )
+    vector_store_block_size: int = Field(
+        default=16384,
+        description="Rows scored per matrix multiplication in memmap search"
+    )
+    vector_store_ivf_lists: int = Field(
+        default=0,
+        description="IVF partitions of memmap collections (0 = exact search only)"
+    )
+    vector_store_ivf_probes: int = Field(
+        default=8,
+        description="IVF partitions scanned per memmap query (more = better recall, slower)"
+    )
+    vector_store_compact_ratio: float = Field(
+        default=0.2,
+        description="Compact a memmap collection once this share of its rows are tombstones"
+    )
+    
+    @field_validator("vector_store")
+    @classmethod
+    def validate_vector_store(cls, v: str) -> str:
+        """Validate vector store setting."""
+        if v not in ["qdrant", "memmap"]:
+            raise ValueError("vector_store must be 'qdrant' or 'memmap'")
+        return v
     
     # CLIP Model Settings
     clip_model_name: str = Field(
@@ -76,7 +163,115 @@ class Settings(BaseSettings):
         description="CLIP model name from HuggingFace"
     )
     clip_device: str = Field(default="cpu", description="Device for CLIP model (cpu/cuda)")
+    clip_backend: str = Field(
+        default="torch",
+        description="CLIP inference backend (torch/onnx/onnx-int8)"
+    )
+    clip_onnx_cache_dir: str = Field(
+        default="models/onnx",
+        description="Directory for exported ONNX towers"
+    )
     clip_batch_size: int = Field(default=32, description="Batch size for CLIP processing")
+    clip_num_threads: int = Field(
+        default=0,
+        description="CPU threads per CLIP forward pass (0 = torch/ONNX Runtime default)"
+    )
+    clip_interop_threads: int = Field(
+        default=0,
+        description="Torch inter-op threads (0 = torch default)"
+    )
+    clip_tuning_mode: str = Field(
+        default="online",
+        description="Entry of the tuning profile applied at startup: 'online', 'offline' or 'none'"
+    )
+    clip_tuning_profile_path: str = Field(
+        default="models/clip_tuning.json",
+        description="Tuning profile written by python -m app.models.tune"
+    )
+    clip_projection_path: str = Field(
+        default="",
+        description="Versioned PCA projection (.npy) applied to all embeddings ('' = full dimension)"
+    )
+    clip_decode_workers: int = Field(
+        default=4,
+        description="Threads decoding images ahead of the model in bulk embedding"
+    )
+    clip_prefetch_batches: int = Field(
+        default=2,
+        description="Batches decoded ahead of the one in the model in bulk embedding"
+    )
+    clip_draft_decode: bool = Field(
+        default=True,
+        description="Decode JPEGs at reduced scale (Image.draft) before resizing to CLIP input"
+    )
+    clip_max_batch_size: int = Field(
+        default=16,
+        description="Maximum number of online queries merged into one CLIP forward pass"
+    )
+    clip_max_batch_wait_ms: float = Field(
+        default=5.0,
+        description="How long the scheduler waits to fill a batch (milliseconds)"
+    )
+    clip_inference_workers: int = Field(
+        default=1,
+        description="Threads running CLIP inference off the event loop"
+    )
+    clip_inference_queue_size: int = Field(
+        default=64,
+        description="Queries allowed to wait for inference before requests are rejected with 503"
+    )
+    clip_sidecar_socket: str = Field(
+        default="",
+        description="Unix socket of the embedding sidecar ('' = load CLIP in every API worker)"
+    )
+    clip_sidecar_connections: int = Field(
+        default=16,
+        description="Connections (and in-flight queries) per API worker to the embedding sidecar"
+    )
+    clip_sidecar_connect_timeout: float = Field(
+        default=120.0,
+        description="Seconds an API worker waits at startup for the sidecar to load the model"
+    )
+    clip_sidecar_metrics_port: int = Field(
+        default=0,
+        description="Port of the embedding sidecar Prometheus exporter (0 = disabled)"
+    )
+    
+    # Bulk Embedding Farm Settings
+    embedding_farm_workers: int = Field(
+        default=0,
+        description="Worker processes for bulk embedding (0 = CPU cores / threads per worker)"
+    )
+    embedding_farm_threads: int = Field(
+        default=4,
+        description="Torch threads pinned in each bulk embedding worker"
+    )
+    embedding_farm_chunk_size: int = Field(
+        default=512,
+        description="Rows handed to a bulk embedding worker at a time"
+    )
+    
+    # Embedding Cache Settings
+    embedding_cache_enabled: bool = Field(
+        default=True,
+        description="Cache query embeddings (normalized text query -> vector)"
+    )
+    embedding_cache_max_size: int = Field(
+        default=10000,
+        description="Maximum number of embeddings kept in process memory"
+    )
+    embedding_cache_ttl_seconds: int = Field(
+        default=3600,
+        description="Lifetime of cached embeddings in seconds"
+    )
+    embedding_cache_images_enabled: bool = Field(
+        default=True,
+        description="Also cache embeddings of uploaded query images, keyed by content hash"
+    )
+    embedding_cache_redis_enabled: bool = Field(
+        default=False,
+        description="Share cached embeddings between workers via Redis"
+    )
     
     @field_validator("clip_device")
     @classmethod
@@ -86,6 +281,22 @@ class Settings(BaseSettings):
             raise ValueError("clip_device must be 'cpu' or 'cuda'")
         return v
     
+    @field_validator("clip_backend")
+    @classmethod
+    def validate_backend(cls, v: str) -> str:
+        """Validate CLIP backend setting."""
+        if v not in ["torch", "onnx", "onnx-int8"]:
+            raise ValueError("clip_backend must be 'torch', 'onnx' or 'onnx-int8'")
+        return v
+    
+    @field_validator("clip_tuning_mode")
+    @classmethod
+    def validate_tuning_mode(cls, v: str) -> str:
+        """Validate CLIP tuning mode setting."""
+        if v not in ["online", "offline", "none"]:
+            raise ValueError("clip_tuning_mode must be 'online', 'offline' or 'none'")
+        return v
+    
     # Celery Settings
     celery_broker_url: str = Field(
         default="redis://localhost:6379/1",
@@ -103,6 +314,14 @@ class Settings(BaseSettings):
         default=3600,
         description="Task time limit in seconds"
     )
+    celery_preload_model: bool = Field(
+        default=True,
+        description="Load CLIP in the worker parent before forking so prefork children share weights"
+    )
+    celery_metrics_port: int = Field(
+        default=0,
+        description="Port of the worker Prometheus exporter (0 = disabled)"
+    )
     
     # Image Processing Settings
     max_image_size: int = Field(default=1024, description="Maximum image dimension")
@@ -131,6 +350,26 @@ class Settings(BaseSettings):
     # Search Settings
     default_search_limit: int = Field(default=20, description="Default search results limit")
     max_search_limit: int = Field(default=100, description="Maximum search results limit")
+    search_batch_max_queries: int = Field(
+        default=32,
+        description="Maximum text and image queries in one /search/batch request"
+    )
+    similar_neighbors_enabled: bool = Field(
+        default=False,
+        description="Serve /search/similar from the precomputed neighbour table (scripts/build_neighbor_table.py)"
+    )
+    similar_neighbors_top_k: int = Field(
+        default=50,
+        description="Neighbours stored per product in the precomputed table"
+    )
+    similar_neighbors_block_size: int = Field(
+        default=512,
+        description="Products per block of the matrix multiplication when building the table"
+    )
+    similar_neighbors_refresh_concurrency: int = Field(
+        default=4,
+        description="Concurrent Qdrant queries while refreshing neighbour entries after catalogue changes"
+    )
     similarity_threshold: float = Field(
         default=0.5,
         description="Minimum similarity threshold for search results"
@@ -143,6 +382,32 @@ class Settings(BaseSettings):
         if not 0 <= v <= 1:
             raise ValueError("similarity_threshold must be between 0 and 1")
         return v
+
+    @field_validator("search_batch_max_queries")
+    @classmethod
+    def validate_search_batch_max_queries(cls, v: int, info: ValidationInfo) -> int:
+        """Validate a full /search/batch request fits into the inference queue."""
+        queue_size = info.data.get("clip_inference_queue_size")
+        if queue_size is not None and v > queue_size:
+            raise ValueError(
+                f"search_batch_max_queries ({v}) must not exceed clip_inference_queue_size ({queue_size}): "
+                "larger batches are always rejected"
+            )
+        return v
+
+    @field_validator("similar_neighbors_refresh_concurrency")
+    @classmethod
+    def validate_similar_neighbors_refresh_concurrency(cls, v: int, info: ValidationInfo) -> int:
+        """Validate neighbour refreshes leave Qdrant connections for live search."""
+        pool_size = info.data.get("qdrant_pool_size")
+        if v < 1:
+            raise ValueError("similar_neighbors_refresh_concurrency must be at least 1")
+        if pool_size is not None and v >= pool_size:
+            raise ValueError(
+                f"similar_neighbors_refresh_concurrency ({v}) must be below qdrant_pool_size ({pool_size}): "
+                "refreshes would take every connection from live search"
+            )
+        return v
     
     # Retry Settings
     max_retries: int = Field(default=3, description="Maximum number of retries")
@@ -4,6 +4,7 @@ Database clients for PostgreSQL and Qdrant.
 from .postgres import (
     Product,
     SearchLog,
+    ProductNeighbors,
     init_db,
     get_session,
     create_product,
@@ -16,11 +17,13 @@ from .postgres import (
     close_db,
 )
 from .qdrant import QdrantManager
+from .vector_store import VectorStore, create_vector_store
 
 __all__ = [
     # PostgreSQL models
     "Product",
     "SearchLog",
+    "ProductNeighbors",
     # PostgreSQL functions
     "init_db",
     "get_session",
@@ -34,5 +37,8 @@ __all__ = [
     "close_db",
     # Qdrant
     "QdrantManager",
+    # Vector store interface
+    "VectorStore",
+    "create_vector_store",
 ]
 
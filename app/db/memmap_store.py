@@ -0,0 +1,968 @@
+"""
+In-process vector store over memory-mapped files.
+
+An alternative to a Qdrant server for edge deployments, CI and benchmarks:
+vectors live in a float32 matrix on disk that the OS pages in on demand, and
+search is an exact top-K by blocked NumPy matrix multiplication. With
+``vector_store_ivf_lists`` > 0 the rows are also partitioned by k-means
+(IVF) and a query scans only the ``vector_store_ivf_probes`` closest
+partitions.
+
+Layout of a collection directory::
+
+    meta.json             dimension, distance, generation, row and tombstone counts
+    g<N>/vectors.f32      row-major float32 matrix (normalized for Cosine), append-only
+    g<N>/rows.jsonl       product_id and payload of each row, append-only
+    g<N>/tombstones.i64   numbers of deleted rows, append-only
+    g<N>/ivf.npy          IVF centroids (IVF mode)
+    g<N>/lists.i32        IVF partition of each row (IVF mode), append-only
+
+Writes only append: a replaced or deleted product leaves a tombstone on its
+old row. Once tombstones exceed ``vector_store_compact_ratio`` of the rows,
+the live rows are rewritten into generation N+1 (retraining IVF centroids)
+and meta.json is switched atomically. Writers hold an flock on the
+collection; every operation re-reads meta.json, so searches in the API
+process see rows appended by Celery workers.
+"""
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import numpy as np
+from loguru import logger
+from qdrant_client.models import (
+    Filter,
+    FieldCondition,
+    HasIdCondition,
+    MatchAny,
+    MatchValue,
+)
+
+from app.config import settings
+from app.db.qdrant import _product_id_to_uuid
+
+DISTANCES = ("Cosine", "Dot")
+
+# Minimum live rows per IVF partition before centroids are trained
+IVF_MIN_POINTS_PER_LIST = 39
+
+# Training sample per IVF partition and k-means iterations
+IVF_SAMPLE_PER_LIST = 256
+IVF_ITERATIONS = 10
+
+
+def exact_top_k(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    top_k: int,
+    block_size: int,
+    allowed: Optional[np.ndarray] = None,
+    candidates: Optional[np.ndarray] = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top-K rows by inner product, scoring block_size rows at a time.
+
+    Args:
+        vectors: Row matrix, shape (N, D); a memmap is read block by block
+        queries: Query matrix, shape (Q, D)
+        top_k: Results per query
+        block_size: Rows per matrix multiplication
+        allowed: Boolean mask of rows that may be returned (default: all)
+        candidates: Sorted row numbers to score instead of the whole matrix
+
+    Returns:
+        Tuple (rows, scores), both of shape (Q, min(top_k, candidates)),
+        best first; scores of excluded rows are -inf
+    """
+    if candidates is None and allowed is not None and allowed.sum() < len(vectors) // 2:
+        # Selective filter: gather the allowed rows instead of scanning all
+        candidates = np.flatnonzero(allowed)
+
+    total = len(vectors) if candidates is None else len(candidates)
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+    for start in range(0, total, block_size):
+        if candidates is None:
+            rows = np.arange(start, min(start + block_size, total))
+            scores = queries @ np.asarray(vectors[start:start + block_size], dtype=np.float32).T
+            if allowed is not None:
+                scores[:, ~allowed[rows]] = -np.inf
+        else:
+            rows = candidates[start:start + block_size]
+            scores = queries @ np.asarray(vectors[rows], dtype=np.float32).T
+
+        merged_rows = np.concatenate([best_rows, np.broadcast_to(rows, scores.shape)], axis=1)
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        k = min(top_k, merged_scores.shape[1])
+        keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+        best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def train_ivf(vectors: np.ndarray, lists: int, seed: int = 0) -> np.ndarray:
+    """
+    Train IVF centroids by spherical k-means on a sample of rows.
+
+    Args:
+        vectors: Row matrix, shape (N, D), N >= lists
+        lists: Number of partitions
+        seed: Random seed of sampling and initialization
+
+    Returns:
+        L2-normalized centroids, shape (lists, D)
+    """
+    rng = np.random.default_rng(seed)
+    size = min(len(vectors), lists * IVF_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), size=size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=lists, replace=False)]
+
+    for _ in range(IVF_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        # Reseed empty partitions with random rows
+        empty = np.bincount(assignment, minlength=lists) == 0
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+    return centroids.astype(np.float32)
+
+
+def assign_ivf(vectors: np.ndarray, centroids: np.ndarray, block_size: int) -> np.ndarray:
+    """IVF partition (closest centroid) of every row, as int32."""
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return lists
+
+
+class PayloadColumns:
+    """
+    Payload fields of one generation's rows as arrays, for vectorized filters.
+
+    A column is built on the first filter that uses its key and extended by the
+    rows appended since; rows never change once written, so earlier entries stay
+    valid until the generation is replaced. Values are dictionary-encoded
+    (equal values share an int code) next to a float copy for Range conditions
+    (NaN for missing and non-numeric values). Point UUIDs are computed only for
+    filters with a HasIdCondition.
+
+    Supports the conditions build_filter() produces and nesting: MatchValue,
+    MatchAny and Range field conditions, HasIdCondition and nested Filters
+    in must / should / must_not.
+    """
+
+    def __init__(self, ids: list[str], payloads: list[dict]):
+        """
+        Args:
+            ids: Product IDs of the rows (the store's list, appended in place)
+            payloads: Payloads of the rows (the store's list, appended in place)
+        """
+        self._ids = ids
+        self._payloads = payloads
+        self._lock = threading.Lock()
+        self._codes: dict[str, np.ndarray] = {}
+        self._numbers: dict[str, np.ndarray] = {}
+        self._vocabularies: dict[str, dict] = {}
+        self._uuid_rows: dict[str, list[int]] = {}
+        self._uuid_count = 0
+
+    def _column(self, key: str, rows: int) -> tuple[np.ndarray, dict, np.ndarray]:
+        """Codes, vocabulary and numeric values of a payload key for the first rows."""
+        with self._lock:
+            vocabulary = self._vocabularies.setdefault(key, {})
+            codes = self._codes.get(key, np.zeros(0, dtype=np.int32))
+            numbers = self._numbers.get(key, np.zeros(0, dtype=np.float64))
+            if len(codes) < rows:
+                new_codes = np.empty(rows - len(codes), dtype=np.int32)
+                new_numbers = np.full(rows - len(codes), np.nan)
+                for i, payload in enumerate(self._payloads[len(codes):rows]):
+                    value = payload.get(key)
+                    try:
+                        new_codes[i] = vocabulary.setdefault(value, len(vocabulary))
+                    except TypeError:
+                        # Lists and dicts never equal a match value
+                        new_codes[i] = -1
+                    if isinstance(value, (int, float)):
+                        new_numbers[i] = value
+                codes = self._codes[key] = np.concatenate([codes, new_codes])
+                numbers = self._numbers[key] = np.concatenate([numbers, new_numbers])
+            return codes[:rows], vocabulary, numbers[:rows]
+
+    def _id_mask(self, point_ids: list, rows: int) -> np.ndarray:
+        """Rows among the first rows whose point UUID is in point_ids."""
+        with self._lock:
+            for row in range(self._uuid_count, rows):
+                self._uuid_rows.setdefault(_product_id_to_uuid(self._ids[row]), []).append(row)
+            self._uuid_count = max(self._uuid_count, rows)
+            matched = [row for point_id in point_ids for row in self._uuid_rows.get(str(point_id), [])]
+
+        mask = np.zeros(rows, dtype=bool)
+        mask[[row for row in matched if row < rows]] = True
+        return mask
+
+    def _condition_mask(self, condition, rows: int) -> np.ndarray:
+        if isinstance(condition, Filter):
+            return self.mask(condition, rows)
+        if isinstance(condition, HasIdCondition):
+            return self._id_mask(condition.has_id, rows)
+        if isinstance(condition, FieldCondition):
+            codes, vocabulary, numbers = self._column(condition.key, rows)
+            if isinstance(condition.match, MatchValue):
+                code = vocabulary.get(condition.match.value)
+                return codes == code if code is not None else np.zeros(rows, dtype=bool)
+            if isinstance(condition.match, MatchAny):
+                return np.isin(codes, [vocabulary[v] for v in condition.match.any if v in vocabulary])
+            if condition.range is not None:
+                bounds = condition.range
+                mask = ~np.isnan(numbers)
+                if bounds.gte is not None:
+                    mask &= numbers >= bounds.gte
+                if bounds.gt is not None:
+                    mask &= numbers > bounds.gt
+                if bounds.lte is not None:
+                    mask &= numbers <= bounds.lte
+                if bounds.lt is not None:
+                    mask &= numbers < bounds.lt
+                return mask
+        raise ValueError(f"Unsupported filter condition for the memmap store: {condition!r}")
+
+    def mask(self, point_filter: Filter, rows: int) -> np.ndarray:
+        """
+        Evaluate a Qdrant filter against the first rows.
+
+        Args:
+            point_filter: Filter to evaluate
+            rows: Number of rows (a snapshot may be shorter than the lists)
+
+        Returns:
+            Boolean mask of the rows that pass the filter
+
+        Raises:
+            ValueError: If the filter contains an unsupported condition
+        """
+        mask = np.ones(rows, dtype=bool)
+        for condition in point_filter.must or []:
+            mask &= self._condition_mask(condition, rows)
+        if point_filter.should:
+            any_mask = np.zeros(rows, dtype=bool)
+            for condition in point_filter.should:
+                any_mask |= self._condition_mask(condition, rows)
+            mask &= any_mask
+        for condition in point_filter.must_not or []:
+            mask &= ~self._condition_mask(condition, rows)
+        return mask
+
+
+class MemmapVectorStore:
+    """
+    Vector store in memory-mapped files of the local file system.
+
+    Implements VectorStore. Qdrant tuning parameters of the search methods
+    (oversampling, rescore, hnsw_ef) are accepted and ignored; exact=True
+    skips IVF partitions.
+    """
+
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        path: Optional[str] = None,
+        ivf_lists: Optional[int] = None,
+        ivf_probes: Optional[int] = None,
+        block_size: Optional[int] = None,
+        compact_ratio: Optional[float] = None
+    ):
+        """
+        Initialize the store (files are opened lazily).
+
+        Args:
+            collection_name: Name of the collection (defaults to settings)
+            path: Directory holding the collections (defaults to settings)
+            ivf_lists: IVF partitions, 0 = exact search only (defaults to settings)
+            ivf_probes: Partitions scanned per query (defaults to settings)
+            block_size: Rows per matrix multiplication (defaults to settings)
+            compact_ratio: Tombstone share that triggers compaction (defaults to settings)
+        """
+        self.collection_name = collection_name or settings.qdrant_collection_name
+        self.root = Path(path or settings.vector_store_path) / self.collection_name
+        self.ivf_lists = settings.vector_store_ivf_lists if ivf_lists is None else ivf_lists
+        self.ivf_probes = ivf_probes or settings.vector_store_ivf_probes
+        self.block_size = block_size or settings.vector_store_block_size
+        self.compact_ratio = settings.vector_store_compact_ratio if compact_ratio is None else compact_ratio
+
+        self._lock = threading.RLock()
+        self._reset()
+        logger.info(f"✅ Memmap vector store: {self.root}")
+
+    async def __aenter__(self) -> "MemmapVectorStore":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    # ----- state -----
+
+    def _reset(self) -> None:
+        """Forget loaded files (next operation reloads them)."""
+        self._meta: Optional[dict] = None
+        self._ids: list[str] = []
+        self._payloads: list[dict] = []
+        self._columns = PayloadColumns(self._ids, self._payloads)
+        self._rows: dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._lists: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._inverted: Optional[tuple[np.ndarray, np.ndarray]] = None
+        self._rows_offset = 0
+        self._tombstones = 0
+
+    def _generation_dir(self, generation: int) -> Path:
+        return self.root / f"g{generation}"
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            return json.loads((self.root / "meta.json").read_text())
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp_path = self.root / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, self.root / "meta.json")
+
+    def _sync(self) -> None:
+        """Load rows and tombstones appended since the last call (or a new generation)."""
+        with self._lock:
+            meta = self._read_meta()
+            if meta is None:
+                self._reset()
+                return
+            if self._meta is None or meta["generation"] != self._meta["generation"]:
+                self._reset()
+                self._meta = {**meta, "rows": 0, "tombstones": 0}
+                self._vectors = np.zeros((0, meta["dim"]), dtype=np.float32)
+                if meta["ivf"]:
+                    self._centroids = np.load(self._generation_dir(meta["generation"]) / "ivf.npy")
+            if meta == self._meta:
+                return
+
+            directory = self._generation_dir(meta["generation"])
+            rows = meta["rows"]
+            if rows > len(self._ids):
+                with open(directory / "rows.jsonl", "rb") as f:
+                    f.seek(self._rows_offset)
+                    for _ in range(rows - len(self._ids)):
+                        record = json.loads(f.readline())
+                        self._rows[record["id"]] = len(self._ids)
+                        self._ids.append(record["id"])
+                        self._payloads.append(record["payload"])
+                    self._rows_offset = f.tell()
+
+                self._alive = np.concatenate([self._alive, np.ones(rows - len(self._alive), dtype=bool)])
+                self._vectors = np.memmap(
+                    directory / "vectors.f32", dtype=np.float32, mode="r", shape=(rows, meta["dim"])
+                )
+                if meta["ivf"]:
+                    self._lists = np.memmap(directory / "lists.i32", dtype=np.int32, mode="r", shape=(rows,))
+                    self._inverted = None
+
+            if meta["tombstones"] > self._tombstones:
+                dead = np.fromfile(
+                    directory / "tombstones.i64",
+                    dtype=np.int64,
+                    count=meta["tombstones"] - self._tombstones,
+                    offset=self._tombstones * 8
+                )
+                self._alive[dead] = False
+                for row in dead.tolist():
+                    if self._rows.get(self._ids[row]) == row:
+                        del self._rows[self._ids[row]]
+                self._tombstones = meta["tombstones"]
+
+            self._meta = meta
+
+    def _require(self) -> None:
+        self._sync()
+        if self._meta is None:
+            raise ValueError(f"Collection '{self.collection_name}' does not exist")
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive write access across threads and processes, with state synced."""
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._sync()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ----- writes (under _write_lock) -----
+
+    def _truncate_to_meta(self, directory: Path) -> None:
+        """
+        Cut files back to the sizes recorded in meta.json.
+
+        A write that failed before meta.json was updated leaves orphaned bytes
+        at the end of the files; the next write would otherwise land behind
+        them and shift rows against their ids.
+        """
+        sizes = {
+            "vectors.f32": self._meta["rows"] * self._meta["dim"] * 4,
+            "rows.jsonl": self._rows_offset,
+            "tombstones.i64": self._meta["tombstones"] * 8,
+        }
+        if self._meta["ivf"]:
+            sizes["lists.i32"] = self._meta["rows"] * 4
+        for name, size in sizes.items():
+            path = directory / name
+            if path.exists() and path.stat().st_size > size:
+                logger.warning(f"Discarding {path.stat().st_size - size} bytes of an incomplete write in {path}")
+                os.truncate(path, size)
+
+    def _append(self, product_ids: list[str], vectors: np.ndarray, payloads: list[dict]) -> None:
+        """Append rows, tombstoning previous rows of the same products."""
+        if self._meta is None:
+            raise ValueError(f"Collection '{self.collection_name}' does not exist")
+        if vectors.ndim != 2 or vectors.shape[1] != self._meta["dim"]:
+            raise ValueError(f"Vector shape {vectors.shape} does not match collection size {self._meta['dim']}")
+
+        # Last occurrence wins, as with sequential upserts
+        last = {product_id: i for i, product_id in enumerate(product_ids)}
+        order = sorted(last.values())
+        vectors = np.ascontiguousarray(vectors[order], dtype=np.float32)
+        if self._meta["distance"] == "Cosine":
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        # Everything that can fail (e.g. a payload that is not JSON) runs before the first write
+        records = "".join(
+            json.dumps({"id": product_ids[i], "payload": payloads[i]}) + "\n" for i in order
+        ).encode()
+        lists = assign_ivf(vectors, self._centroids, self.block_size) if self._centroids is not None else None
+        replaced = [self._rows[product_ids[i]] for i in order if product_ids[i] in self._rows]
+        directory = self._generation_dir(self._meta["generation"])
+
+        self._truncate_to_meta(directory)
+        with open(directory / "vectors.f32", "ab") as f:
+            vectors.tofile(f)
+        with open(directory / "rows.jsonl", "ab") as f:
+            f.write(records)
+        if lists is not None:
+            with open(directory / "lists.i32", "ab") as f:
+                lists.tofile(f)
+        if replaced:
+            with open(directory / "tombstones.i64", "ab") as f:
+                np.asarray(replaced, dtype=np.int64).tofile(f)
+
+        self._write_meta({
+            **self._meta,
+            "rows": self._meta["rows"] + len(order),
+            "tombstones": self._meta["tombstones"] + len(replaced)
+        })
+        self._sync()
+        self._maybe_compact()
+
+    def _delete(self, product_ids: list[str]) -> None:
+        """Tombstone the rows of the given products."""
+        if self._meta is None:
+            raise ValueError(f"Collection '{self.collection_name}' does not exist")
+
+        rows = sorted({self._rows[product_id] for product_id in product_ids if product_id in self._rows})
+        if not rows:
+            return
+
+        directory = self._generation_dir(self._meta["generation"])
+        self._truncate_to_meta(directory)
+        with open(directory / "tombstones.i64", "ab") as f:
+            np.asarray(rows, dtype=np.int64).tofile(f)
+
+        self._write_meta({**self._meta, "tombstones": self._meta["tombstones"] + len(rows)})
+        self._sync()
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        live = int(self._alive.sum())
+        dead = len(self._alive) - live
+        retrain = (
+            self.ivf_lists > 0
+            and live >= self.ivf_lists * IVF_MIN_POINTS_PER_LIST
+            and (self._centroids is None or len(self._centroids) != self.ivf_lists)
+        )
+        if retrain or (dead > 0 and dead >= self.compact_ratio * len(self._alive)):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite live rows into the next generation and retrain IVF centroids."""
+        live = np.flatnonzero(self._alive)
+        generation = self._meta["generation"] + 1
+        directory = self._generation_dir(generation)
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+
+        with open(directory / "vectors.f32", "wb") as f:
+            for start in range(0, len(live), self.block_size):
+                np.asarray(self._vectors[live[start:start + self.block_size]], dtype=np.float32).tofile(f)
+        with open(directory / "rows.jsonl", "w") as f:
+            for row in live.tolist():
+                f.write(json.dumps({"id": self._ids[row], "payload": self._payloads[row]}) + "\n")
+        (directory / "tombstones.i64").touch()
+
+        ivf = self.ivf_lists > 0 and len(live) >= self.ivf_lists * IVF_MIN_POINTS_PER_LIST
+        if ivf:
+            vectors = np.memmap(
+                directory / "vectors.f32", dtype=np.float32, mode="r", shape=(len(live), self._meta["dim"])
+            )
+            centroids = train_ivf(vectors, self.ivf_lists)
+            np.save(directory / "ivf.npy", centroids)
+            assign_ivf(vectors, centroids, self.block_size).tofile(directory / "lists.i32")
+            del vectors
+
+        self._write_meta({**self._meta, "generation": generation, "rows": len(live), "tombstones": 0, "ivf": ivf})
+        self._sync()
+
+        # Keep the previous generation for readers that have not switched yet
+        for old in self.root.glob("g*"):
+            if old.name[1:].isdigit() and int(old.name[1:]) < generation - 1:
+                shutil.rmtree(old, ignore_errors=True)
+
+        logger.info(
+            f"Compacted '{self.collection_name}' to generation {generation}: "
+            f"{len(live)} rows, ivf_lists={self.ivf_lists if ivf else 0}"
+        )
+
+    # ----- search -----
+
+    def _inverted_lists(self) -> tuple[np.ndarray, np.ndarray]:
+        """Rows sorted by IVF partition and partition boundaries."""
+        if self._inverted is None:
+            order = np.argsort(self._lists, kind="stable")
+            bounds = np.searchsorted(self._lists[order], np.arange(len(self._centroids) + 1))
+            self._inverted = (order, bounds)
+        return self._inverted
+
+    def _search(
+        self,
+        queries: Optional[np.ndarray],
+        top_k: int,
+        score_threshold: Optional[float],
+        exact: bool,
+        query_filter: Optional[Filter],
+        exclude: Optional[str] = None
+    ) -> Optional[list[list[dict]]]:
+        """
+        Top-K of each query row; runs in a worker thread.
+
+        With exclude set and queries None, the stored vector of that product is
+        the query and the product itself is left out of the results.
+        Like Qdrant, score_threshold is exclusive: a score equal to it is dropped.
+
+        Returns:
+            One result list per query, or None if exclude is not in the collection
+        """
+        with self._lock:
+            self._require()
+            if exclude is not None:
+                if exclude not in self._rows:
+                    return None
+                exclude_row = self._rows[exclude]
+                if queries is None:
+                    queries = self._vectors[[exclude_row]]
+            vectors, ids, payloads, columns = self._vectors, self._ids, self._payloads, self._columns
+            allowed = self._alive.copy()
+            distance = self._meta["distance"]
+            use_ivf = not exact and self.ivf_lists > 0 and self._centroids is not None
+            if use_ivf:
+                centroids = self._centroids
+                lists_order, lists_bounds = self._inverted_lists()
+
+        # The snapshot covers len(allowed) rows; later appends only extend the lists
+        if query_filter is not None:
+            allowed &= columns.mask(query_filter, len(allowed))
+        if exclude is not None:
+            allowed[exclude_row] = False
+
+        queries = np.asarray(queries, dtype=np.float32)
+        if distance == "Cosine":
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        if not use_ivf:
+            rows, scores = exact_top_k(vectors, queries, top_k, self.block_size, allowed=allowed)
+        else:
+            probes = min(self.ivf_probes, len(centroids))
+            closest = np.argpartition(-(queries @ centroids.T), probes - 1, axis=1)[:, :probes]
+            rows, scores = [], []
+            for query, lists in zip(queries, closest):
+                candidates = np.concatenate(
+                    [lists_order[lists_bounds[i]:lists_bounds[i + 1]] for i in lists]
+                )
+                candidates = np.sort(candidates[allowed[candidates]])
+                query_rows, query_scores = exact_top_k(
+                    vectors, query[None], top_k, self.block_size, candidates=candidates
+                )
+                rows.append(query_rows[0])
+                scores.append(query_scores[0])
+
+        return [
+            [
+                {"id": ids[row], "score": float(score), "payload": payloads[row]}
+                for row, score in zip(query_rows.tolist(), query_scores.tolist())
+                if score != -np.inf and (score_threshold is None or score > score_threshold)
+            ]
+            for query_rows, query_scores in zip(rows, scores)
+        ]
+
+    # ----- VectorStore -----
+
+    async def create_collection(self, vector_size: int = 512, distance: str = "Cosine") -> bool:
+        """
+        Create collection if it doesn't exist.
+
+        Args:
+            vector_size: Dimension of the vectors (default: 512 for CLIP)
+            distance: Distance metric - "Cosine" or "Dot"
+
+        Returns:
+            True if collection was created or already exists
+
+        Raises:
+            ValueError: If the distance is not supported
+        """
+        if distance not in DISTANCES:
+            raise ValueError(f"Unsupported distance for the memmap store: {distance}. Use one of {DISTANCES}")
+
+        def create():
+            with self._write_lock():
+                if self._meta is not None:
+                    logger.info(f"Collection '{self.collection_name}' already exists")
+                    return
+                directory = self._generation_dir(0)
+                directory.mkdir(parents=True, exist_ok=True)
+                for name in ("vectors.f32", "rows.jsonl", "tombstones.i64"):
+                    (directory / name).touch()
+                self._write_meta({
+                    "dim": vector_size, "distance": distance, "generation": 0,
+                    "rows": 0, "tombstones": 0, "ivf": False
+                })
+                self._sync()
+                logger.info(f"✅ Created memmap collection '{self.collection_name}' with vector_size={vector_size}")
+
+        await asyncio.to_thread(create)
+        return True
+
+    async def collection_exists(self) -> bool:
+        """Check if collection exists."""
+        return (self.root / "meta.json").exists()
+
+    async def delete_collection(self) -> bool:
+        """
+        Delete the collection directory.
+
+        Returns:
+            True if collection was deleted
+        """
+        def delete():
+            with self._write_lock():
+                shutil.rmtree(self.root, ignore_errors=True)
+                self._reset()
+
+        await asyncio.to_thread(delete)
+        logger.warning(f"⚠️  Deleted memmap collection '{self.collection_name}'")
+        return True
+
+    async def get_collection_info(self) -> dict:
+        """
+        Get collection information (same keys as QdrantManager).
+
+        Raises:
+            ValueError: If the collection does not exist
+        """
+        def info():
+            with self._lock:
+                self._require()
+                points = int(self._alive.sum())
+                return {
+                    "name": self.collection_name,
+                    "vectors_count": points,
+                    "points_count": points,
+                    "status": "green",
+                    "vector_size": self._meta["dim"],
+                    "distance": self._meta["distance"],
+                    "quantization": "none",
+                    "on_disk": True,
+                    "ivf_lists": len(self._centroids) if self._centroids is not None else 0,
+                    "tombstones": len(self._alive) - points
+                }
+
+        # Syncing reads files and waits for writers: keep it off the event loop
+        return await asyncio.to_thread(info)
+
+    async def count_vectors(self) -> int:
+        """Number of live points in the collection."""
+        def count():
+            with self._lock:
+                self._require()
+                return int(self._alive.sum())
+
+        return await asyncio.to_thread(count)
+
+    async def upsert_vectors(
+        self,
+        product_ids: list[str],
+        vectors: list[list[float]],
+        payloads: Optional[list[dict]] = None
+    ) -> bool:
+        """
+        Add or update vectors in the collection.
+
+        Args:
+            product_ids: List of unique product IDs (external_id)
+            vectors: List of embedding vectors
+            payloads: Optional list of metadata dictionaries for each vector
+
+        Returns:
+            True if operation was successful
+
+        Raises:
+            ValueError: If input lists have different lengths or the collection does not exist
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        await self.upload_vectors(product_ids, vectors, payloads)
+        return True
+
+    async def upload_vectors(
+        self,
+        product_ids: list[str],
+        vectors: np.ndarray,
+        payloads: Optional[list[dict]] = None,
+        batch_size: Optional[int] = None,
+        parallel: Optional[int] = None,
+        wait: bool = True
+    ) -> int:
+        """
+        Append a float32 matrix in one write.
+
+        Args:
+            product_ids: Unique product IDs (external_id), one per row
+            vectors: Embedding matrix of shape (N, D)
+            payloads: Optional metadata per row ("product_id" is added if missing)
+            batch_size: Ignored (one append per call)
+            parallel: Ignored
+            wait: Ignored (rows are searchable on return)
+
+        Returns:
+            Number of uploaded points
+
+        Raises:
+            ValueError: If the matrix is not 2-D, lengths differ or the collection does not exist
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError(f"Expected a 2-D vector matrix, got shape {vectors.shape}")
+        if len(product_ids) != len(vectors):
+            raise ValueError(f"Length mismatch: {len(product_ids)} product_ids vs {len(vectors)} vectors")
+        if payloads is not None and len(payloads) != len(vectors):
+            raise ValueError(f"Length mismatch: {len(payloads)} payloads vs {len(vectors)} vectors")
+        if not product_ids:
+            return 0
+
+        payloads = [
+            {**(payload or {}), "product_id": (payload or {}).get("product_id", product_id)}
+            for product_id, payload in zip(product_ids, payloads or [None] * len(product_ids))
+        ]
+
+        def append():
+            with self._write_lock():
+                self._append(list(product_ids), vectors, payloads)
+
+        await asyncio.to_thread(append)
+        logger.info(f"✅ Upserted {len(product_ids)} vectors to memmap collection '{self.collection_name}'")
+        return len(product_ids)
+
+    async def wait_for_updates(self) -> None:
+        """No-op: writes are applied before they return."""
+
+    async def delete_vectors(self, product_ids: list[str]) -> bool:
+        """
+        Delete vectors by product IDs (tombstones; space is reclaimed by compaction).
+
+        Returns:
+            True if operation was successful
+        """
+        if not product_ids:
+            logger.warning("No product IDs provided for deletion")
+            return True
+
+        def delete():
+            with self._write_lock():
+                self._delete(product_ids)
+
+        await asyncio.to_thread(delete)
+        logger.info(f"✅ Deleted {len(product_ids)} vectors from memmap collection '{self.collection_name}'")
+        return True
+
+    async def set_payloads(self, payloads: dict[str, dict]) -> None:
+        """
+        Merge payload fields into existing points (re-appends their rows).
+
+        Args:
+            payloads: Mapping product_id -> fields to set (other fields are kept)
+
+        Raises:
+            ValueError: If a point does not exist
+        """
+        if not payloads:
+            return
+
+        def update():
+            with self._write_lock():
+                missing = [product_id for product_id in payloads if product_id not in self._rows]
+                if missing:
+                    raise ValueError(f"Points not found: {missing[:5]}")
+                rows = [self._rows[product_id] for product_id in payloads]
+                self._append(
+                    list(payloads),
+                    np.asarray(self._vectors[rows], dtype=np.float32),
+                    [{**self._payloads[row], **fields} for row, fields in zip(rows, payloads.values())]
+                )
+
+        await asyncio.to_thread(update)
+
+    async def compact(self) -> None:
+        """Rewrite live rows now (and retrain IVF centroids) instead of waiting for the threshold."""
+        def compact():
+            with self._write_lock():
+                if self._meta is None:
+                    raise ValueError(f"Collection '{self.collection_name}' does not exist")
+                self._compact()
+
+        await asyncio.to_thread(compact)
+
+    async def search_similar(
+        self,
+        query_vector: list[float],
+        top_k: int = 10,
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
+    ) -> list[dict]:
+        """
+        Search for similar vectors.
+
+        Args:
+            query_vector: Query embedding vector
+            top_k: Number of results to return
+            score_threshold: Only results scoring above it are returned (None = all)
+            oversampling: Ignored
+            rescore: Ignored
+            hnsw_ef: Ignored
+            exact: Scan all rows even in IVF mode
+            query_filter: Payload filter (see build_filter)
+
+        Returns:
+            List of results with "id", "score" and "payload", best first
+        """
+        results = await asyncio.to_thread(
+            self._search, np.asarray([query_vector]), top_k, score_threshold, exact, query_filter
+        )
+        return results[0]
+
+    async def search_similar_batch(
+        self,
+        query_vectors: list[list[float]],
+        top_k: int = 10,
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
+    ) -> list[list[dict]]:
+        """
+        Search for several query vectors with one matrix multiplication per block.
+
+        Returns:
+            One result list per query vector, in query order
+        """
+        if len(query_vectors) == 0:
+            return []
+        return await asyncio.to_thread(
+            self._search, np.asarray(query_vectors), top_k, score_threshold, exact, query_filter
+        )
+
+    async def search_similar_to_product(
+        self,
+        product_id: str,
+        top_k: int = 10,
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
+    ) -> Optional[list[dict]]:
+        """
+        Find neighbours of a stored product by its vector; the product itself is excluded.
+
+        Returns:
+            List of results, or None if the product is not in the collection
+        """
+        results = await asyncio.to_thread(
+            self._search, None, top_k, score_threshold, exact, query_filter, product_id
+        )
+        return results[0] if results is not None else None
+
+    async def scroll_vectors(
+        self,
+        batch_size: int = 1000,
+        with_vectors: bool = True
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Iterate over all live points of the collection.
+
+        Args:
+            batch_size: Points per yielded batch
+            with_vectors: Include vectors (False: "vector" is None)
+
+        Yields:
+            Lists of dicts with "id" (point UUID), "vector" and "payload"
+        """
+        def snapshot():
+            with self._lock:
+                self._require()
+                return np.flatnonzero(self._alive), self._vectors, self._ids, self._payloads
+
+        def read(rows: np.ndarray) -> list[dict]:
+            block = np.asarray(vectors[rows]).tolist() if with_vectors else [None] * len(rows)
+            return [
+                {"id": _product_id_to_uuid(ids[row]), "vector": vector, "payload": payloads[row]}
+                for row, vector in zip(rows.tolist(), block)
+            ]
+
+        live, vectors, ids, payloads = await asyncio.to_thread(snapshot)
+        for start in range(0, len(live), batch_size):
+            yield await asyncio.to_thread(read, live[start:start + batch_size])
+
+    async def close(self) -> None:
+        """Drop the memory maps."""
+        def reset():
+            with self._lock:
+                self._reset()
+
+        await asyncio.to_thread(reset)
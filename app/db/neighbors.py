@@ -0,0 +1,214 @@
+"""
+Precomputed nearest-neighbour table for "similar products".
+
+A full build loads every vector of the collection and finds the top-K
+neighbours of each product by blocked matrix multiplication, so memory stays
+at block_size x N scores. Catalogue changes refresh single entries with
+Qdrant queries by stored vector. Entries live in the ``product_neighbors``
+PostgreSQL table, which turns /search/similar into a key lookup.
+"""
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.db.postgres import (
+    get_session,
+    get_product_neighbors,
+    upsert_product_neighbors,
+    delete_product_neighbors,
+)
+from app.db.vector_store import VectorStore
+
+
+def top_k_neighbors(
+    vectors: np.ndarray,
+    top_k: int,
+    block_size: int = 512
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find the top-K most similar vectors for every vector, excluding itself.
+
+    Args:
+        vectors: L2-normalized vectors, shape (N, D)
+        top_k: Neighbours per vector (capped at N - 1)
+        block_size: Rows scored against the whole matrix at a time
+
+    Returns:
+        Tuple (indices, scores), both of shape (N, min(top_k, N - 1)),
+        most similar first
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count = len(vectors)
+    k = max(min(top_k, count - 1), 0)
+    indices = np.empty((count, k), dtype=np.int64)
+    scores = np.empty((count, k), dtype=np.float32)
+    if k == 0:
+        return indices, scores
+
+    for start in range(0, count, block_size):
+        block = vectors[start:start + block_size]
+        rows = np.arange(len(block))
+
+        similarities = block @ vectors.T
+        similarities[rows, start + rows] = -np.inf
+
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(similarities, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+
+        indices[start:start + len(block)] = np.take_along_axis(candidates, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(candidate_scores, order, axis=1)
+
+    return indices, np.minimum(scores, 1.0)
+
+
+async def load_collection_vectors(
+    qdrant: VectorStore,
+    batch_size: int = 1000
+) -> tuple[list[str], np.ndarray]:
+    """
+    Load all vectors of the collection.
+
+    Args:
+        qdrant: Vector store
+        batch_size: Points fetched per request
+
+    Returns:
+        Tuple (product_ids, vectors) with L2-normalized vectors of shape (N, D)
+    """
+    product_ids: list[str] = []
+    blocks: list[np.ndarray] = []
+    async for batch in qdrant.scroll_vectors(batch_size=batch_size):
+        product_ids.extend(point["payload"]["product_id"] for point in batch)
+        blocks.append(np.asarray([point["vector"] for point in batch], dtype=np.float32))
+
+    if not blocks:
+        return [], np.empty((0, 0), dtype=np.float32)
+
+    vectors = np.concatenate(blocks)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return product_ids, vectors / np.maximum(norms, 1e-12)
+
+
+async def build_neighbor_table(
+    qdrant: VectorStore,
+    top_k: Optional[int] = None,
+    block_size: Optional[int] = None,
+    write_batch_size: int = 1000
+) -> int:
+    """
+    Rebuild the whole neighbour table from the collection.
+
+    Entries of products that are no longer in the collection are removed.
+
+    Args:
+        qdrant: Vector store
+        top_k: Neighbours per product (default: settings.similar_neighbors_top_k)
+        block_size: Rows per matrix multiplication block
+            (default: settings.similar_neighbors_block_size)
+        write_batch_size: Entries written per transaction
+
+    Returns:
+        Number of entries written
+    """
+    top_k = top_k or settings.similar_neighbors_top_k
+    block_size = block_size or settings.similar_neighbors_block_size
+    started_at = datetime.utcnow()
+
+    product_ids, vectors = await load_collection_vectors(qdrant)
+    logger.info(f"Loaded {len(product_ids)} vectors from '{qdrant.collection_name}'")
+
+    indices, scores = await asyncio.to_thread(top_k_neighbors, vectors, top_k, block_size)
+
+    written = 0
+    for start in range(0, len(product_ids), write_batch_size):
+        # Same exclusive 0.0 threshold as refreshes, which query Qdrant
+        entries = {
+            product_ids[row]: [
+                (product_ids[index], score)
+                for index, score in zip(indices[row].tolist(), scores[row].tolist())
+                if score > 0.0
+            ]
+            for row in range(start, min(start + write_batch_size, len(product_ids)))
+        }
+        async with get_session() as session:
+            written += await upsert_product_neighbors(session, entries)
+
+    async with get_session() as session:
+        stale = await delete_product_neighbors(session, updated_before=started_at)
+
+    logger.info(f"✅ Neighbour table rebuilt: {written} entries, {stale} stale removed (top_k={top_k})")
+    return written
+
+
+async def refresh_neighbors(
+    qdrant: VectorStore,
+    product_ids: list[str],
+    top_k: Optional[int] = None,
+    concurrency: Optional[int] = None
+) -> int:
+    """
+    Refresh entries of products touched by catalogue changes.
+
+    Entries of the products' previous and new neighbours are recomputed too:
+    similarity is symmetric, so those are the lists that most likely gain,
+    lose or re-rank a touched product. Products that are no longer in the
+    collection lose their entries.
+
+    Args:
+        qdrant: Vector store
+        product_ids: External IDs of created, updated or deleted products
+        top_k: Neighbours per product (default: settings.similar_neighbors_top_k)
+        concurrency: Qdrant queries in flight at a time
+            (default: settings.similar_neighbors_refresh_concurrency)
+
+    Returns:
+        Number of entries written
+    """
+    top_k = top_k or settings.similar_neighbors_top_k
+    # One limit for both rounds: the second covers up to 2 * top_k products
+    # per touched product and must not crowd out live search
+    limit = asyncio.Semaphore(concurrency or settings.similar_neighbors_refresh_concurrency)
+
+    async with get_session() as session:
+        previous = await get_product_neighbors(session, product_ids)
+
+    entries = await _query_neighbors(qdrant, product_ids, top_k, limit)
+
+    affected = {neighbor_id for entry in previous.values() for neighbor_id in entry.neighbor_ids}
+    affected.update(neighbor_id for hits in entries.values() if hits for neighbor_id, _ in hits)
+    affected.difference_update(product_ids)
+    entries.update(await _query_neighbors(qdrant, sorted(affected), top_k, limit))
+
+    found = {product_id: hits for product_id, hits in entries.items() if hits is not None}
+    missing = [product_id for product_id, hits in entries.items() if hits is None]
+
+    async with get_session() as session:
+        written = await upsert_product_neighbors(session, found)
+        if missing:
+            await delete_product_neighbors(session, external_ids=missing)
+
+    logger.info(f"Refreshed neighbours of {written} products, removed {len(missing)}")
+    return written
+
+
+async def _query_neighbors(
+    qdrant: VectorStore,
+    product_ids: list[str],
+    top_k: int,
+    limit: asyncio.Semaphore
+) -> dict[str, Optional[list[tuple[str, float]]]]:
+    """Query neighbours by stored vector; None for products not in the collection."""
+    async def query(product_id: str) -> Optional[list[dict]]:
+        async with limit:
+            return await qdrant.search_similar_to_product(product_id, top_k=top_k)
+
+    results = await asyncio.gather(*(query(product_id) for product_id in product_ids))
+    return {
+        product_id: None if hits is None else [(hit["id"], min(hit["score"], 1.0)) for hit in hits]
+        for product_id, hits in zip(product_ids, results)
+    }
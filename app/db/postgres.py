@@ -19,6 +19,7 @@ from sqlalchemy import (
     update,
     delete,
 )
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncSession,
@@ -80,6 +81,20 @@ class SearchLog(Base):
         return f"<SearchLog(id={self.id}, query_type='{self.query_type}', results_count={self.results_count})>"
 
 
+class ProductNeighbors(Base):
+    """Precomputed top-K similar products of one product (see app.db.neighbors)."""
+    
+    __tablename__ = "product_neighbors"
+    
+    external_id = Column(String(255), primary_key=True)
+    neighbor_ids = Column(JSON, nullable=False)  # external IDs, most similar first
+    scores = Column(JSON, nullable=False)  # similarity scores, aligned with neighbor_ids
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self) -> str:
+        return f"<ProductNeighbors(external_id='{self.external_id}', neighbors={len(self.neighbor_ids)})>"
+
+
 # Create indexes
 Index("idx_products_external_id", Product.external_id)
 Index("idx_products_category", Product.category)
@@ -286,6 +301,35 @@ async def get_product_by_external_id(session: AsyncSession, external_id: str) ->
         raise
 
 
+async def get_products_by_external_ids(
+    session: AsyncSession,
+    external_ids: list[str]
+) -> dict[str, Product]:
+    """
+    Get products by external IDs in a single query.
+
+    Args:
+        session: Database session
+        external_ids: External product IDs (duplicates allowed)
+
+    Returns:
+        Mapping external_id -> Product for the products that exist
+    """
+    try:
+        unique_ids = list(dict.fromkeys(external_ids))
+        if not unique_ids:
+            return {}
+
+        stmt = select(Product).where(Product.external_id.in_(unique_ids))
+        result = await session.execute(stmt)
+        products = {product.external_id: product for product in result.scalars().all()}
+        logger.debug(f"Found {len(products)}/{len(unique_ids)} products by external_id")
+        return products
+    except Exception as e:
+        logger.error(f"❌ Failed to get products by external_ids: {e}")
+        raise
+
+
 async def get_products_count(session: AsyncSession) -> int:
     """
     Get total count of products in database.
@@ -426,6 +470,117 @@ async def log_search(session: AsyncSession, log_data: dict) -> SearchLog:
         raise
 
 
+# CRUD Operations for ProductNeighbors
+async def get_product_neighbors(
+    session: AsyncSession,
+    external_ids: list[str]
+) -> dict[str, ProductNeighbors]:
+    """
+    Get precomputed neighbours of products in a single query.
+    
+    Args:
+        session: Database session
+        external_ids: External product IDs
+        
+    Returns:
+        Mapping external_id -> ProductNeighbors for the products that have an entry
+    """
+    try:
+        unique_ids = list(dict.fromkeys(external_ids))
+        if not unique_ids:
+            return {}
+        
+        stmt = select(ProductNeighbors).where(ProductNeighbors.external_id.in_(unique_ids))
+        result = await session.execute(stmt)
+        return {row.external_id: row for row in result.scalars().all()}
+    except Exception as e:
+        logger.error(f"❌ Failed to get product neighbors: {e}")
+        raise
+
+
+async def upsert_product_neighbors(
+    session: AsyncSession,
+    neighbors: dict[str, list[tuple[str, float]]]
+) -> int:
+    """
+    Insert or replace precomputed neighbours of products.
+    
+    Args:
+        session: Database session
+        neighbors: Mapping external_id -> [(neighbor external_id, score), ...],
+            most similar first
+        
+    Returns:
+        Number of rows written
+    """
+    try:
+        if not neighbors:
+            return 0
+        
+        now = datetime.utcnow()
+        rows = [
+            {
+                "external_id": external_id,
+                "neighbor_ids": [neighbor_id for neighbor_id, _ in hits],
+                "scores": [round(float(score), 6) for _, score in hits],
+                "updated_at": now,
+            }
+            for external_id, hits in neighbors.items()
+        ]
+        stmt = pg_insert(ProductNeighbors).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductNeighbors.external_id],
+            set_={
+                "neighbor_ids": stmt.excluded.neighbor_ids,
+                "scores": stmt.excluded.scores,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+        await session.execute(stmt)
+        logger.debug(f"Upserted neighbors of {len(rows)} products")
+        return len(rows)
+    except Exception as e:
+        logger.error(f"❌ Failed to upsert product neighbors: {e}")
+        raise
+
+
+async def delete_product_neighbors(
+    session: AsyncSession,
+    external_ids: Optional[list[str]] = None,
+    updated_before: Optional[datetime] = None
+) -> int:
+    """
+    Delete precomputed neighbours by product or by age.
+    
+    Args:
+        session: Database session
+        external_ids: Delete entries of these products
+        updated_before: Delete entries not refreshed since this time
+            (stale products after a full rebuild)
+        
+    Returns:
+        Number of deleted rows
+            
+    Raises:
+        ValueError: If neither condition is given
+    """
+    if external_ids is None and updated_before is None:
+        raise ValueError("external_ids or updated_before is required")
+    
+    try:
+        stmt = delete(ProductNeighbors)
+        if external_ids is not None:
+            stmt = stmt.where(ProductNeighbors.external_id.in_(external_ids))
+        if updated_before is not None:
+            stmt = stmt.where(ProductNeighbors.updated_at < updated_before)
+        result = await session.execute(stmt)
+        logger.debug(f"Deleted neighbors of {result.rowcount} products")
+        return result.rowcount
+    except Exception as e:
+        logger.error(f"❌ Failed to delete product neighbors: {e}")
+        raise
+
+
 async def close_db() -> None:
     """
     Close database engine and cleanup connections.
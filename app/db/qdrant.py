@@ -1,23 +1,65 @@
 """
 Qdrant vector database module with async support.
+
+Built on ``AsyncQdrantClient``: requests never block the event loop. One
+manager keeps one client with persistent connections (a keep-alive HTTP pool
+for REST, a single multiplexed channel for gRPC), so create it once and reuse it.
 """
-from typing import Optional
+import asyncio
+import copy
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Optional
 from uuid import uuid5, NAMESPACE_DNS
+
+import httpx
+import numpy as np
 from loguru import logger
 
-from qdrant_client import QdrantClient as QdrantClientSDK
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.models import (
     Distance,
     VectorParams,
+    VectorParamsDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    SearchParams,
     PointStruct,
+    FilterSelector,
     Filter,
     FieldCondition,
+    MatchAny,
     MatchValue,
+    Range,
+    PayloadSchemaType,
+    SetPayload,
+    SetPayloadOperation,
+    HasIdCondition,
+    QueryRequest,
+    ScoredPoint,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
 )
 
 from app.config import settings
 
 
+# Payload fields indexed for server-side filtering (written by product_payload)
+PAYLOAD_INDEXES = {
+    "category": PayloadSchemaType.KEYWORD,
+    "price": PayloadSchemaType.FLOAT,
+    "source": PayloadSchemaType.KEYWORD,
+}
+
+
 def _product_id_to_uuid(product_id: str) -> str:
     """
     Convert product_id string to UUID string.
@@ -31,42 +73,267 @@ def _product_id_to_uuid(product_id: str) -> str:
     return str(uuid5(NAMESPACE_DNS, product_id))
 
 
+def _format_point(point: ScoredPoint) -> dict:
+    """
+    Convert a search hit to the manager's result format.
+    
+    Args:
+        point: Scored point returned by Qdrant
+        
+    Returns:
+        Dictionary with "id" (product_id from payload), "score" and "payload"
+    """
+    return {
+        "id": point.payload.get("product_id", str(point.id)),
+        "score": float(point.score),
+        "payload": point.payload
+    }
+
+
+def _is_missing_point_error(error: Exception) -> bool:
+    """
+    Check whether a query by point ID failed because the point does not exist.
+    
+    REST and gRPC report "No point with id ... found", local mode raises
+    "Point ... is not found in the collection". A missing collection or an
+    unreachable server does not match.
+    """
+    message = str(error).lower()
+    return "no point with id" in message or ("point" in message and "not found" in message)
+
+
+def product_payload(
+    product_id: str,
+    category: Optional[str] = None,
+    price: Optional[float] = None,
+    source: Optional[str] = None,
+    **extra
+) -> dict:
+    """
+    Build a point payload with the filterable fields.
+    
+    Every upsert site should use it so that filters see the same fields.
+    Missing values are left out (filters on them never match).
+    
+    Args:
+        product_id: Product external ID
+        category: Product category
+        price: Product price (stored as float)
+        source: Where the product came from ("webhook", "bakai_s3", ...)
+        **extra: Additional payload fields
+        
+    Returns:
+        Payload dictionary
+    """
+    payload = {"product_id": product_id, **extra}
+    if category is not None:
+        payload["category"] = category
+    if price is not None:
+        payload["price"] = float(price)
+    if source is not None:
+        payload["source"] = source
+    return payload
+
+
+def build_filter(
+    categories: Optional[list[str]] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    source: Optional[str] = None
+) -> Optional[Filter]:
+    """
+    Build a Qdrant filter over the indexed payload fields.
+    
+    Args:
+        categories: Match any of these categories
+        min_price: Minimum price (inclusive)
+        max_price: Maximum price (inclusive)
+        source: Exact source
+        
+    Returns:
+        Filter, or None if no condition is given
+    """
+    conditions = []
+    if categories:
+        conditions.append(FieldCondition(key="category", match=MatchAny(any=list(categories))))
+    if min_price is not None or max_price is not None:
+        conditions.append(FieldCondition(key="price", range=Range(gte=min_price, lte=max_price)))
+    if source:
+        conditions.append(FieldCondition(key="source", match=MatchValue(value=source)))
+    return Filter(must=conditions) if conditions else None
+
+
+def versioned_collection_name(alias: Optional[str] = None) -> str:
+    """
+    Name for a new version of an aliased collection.
+    
+    Versions sort chronologically: ``product_embeddings_v20250101120000123456``
+    (UTC, microsecond resolution, so back-to-back reindexes get distinct names).
+    
+    Args:
+        alias: Alias the version will be published under (defaults to settings)
+        
+    Returns:
+        Versioned collection name
+    """
+    alias = alias or settings.qdrant_collection_name
+    return f"{alias}_v{datetime.now(timezone.utc):%Y%m%d%H%M%S%f}"
+
+
+def embedding_model_key(projection_version: Optional[str] = None) -> str:
+    """
+    Identifier of the embedding space vectors are written in.
+    
+    Stored as ``model_key`` in every point payload, so points of different
+    models (or projections) are never mixed when copying between versions.
+    
+    Args:
+        projection_version: Projection applied to the vectors (defaults to
+            the configured projection file, if any)
+        
+    Returns:
+        '<model name>' or '<model name>+<projection version>'
+    """
+    if projection_version is None and settings.clip_projection_path:
+        projection_version = Path(settings.clip_projection_path).stem
+    key = settings.clip_model_name
+    if projection_version:
+        key += f"+{projection_version}"
+    return key
+
+
+def _quantization_config(quantization: str):
+    """
+    Build the collection quantization config.
+    
+    Quantized vectors are always kept in RAM; originals are used for rescoring.
+    
+    Args:
+        quantization: "none", "int8" (scalar, 4x smaller) or "binary" (32x smaller)
+        
+    Returns:
+        Quantization config, or None for "none"
+    """
+    if quantization == "int8":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if quantization == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    if quantization == "none":
+        return None
+    raise ValueError(f"Invalid quantization: {quantization}. Use 'none', 'int8' or 'binary'")
+
+
+def _search_params(
+    oversampling: Optional[float] = None,
+    rescore: Optional[bool] = None,
+    hnsw_ef: Optional[int] = None,
+    exact: bool = False
+) -> SearchParams:
+    """
+    Build per-request search parameters (defaults from settings).
+    
+    Qdrant ignores the quantization parameters on collections without quantization.
+    
+    Args:
+        oversampling: Candidates fetched from quantized vectors per requested result
+        rescore: Re-rank candidates with the original vectors
+        hnsw_ef: HNSW search beam size; lower is faster and less precise
+            (0 or None with a zero setting = collection default)
+        exact: Full scan over the original vectors (no HNSW, no quantization)
+        
+    Returns:
+        SearchParams for a query
+    """
+    hnsw_ef = settings.qdrant_search_hnsw_ef if hnsw_ef is None else hnsw_ef
+    return SearchParams(
+        hnsw_ef=hnsw_ef or None,
+        exact=exact,
+        quantization=QuantizationSearchParams(
+            ignore=exact,
+            oversampling=settings.qdrant_search_oversampling if oversampling is None else oversampling,
+            rescore=settings.qdrant_search_rescore if rescore is None else rescore
+        )
+    )
+
+
 class QdrantManager:
     """
     Manager class for Qdrant vector database operations.
     
     Handles vector storage, search, and collection management for product embeddings.
+    Use as ``async with QdrantManager() as qdrant:`` or call :meth:`close` when done.
     """
     
+    _model_key: Optional[str] = None
+    
     def __init__(
         self,
         host: Optional[str] = None,
         port: Optional[int] = None,
-        collection_name: Optional[str] = None
+        collection_name: Optional[str] = None,
+        prefer_grpc: Optional[bool] = None,
+        grpc_port: Optional[int] = None,
+        model_key: Optional[str] = None
     ):
         """
         Initialize Qdrant manager.
         
         Args:
             host: Qdrant server host (defaults to settings)
-            port: Qdrant server port (defaults to settings)
+            port: Qdrant server REST port (defaults to settings)
             collection_name: Name of the collection (defaults to settings)
+            prefer_grpc: Use gRPC instead of REST (defaults to settings)
+            grpc_port: Qdrant server gRPC port (defaults to settings)
+            model_key: Embedding space of written vectors (defaults to embedding_model_key())
         """
+        self._model_key = model_key
         self.host = host or settings.qdrant_host
         self.port = port or settings.qdrant_port
+        self.grpc_port = grpc_port or settings.qdrant_grpc_port
+        self.prefer_grpc = settings.qdrant_prefer_grpc if prefer_grpc is None else prefer_grpc
         self.collection_name = collection_name or settings.qdrant_collection_name
         
         try:
-            self.client = QdrantClientSDK(host=self.host, port=self.port)
-            logger.info(f"✅ Connected to Qdrant: {self.host}:{self.port}")
+            pool_size = settings.qdrant_pool_size
+            self.client = AsyncQdrantClient(
+                host=self.host,
+                port=self.port,
+                grpc_port=self.grpc_port,
+                prefer_grpc=self.prefer_grpc,
+                timeout=settings.qdrant_timeout,
+                # The client disables keep-alive for localhost by default
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size
+                )
+            )
+            transport = f"gRPC :{self.grpc_port}" if self.prefer_grpc else f"REST :{self.port}"
+            logger.info(f"✅ Connected to Qdrant: {self.host} ({transport})")
         except Exception as e:
             logger.error(f"❌ Failed to connect to Qdrant: {e}")
             raise
     
+    @property
+    def model_key(self) -> str:
+        """Embedding space stamped into the payload of every written point."""
+        return self._model_key or embedding_model_key()
+    
+    async def __aenter__(self) -> "QdrantManager":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
     async def create_collection(
         self,
         vector_size: int = 512,
-        distance: str = "Cosine"
+        distance: str = "Cosine",
+        quantization: Optional[str] = None,
+        on_disk: Optional[bool] = None,
+        hnsw_m: Optional[int] = None,
+        hnsw_ef_construct: Optional[int] = None
     ) -> bool:
         """
         Create collection if it doesn't exist.
@@ -74,6 +341,10 @@ class QdrantManager:
         Args:
             vector_size: Dimension of the vectors (default: 512 for CLIP)
             distance: Distance metric - "Cosine", "Euclidean", or "Dot"
+            quantization: "none", "int8" or "binary" (defaults to settings)
+            on_disk: Keep original vectors on disk (defaults to settings)
+            hnsw_m: HNSW graph edges per node (defaults to settings)
+            hnsw_ef_construct: HNSW beam size while building the graph (defaults to settings)
             
         Returns:
             True if collection was created or already exists
@@ -97,32 +368,133 @@ class QdrantManager:
             if distance not in distance_map:
                 raise ValueError(f"Invalid distance metric: {distance}. Use 'Cosine', 'Euclidean', or 'Dot'")
             
+            quantization = quantization or settings.qdrant_quantization
+            on_disk = settings.qdrant_on_disk_vectors if on_disk is None else on_disk
+            hnsw_m = hnsw_m or settings.qdrant_hnsw_m
+            hnsw_ef_construct = hnsw_ef_construct or settings.qdrant_hnsw_ef_construct
+            
             # Create collection
-            self.client.create_collection(
+            await self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size=vector_size,
-                    distance=distance_map[distance]
-                )
+                    distance=distance_map[distance],
+                    on_disk=on_disk
+                ),
+                hnsw_config=HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+                quantization_config=_quantization_config(quantization)
             )
             
-            logger.info(f"✅ Created collection '{self.collection_name}' with vector_size={vector_size}, distance={distance}")
+            await self.create_payload_indexes()
+            
+            logger.info(
+                f"✅ Created collection '{self.collection_name}' with vector_size={vector_size}, "
+                f"distance={distance}, quantization={quantization}, on_disk={on_disk}, "
+                f"hnsw m={hnsw_m}, ef_construct={hnsw_ef_construct}"
+            )
             return True
             
         except Exception as e:
             logger.error(f"❌ Failed to create collection '{self.collection_name}': {e}")
             raise
     
+    async def create_payload_indexes(self) -> None:
+        """
+        Create indexes on the filterable payload fields (see PAYLOAD_INDEXES).
+        
+        Safe to call on a collection that already has them.
+        
+        Raises:
+            Exception: If index creation fails
+        """
+        try:
+            for field_name, field_schema in PAYLOAD_INDEXES.items():
+                await self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema
+                )
+            logger.info(f"✅ Payload indexes on '{self.collection_name}': {', '.join(PAYLOAD_INDEXES)}")
+        except Exception as e:
+            logger.error(f"❌ Failed to create payload indexes on '{self.collection_name}': {e}")
+            raise
+    
+    async def set_payloads(self, payloads: dict[str, dict]) -> None:
+        """
+        Merge payload fields into existing points in one request.
+        
+        Args:
+            payloads: Mapping product_id -> fields to set (other fields are kept)
+            
+        Raises:
+            Exception: If a point does not exist or the update fails
+        """
+        if not payloads:
+            return
+        try:
+            await self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=[
+                    SetPayloadOperation(
+                        set_payload=SetPayload(payload=payload, points=[_product_id_to_uuid(product_id)])
+                    )
+                    for product_id, payload in payloads.items()
+                ]
+            )
+            logger.debug(f"Updated payload of {len(payloads)} points in '{self.collection_name}'")
+        except Exception as e:
+            logger.error(f"❌ Failed to update payloads: {e}")
+            raise
+    
+    async def update_quantization(
+        self,
+        quantization: str,
+        on_disk: Optional[bool] = None
+    ) -> bool:
+        """
+        Change quantization and vector storage of the existing collection in place.
+        
+        Qdrant rebuilds the segments in the background; the collection stays
+        searchable and its status is "yellow" until the optimizers finish.
+        
+        Args:
+            quantization: "none", "int8" or "binary"
+            on_disk: Move original vectors to disk (True) or RAM (False); None keeps them
+            
+        Returns:
+            True if the update was accepted
+            
+        Raises:
+            Exception: If the update fails
+        """
+        try:
+            config = _quantization_config(quantization)
+            await self.client.update_collection(
+                collection_name=self.collection_name,
+                quantization_config=Disabled.DISABLED if config is None else config,
+                vectors_config=None if on_disk is None else {"": VectorParamsDiff(on_disk=on_disk)}
+            )
+            logger.info(
+                f"✅ Updated collection '{self.collection_name}': quantization={quantization}, on_disk={on_disk}"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to update quantization of '{self.collection_name}': {e}")
+            raise
+    
     async def collection_exists(self) -> bool:
         """
-        Check if collection exists.
+        Check if collection (or an alias with this name) exists.
         
         Returns:
             True if collection exists, False otherwise
         """
         try:
-            collections = self.client.get_collections().collections
-            exists = any(col.name == self.collection_name for col in collections)
+            collections = (await self.client.get_collections()).collections
+            exists = (
+                any(col.name == self.collection_name for col in collections)
+                or await self.get_alias_target() is not None
+            )
             logger.debug(f"Collection '{self.collection_name}' exists: {exists}")
             return exists
         except Exception as e:
@@ -142,6 +514,7 @@ class QdrantManager:
             product_ids: List of unique product IDs (external_id)
             vectors: List of embedding vectors
             payloads: Optional list of metadata dictionaries for each vector
+                ("product_id" is added if missing, "model_key" is always set)
             
         Returns:
             True if operation was successful
@@ -159,13 +532,15 @@ class QdrantManager:
                 raise ValueError(f"Length mismatch: {len(payloads)} payloads vs {len(vectors)} vectors")
             
             # Create default payloads if not provided
+            model_key = self.model_key
             if payloads is None:
-                payloads = [{"product_id": pid} for pid in product_ids]
+                payloads = [{"product_id": pid, "model_key": model_key} for pid in product_ids]
             else:
                 # Ensure product_id is in payload
                 for i, payload in enumerate(payloads):
                     if "product_id" not in payload:
                         payload["product_id"] = product_ids[i]
+                    payload["model_key"] = model_key
             
             # Create points with UUID
             points = [
@@ -178,7 +553,7 @@ class QdrantManager:
             ]
             
             # Upsert to Qdrant
-            self.client.upsert(
+            await self.client.upsert(
                 collection_name=self.collection_name,
                 points=points
             )
@@ -190,6 +565,109 @@ class QdrantManager:
             logger.error(f"❌ Failed to upsert vectors: {e}")
             raise
     
+    async def upload_vectors(
+        self,
+        product_ids: list[str],
+        vectors: np.ndarray,
+        payloads: Optional[list[dict]] = None,
+        batch_size: Optional[int] = None,
+        parallel: Optional[int] = None,
+        wait: bool = True
+    ) -> int:
+        """
+        Bulk upload a float32 matrix without per-point Python objects.
+        
+        The matrix goes to the client's batch uploader as is (a memmap
+        works), split into batch_size requests sent by parallel processes
+        with wait=False: Qdrant acknowledges each batch once it is in the
+        write-ahead log. Use it for indexing; upsert_vectors() remains the
+        path for single writes that must be visible on return.
+        
+        Args:
+            product_ids: Unique product IDs (external_id), one per row
+            vectors: Embedding matrix of shape (N, D)
+            payloads: Optional metadata per row ("product_id" is added if missing,
+                "model_key" is always set)
+            batch_size: Points per request (default: settings.qdrant_upload_batch_size)
+            parallel: Upload processes (default: settings.qdrant_upload_parallel)
+            wait: Finish with wait_for_updates(), so the points are searchable
+                on return; pass False when several uploads share one barrier
+            
+        Returns:
+            Number of uploaded points
+            
+        Raises:
+            ValueError: If the matrix is not 2-D or lengths differ
+            Exception: If upload fails
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError(f"Expected a 2-D vector matrix, got shape {vectors.shape}")
+        if len(product_ids) != len(vectors):
+            raise ValueError(f"Length mismatch: {len(product_ids)} product_ids vs {len(vectors)} vectors")
+        if payloads is not None and len(payloads) != len(vectors):
+            raise ValueError(f"Length mismatch: {len(payloads)} payloads vs {len(vectors)} vectors")
+        if not product_ids:
+            return 0
+        
+        model_key = self.model_key
+        if payloads is None:
+            payloads = ({"product_id": product_id, "model_key": model_key} for product_id in product_ids)
+        else:
+            payloads = (
+                {"product_id": product_id, **payload, "model_key": model_key}
+                for product_id, payload in zip(product_ids, payloads)
+            )
+        
+        try:
+            # The client uploader is blocking (own connections or processes): keep it off the event loop
+            await asyncio.to_thread(
+                self.client.upload_collection,
+                collection_name=self.collection_name,
+                vectors=vectors,
+                payload=payloads,
+                ids=[_product_id_to_uuid(product_id) for product_id in product_ids],
+                batch_size=batch_size or settings.qdrant_upload_batch_size,
+                parallel=parallel or settings.qdrant_upload_parallel,
+                wait=False
+            )
+            if wait:
+                await self.wait_for_updates()
+            
+            logger.info(f"✅ Uploaded {len(product_ids)} vectors to collection '{self.collection_name}'")
+            return len(product_ids)
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to upload vectors: {e}")
+            raise
+    
+    async def wait_for_updates(self) -> None:
+        """
+        Consistency barrier for writes sent with wait=False, on every shard.
+        
+        Sends a no-op write with wait=True: a delete by filter matching only a
+        reserved, never used ID. Unlike a delete by ID list, which is routed
+        to the single shard owning the ID, a filter selector is sent to all
+        shards (Qdrant cannot know where matching points live). Each shard
+        applies its updates in order, so the call returns only after every
+        previously acknowledged write is applied on every shard, and counts,
+        searches and alias switches that follow see the whole collection.
+        
+        Raises:
+            Exception: If the request fails
+        """
+        try:
+            await self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=FilterSelector(
+                    filter=Filter(must=[HasIdCondition(has_id=[_product_id_to_uuid("__write_barrier__")])])
+                ),
+                wait=True
+            )
+        except Exception as e:
+            logger.error(f"❌ Write barrier failed on '{self.collection_name}': {e}")
+            raise
+    
     async def delete_vectors(self, product_ids: list[str]) -> bool:
         """
         Delete vectors by product IDs.
@@ -211,7 +689,7 @@ class QdrantManager:
             # Convert product IDs to UUIDs
             uuids = [_product_id_to_uuid(pid) for pid in product_ids]
             
-            self.client.delete(
+            await self.client.delete(
                 collection_name=self.collection_name,
                 points_selector=uuids
             )
@@ -227,7 +705,12 @@ class QdrantManager:
         self,
         query_vector: list[float],
         top_k: int = 10,
-        score_threshold: float = 0.0
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
     ) -> list[dict]:
         """
         Search for similar vectors.
@@ -235,7 +718,12 @@ class QdrantManager:
         Args:
             query_vector: Query embedding vector
             top_k: Number of top results to return
-            score_threshold: Minimum similarity score (0.0 to 1.0)
+            score_threshold: Only results scoring above it are returned (None = all)
+            oversampling: Quantized candidates per result (defaults to settings)
+            rescore: Re-rank candidates with original vectors (defaults to settings)
+            hnsw_ef: HNSW search beam size (defaults to settings)
+            exact: Exact full-scan search instead of HNSW
+            query_filter: Payload filter applied inside Qdrant (see build_filter)
             
         Returns:
             List of dictionaries with format:
@@ -253,22 +741,19 @@ class QdrantManager:
         """
         try:
             # Perform search
-            search_results = self.client.search(
+            response = await self.client.query_points(
                 collection_name=self.collection_name,
-                query_vector=query_vector,
+                query=query_vector,
+                query_filter=query_filter,
                 limit=top_k,
-                score_threshold=score_threshold
+                score_threshold=score_threshold,
+                search_params=_search_params(oversampling, rescore, hnsw_ef, exact),
+                with_payload=True
             )
+            search_results = response.points
             
             # Format results - return product_id from payload
-            results = [
-                {
-                    "id": result.payload.get("product_id", str(result.id)),
-                    "score": float(result.score),
-                    "payload": result.payload
-                }
-                for result in search_results
-            ]
+            results = [_format_point(result) for result in search_results]
             
             logger.info(f"✅ Found {len(results)} similar vectors (top_k={top_k}, threshold={score_threshold})")
             return results
@@ -277,6 +762,132 @@ class QdrantManager:
             logger.error(f"❌ Failed to search similar vectors: {e}")
             raise
     
+    async def search_similar_to_product(
+        self,
+        product_id: str,
+        top_k: int = 10,
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
+    ) -> Optional[list[dict]]:
+        """
+        Search for vectors similar to a stored product's vector.
+        
+        Qdrant looks up the product's point and searches with its vector
+        server-side (one round trip, no re-embedding); the product itself is
+        excluded from the results.
+        
+        Args:
+            product_id: Product external ID of the stored point
+            top_k: Number of top results to return
+            score_threshold: Only results scoring above it are returned (None = all)
+            oversampling: Quantized candidates per result (defaults to settings)
+            rescore: Re-rank candidates with original vectors (defaults to settings)
+            hnsw_ef: HNSW search beam size (defaults to settings)
+            exact: Exact full-scan search instead of HNSW
+            query_filter: Payload filter applied inside Qdrant (see build_filter)
+            
+        Returns:
+            Results in the format of :meth:`search_similar`, or None if the
+            product is not in the collection
+            
+        Raises:
+            Exception: If search operation fails
+        """
+        point_id = _product_id_to_uuid(product_id)
+        try:
+            response = await self.client.query_points(
+                collection_name=self.collection_name,
+                query=point_id,
+                query_filter=Filter(
+                    must=[query_filter] if query_filter else None,
+                    must_not=[HasIdCondition(has_id=[point_id])]
+                ),
+                limit=top_k,
+                score_threshold=score_threshold,
+                search_params=_search_params(oversampling, rescore, hnsw_ef, exact),
+                with_payload=True
+            )
+        except Exception as e:
+            if _is_missing_point_error(e):
+                logger.info(f"Product {product_id} is not indexed in '{self.collection_name}'")
+                return None
+            logger.error(f"❌ Failed to search similar to product {product_id}: {e}")
+            raise
+        
+        results = [_format_point(result) for result in response.points]
+        logger.info(f"✅ Found {len(results)} vectors similar to {product_id} (top_k={top_k})")
+        return results
+    
+    async def search_similar_batch(
+        self,
+        query_vectors: list[list[float]],
+        top_k: int = 10,
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
+    ) -> list[list[dict]]:
+        """
+        Search for several query vectors in one request.
+        
+        Args:
+            query_vectors: Query embedding vectors
+            top_k: Number of top results to return per query
+            score_threshold: Only results scoring above it are returned (None = all)
+            oversampling: Quantized candidates per result (defaults to settings)
+            rescore: Re-rank candidates with original vectors (defaults to settings)
+            hnsw_ef: HNSW search beam size (defaults to settings)
+            exact: Exact full-scan search instead of HNSW
+            query_filter: Payload filter applied inside Qdrant (see build_filter)
+            
+        Returns:
+            One result list per query vector, in the same order and format
+            as :meth:`search_similar`
+            
+        Raises:
+            Exception: If search operation fails
+        """
+        try:
+            if not query_vectors:
+                return []
+            
+            params = _search_params(oversampling, rescore, hnsw_ef, exact)
+            responses = await self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=[
+                    QueryRequest(
+                        query=query_vector,
+                        filter=query_filter,
+                        limit=top_k,
+                        score_threshold=score_threshold,
+                        params=params,
+                        with_payload=True
+                    )
+                    for query_vector in query_vectors
+                ]
+            )
+            
+            results = [
+                [_format_point(result) for result in response.points]
+                for response in responses
+            ]
+            
+            logger.info(
+                f"✅ Batch search: {len(query_vectors)} queries, "
+                f"{sum(len(r) for r in results)} results (top_k={top_k}, threshold={score_threshold})"
+            )
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to batch search similar vectors: {e}")
+            raise
+    
     async def get_collection_info(self) -> dict:
         """
         Get information about the collection.
@@ -289,22 +900,36 @@ class QdrantManager:
                 "points_count": 1000,
                 "status": "green",
                 "vector_size": 512,
-                "distance": "Cosine"
+                "distance": "Cosine",
+                "quantization": "int8",
+                "on_disk": False
             }
             
         Raises:
             Exception: If collection doesn't exist or operation fails
         """
         try:
-            collection_info = self.client.get_collection(self.collection_name)
+            collection_info = await self.client.get_collection(self.collection_name)
+            quantization_config = collection_info.config.quantization_config
+            if isinstance(quantization_config, ScalarQuantization):
+                quantization = "int8"
+            elif isinstance(quantization_config, BinaryQuantization):
+                quantization = "binary"
+            else:
+                quantization = "none"
             
+            # CollectionInfo.vectors_count is gone from current clients; with one
+            # unnamed vector per point the number of vectors is the number of points
+            points_count = collection_info.points_count or 0
             info = {
                 "name": self.collection_name,
-                "vectors_count": collection_info.vectors_count or 0,
-                "points_count": collection_info.points_count,
+                "vectors_count": points_count,
+                "points_count": points_count,
                 "status": collection_info.status,
                 "vector_size": collection_info.config.params.vectors.size,
-                "distance": collection_info.config.params.vectors.distance.name
+                "distance": collection_info.config.params.vectors.distance.name,
+                "quantization": quantization,
+                "on_disk": bool(collection_info.config.params.vectors.on_disk)
             }
             
             logger.debug(f"Collection info: {info}")
@@ -325,7 +950,7 @@ class QdrantManager:
             Exception: If collection doesn't exist or operation fails
         """
         try:
-            collection_info = self.client.get_collection(self.collection_name)
+            collection_info = await self.client.get_collection(self.collection_name)
             count = collection_info.points_count
             logger.debug(f"Collection '{self.collection_name}' has {count} vectors")
             return count
@@ -333,6 +958,286 @@ class QdrantManager:
             logger.error(f"❌ Failed to count vectors: {e}")
             raise
     
+    async def scroll_vectors(
+        self,
+        batch_size: int = 1000,
+        with_vectors: bool = True
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Iterate over all points of the collection with their vectors.
+        
+        Args:
+            batch_size: Points fetched per request
+            with_vectors: Fetch vectors (False: "vector" is None, payload only)
+            
+        Yields:
+            Batches of dictionaries with "id", "vector" and "payload"
+            
+        Raises:
+            Exception: If scrolling fails
+        """
+        offset = None
+        try:
+            while True:
+                points, offset = await self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=with_vectors
+                )
+                if points:
+                    yield [
+                        {"id": str(point.id), "vector": point.vector, "payload": point.payload}
+                        for point in points
+                    ]
+                if offset is None:
+                    break
+        except Exception as e:
+            logger.error(f"❌ Failed to scroll collection '{self.collection_name}': {e}")
+            raise
+    
+    def for_collection(self, collection_name: str) -> "QdrantManager":
+        """
+        Manager for another collection on the same connection.
+        
+        The sibling shares this manager's client: close only one of them.
+        
+        Args:
+            collection_name: Collection (or alias) the sibling works with
+            
+        Returns:
+            QdrantManager for collection_name
+        """
+        sibling = copy.copy(self)
+        sibling.collection_name = collection_name
+        return sibling
+    
+    async def get_alias_target(self) -> Optional[str]:
+        """
+        Get the collection this manager's name points to as an alias.
+        
+        Returns:
+            Target collection name, or None if the name is not an alias
+        """
+        response = await self.client.get_aliases()
+        for alias in response.aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        return None
+    
+    async def list_versions(self) -> list[str]:
+        """
+        List versioned collections of this manager's alias, oldest first.
+        
+        Returns:
+            Collection names created by :func:`versioned_collection_name`
+        """
+        response = await self.client.get_collections()
+        prefix = f"{self.collection_name}_v"
+        return sorted(
+            c.name for c in response.collections
+            if c.name.startswith(prefix) and c.name[len(prefix):].isdigit()
+        )
+    
+    async def switch_alias(self, target_collection: str, replace_collection: bool = False) -> Optional[str]:
+        """
+        Atomically point this manager's name (the alias) at another collection.
+        
+        Readers and writers using the alias move to the target in one step, so
+        a collection can be built in full before it goes live.
+        
+        Args:
+            target_collection: Collection to publish, usually a new version
+            replace_collection: If a plain collection holds the alias name
+                (deployments before aliases), delete it first. This one-time
+                switch is not atomic and has no rollback target.
+            
+        Returns:
+            Previous target of the alias, or None
+            
+        Raises:
+            ValueError: If a plain collection holds the alias name and
+                replace_collection is False
+            Exception: If the switch fails
+        """
+        try:
+            previous = await self.get_alias_target()
+            
+            if previous is None and await self.collection_exists():
+                if not replace_collection:
+                    raise ValueError(
+                        f"'{self.collection_name}' is a collection, not an alias; "
+                        f"pass replace_collection=True to replace it"
+                    )
+                await self.client.delete_collection(self.collection_name)
+                logger.warning(f"⚠️  Deleted plain collection '{self.collection_name}' to replace it with an alias")
+            
+            operations = []
+            if previous is not None:
+                operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=self.collection_name)))
+            operations.append(CreateAliasOperation(
+                create_alias=CreateAlias(collection_name=target_collection, alias_name=self.collection_name)
+            ))
+            await self.client.update_collection_aliases(change_aliases_operations=operations)
+            
+            logger.info(f"✅ Alias '{self.collection_name}': {previous} -> {target_collection}")
+            return previous
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to switch alias '{self.collection_name}' to '{target_collection}': {e}")
+            raise
+    
+    async def publish_version(self, version: str, carry_over: bool = False) -> Optional[str]:
+        """
+        Publish a fully built version under this manager's name (the alias).
+        
+        A plain collection holding the alias name (deployments before aliases)
+        is replaced; with carry_over its points reach the new version first.
+        
+        Args:
+            version: Versioned collection to publish
+            carry_over: Copy points of the live collection that the version
+                lacks (products indexed while it was built). Off by default:
+                it also restores products the rebuild left out on purpose
+            
+        Returns:
+            Previously live collection (rollback target), or None
+            
+        Raises:
+            ValueError: If carry_over is set and the live collection holds
+                vectors of another size, distance or model (nothing is published)
+        """
+        if carry_over and await self.collection_exists():
+            await self.for_collection(version).copy_missing_from(self.collection_name)
+        return await self.switch_alias(version, replace_collection=True)
+    
+    async def rollback_alias(self) -> str:
+        """
+        Point the alias back at the version preceding the current one.
+        
+        Returns:
+            Collection the alias points to now
+            
+        Raises:
+            ValueError: If there is no earlier version
+        """
+        current = await self.get_alias_target()
+        earlier = [version for version in await self.list_versions() if current is None or version < current]
+        if not earlier:
+            raise ValueError(f"No version of '{self.collection_name}' before {current}")
+        
+        await self.switch_alias(earlier[-1])
+        return earlier[-1]
+    
+    async def delete_old_versions(self, keep: int = 2) -> list[str]:
+        """
+        Delete old versions, keeping the newest ones and the live one.
+        
+        Args:
+            keep: Number of newest versions to keep (rollback targets)
+            
+        Returns:
+            Deleted collection names
+        """
+        current = await self.get_alias_target()
+        versions = await self.list_versions()
+        stale = [v for v in versions[:max(len(versions) - keep, 0)] if v != current]
+        
+        for version in stale:
+            await self.client.delete_collection(version)
+            logger.info(f"Deleted old version '{version}'")
+        return stale
+    
+    async def copy_missing_from(self, source_collection: str, batch_size: int = 1000) -> int:
+        """
+        Copy points of another collection that this collection lacks.
+        
+        Used before publishing a new version to carry over products indexed
+        (e.g. by webhooks) into the live collection while the version was built.
+        Vectors are copied as is, so nothing is copied unless both collections
+        have the same vector size and distance and every missing point carries
+        this manager's model_key.
+        
+        Args:
+            source_collection: Collection or alias to copy from
+            batch_size: Points per request
+            
+        Returns:
+            Number of copied points
+            
+        Raises:
+            ValueError: If the collections or the points' models do not match
+        """
+        try:
+            source_params = (await self.client.get_collection(source_collection)).config.params.vectors
+            target_params = (await self.client.get_collection(self.collection_name)).config.params.vectors
+            if (source_params.size, source_params.distance) != (target_params.size, target_params.distance):
+                raise ValueError(
+                    f"Cannot copy from '{source_collection}' ({source_params.size}, {source_params.distance}) "
+                    f"to '{self.collection_name}' ({target_params.size}, {target_params.distance})"
+                )
+            
+            # Check every missing point before copying any, so a refusal leaves this collection as built
+            missing_ids = []
+            foreign_keys = set()
+            offset = None
+            while True:
+                points, offset = await self.client.scroll(
+                    collection_name=source_collection,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=["model_key"],
+                    with_vectors=False
+                )
+                if points:
+                    existing = await self.client.retrieve(
+                        collection_name=self.collection_name,
+                        ids=[point.id for point in points],
+                        with_payload=False,
+                        with_vectors=False
+                    )
+                    existing_ids = {str(point.id) for point in existing}
+                    for point in points:
+                        if str(point.id) in existing_ids:
+                            continue
+                        missing_ids.append(point.id)
+                        model_key = (point.payload or {}).get("model_key")
+                        if model_key != self.model_key:
+                            foreign_keys.add(model_key)
+                if offset is None:
+                    break
+            
+            if foreign_keys:
+                raise ValueError(
+                    f"'{source_collection}' holds points of model(s) {sorted(map(str, foreign_keys))}, "
+                    f"not '{self.model_key}': refusing to copy them into '{self.collection_name}'"
+                )
+            
+            copied = 0
+            for start in range(0, len(missing_ids), batch_size):
+                points = await self.client.retrieve(
+                    collection_name=source_collection,
+                    ids=missing_ids[start:start + batch_size],
+                    with_payload=True,
+                    with_vectors=True
+                )
+                if points:
+                    await self.client.upsert(
+                        collection_name=self.collection_name,
+                        points=[
+                            PointStruct(id=point.id, vector=point.vector, payload=point.payload)
+                            for point in points
+                        ]
+                    )
+                    copied += len(points)
+        except Exception as e:
+            logger.error(f"❌ Failed to copy points from '{source_collection}': {e}")
+            raise
+        
+        logger.info(f"✅ Copied {copied} missing points from '{source_collection}' to '{self.collection_name}'")
+        return copied
+    
     async def delete_collection(self) -> bool:
         """
         Delete the entire collection.
@@ -343,14 +1248,18 @@ class QdrantManager:
             True if collection was deleted
             
         Raises:
+            ValueError: If the name is an alias (delete its versions instead)
             Exception: If delete operation fails
         """
         try:
+            if await self.get_alias_target() is not None:
+                raise ValueError(f"'{self.collection_name}' is an alias; delete its versions instead")
+            
             if not await self.collection_exists():
                 logger.warning(f"Collection '{self.collection_name}' does not exist")
                 return True
             
-            self.client.delete_collection(self.collection_name)
+            await self.client.delete_collection(self.collection_name)
             logger.warning(f"⚠️  Deleted collection '{self.collection_name}'")
             return True
             
@@ -358,13 +1267,13 @@ class QdrantManager:
             logger.error(f"❌ Failed to delete collection: {e}")
             raise
     
-    def close(self) -> None:
+    async def close(self) -> None:
         """
-        Close the Qdrant client connection.
+        Close the Qdrant client connections.
         """
         try:
             if hasattr(self, 'client') and self.client:
-                self.client.close()
+                await self.client.close()
                 logger.info("Qdrant client connection closed")
         except Exception as e:
             logger.error(f"Error closing Qdrant client: {e}")
@@ -0,0 +1,171 @@
+"""
+Vector store interface shared by the search API, workers and neighbour table.
+
+``qdrant`` (QdrantManager) talks to a Qdrant server. ``memmap``
+(MemmapVectorStore) keeps the index in memory-mapped files inside the
+process: no server, for edge deployments, CI and benchmarks. The backend is
+chosen by ``settings.vector_store``.
+
+Results of every search method are dicts ``{"id": product_id, "score",
+"payload"}``; filters are Qdrant ``Filter`` objects built by build_filter().
+Collection versioning (aliases), quantization and payload indexes are
+Qdrant features and are not part of the interface.
+"""
+from typing import AsyncIterator, Optional, Protocol, runtime_checkable
+
+import numpy as np
+from qdrant_client.models import Filter
+
+from app.config import settings
+
+VECTOR_STORES = ("qdrant", "memmap")
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """Operations the application needs from a vector index."""
+
+    collection_name: str
+
+    async def __aenter__(self) -> "VectorStore": ...
+
+    async def __aexit__(self, *exc_info) -> None: ...
+
+    async def create_collection(self, vector_size: int = 512, distance: str = "Cosine") -> bool:
+        """Create the collection if it does not exist."""
+        ...
+
+    async def collection_exists(self) -> bool:
+        """Check whether the collection exists."""
+        ...
+
+    async def delete_collection(self) -> bool:
+        """Delete the collection with all its points."""
+        ...
+
+    async def get_collection_info(self) -> dict:
+        """Collection statistics: name, points_count, vector_size, distance, status."""
+        ...
+
+    async def count_vectors(self) -> int:
+        """Number of points in the collection."""
+        ...
+
+    async def upsert_vectors(
+        self,
+        product_ids: list[str],
+        vectors: list[list[float]],
+        payloads: Optional[list[dict]] = None
+    ) -> bool:
+        """Add or replace points; visible to searches on return."""
+        ...
+
+    async def upload_vectors(
+        self,
+        product_ids: list[str],
+        vectors: np.ndarray,
+        payloads: Optional[list[dict]] = None,
+        batch_size: Optional[int] = None,
+        parallel: Optional[int] = None,
+        wait: bool = True
+    ) -> int:
+        """Bulk add or replace points from a float32 matrix."""
+        ...
+
+    async def wait_for_updates(self) -> None:
+        """Barrier for uploads made with wait=False."""
+        ...
+
+    async def delete_vectors(self, product_ids: list[str]) -> bool:
+        """Delete points by product ID."""
+        ...
+
+    async def set_payloads(self, payloads: dict[str, dict]) -> None:
+        """Merge payload fields into existing points."""
+        ...
+
+    async def search_similar(
+        self,
+        query_vector: list[float],
+        top_k: int = 10,
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
+    ) -> list[dict]:
+        """Nearest neighbours of a query vector."""
+        ...
+
+    async def search_similar_batch(
+        self,
+        query_vectors: list[list[float]],
+        top_k: int = 10,
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
+    ) -> list[list[dict]]:
+        """Nearest neighbours of several query vectors, in query order."""
+        ...
+
+    async def search_similar_to_product(
+        self,
+        product_id: str,
+        top_k: int = 10,
+        score_threshold: Optional[float] = 0.0,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[Filter] = None
+    ) -> Optional[list[dict]]:
+        """Nearest neighbours of a stored product, without itself; None if not stored."""
+        ...
+
+    def scroll_vectors(
+        self,
+        batch_size: int = 1000,
+        with_vectors: bool = True
+    ) -> AsyncIterator[list[dict]]:
+        """Iterate over all points as dicts with "id", "vector" and "payload"."""
+        ...
+
+    async def close(self) -> None:
+        """Release connections or file handles."""
+        ...
+
+
+def create_vector_store(
+    collection_name: Optional[str] = None,
+    backend: Optional[str] = None
+) -> VectorStore:
+    """
+    Create the configured vector store.
+
+    Args:
+        collection_name: Collection name (defaults to settings.qdrant_collection_name)
+        backend: 'qdrant' or 'memmap' (defaults to settings.vector_store)
+
+    Returns:
+        Vector store instance
+
+    Raises:
+        ValueError: If backend name is unknown
+    """
+    backend = backend or settings.vector_store
+
+    if backend == "qdrant":
+        from app.db.qdrant import QdrantManager
+
+        return QdrantManager(collection_name=collection_name)
+
+    if backend == "memmap":
+        from app.db.memmap_store import MemmapVectorStore
+
+        return MemmapVectorStore(collection_name=collection_name)
+
+    raise ValueError(f"Unknown vector store: {backend}. Use one of {VECTOR_STORES}")
@@ -1,7 +1,16 @@
 """
 CLIP model wrapper and related functionality.
+
+``CLIPModel`` is imported on first access, so lightweight modules of the
+package (sidecar client, preprocessing, executor) load without torch.
 """
-from .clip_model import CLIPModel
 
 __all__ = ["CLIPModel"]
 
+
+def __getattr__(name: str):
+    if name == "CLIPModel":
+        from .clip_model import CLIPModel
+
+        return CLIPModel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,470 @@
+"""
+Inference backends for the CLIP vision and text towers.
+
+``torch`` runs the HuggingFace model directly. ``onnx`` and ``onnx-int8`` export
+both towers of the configured model to ONNX once, cache the files on disk and
+serve them from ONNX Runtime on CPU (``onnx-int8`` additionally applies dynamic
+int8 weight quantization).
+
+Every backend can be limited to one tower (``towers=("vision",)`` or
+``("text",)``) for processes that only embed images or only embed queries;
+the other tower is then neither loaded nor exported.
+"""
+import inspect
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import torch
+import transformers
+from loguru import logger
+from transformers import CLIPConfig
+from transformers import CLIPModel as HFCLIPModel
+from transformers import CLIPTextModelWithProjection, CLIPVisionModelWithProjection
+
+from app.config import settings
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+TOWERS = ("vision", "text")
+
+# Opset with stable support for the attention ops used by CLIP
+ONNX_OPSET = 17
+
+# Written next to the exported files; a mismatch invalidates the cache
+ONNX_METADATA_FILE = "export.json"
+
+
+def validate_towers(towers: Sequence[str]) -> tuple:
+    """
+    Check tower names and return them in canonical order.
+
+    Raises:
+        ValueError: If a tower is unknown or none is given
+    """
+    unknown = set(towers) - set(TOWERS)
+    if unknown or not towers:
+        raise ValueError(f"Invalid CLIP towers: {tuple(towers)}. Use a subset of {TOWERS}")
+    return tuple(tower for tower in TOWERS if tower in towers)
+
+
+def load_tower_model(model_name: str, tower: str) -> torch.nn.Module:
+    """
+    Load a single tower with its projection from a full CLIP checkpoint.
+
+    Args:
+        model_name: HuggingFace model name
+        tower: 'vision' or 'text'
+
+    Returns:
+        CLIPVisionModelWithProjection or CLIPTextModelWithProjection in eval mode
+    """
+    config = CLIPConfig.from_pretrained(model_name)
+    if tower == "vision":
+        model_class, tower_config = CLIPVisionModelWithProjection, config.vision_config
+    else:
+        model_class, tower_config = CLIPTextModelWithProjection, config.text_config
+    # Sub-configs do not carry the shared projection size
+    tower_config.projection_dim = config.projection_dim
+
+    model = model_class.from_pretrained(model_name, config=tower_config, use_safetensors=True)
+    return model.eval()
+
+
+class CLIPBackend(ABC):
+    """Interface of a backend: raw (not normalized) tower outputs as float32 arrays."""
+
+    name: str = ""
+    embedding_dim: int = 0
+    towers: tuple = TOWERS
+
+    def _require(self, tower: str) -> None:
+        if tower not in self.towers:
+            raise RuntimeError(f"The {tower} tower is not loaded (towers={self.towers})")
+
+    @abstractmethod
+    def image_features(self, pixel_values: np.ndarray) -> np.ndarray:
+        """
+        Run the vision tower.
+
+        Args:
+            pixel_values: Preprocessed images, shape (batch, 3, H, W)
+
+        Returns:
+            Image features, shape (batch, embedding_dim)
+        """
+
+    @abstractmethod
+    def text_features(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """
+        Run the text tower.
+
+        Args:
+            input_ids: Token ids, shape (batch, seq_len)
+            attention_mask: Attention mask, shape (batch, seq_len)
+
+        Returns:
+            Text features, shape (batch, embedding_dim)
+        """
+
+
+class TorchBackend(CLIPBackend):
+    """HuggingFace CLIP in PyTorch (CPU or CUDA): the full model or single towers."""
+
+    name = "torch"
+
+    def __init__(
+        self,
+        model: Optional[HFCLIPModel],
+        device: str,
+        vision_model: Optional[CLIPVisionModelWithProjection] = None,
+        text_model: Optional[CLIPTextModelWithProjection] = None,
+    ):
+        """
+        Initialize backend.
+
+        Args:
+            model: Loaded HuggingFace CLIP model (None when single towers are given)
+            device: Device the model runs on
+            vision_model: Standalone vision tower, used without a full model
+            text_model: Standalone text tower, used without a full model
+        """
+        self.model = model
+        self.vision_model = vision_model
+        self.text_model = text_model
+        self.device = device
+
+        if model is not None:
+            self.towers = TOWERS
+            self.embedding_dim = model.config.projection_dim
+        else:
+            self.towers = validate_towers(
+                [tower for tower, m in (("vision", vision_model), ("text", text_model)) if m is not None]
+            )
+            self.embedding_dim = (vision_model or text_model).config.projection_dim
+
+    def image_features(self, pixel_values: np.ndarray) -> np.ndarray:
+        """Run the vision tower in PyTorch."""
+        self._require("vision")
+        pixels = torch.from_numpy(pixel_values).to(self.device)
+        with torch.no_grad():
+            if self.model is not None:
+                features = self.model.get_image_features(pixel_values=pixels)
+            else:
+                features = self.vision_model(pixel_values=pixels).image_embeds
+        return features.cpu().numpy()
+
+    def text_features(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Run the text tower in PyTorch."""
+        self._require("text")
+        inputs = {
+            "input_ids": torch.from_numpy(input_ids).to(self.device),
+            "attention_mask": torch.from_numpy(attention_mask).to(self.device),
+        }
+        with torch.no_grad():
+            if self.model is not None:
+                features = self.model.get_text_features(**inputs)
+            else:
+                features = self.text_model(**inputs).text_embeds
+        return features.cpu().numpy()
+
+
+class _VisionTower(torch.nn.Module):
+    """Vision tower + projection as a standalone module for export."""
+
+    def __init__(self, model: HFCLIPModel):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model.get_image_features(pixel_values=pixel_values)
+
+
+class _TextTower(torch.nn.Module):
+    """Text tower + projection as a standalone module for export."""
+
+    def __init__(self, model: HFCLIPModel):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+
+class OnnxBackend(CLIPBackend):
+    """CLIP towers exported to ONNX and served from ONNX Runtime on CPU."""
+
+    def __init__(
+        self,
+        model_name: str,
+        quantize: bool = False,
+        cache_dir: Optional[str] = None,
+        model: Optional[HFCLIPModel] = None,
+        num_threads: int = 0,
+        towers: Sequence[str] = TOWERS,
+    ):
+        """
+        Initialize backend, exporting the towers on first use.
+
+        Args:
+            model_name: HuggingFace model name
+            quantize: Apply dynamic int8 weight quantization
+            cache_dir: Directory for exported files (defaults to settings)
+            model: Already loaded HuggingFace model to export from (loaded on demand)
+            num_threads: Intra-op threads per session (0 = ONNX Runtime default)
+            towers: Towers to serve; only their sessions are created
+
+        Raises:
+            ImportError: If onnxruntime / onnx are not installed
+        """
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError(
+                "ONNX backend requires onnxruntime and onnx: poetry install -E onnx"
+            ) from e
+
+        self.name = "onnx-int8" if quantize else "onnx"
+        self.model_name = model_name
+        self.quantize = quantize
+        self.towers = validate_towers(towers)
+        self.cache_dir = Path(cache_dir or settings.clip_onnx_cache_dir) / model_name.replace(
+            "/", "--"
+        )
+
+        paths = {"vision": self._vision_path, "text": self._text_path}
+        self._invalidate_stale_export()
+        if not all(paths[tower].exists() for tower in self.towers):
+            self.export(model, towers=self.towers)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        providers = ["CPUExecutionProvider"]
+
+        sessions = {
+            tower: onnxruntime.InferenceSession(str(paths[tower]), options, providers=providers)
+            for tower in self.towers
+        }
+        self.vision_session = sessions.get("vision")
+        self.text_session = sessions.get("text")
+        self.embedding_dim = next(iter(sessions.values())).get_outputs()[0].shape[-1]
+
+        logger.success(
+            f"ONNX backend ready: {', '.join(paths[tower].name for tower in self.towers)}"
+        )
+
+    @property
+    def _vision_path(self) -> Path:
+        suffix = ".int8.onnx" if self.quantize else ".onnx"
+        return self.cache_dir / f"vision{suffix}"
+
+    @property
+    def _text_path(self) -> Path:
+        suffix = ".int8.onnx" if self.quantize else ".onnx"
+        return self.cache_dir / f"text{suffix}"
+
+    def _export_metadata(self) -> dict:
+        """Everything that changes the exported graphs for the same model name."""
+        return {
+            "model_name": self.model_name,
+            "opset": ONNX_OPSET,
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+        }
+
+    def _invalidate_stale_export(self) -> None:
+        """Drop cached exports written by another opset or torch/transformers version."""
+        exported = list(self.cache_dir.glob("*.onnx")) if self.cache_dir.exists() else []
+        if not exported:
+            return
+
+        metadata_path = self.cache_dir / ONNX_METADATA_FILE
+        try:
+            metadata = json.loads(metadata_path.read_text())
+        except (OSError, ValueError):
+            metadata = None
+        if metadata == self._export_metadata():
+            return
+
+        logger.warning(
+            f"ONNX cache in {self.cache_dir} was exported with {metadata or 'unknown settings'}, "
+            f"expected {self._export_metadata()}; exporting again"
+        )
+        for path in exported:
+            path.unlink()
+
+    def export(self, model: Optional[HFCLIPModel] = None, towers: Sequence[str] = TOWERS) -> None:
+        """
+        Export towers to ONNX (and quantize them if requested).
+
+        Args:
+            model: Loaded HuggingFace model (loaded from model_name if omitted)
+            towers: Towers to export
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        if model is None:
+            logger.info(f"Loading {self.model_name} for ONNX export")
+            model = HFCLIPModel.from_pretrained(self.model_name, use_safetensors=True)
+        model = model.to("cpu").eval()
+
+        vision_fp32 = self.cache_dir / "vision.onnx"
+        text_fp32 = self.cache_dir / "text.onnx"
+
+        if "vision" in towers and not vision_fp32.exists():
+            image_size = model.config.vision_config.image_size
+            dummy_pixels = torch.zeros(1, 3, image_size, image_size)
+            self._export_module(
+                _VisionTower(model),
+                (dummy_pixels,),
+                vision_fp32,
+                input_names=["pixel_values"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+                output_name="image_embeds",
+            )
+
+        if "text" in towers and not text_fp32.exists():
+            dummy_ids = torch.ones(2, 8, dtype=torch.long)
+            dummy_mask = torch.ones(2, 8, dtype=torch.long)
+            self._export_module(
+                _TextTower(model),
+                (dummy_ids, dummy_mask),
+                text_fp32,
+                input_names=["input_ids", "attention_mask"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "text_embeds": {0: "batch"},
+                },
+                output_name="text_embeds",
+            )
+
+        if self.quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            for tower, source, target in (
+                ("vision", vision_fp32, self._vision_path),
+                ("text", text_fp32, self._text_path),
+            ):
+                if tower in towers and not target.exists():
+                    logger.info(f"Quantizing {source.name} to int8")
+                    quantize_dynamic(str(source), str(target), weight_type=QuantType.QInt8)
+
+        (self.cache_dir / ONNX_METADATA_FILE).write_text(json.dumps(self._export_metadata()))
+
+    @staticmethod
+    def _export_module(
+        module: torch.nn.Module,
+        args: tuple,
+        path: Path,
+        input_names: list,
+        dynamic_axes: dict,
+        output_name: str,
+    ) -> None:
+        """Export a tower, writing to a temporary file first so a crash never leaves a partial cache."""
+        logger.info(f"Exporting {path.name} to ONNX (opset {ONNX_OPSET})")
+        tmp_path = path.with_suffix(".tmp")
+
+        # torch >= 2.5 defaults towards the dynamo exporter; older releases
+        # do not know the keyword at all
+        extra = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            extra["dynamo"] = False
+
+        with torch.no_grad():
+            torch.onnx.export(
+                module,
+                args,
+                str(tmp_path),
+                input_names=input_names,
+                output_names=[output_name],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET,
+                do_constant_folding=True,
+                **extra,
+            )
+
+        tmp_path.replace(path)
+
+    def image_features(self, pixel_values: np.ndarray) -> np.ndarray:
+        """Run the vision tower in ONNX Runtime."""
+        self._require("vision")
+        (features,) = self.vision_session.run(
+            None, {"pixel_values": pixel_values.astype(np.float32, copy=False)}
+        )
+        return features
+
+    def text_features(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Run the text tower in ONNX Runtime."""
+        self._require("text")
+        (features,) = self.text_session.run(
+            None,
+            {
+                "input_ids": input_ids.astype(np.int64, copy=False),
+                "attention_mask": attention_mask.astype(np.int64, copy=False),
+            },
+        )
+        return features
+
+
+def create_backend(
+    name: str,
+    model_name: str,
+    device: str,
+    model: Optional[HFCLIPModel] = None,
+    num_threads: int = 0,
+    towers: Sequence[str] = TOWERS,
+) -> CLIPBackend:
+    """
+    Create inference backend by name.
+
+    Args:
+        name: Backend name ('torch', 'onnx' or 'onnx-int8')
+        model_name: HuggingFace model name
+        device: Device for the torch backend
+        model: Already loaded full HuggingFace model (loaded on demand if omitted)
+        num_threads: Intra-op threads for ONNX Runtime sessions (0 = default);
+            torch threads are process-wide and set by the caller
+        towers: Towers to load ('vision', 'text'); a single tower never loads the other
+
+    Returns:
+        Backend instance
+
+    Raises:
+        ValueError: If backend name is unknown
+    """
+    towers = validate_towers(towers)
+
+    if name == "torch":
+        if model is not None or towers == TOWERS:
+            if model is None:
+                model = HFCLIPModel.from_pretrained(model_name, use_safetensors=True)
+                model.to(device)
+                model.eval()
+            return TorchBackend(model, device)
+
+        tower_models = {tower: load_tower_model(model_name, tower).to(device) for tower in towers}
+        return TorchBackend(
+            None,
+            device,
+            vision_model=tower_models.get("vision"),
+            text_model=tower_models.get("text"),
+        )
+
+    if name in ("onnx", "onnx-int8"):
+        if device != "cpu":
+            logger.warning(f"ONNX backend runs on CPU, ignoring device={device}")
+        return OnnxBackend(
+            model_name,
+            quantize=(name == "onnx-int8"),
+            model=model,
+            num_threads=num_threads,
+            towers=towers,
+        )
+
+    raise ValueError(f"Unknown CLIP backend: {name}. Use one of {', '.join(BACKENDS)}")
@@ -0,0 +1,317 @@
+"""
+Dynamic micro-batching scheduler for online CLIP queries.
+"""
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+from app.config import settings
+from app.models.clip_model import CLIPEmbedder
+from app.models.executor import InferenceExecutor, InferenceQueueFull, get_inference_executor
+from app.utils.metrics import record_clip_batch, record_inference_rejected, set_clip_queue_depth
+
+
+@dataclass
+class _ModalityQueue:
+    """Pending queries of one modality plus the events used to wake the worker."""
+
+    encode: Callable[[List[Any]], np.ndarray]
+    items: Deque[Tuple[Any, asyncio.Future, float]] = field(default_factory=deque)
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    full: asyncio.Event = field(default_factory=asyncio.Event)
+    worker: Optional[asyncio.Task] = None
+
+
+class InferenceScheduler:
+    """
+    Merge concurrent online queries into batched CLIP forward passes.
+
+    Each modality (image, pixels, text) has its own queue and worker task. The worker
+    waits for the first query, keeps collecting until ``max_batch_size`` queries
+    are pending or ``max_wait_ms`` has elapsed, runs one batched forward pass on
+    the inference executor and resolves every waiting coroutine with its row of
+    the result. While all inference threads are busy, new queries keep
+    accumulating into the next batch; once ``max_queue_size`` queries are
+    waiting, further queries are rejected with :class:`InferenceQueueFull`.
+    """
+
+    def __init__(
+        self,
+        embedder: CLIPEmbedder,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        max_queue_size: Optional[int] = None,
+        executor: Optional[InferenceExecutor] = None,
+    ):
+        """
+        Initialize scheduler.
+
+        Args:
+            embedder: Loaded CLIP embedder used for the batched forward passes
+            max_batch_size: Maximum queries per forward pass (defaults to the
+                embedder's tuned or configured limit)
+            max_wait_ms: Maximum time to wait for a batch to fill (defaults to settings)
+            max_queue_size: Queries per modality allowed to wait (defaults to settings)
+            executor: Executor running the forward passes (defaults to the global one)
+        """
+        self.embedder = embedder
+        self.executor = executor or get_inference_executor()
+        self.max_batch_size = max_batch_size or embedder.max_batch_size
+        if max_wait_ms is None:
+            max_wait_ms = settings.clip_max_batch_wait_ms
+        self.max_wait = max_wait_ms / 1000
+        if max_queue_size is None:
+            max_queue_size = settings.clip_inference_queue_size
+        self.max_queue_size = max_queue_size
+
+        self._encoders: Dict[str, Callable[[List[Any]], np.ndarray]] = {
+            "image": embedder.encode_images,
+            "text": embedder.encode_text,
+            # Images already resized and cropped elsewhere (embedding sidecar clients)
+            "pixels": lambda crops: embedder.encode_pixels(np.stack(crops)),
+        }
+        self._queues: Dict[str, _ModalityQueue] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    @property
+    def is_running(self) -> bool:
+        """Whether worker tasks are running."""
+        return bool(self._queues)
+
+    async def start(self) -> None:
+        """Start one worker task per modality on the running event loop."""
+        if self.is_running:
+            return
+
+        # One in-flight batch per inference thread, shared by all modalities
+        self._slots = asyncio.Semaphore(self.executor.max_workers)
+
+        for modality, encode in self._encoders.items():
+            queue = _ModalityQueue(encode=encode)
+            queue.worker = asyncio.create_task(
+                self._run(modality, queue), name=f"clip-batcher-{modality}"
+            )
+            self._queues[modality] = queue
+
+        logger.info(
+            f"Inference scheduler started: max_batch_size={self.max_batch_size}, "
+            f"max_wait={self.max_wait * 1000:.1f}ms"
+        )
+
+    async def stop(self) -> None:
+        """Stop worker tasks and fail queries that are still waiting."""
+        queues, self._queues = self._queues, {}
+
+        for modality, queue in queues.items():
+            if queue.worker:
+                queue.worker.cancel()
+            while queue.items:
+                _, future, _ = queue.items.popleft()
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference scheduler stopped"))
+            set_clip_queue_depth(modality, 0)
+
+        await asyncio.gather(
+            *(queue.worker for queue in queues.values() if queue.worker),
+            *self._inflight,
+            return_exceptions=True,
+        )
+        logger.info("Inference scheduler stopped")
+
+    async def embed_image(self, image: Image.Image) -> np.ndarray:
+        """
+        Generate normalized embedding for a decoded RGB image.
+
+        Args:
+            image: PIL image
+
+        Returns:
+            Normalized embedding vector
+
+        Raises:
+            InferenceQueueFull: If too many image queries are already waiting
+        """
+        return await self._submit("image", image)
+
+    async def embed_pixels(self, crop: np.ndarray) -> np.ndarray:
+        """
+        Generate normalized embedding for an image already resized and cropped.
+
+        Args:
+            crop: uint8 array of shape (H, W, 3) from ImagePreprocessor.resize_and_crop
+
+        Returns:
+            Normalized embedding vector
+
+        Raises:
+            InferenceQueueFull: If too many pixel queries are already waiting
+        """
+        return await self._submit("pixels", crop)
+
+    async def embed_text(self, text: str) -> np.ndarray:
+        """
+        Generate normalized embedding for a text query.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Normalized embedding vector
+
+        Raises:
+            InferenceQueueFull: If too many text queries are already waiting
+        """
+        return await self._submit("text", text)
+
+    async def embed_images(self, images: List[Image.Image]) -> List[np.ndarray]:
+        """
+        Generate normalized embeddings for several decoded RGB images.
+
+        The images are enqueued together, so up to ``max_batch_size`` of them
+        share one forward pass (together with concurrent queries).
+
+        Args:
+            images: PIL images
+
+        Returns:
+            Normalized embedding vectors, in input order
+
+        Raises:
+            InferenceQueueFull: If the images don't fit into the image queue
+        """
+        return await self._submit_many("image", images)
+
+    async def embed_texts(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Generate normalized embeddings for several text queries.
+
+        The texts are enqueued together, so up to ``max_batch_size`` of them
+        share one forward pass (together with concurrent queries).
+
+        Args:
+            texts: Query texts
+
+        Returns:
+            Normalized embedding vectors, in input order
+
+        Raises:
+            InferenceQueueFull: If the texts don't fit into the text queue
+        """
+        return await self._submit_many("text", texts)
+
+    async def _submit(self, modality: str, item: Any) -> np.ndarray:
+        """Enqueue a query and wait until its batch has been processed."""
+        (embedding,) = await self._submit_many(modality, [item])
+        return embedding
+
+    async def _submit_many(self, modality: str, items: List[Any]) -> List[np.ndarray]:
+        """Enqueue queries together and wait until all of them have been processed."""
+        queue = self._queues.get(modality)
+        if queue is None:
+            raise RuntimeError("Inference scheduler is not running")
+
+        if not items:
+            return []
+
+        if len(queue.items) + len(items) > self.max_queue_size:
+            record_inference_rejected()
+            raise InferenceQueueFull(
+                f"Too many {modality} queries waiting for inference "
+                f"({len(queue.items)} waiting, {len(items)} new)"
+            )
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            queue.items.append((item, future, now))
+            futures.append(future)
+        queue.ready.set()
+        if len(queue.items) >= self.max_batch_size:
+            queue.full.set()
+
+        set_clip_queue_depth(modality, len(queue.items))
+        return list(await asyncio.gather(*futures))
+
+    async def _wait_for_batch(self, queue: _ModalityQueue) -> None:
+        """Wait until a batch is full or the oldest query has waited max_wait."""
+        await queue.ready.wait()
+
+        if len(queue.items) >= self.max_batch_size:
+            return
+
+        loop = asyncio.get_running_loop()
+        remaining = queue.items[0][2] + self.max_wait - loop.time()
+        if remaining <= 0:
+            return
+
+        queue.full.clear()
+        try:
+            await asyncio.wait_for(queue.full.wait(), timeout=remaining)
+        except asyncio.TimeoutError:
+            pass
+
+    def _take_batch(self, queue: _ModalityQueue) -> List[Tuple[Any, asyncio.Future]]:
+        """Pop up to max_batch_size queries whose callers are still waiting."""
+        batch = []
+        while queue.items and len(batch) < self.max_batch_size:
+            item, future, _ = queue.items.popleft()
+            # Callers that went away (e.g. client disconnected) don't need a result
+            if not future.done():
+                batch.append((item, future))
+
+        if not queue.items:
+            queue.ready.clear()
+        if len(queue.items) < self.max_batch_size:
+            queue.full.clear()
+
+        return batch
+
+    async def _run(self, modality: str, queue: _ModalityQueue) -> None:
+        """Worker loop: collect a batch, wait for a free inference thread, dispatch it."""
+        while True:
+            await self._wait_for_batch(queue)
+
+            # Queries keep accumulating while all inference threads are busy
+            await self._slots.acquire()
+            batch = self._take_batch(queue)
+            set_clip_queue_depth(modality, len(queue.items))
+
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._dispatch(modality, queue, batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(
+        self,
+        modality: str,
+        queue: _ModalityQueue,
+        batch: List[Tuple[Any, asyncio.Future]],
+    ) -> None:
+        """Run one batched forward pass on the executor and fan results out."""
+        record_clip_batch(modality, len(batch))
+
+        try:
+            embeddings = await self.executor.run(queue.encode, [item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"Batched {modality} inference failed ({len(batch)} queries): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
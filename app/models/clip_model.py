@@ -3,43 +3,109 @@ Optimized CLIP model wrapper for image and text encoding.
 """
 import asyncio
 import atexit
-from pathlib import Path
-from typing import List, Optional, Union
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import (
+    Any,
+    AsyncIterator,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import torch
 from loguru import logger
 from PIL import Image
 from tqdm.asyncio import tqdm
+from transformers import CLIPImageProcessor
 from transformers import CLIPModel as HFCLIPModel
-from transformers import CLIPProcessor
+from transformers import CLIPProcessor, CLIPTokenizerFast
 
 from app.config import settings
+from app.models.backends import TOWERS, CLIPBackend, create_backend, validate_towers
+from app.models.executor import get_inference_executor
+from app.models.preprocessing import ImagePreprocessor
+from app.models.projection import EmbeddingProjection
+from app.models.tune import load_tuning_profile
+from app.utils.image_processing import ImageSource, describe_image_source
+from app.utils.metrics import record_pipeline_stage
+
+
+def _l2_normalize(features: np.ndarray) -> np.ndarray:
+    """L2-normalize feature rows (CRITICAL for cosine similarity search)."""
+    return features / np.linalg.norm(features, axis=-1, keepdims=True)
 
 
 class CLIPEmbedder:
     """Optimized wrapper for CLIP model with async support and batch processing."""
 
+    # Optional dimensionality reduction applied to all output embeddings
+    projection: Optional[EmbeddingProjection] = None
+    towers: tuple = TOWERS
+
     def __init__(
         self,
         model_name: str = "openai/clip-vit-base-patch32",
         device: str = "auto",
+        backend: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        tuning_mode: Optional[str] = None,
+        towers: Sequence[str] = TOWERS,
     ):
         """
         Initialize CLIP embedder with automatic device selection.
 
+        Backend, thread counts and batch sizes not set explicitly come from the
+        tuning profile written by ``python -m app.models.tune``, if there is one
+        for this model, device and host.
+
         Args:
             model_name: HuggingFace model name (default: openai/clip-vit-base-patch32)
             device: Device to use ('auto', 'cpu', 'cuda', or specific cuda device like 'cuda:0')
+            backend: Inference backend ('torch', 'onnx', 'onnx-int8'; defaults to settings)
+            num_threads: CPU threads per forward pass (defaults to settings, 0 = library default)
+            tuning_mode: Tuning profile entry to apply ('online', 'offline', 'none';
+                defaults to settings)
+            towers: Towers to load: ('vision', 'text'), ('vision',) for image-only
+                processes, ('text',) for query-only ones
         """
         self.model_name = model_name
+        self.towers = validate_towers(towers)
         self._setup_device(device)
+
+        tuned = load_tuning_profile(model_name, self.device, mode=tuning_mode)
+        self.backend_name = backend or tuned.get("clip_backend", settings.clip_backend)
+        if num_threads is None:
+            num_threads = tuned.get("clip_num_threads", settings.clip_num_threads)
+        self.num_threads = num_threads
+        self.batch_size = tuned.get("clip_batch_size", settings.clip_batch_size)
+        self.max_batch_size = tuned.get("clip_max_batch_size", settings.clip_max_batch_size)
+
+        if self.num_threads:
+            # Process-wide: pins torch intra-op parallelism
+            torch.set_num_threads(self.num_threads)
+        interop_threads = tuned.get("clip_interop_threads", settings.clip_interop_threads)
+        if interop_threads and torch.get_num_interop_threads() != interop_threads:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError as e:
+                # Only possible before the first parallel work in the process
+                logger.warning(f"Could not set inter-op threads to {interop_threads}: {e}")
+
         self._load_model()
         self._register_shutdown()
 
         logger.info(
             f"CLIPEmbedder initialized: model={self.model_name}, device={self.device}, "
-            f"embedding_dim={self.get_embedding_dimension()}"
+            f"backend={self.backend_name}, embedding_dim={self.get_embedding_dimension()}"
         )
 
     def _setup_device(self, device: str) -> None:
@@ -69,24 +135,73 @@ class CLIPEmbedder:
             self.device = "cpu"
 
     def _load_model(self) -> None:
-        """Load CLIP model and processor from HuggingFace."""
+        """Load CLIP processor from HuggingFace and the configured inference backend."""
         try:
-            logger.info(f"Loading CLIP model: {self.model_name}")
+            logger.info(
+                f"Loading CLIP model: {self.model_name} "
+                f"(backend={self.backend_name}, towers={','.join(self.towers)})"
+            )
 
             # Load processor and model
             # Use safetensors to avoid torch.load vulnerability
-            self.processor = CLIPProcessor.from_pretrained(self.model_name)
-            self.model = HFCLIPModel.from_pretrained(
+            self.processor: Optional[CLIPProcessor] = None
+            self.preprocessor: Optional[ImagePreprocessor] = None
+            self.tokenizer: Optional[CLIPTokenizerFast] = None
+            if self.towers == TOWERS:
+                self.processor = CLIPProcessor.from_pretrained(self.model_name)
+                image_processor = self.processor.image_processor
+                self.tokenizer = self.processor.tokenizer
+            else:
+                # Single tower: only its half of the processor
+                image_processor = None
+                if "vision" in self.towers:
+                    image_processor = CLIPImageProcessor.from_pretrained(self.model_name)
+                if "text" in self.towers:
+                    self.tokenizer = CLIPTokenizerFast.from_pretrained(self.model_name)
+
+            if image_processor is not None:
+                self.preprocessor = ImagePreprocessor.from_image_processor(
+                    image_processor, draft=settings.clip_draft_decode
+                )
+            self.model: Optional[HFCLIPModel] = None
+
+            if self.backend_name == "torch" and self.towers == TOWERS:
+                self.model = HFCLIPModel.from_pretrained(
+                    self.model_name,
+                    use_safetensors=True
+                )
+
+                # Move to device and set to eval mode
+                self.model.to(self.device)
+                self.model.eval()
+            elif self.backend_name != "torch":
+                # ONNX Runtime serves on CPU; the torch model is only loaded for export
+                self.device = "cpu"
+
+            self.backend: CLIPBackend = create_backend(
+                self.backend_name,
                 self.model_name,
-                use_safetensors=True
+                self.device,
+                model=self.model,
+                num_threads=self.num_threads,
+                towers=self.towers,
             )
 
-            # Move to device and set to eval mode
-            self.model.to(self.device)
-            self.model.eval()
-
             # Get embedding dimension
-            self._embedding_dim = self.model.config.projection_dim
+            self._embedding_dim = self.backend.embedding_dim
+
+            if settings.clip_projection_path:
+                self.projection = EmbeddingProjection.load(settings.clip_projection_path)
+                if self.projection.input_dim != self._embedding_dim:
+                    raise ValueError(
+                        f"Projection {self.projection.version} expects {self.projection.input_dim}-d "
+                        f"embeddings, model produces {self._embedding_dim}-d"
+                    )
+                self._embedding_dim = self.projection.output_dim
+                logger.info(
+                    f"Embeddings projected to {self._embedding_dim} dimensions "
+                    f"({self.projection.version})"
+                )
 
             logger.success(
                 f"Model loaded successfully (embedding_dim={self._embedding_dim})"
@@ -103,6 +218,8 @@ class CLIPEmbedder:
     def _cleanup(self) -> None:
         """Cleanup resources on shutdown."""
         try:
+            if hasattr(self, "backend"):
+                del self.backend
             if hasattr(self, "model"):
                 del self.model
             if torch.cuda.is_available():
@@ -111,154 +228,317 @@ class CLIPEmbedder:
             # Silently ignore cleanup errors (logger may be closed)
             pass
 
-    async def generate_embedding(self, image_path: str) -> Optional[np.ndarray]:
+    async def generate_embedding(self, image: ImageSource) -> Optional[np.ndarray]:
         """
         Generate normalized embedding for a single image.
 
+        Decoding and the forward pass run on the inference executor, so the
+        event loop stays responsive while the model is busy. Bytes, file-like
+        objects and PIL images are decoded in memory, no temp file is needed.
+
         Args:
-            image_path: Path to image file
+            image: Path to image file, encoded image bytes, binary file-like object
+                or decoded PIL image
 
         Returns:
             Normalized embedding vector (L2 norm) as numpy array, or None if failed
 
         Raises:
             FileNotFoundError: If image file doesn't exist
+            InferenceQueueFull: If the inference executor is saturated
             Exception: For other processing errors
         """
-        try:
-            # Validate path
-            path = Path(image_path)
-            if not path.exists():
-                logger.error(f"Image file not found: {image_path}")
-                raise FileNotFoundError(f"Image not found: {image_path}")
+        return await get_inference_executor().run(self._generate_embedding, image)
 
+    def _generate_embedding(self, image: ImageSource) -> Optional[np.ndarray]:
+        """Blocking implementation of generate_embedding."""
+        description = describe_image_source(image)
+        try:
             # Load image
-            logger.debug(f"Loading image: {image_path}")
-            image = Image.open(path).convert("RGB")
+            logger.debug(f"Loading image: {description}")
+            rgb_image = self.load_image(image)
 
-            # Preprocess image
-            inputs = self.processor(images=image, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-            # Generate embedding with no gradient computation
-            with torch.no_grad():
-                image_features = self.model.get_image_features(**inputs)
-
-                # CRITICAL: L2 normalization
-                image_features = image_features / image_features.norm(
-                    dim=-1, keepdim=True
-                )
-
-            # Convert to numpy
-            embedding = image_features.cpu().numpy()[0]
+            embedding = self.encode_images([rgb_image])[0]
 
             logger.debug(
-                f"Generated embedding for {image_path}: shape={embedding.shape}, "
+                f"Generated embedding for {description}: shape={embedding.shape}, "
                 f"norm={np.linalg.norm(embedding):.4f}"
             )
 
             return embedding
 
         except FileNotFoundError:
+            logger.error(f"Image file not found: {description}")
             raise
         except Exception as e:
-            logger.error(f"Error generating embedding for {image_path}: {e}")
+            logger.error(f"Error generating embedding for {description}: {e}")
             return None
 
     async def generate_embeddings_batch(
         self,
-        image_paths: List[str],
-        batch_size: int = 32,
+        images: Sequence[ImageSource],
+        batch_size: Optional[int] = None,
         show_progress: bool = True,
+        prefetch_batches: Optional[int] = None,
+        decode_workers: Optional[int] = None,
     ) -> List[Optional[np.ndarray]]:
         """
         Generate embeddings for multiple images with batch processing.
 
+        Decoding is pipelined with the forward pass: while batch N is in the
+        model, a thread pool decodes, resizes and crops the next
+        ``prefetch_batches`` batches. Per-stage timings are logged and exported
+        to the ``clip_pipeline_stage_seconds`` metric.
+
         Args:
-            image_paths: List of image file paths
-            batch_size: Number of images to process in each batch
+            images: Image file paths, encoded image bytes, binary file-like objects
+                or decoded PIL images (may be mixed)
+            batch_size: Number of images to process in each batch (defaults to the
+                tuned or configured batch size)
             show_progress: Whether to show progress bar
+            prefetch_batches: Batches decoded ahead of the model (defaults to settings)
+            decode_workers: Threads decoding images (defaults to settings)
 
         Returns:
             List of embeddings (None for failed images)
         """
+        batch_size = batch_size or self.batch_size
         logger.info(
-            f"Starting batch embedding generation: {len(image_paths)} images, "
+            f"Starting batch embedding generation: {len(images)} images, "
             f"batch_size={batch_size}"
         )
 
         embeddings: List[Optional[np.ndarray]] = []
         failed_count = 0
 
-        # Process in batches
-        for i in range(0, len(image_paths), batch_size):
-            batch_paths = image_paths[i : i + batch_size]
-
-            # Load batch images
-            batch_images = []
-            batch_indices = []
-
-            for idx, path in enumerate(batch_paths):
-                try:
-                    path_obj = Path(path)
-                    if not path_obj.exists():
-                        logger.warning(f"Skipping missing file: {path}")
-                        embeddings.append(None)
-                        failed_count += 1
-                        continue
-
-                    image = Image.open(path_obj).convert("RGB")
-                    batch_images.append(image)
-                    batch_indices.append(len(embeddings))
-                    embeddings.append(None)  # Placeholder
-
-                except Exception as e:
-                    logger.warning(f"Failed to load image {path}: {e}")
-                    embeddings.append(None)
-                    failed_count += 1
-
-            # Process batch if we have valid images
-            if batch_images:
-                try:
-                    # Preprocess batch
-                    inputs = self.processor(images=batch_images, return_tensors="pt")
-                    inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-                    # Generate embeddings with no gradient computation
-                    with torch.no_grad():
-                        batch_features = self.model.get_image_features(**inputs)
-
-                        # CRITICAL: L2 normalization
-                        batch_features = batch_features / batch_features.norm(
-                            dim=-1, keepdim=True
-                        )
-
-                    # Convert to numpy and assign to results
-                    batch_embeddings = batch_features.cpu().numpy()
-
-                    for idx, embedding in zip(batch_indices, batch_embeddings):
-                        embeddings[idx] = embedding
-
-                except Exception as e:
-                    logger.error(f"Batch processing failed: {e}")
-                    # Mark all batch items as failed
-                    for idx in batch_indices:
-                        embeddings[idx] = None
-                    failed_count += len(batch_images)
+        batches = (images[i : i + batch_size] for i in range(0, len(images), batch_size))
+
+        async for batch_embeddings in self._embed_pipeline(
+            batches, prefetch_batches, decode_workers
+        ):
+            embeddings.extend(batch_embeddings)
+            failed_count += sum(embedding is None for embedding in batch_embeddings)
 
             # Update progress
             if show_progress:
-                progress = (i + len(batch_paths)) / len(image_paths) * 100
-                logger.info(f"Progress: {progress:.1f}% ({i + len(batch_paths)}/{len(image_paths)})")
+                progress = len(embeddings) / len(images) * 100
+                logger.info(f"Progress: {progress:.1f}% ({len(embeddings)}/{len(images)})")
 
         successful_count = len(embeddings) - failed_count
         logger.info(
-            f"Batch processing completed: {successful_count}/{len(image_paths)} successful, "
+            f"Batch processing completed: {successful_count}/{len(images)} successful, "
             f"{failed_count} failed"
         )
 
         return embeddings
 
+    async def iter_embeddings(
+        self,
+        source: Iterable[Tuple[Any, ImageSource]],
+        batch_size: Optional[int] = None,
+        prefetch_batches: Optional[int] = None,
+        decode_workers: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[List[Any], np.ndarray]]:
+        """
+        Stream embeddings of an arbitrarily large catalog chunk by chunk.
+
+        ``source`` is consumed lazily, only ``prefetch_batches + 1`` batches are
+        held at any time, so memory stays constant regardless of catalog size.
+        Image sources may be zero-argument callables (e.g. an S3 download), which
+        are then called on the decode threads. Failed images are logged and
+        left out of the chunk.
+
+        Args:
+            source: Iterable of (id, image source) pairs
+            batch_size: Number of images per forward pass (defaults to the tuned
+                or configured batch size)
+            prefetch_batches: Batches decoded ahead of the model (defaults to settings)
+            decode_workers: Threads decoding images (defaults to settings)
+
+        Yields:
+            (ids, vectors) per batch: ids of the successfully embedded images and
+            their normalized embeddings as a float32 array of shape (len(ids), dim)
+        """
+        batch_size = batch_size or self.batch_size
+        items = iter(source)
+        batch_ids: Deque[List[Any]] = deque()
+
+        def batches() -> Iterator[List[ImageSource]]:
+            while True:
+                chunk = list(islice(items, batch_size))
+                if not chunk:
+                    return
+                batch_ids.append([item_id for item_id, _ in chunk])
+                yield [image for _, image in chunk]
+
+        async for batch_embeddings in self._embed_pipeline(
+            batches(), prefetch_batches, decode_workers
+        ):
+            ids = batch_ids.popleft()
+            ok = [i for i, embedding in enumerate(batch_embeddings) if embedding is not None]
+
+            vectors = np.empty((len(ok), self._embedding_dim), dtype=np.float32)
+            for row, i in enumerate(ok):
+                vectors[row] = batch_embeddings[i]
+
+            yield [ids[i] for i in ok], vectors
+
+    async def _embed_pipeline(
+        self,
+        batches: Iterator[Sequence[ImageSource]],
+        prefetch_batches: Optional[int] = None,
+        decode_workers: Optional[int] = None,
+    ) -> AsyncIterator[List[Optional[np.ndarray]]]:
+        """
+        Decode/forward pipeline yielding the embeddings of each batch in order.
+
+        Args:
+            batches: Lazily produced batches of image sources
+            prefetch_batches: Batches decoded ahead of the model (defaults to settings)
+            decode_workers: Threads decoding images (defaults to settings)
+
+        Yields:
+            Embeddings of one batch (None for failed images)
+        """
+        if prefetch_batches is None:
+            prefetch_batches = settings.clip_prefetch_batches
+        decode_workers = decode_workers or settings.clip_decode_workers
+
+        timings = {"decode": 0.0, "decode_wait": 0.0, "forward": 0.0}
+        pending: Deque[Tuple[Sequence[ImageSource], List[Future]]] = deque()
+
+        with ThreadPoolExecutor(decode_workers, thread_name_prefix="clip-decode") as pool:
+
+            def submit_next() -> None:
+                sources = next(batches, None)
+                if sources is not None:
+                    futures = [pool.submit(self._decode_for_batch, source) for source in sources]
+                    pending.append((sources, futures))
+
+            # The batch being encoded plus prefetch_batches decoded ahead of it
+            for _ in range(prefetch_batches + 1):
+                submit_next()
+
+            try:
+                while pending:
+                    sources, futures = pending.popleft()
+
+                    wait_start = time.perf_counter()
+                    await asyncio.wait([asyncio.wrap_future(f) for f in futures])
+                    timings["decode_wait"] += time.perf_counter() - wait_start
+
+                    # Keep the decode threads busy while this batch is in the model
+                    submit_next()
+
+                    crops, indices = [], []
+                    batch_embeddings: List[Optional[np.ndarray]] = [None] * len(futures)
+                    for idx, future in enumerate(futures):
+                        error = future.exception()
+                        if error is None:
+                            crop, decode_time = future.result()
+                            timings["decode"] += decode_time
+                            crops.append(crop)
+                            indices.append(idx)
+                        elif isinstance(error, FileNotFoundError):
+                            logger.warning(
+                                f"Skipping missing file: {describe_image_source(sources[idx])}"
+                            )
+                        else:
+                            logger.warning(
+                                f"Failed to load image {describe_image_source(sources[idx])}: {error}"
+                            )
+
+                    if crops:
+                        try:
+                            forward_start = time.perf_counter()
+                            # Normalize and run the forward pass off the event loop
+                            encoded = await get_inference_executor().run(
+                                self.encode_pixels, np.stack(crops)
+                            )
+                            timings["forward"] += time.perf_counter() - forward_start
+
+                            for idx, embedding in zip(indices, encoded):
+                                batch_embeddings[idx] = embedding
+
+                        except Exception as e:
+                            logger.error(f"Batch processing failed: {e}")
+
+                    yield batch_embeddings
+            finally:
+                # Stop decoding ahead if the consumer bailed out early
+                for _, futures in pending:
+                    for future in futures:
+                        future.cancel()
+
+        for stage, duration in timings.items():
+            record_pipeline_stage(stage, duration)
+        logger.info(
+            f"Pipeline timing: decode={timings['decode']:.2f}s "
+            f"(summed over {decode_workers} workers), "
+            f"waiting for decode={timings['decode_wait']:.2f}s, "
+            f"forward={timings['forward']:.2f}s"
+        )
+
+    def _decode_for_batch(self, source: ImageSource) -> Tuple[np.ndarray, float]:
+        """Decode, resize and crop one image on a decode thread; returns crop and time spent."""
+        start = time.perf_counter()
+        crop = self.preprocessor.resize_and_crop(self.load_image(source))
+        return crop, time.perf_counter() - start
+
+    def load_image(self, image: ImageSource) -> Image.Image:
+        """
+        Decode image for encoding (JPEGs at reduced scale if clip_draft_decode is on).
+
+        Args:
+            image: Path to image file, encoded image bytes, binary file-like object
+                or decoded PIL image
+
+        Returns:
+            RGB PIL image
+        """
+        self._require_tower("vision")
+        return self.preprocessor.load(image)
+
+    def encode_images(self, images: List[Image.Image]) -> np.ndarray:
+        """
+        Encode already decoded RGB images in a single forward pass.
+
+        Args:
+            images: List of PIL images
+
+        Returns:
+            Normalized embedding matrix of shape (len(images), embedding_dim)
+        """
+        self._require_tower("vision")
+        return self.encode_pixels(self.preprocessor.stack(images))
+
+    def encode_pixels(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Encode a batch of resized and cropped images in a single forward pass.
+
+        Args:
+            batch: uint8 array of shape (batch, H, W, 3) from ImagePreprocessor.stack
+
+        Returns:
+            Normalized embedding matrix of shape (batch, embedding_dim)
+        """
+        self._require_tower("vision")
+        pixel_values = self.preprocessor.normalize(batch)
+        image_features = self.backend.image_features(pixel_values)
+
+        return self._finalize(image_features)
+
+    def _require_tower(self, tower: str) -> None:
+        if tower not in self.towers:
+            raise RuntimeError(f"The {tower} tower is not loaded (towers={self.towers})")
+
+    def _finalize(self, features: np.ndarray) -> np.ndarray:
+        """Normalize raw tower outputs and apply the projection, if any."""
+        embeddings = _l2_normalize(features)
+        if self.projection is not None:
+            embeddings = self.projection.apply(embeddings)
+        return embeddings
+
     def get_embedding_dimension(self) -> int:
         """
         Get the dimension of embedding vectors.
@@ -268,6 +548,19 @@ class CLIPEmbedder:
         """
         return self._embedding_dim
 
+    @property
+    def model_key(self) -> str:
+        """
+        Identifier of the vectors this embedder produces (model name, backend and
+        projection version, if any).
+
+        Used in cache keys so a model change never serves vectors of another model.
+        """
+        key = f"{self.model_name}@{self.backend_name}"
+        if self.projection is not None:
+            key += f"+{self.projection.version}"
+        return key
+
     def encode_text(self, text: Union[str, List[str]]) -> np.ndarray:
         """
         Encode text(s) to normalized embedding vector(s).
@@ -285,22 +578,17 @@ class CLIPEmbedder:
 
             logger.debug(f"Encoding {len(texts)} text(s)")
 
+            self._require_tower("text")
+
             # Process text
-            inputs = self.processor(
-                text=texts, return_tensors="pt", padding=True, truncation=True
+            inputs = self.tokenizer(
+                texts, return_tensors="np", padding=True, truncation=True
+            )
+            text_features = self.backend.text_features(
+                inputs["input_ids"], inputs["attention_mask"]
             )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-            # Get embeddings with no gradient computation
-            with torch.no_grad():
-                text_features = self.model.get_text_features(**inputs)
-
-                # CRITICAL: L2 normalization
-                text_features = text_features / text_features.norm(
-                    dim=-1, keepdim=True
-                )
 
-            embeddings = text_features.cpu().numpy()
+            embeddings = self._finalize(text_features)
 
             return embeddings[0] if is_single else embeddings
 
@@ -343,13 +631,6 @@ class CLIPModel(CLIPEmbedder):
         is_single = not isinstance(image, list)
         images = [image] if is_single else image
 
-        inputs = self.processor(images=images, return_tensors="pt", padding=True)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-        with torch.no_grad():
-            image_features = self.model.get_image_features(**inputs)
-            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-
-        embeddings = image_features.cpu().numpy()
+        embeddings = self.encode_images(images)
         return embeddings[0] if is_single else embeddings
 
@@ -0,0 +1,219 @@
+"""
+Two-tier cache for query embeddings (text queries and uploaded query images).
+
+The first tier is a bounded in-process LRU with a TTL. The optional second tier
+is Redis, shared by all API workers; vectors are stored there as raw float32
+bytes with the same TTL. Keys always contain the model key of the embedder
+(model name and backend), so switching models never serves stale vectors.
+Redis errors are logged and treated as misses: the cache must never fail a search.
+"""
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.utils.metrics import record_embedding_cache, set_embedding_cache_size
+
+KEY_PREFIX = "emb"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_key(data: bytes) -> str:
+    """
+    Build lookup key for uploaded image bytes.
+
+    Identical uploads (client retries, shared screenshots) get the same key, so
+    their embedding is served without decoding or inference.
+
+    Args:
+        data: Raw uploaded bytes
+
+    Returns:
+        Hex SHA-256 of the content
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize text query for cache lookups.
+
+    CLIP's tokenizer lowercases and collapses whitespace itself, so queries
+    that differ only in case, spacing or Unicode form get the same embedding.
+
+    Args:
+        text: Raw query
+
+    Returns:
+        Normalized query
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+class EmbeddingCache:
+    """Bounded LRU + TTL embedding cache with an optional shared Redis tier."""
+
+    def __init__(
+        self,
+        name: str,
+        model_key: str,
+        max_size: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        redis_client=None,
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            name: Cache name, used in keys and metric labels (e.g. 'text')
+            model_key: Identifies the model producing the vectors
+            max_size: Maximum number of in-process entries (defaults to settings)
+            ttl_seconds: Entry lifetime in both tiers (defaults to settings)
+            redis_client: Async Redis client for the shared tier (None = local only)
+        """
+        self.name = name
+        self.model_key = model_key
+        self.max_size = settings.embedding_cache_max_size if max_size is None else max_size
+        self.ttl_seconds = settings.embedding_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.redis = redis_client
+
+        self._entries: "OrderedDict[str, tuple[float, np.ndarray]]" = OrderedDict()
+
+    def make_key(self, key: str) -> str:
+        """
+        Build storage key: prefix, cache name, model key and a hash of the key.
+
+        Args:
+            key: Already normalized lookup key
+
+        Returns:
+            Key used in both tiers
+        """
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{self.name}:{self.model_key}:{digest}"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Look up an embedding, local tier first, then Redis.
+
+        Args:
+            key: Already normalized lookup key
+
+        Returns:
+            Cached embedding or None on miss
+        """
+        storage_key = self.make_key(key)
+
+        embedding = self._get_local(storage_key)
+        if embedding is not None:
+            record_embedding_cache(self.name, "hit")
+            return embedding
+
+        if self.redis is not None:
+            try:
+                data = await self.redis.get(storage_key)
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis get failed: {e}")
+                data = None
+
+            if data is not None:
+                embedding = np.frombuffer(data, dtype=np.float32).copy()
+                self._set_local(storage_key, embedding)
+                record_embedding_cache(self.name, "redis_hit")
+                return embedding
+
+        record_embedding_cache(self.name, "miss")
+        return None
+
+    async def set(self, key: str, embedding: np.ndarray) -> None:
+        """
+        Store an embedding in both tiers.
+
+        Args:
+            key: Already normalized lookup key
+            embedding: Embedding vector
+        """
+        storage_key = self.make_key(key)
+        # Own copy: a row view would keep the whole batch matrix alive
+        embedding = np.array(embedding, dtype=np.float32)
+
+        self._set_local(storage_key, embedding)
+
+        if self.redis is not None:
+            try:
+                await self.redis.set(
+                    storage_key, embedding.tobytes(), ex=max(1, int(self.ttl_seconds))
+                )
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis set failed: {e}")
+
+    def clear(self) -> None:
+        """Drop all in-process entries (Redis entries expire on their own)."""
+        self._entries.clear()
+        set_embedding_cache_size(self.name, 0)
+
+    async def close(self) -> None:
+        """Close the Redis connection, if any."""
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    def _get_local(self, storage_key: str) -> Optional[np.ndarray]:
+        entry = self._entries.get(storage_key)
+        if entry is None:
+            return None
+
+        expires_at, embedding = entry
+        if expires_at <= time.monotonic():
+            del self._entries[storage_key]
+            set_embedding_cache_size(self.name, len(self._entries))
+            return None
+
+        self._entries.move_to_end(storage_key)
+        return embedding
+
+    def _set_local(self, storage_key: str, embedding: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+
+        # Cached vectors are shared between requests and must not be mutated
+        embedding.setflags(write=False)
+        self._entries[storage_key] = (time.monotonic() + self.ttl_seconds, embedding)
+        self._entries.move_to_end(storage_key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        set_embedding_cache_size(self.name, len(self._entries))
+
+
+def create_embedding_cache(name: str, model_key: str) -> EmbeddingCache:
+    """
+    Create cache from settings, with the Redis tier if enabled.
+
+    Args:
+        name: Cache name (e.g. 'text', 'image')
+        model_key: Identifies the model producing the vectors
+
+    Returns:
+        Embedding cache
+    """
+    redis_client = None
+    if settings.embedding_cache_redis_enabled:
+        import redis.asyncio as redis
+
+        redis_client = redis.from_url(settings.redis_url)
+        logger.info(f"Embedding cache '{name}' uses Redis tier: {settings.redis_url}")
+
+    return EmbeddingCache(name, model_key, redis_client=redis_client)
@@ -0,0 +1,306 @@
+"""
+Multi-process CPU embedding farm for full catalog reindexes.
+
+Torch intra-op parallelism stops scaling after a handful of cores at batch
+size 32, so a big box is used by running N worker processes instead. Each worker
+has its own model copy and a pinned number of torch threads. The parent
+splits the input into row chunks and hands them out through a queue, so faster
+workers take more chunks. Workers write normalized float32 vectors straight into
+a shared ``.npy`` memory map, at the row of each input. The parent tracks
+progress and failures. Rows that failed are NaN in the output.
+"""
+import asyncio
+import functools
+import multiprocessing as mp
+import os
+import queue
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+from tqdm import tqdm
+
+from app.config import settings
+
+
+@dataclass
+class FarmResult:
+    """Outcome of a bulk embedding run."""
+
+    output_path: Path
+    total: int
+    failed_rows: List[int] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self) -> int:
+        return self.total - len(self.failed_rows)
+
+    @property
+    def images_per_second(self) -> float:
+        return self.succeeded / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def create_cpu_embedder(num_threads: int):
+    """Default worker embedder: vision tower of the configured model on CPU, offline tuning."""
+    from app.models.clip_model import CLIPEmbedder
+
+    return CLIPEmbedder(
+        model_name=settings.clip_model_name,
+        device="cpu",
+        num_threads=num_threads,
+        tuning_mode="offline",
+        towers=("vision",),
+    )
+
+
+def _farm_worker(
+    worker_id: int,
+    embedder_factory: Callable[[int], Any],
+    num_threads: int,
+    output_path: str,
+    loader: Optional[Callable[[Any], Any]],
+    batch_size: Optional[int],
+    decode_workers: int,
+    tasks: "mp.Queue",
+    results: "mp.Queue",
+) -> None:
+    """Worker process: embed chunks from the task queue into the memory map."""
+    import torch
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already initialised by an import in this process
+        pass
+
+    try:
+        embedder = embedder_factory(num_threads)
+        dim = embedder.get_embedding_dimension()
+    except Exception as e:
+        results.put(("error", worker_id, f"{type(e).__name__}: {e}"))
+        return
+    # The parent creates the memory map once it knows the dimension
+    output = None
+
+    async def embed_chunk(start: int, items: List[Any]) -> List[int]:
+        source = (
+            (start + i, functools.partial(loader, item) if loader else item)
+            for i, item in enumerate(items)
+        )
+        done = set()
+        async for rows, vectors in embedder.iter_embeddings(
+            source, batch_size=batch_size, prefetch_batches=1, decode_workers=decode_workers
+        ):
+            output[rows] = vectors
+            done.update(rows)
+            results.put(("progress", worker_id, len(rows)))
+        return [start + i for i in range(len(items)) if start + i not in done]
+
+    results.put(("ready", worker_id, dim))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        if output is None:
+            output = np.load(output_path, mmap_mode="r+")
+        chunk_id, start, items = task
+        results.put(("started", worker_id, chunk_id))
+        failed = asyncio.run(embed_chunk(start, items))
+        output.flush()
+        results.put(("done", worker_id, chunk_id, failed))
+
+
+def embed_to_memmap(
+    items: Sequence[Any],
+    output_path: str,
+    loader: Optional[Callable[[Any], Any]] = None,
+    num_workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    decode_workers: int = 2,
+    dim: Optional[int] = None,
+    embedder_factory: Callable[[int], Any] = create_cpu_embedder,
+    show_progress: bool = True,
+) -> FarmResult:
+    """
+    Embed all items with a pool of worker processes into a float32 ``.npy`` memory map.
+
+    Row ``i`` of the output holds the embedding of ``items[i]`` (NaN if it failed),
+    so the result can be joined back to ids by position, e.g. with
+    ``np.load(output_path, mmap_mode="r")``. The output width is the embedding
+    dimension reported by the first worker that loads its embedder.
+
+    Args:
+        items: Image sources, or keys resolved by ``loader`` (must be picklable)
+        output_path: Path of the ``.npy`` file to create
+        loader: Picklable function mapping an item to an image source; it runs
+            on the decode threads of the workers (e.g. an S3 download)
+        num_workers: Worker processes (defaults to settings, 0 = cores / threads)
+        threads_per_worker: Torch threads pinned per worker (defaults to settings)
+        batch_size: Images per forward pass (defaults to the embedder's batch size)
+        chunk_size: Rows handed to a worker at a time (defaults to settings)
+        decode_workers: Decode threads per worker
+        dim: Expected embedding dimension; a different embedder output raises
+        embedder_factory: Picklable ``factory(num_threads) -> embedder`` run in each worker
+        show_progress: Show a progress bar
+
+    Returns:
+        Run summary with the failed rows (including chunks of crashed workers)
+
+    Raises:
+        RuntimeError: If a worker fails to load its embedder or reports an
+            unexpected embedding dimension
+    """
+    start_time = time.time()
+
+    threads_per_worker = threads_per_worker or settings.embedding_farm_threads
+    num_workers = num_workers or settings.embedding_farm_workers
+    if not num_workers:
+        num_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+    chunk_size = chunk_size or settings.embedding_farm_chunk_size
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output = None
+
+    chunks: Dict[int, Tuple[int, int]] = {
+        chunk_id: (start, min(start + chunk_size, len(items)))
+        for chunk_id, start in enumerate(range(0, len(items), chunk_size))
+    }
+    num_workers = max(1, min(num_workers, len(chunks)))
+    ctx = mp.get_context("spawn")
+    tasks = ctx.Queue()
+    results = ctx.Queue()
+
+    logger.info(
+        f"Embedding farm: {len(items)} items, {len(chunks)} chunks, "
+        f"{num_workers} workers x {threads_per_worker} threads"
+    )
+
+    workers = [
+        ctx.Process(
+            target=_farm_worker,
+            args=(
+                worker_id,
+                embedder_factory,
+                threads_per_worker,
+                str(output_path),
+                loader,
+                batch_size,
+                decode_workers,
+                tasks,
+                results,
+            ),
+            name=f"embedding-farm-{worker_id}",
+            daemon=True,
+        )
+        for worker_id in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    ready: set = set()
+    in_flight: Dict[int, int] = {}
+    finished: set = set()
+    failed_rows: List[int] = []
+    progress = tqdm(total=len(items), desc="Embedding farm", disable=not show_progress)
+
+    try:
+        while output is None or len(finished) < len(chunks):
+            try:
+                message = results.get(timeout=1.0)
+            except queue.Empty:
+                for worker_id, worker in enumerate(workers):
+                    if worker.exitcode not in (None, 0) and worker_id not in ready:
+                        raise RuntimeError(
+                            f"Embedding worker {worker_id} exited during startup "
+                            f"(exit code {worker.exitcode})"
+                        )
+                    # A worker that died takes its current chunk with it
+                    if worker.exitcode not in (None, 0) and worker_id in in_flight:
+                        chunk_id = in_flight.pop(worker_id)
+                        start, end = chunks[chunk_id]
+                        logger.error(
+                            f"Worker {worker_id} died (exit code {worker.exitcode}), "
+                            f"rows {start}-{end} failed"
+                        )
+                        failed_rows.extend(range(start, end))
+                        finished.add(chunk_id)
+                if all(not worker.is_alive() for worker in workers):
+                    # Nobody is left to pick up the rest (or the last messages were lost)
+                    for chunk_id, (start, end) in chunks.items():
+                        if chunk_id not in finished:
+                            failed_rows.extend(range(start, end))
+                            finished.add(chunk_id)
+                    logger.error("All embedding workers exited, unfinished rows marked failed")
+                continue
+
+            kind, worker_id = message[0], message[1]
+            if kind == "error":
+                raise RuntimeError(f"Embedding worker {worker_id} failed to start: {message[2]}")
+            elif kind == "ready":
+                worker_dim = message[2]
+                if dim is not None and worker_dim != dim:
+                    raise RuntimeError(
+                        f"Embedding worker {worker_id} produces {worker_dim}-d vectors, "
+                        f"expected {dim}"
+                    )
+                ready.add(worker_id)
+                logger.debug(f"Worker {worker_id} ready ({worker_dim}-d)")
+
+                if output is None:
+                    # Size the output from the embedder, then hand out the chunks
+                    dim = worker_dim
+                    output = np.lib.format.open_memmap(
+                        output_path, mode="w+", dtype=np.float32, shape=(len(items), dim)
+                    )
+                    for chunk_id, (start, end) in chunks.items():
+                        tasks.put((chunk_id, start, list(items[start:end])))
+                    for _ in range(num_workers):
+                        tasks.put(None)
+            elif kind == "started":
+                in_flight[worker_id] = message[2]
+            elif kind == "progress":
+                progress.update(message[2])
+            elif kind == "done":
+                chunk_id, chunk_failed = message[2], message[3]
+                in_flight.pop(worker_id, None)
+                finished.add(chunk_id)
+                failed_rows.extend(chunk_failed)
+                progress.update(len(chunk_failed))
+    except BaseException:
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        progress.close()
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+    failed_rows.sort()
+    if failed_rows:
+        output[failed_rows] = np.nan
+    output.flush()
+    del output
+
+    result = FarmResult(
+        output_path=output_path,
+        total=len(items),
+        failed_rows=failed_rows,
+        elapsed=time.time() - start_time,
+    )
+    logger.info(
+        f"Embedding farm done: {result.succeeded}/{result.total} embedded, "
+        f"{len(failed_rows)} failed, {result.images_per_second:.1f} img/s"
+    )
+    return result
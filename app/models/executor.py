@@ -0,0 +1,128 @@
+"""
+Dedicated thread pool for CLIP inference with bounded queue and load shedding.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from loguru import logger
+
+from app.config import settings
+from app.utils.metrics import record_inference_rejected, set_inference_pending
+
+T = TypeVar("T")
+
+
+class InferenceQueueFull(Exception):
+    """Raised when inference is saturated and a new job has to be rejected."""
+
+
+class InferenceExecutor:
+    """
+    Run blocking decode/forward work off the asyncio event loop.
+
+    At most ``max_workers`` jobs run at the same time and at most
+    ``max_queue_size`` more may wait for a worker. Anything beyond that is
+    rejected immediately with :class:`InferenceQueueFull` so callers can shed
+    load instead of piling up latency.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+    ):
+        """
+        Initialize executor.
+
+        Args:
+            max_workers: Number of inference threads (defaults to settings)
+            max_queue_size: Jobs allowed to wait for a free thread (defaults to settings)
+        """
+        self.max_workers = max_workers or settings.clip_inference_workers
+        if max_queue_size is None:
+            max_queue_size = settings.clip_inference_queue_size
+        self.max_queue_size = max_queue_size
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="clip-inference"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        logger.info(
+            f"Inference executor started: workers={self.max_workers}, "
+            f"queue_size={self.max_queue_size}"
+        )
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs running or waiting for a thread."""
+        return self._pending
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a blocking callable on the inference threads.
+
+        Args:
+            func: Callable to execute
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            Result of func
+
+        Raises:
+            InferenceQueueFull: If all workers are busy and the queue is full
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue_size:
+                record_inference_rejected()
+                raise InferenceQueueFull(
+                    f"Inference queue is full ({self._pending} jobs pending)"
+                )
+            self._pending += 1
+            set_inference_pending(self._pending)
+
+        # Release the slot when the thread job finishes (or is dropped from the
+        # queue), not when the caller stops waiting: a cancelled request must
+        # not free capacity while its work is still queued or running.
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        """Free the slot held by a finished or dropped job."""
+        with self._lock:
+            self._pending -= 1
+            set_inference_pending(self._pending)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop inference threads.
+
+        Args:
+            wait: Whether to wait for running jobs to finish
+        """
+        self._executor.shutdown(wait=wait)
+        logger.info("Inference executor stopped")
+
+
+# Global executor instance
+_inference_executor: Optional[InferenceExecutor] = None
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Get or create global inference executor instance."""
+    global _inference_executor
+
+    if _inference_executor is None:
+        _inference_executor = InferenceExecutor()
+
+    return _inference_executor
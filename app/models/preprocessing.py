@@ -0,0 +1,164 @@
+"""
+Vectorized CLIP image preprocessing.
+
+Reproduces ``CLIPImageProcessor`` (shortest-edge bicubic resize, center crop,
+rescale, normalize) but only the resize and crop run per image, in PIL's C code
+on uint8 data. The crops are stacked into one uint8 batch which is rescaled and
+normalized in a single NumPy expression. JPEGs can additionally be decoded at a
+reduced scale (``Image.draft``) so large photos are never fully decompressed.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.utils.image_processing import ImageSource, load_image
+
+
+class ImagePreprocessor:
+    """Batch preprocessing equivalent to CLIPImageProcessor."""
+
+    def __init__(
+        self,
+        size: int = 224,
+        crop_size: Tuple[int, int] = (224, 224),
+        image_mean: Sequence[float] = (0.48145466, 0.4578275, 0.40821073),
+        image_std: Sequence[float] = (0.26862954, 0.26130258, 0.27577711),
+        rescale_factor: float = 1 / 255,
+        resample: int = Image.Resampling.BICUBIC,
+        draft: bool = True,
+    ):
+        """
+        Initialize preprocessor.
+
+        Args:
+            size: Target length of the shortest edge after resizing
+            crop_size: (height, width) of the center crop
+            image_mean: Per-channel mean used for normalization
+            image_std: Per-channel std used for normalization
+            rescale_factor: Factor mapping uint8 pixels to [0, 1]
+            resample: PIL resampling filter for resizing
+            draft: Decode JPEGs at reduced scale when loading
+        """
+        self.size = size
+        self.crop_size = crop_size
+        self.resample = resample
+        self.draft = draft
+
+        # (x * rescale - mean) / std == x * scale + shift, folded per channel
+        std = np.asarray(image_std, dtype=np.float32)
+        self._scale = (np.float32(rescale_factor) / std).reshape(1, 3, 1, 1)
+        self._shift = (-np.asarray(image_mean, dtype=np.float32) / std).reshape(1, 3, 1, 1)
+
+    @classmethod
+    def from_image_processor(cls, image_processor, draft: bool = True) -> "ImagePreprocessor":
+        """
+        Build preprocessor from a HuggingFace CLIP image processor config.
+
+        Args:
+            image_processor: CLIPImageProcessor (``processor.image_processor``)
+            draft: Decode JPEGs at reduced scale when loading
+
+        Returns:
+            Preprocessor producing the same pixel values
+        """
+        size = image_processor.size
+        size = size["shortest_edge"] if "shortest_edge" in size else min(size["height"], size["width"])
+        crop = image_processor.crop_size
+
+        return cls(
+            size=size,
+            crop_size=(crop["height"], crop["width"]),
+            image_mean=image_processor.image_mean,
+            image_std=image_processor.image_std,
+            rescale_factor=image_processor.rescale_factor,
+            resample=image_processor.resample,
+            draft=draft,
+        )
+
+    def load(self, source: ImageSource) -> Image.Image:
+        """
+        Decode image source to RGB, at reduced scale for JPEGs if enabled.
+
+        The draft scale is a power of two chosen so both sides stay at least
+        ``size``, so the subsequent resize still only downsamples.
+
+        Args:
+            source: File path, encoded bytes, binary file-like object or PIL image
+
+        Returns:
+            RGB PIL image
+        """
+        return load_image(source, draft_size=self.size if self.draft else None)
+
+    def resize_and_crop(self, image: Image.Image) -> np.ndarray:
+        """
+        Resize the shortest edge to ``size`` and center crop.
+
+        Args:
+            image: RGB PIL image
+
+        Returns:
+            uint8 array of shape (crop_height, crop_width, 3)
+        """
+        width, height = image.size
+        short, long = (width, height) if width <= height else (height, width)
+        new_short, new_long = self.size, int(self.size * long / short)
+        new_size = (new_short, new_long) if width <= height else (new_long, new_short)
+
+        if image.size != new_size:
+            image = image.resize(new_size, resample=self.resample)
+
+        crop_height, crop_width = self.crop_size
+        top = (new_size[1] - crop_height) // 2
+        left = (new_size[0] - crop_width) // 2
+        # Out-of-bounds boxes are zero padded, as in CLIPImageProcessor
+        image = image.crop((left, top, left + crop_width, top + crop_height))
+
+        return np.asarray(image, dtype=np.uint8)
+
+    def stack(self, images: List[Image.Image]) -> np.ndarray:
+        """
+        Resize, crop and stack images into a uint8 batch.
+
+        Args:
+            images: RGB PIL images
+
+        Returns:
+            uint8 array of shape (batch, crop_height, crop_width, 3)
+        """
+        crop_height, crop_width = self.crop_size
+        batch = np.empty((len(images), crop_height, crop_width, 3), dtype=np.uint8)
+        for i, image in enumerate(images):
+            batch[i] = self.resize_and_crop(image)
+        return batch
+
+    def normalize(self, batch: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Rescale and normalize a uint8 batch in one pass.
+
+        Args:
+            batch: uint8 array of shape (batch, H, W, 3)
+            out: Optional float32 buffer of shape (batch, 3, H, W) to write into
+
+        Returns:
+            float32 pixel values of shape (batch, 3, H, W)
+        """
+        chw = batch.transpose(0, 3, 1, 2)
+        if out is None:
+            out = np.empty(chw.shape, dtype=np.float32)
+        np.multiply(chw, self._scale, out=out)
+        out += self._shift
+        return out
+
+    def __call__(self, images: List[Image.Image]) -> np.ndarray:
+        """
+        Preprocess decoded images into model input.
+
+        Args:
+            images: RGB PIL images
+
+        Returns:
+            float32 pixel values of shape (batch, 3, crop_height, crop_width)
+        """
+        return self.normalize(self.stack(images))
@@ -0,0 +1,166 @@
+"""
+Learned dimensionality reduction for stored embeddings.
+
+A PCA projection is fitted on normalized catalog embeddings and stored as a
+single versioned ``.npy`` matrix of shape ``(input_dim + 1, output_dim)``: the
+first ``input_dim`` rows are the principal components, the last row is the
+offset ``-mean @ components``. Projected vectors are re-normalized, so cosine
+search works the same on the reduced collection. The version (file stem) is part
+of the embedder's model key, so cached vectors never mix dimensions.
+"""
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+
+class EmbeddingProjection:
+    """Linear projection (PCA) applied to normalized embeddings."""
+
+    def __init__(self, components: np.ndarray, offset: np.ndarray, version: str):
+        """
+        Initialize projection.
+
+        Args:
+            components: Projection matrix, shape (input_dim, output_dim)
+            offset: Added after the projection, shape (output_dim,)
+            version: Identifier of this projection (stored in cache keys)
+        """
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.version = version
+
+    @property
+    def input_dim(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def output_dim(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(
+        cls,
+        vectors: np.ndarray,
+        output_dim: int,
+        version: Optional[str] = None,
+    ) -> "EmbeddingProjection":
+        """
+        Fit PCA on embeddings.
+
+        Args:
+            vectors: Normalized embeddings, shape (n, input_dim)
+            output_dim: Number of principal components to keep
+            version: Identifier (defaults to 'pca<dim>-<hash of the matrix>')
+
+        Returns:
+            Fitted projection
+
+        Raises:
+            ValueError: If there are fewer vectors than components
+        """
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if output_dim > min(vectors.shape):
+            raise ValueError(
+                f"Cannot fit {output_dim} components on {vectors.shape[0]} vectors "
+                f"of dimension {vectors.shape[1]}"
+            )
+
+        mean = vectors.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        components = vt[:output_dim].T
+
+        explained = (singular_values[:output_dim] ** 2).sum() / (singular_values ** 2).sum()
+        logger.info(
+            f"PCA fitted on {len(vectors)} vectors: {vectors.shape[1]} -> {output_dim}, "
+            f"explained variance {explained:.3f}"
+        )
+
+        offset = -mean @ components
+        if version is None:
+            digest = hashlib.sha1(components.astype(np.float32).tobytes()).hexdigest()[:8]
+            version = f"pca{output_dim}-{digest}"
+        return cls(components, offset, version)
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Project and re-normalize embeddings.
+
+        Args:
+            vectors: Embeddings, shape (n, input_dim) or (input_dim,)
+
+        Returns:
+            Normalized float32 embeddings, shape (n, output_dim) or (output_dim,)
+        """
+        projected = np.asarray(vectors, dtype=np.float32) @ self.components + self.offset
+        return projected / np.linalg.norm(projected, axis=-1, keepdims=True)
+
+    def save(self, directory: str) -> Path:
+        """
+        Save as '<directory>/<version>.npy'.
+
+        Returns:
+            Path of the written file
+        """
+        path = Path(directory) / f"{self.version}.npy"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, np.vstack([self.components, self.offset[None, :]]))
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingProjection":
+        """
+        Load projection saved by :meth:`save`; the file stem is the version.
+
+        Args:
+            path: Path to the .npy file
+
+        Returns:
+            Loaded projection
+        """
+        path = Path(path)
+        matrix = np.load(path)
+        return cls(matrix[:-1], matrix[-1], version=path.stem)
+
+
+def recall_at_k(
+    full: np.ndarray,
+    reduced: np.ndarray,
+    query_rows: np.ndarray,
+    k: int = 10,
+) -> float:
+    """
+    Recall@k of exact search on reduced vectors against exact search on full ones.
+
+    Each query row searches the whole set, excluding itself.
+
+    Args:
+        full: Normalized full-dimension vectors, shape (n, d)
+        reduced: The same vectors projected, shape (n, d')
+        query_rows: Rows used as queries
+        k: Neighbours compared per query (capped at n - 1)
+
+    Returns:
+        Mean fraction of the true top-k found in the reduced top-k
+
+    Raises:
+        ValueError: If there are fewer than two vectors
+    """
+    k = min(k, len(full) - 1)
+    if k < 1:
+        raise ValueError(f"Recall needs at least two vectors, got {len(full)}")
+
+    def top_k(vectors: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        scores = vectors[rows] @ vectors.T
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return np.argpartition(-scores, k, axis=1)[:, :k]
+
+    hits = []
+    # Query blocks keep the score matrix small for large collections
+    for start in range(0, len(query_rows), 256):
+        rows = np.asarray(query_rows[start : start + 256])
+        expected, found = top_k(full, rows), top_k(reduced, rows)
+        hits.extend(len(np.intersect1d(e, f)) for e, f in zip(expected, found))
+    return float(np.mean(hits)) / k
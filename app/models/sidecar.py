@@ -0,0 +1,199 @@
+"""
+Embedding sidecar: one process owns the CLIP model for all API workers.
+
+The sidecar loads :class:`CLIPEmbedder` and the :class:`InferenceScheduler`
+once and serves queries over a Unix domain socket, so concurrent queries from
+every uvicorn worker are merged into the same batches. API workers run a
+:class:`SidecarClient` instead of a model and start without loading weights.
+
+The wire protocol and the client live in :mod:`app.models.sidecar_client`,
+which API workers import without loading torch. Here too the model is
+imported only by :func:`serve`.
+
+Run with ``python -m app.models.sidecar`` and set ``clip_sidecar_socket`` for
+the API to use it.
+"""
+import asyncio
+import os
+import signal
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.models.executor import InferenceQueueFull
+from app.models.sidecar_client import _read_slot, _recv, _send, _write_slot
+
+if TYPE_CHECKING:
+    from app.models.batching import InferenceScheduler
+    from app.models.clip_model import CLIPEmbedder
+
+
+class EmbeddingSidecar:
+    """Serve a loaded embedder and its scheduler to API workers over a Unix socket."""
+
+    def __init__(
+        self,
+        embedder: "CLIPEmbedder",
+        scheduler: "InferenceScheduler",
+        socket_path: Optional[str] = None,
+    ):
+        """
+        Initialize sidecar.
+
+        Args:
+            embedder: Loaded CLIP embedder (both towers)
+            scheduler: Started scheduler batching queries for the embedder
+            socket_path: Unix socket to listen on (defaults to settings)
+        """
+        self.embedder = embedder
+        self.scheduler = scheduler
+        self.socket_path = socket_path or settings.clip_sidecar_socket
+
+        preprocessor = embedder.preprocessor
+        self.crop_shape = (*preprocessor.crop_size, 3)
+        # Large enough for the query image in and the embedding out
+        self.slot_size = max(
+            int(np.prod(self.crop_shape)), embedder.get_embedding_dimension() * 4
+        )
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+
+    def info(self) -> Dict[str, Any]:
+        """Model description sent to every client when it connects."""
+        preprocessor = self.embedder.preprocessor
+        return {
+            "pid": os.getpid(),
+            "model_key": self.embedder.model_key,
+            "embedding_dim": self.embedder.get_embedding_dimension(),
+            "device": self.embedder.device,
+            "preprocessor": {
+                "size": preprocessor.size,
+                "crop_size": list(preprocessor.crop_size),
+                "resample": int(preprocessor.resample),
+                "draft": preprocessor.draft,
+            },
+        }
+
+    async def start(self) -> None:
+        """Start listening; a stale socket file from a previous run is replaced."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.success(f"✅ Embedding sidecar listening on {self.socket_path}")
+
+    async def stop(self) -> None:
+        """Stop listening and close open connections."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        for task in self._connections:
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        logger.info("Embedding sidecar stopped")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one client connection until it closes."""
+        task = asyncio.current_task()
+        self._connections.add(task)
+        slot = SharedMemory(create=True, size=self.slot_size)
+
+        try:
+            await _send(writer, {**self.info(), "shm": slot.name})
+            while True:
+                try:
+                    request = await _recv(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                await _send(writer, await self._serve(request, slot))
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            slot.close()
+            slot.unlink()
+
+    async def _serve(self, request: Dict[str, Any], slot: SharedMemory) -> Dict[str, Any]:
+        """Embed one query; the embedding is left in the slot, the reply describes it."""
+        op = request.get("op")
+        try:
+            if op == "pixels":
+                crop = _read_slot(slot, self.crop_shape, np.uint8)
+                embedding = await self.scheduler.embed_pixels(crop)
+            elif op == "text":
+                embedding = await self.scheduler.embed_text(request["text"])
+            else:
+                return {"error": f"Unknown operation: {op}"}
+        except InferenceQueueFull as e:
+            return {"error": str(e), "overloaded": True}
+        except Exception as e:
+            logger.error(f"Sidecar {op} query failed: {e}")
+            return {"error": str(e)}
+
+        embedding = np.asarray(embedding, dtype=np.float32)
+        _write_slot(slot, embedding)
+        return {"dim": len(embedding)}
+
+
+async def serve(socket_path: Optional[str] = None) -> None:
+    """Load the model and serve it until SIGTERM/SIGINT."""
+    from app.models.batching import InferenceScheduler
+    from app.models.clip_model import CLIPEmbedder
+
+    embedder = CLIPEmbedder(device="auto")
+    scheduler = InferenceScheduler(embedder)
+    await scheduler.start()
+
+    sidecar = EmbeddingSidecar(embedder, scheduler, socket_path)
+    await sidecar.start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    await stopping.wait()
+
+    await sidecar.stop()
+    await scheduler.stop()
+
+
+def main() -> None:
+    """Entry point of ``python -m app.models.sidecar``."""
+    import argparse
+
+    from app.utils.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description="CLIP embedding sidecar for API workers")
+    parser.add_argument(
+        "--socket", default=None, help="Unix socket path (default: CLIP_SIDECAR_SOCKET)"
+    )
+    args = parser.parse_args()
+
+    socket_path = args.socket or settings.clip_sidecar_socket
+    if not socket_path:
+        parser.error("set CLIP_SIDECAR_SOCKET or pass --socket")
+
+    setup_logging()
+
+    if settings.clip_sidecar_metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(settings.clip_sidecar_metrics_port)
+
+    asyncio.run(serve(socket_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Client side of the embedding sidecar, used by API workers.
+
+Kept apart from :mod:`app.models.sidecar` so that a worker talking to the
+sidecar imports neither torch nor transformers: it only decodes, resizes and
+crops images and exchanges them through the socket and shared memory.
+
+Messages on the socket are small length-prefixed JSON headers. Bulk data never
+goes through the socket: every connection gets its own shared memory slot,
+created by the sidecar, into which the client writes the resized and cropped
+uint8 image and from which it reads the resulting embedding. Each connection
+carries one query at a time, so the slot is never shared between queries.
+"""
+import asyncio
+import json
+import os
+import struct
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+from app.config import settings
+from app.models.executor import InferenceQueueFull
+from app.models.preprocessing import ImagePreprocessor
+from app.utils.image_processing import ImageSource
+
+_HEADER = struct.Struct("!I")
+
+
+async def _send(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    data = json.dumps(message).encode()
+    writer.write(_HEADER.pack(len(data)) + data)
+    await writer.drain()
+
+
+async def _recv(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return json.loads(await reader.readexactly(size))
+
+
+def _write_slot(shm: SharedMemory, array: np.ndarray) -> None:
+    """Copy an array to the start of a shared memory slot."""
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    # Views must not outlive the slot, or closing it fails
+    del view
+
+
+def _read_slot(shm: SharedMemory, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+    """Copy an array out of a shared memory slot."""
+    view = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array = view.copy()
+    del view
+    return array
+
+
+class _Connection:
+    """Client side of one sidecar connection and its shared memory slot."""
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        info: Dict[str, Any],
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.info = info
+        self.slot = SharedMemory(name=info["shm"])
+        if info["pid"] != os.getpid():
+            # The sidecar owns and unlinks the slot; don't let this process's
+            # resource tracker unlink it too when the worker exits
+            resource_tracker.unregister(self.slot._name, "shared_memory")
+
+    @classmethod
+    async def open(cls, socket_path: str) -> "_Connection":
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        return cls(reader, writer, await _recv(reader))
+
+    async def request(
+        self, message: Dict[str, Any], pixels: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        if pixels is not None:
+            _write_slot(self.slot, pixels)
+        await _send(self.writer, message)
+        return await _recv(self.reader)
+
+    def close(self) -> None:
+        self.writer.close()
+        self.slot.close()
+
+
+class SidecarClient:
+    """
+    Embed queries through the embedding sidecar.
+
+    Used by API workers in place of both the :class:`CLIPEmbedder` and the
+    :class:`InferenceScheduler`: images are decoded, resized and cropped
+    locally (:meth:`load_image`), the forward pass runs in the sidecar. Up to
+    ``max_connections`` queries are in flight at a time, further queries wait
+    for a free connection. A sidecar rejecting a query for overload raises
+    :class:`InferenceQueueFull`, as the local scheduler does.
+    """
+
+    device = "sidecar"
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+    ):
+        """
+        Initialize client.
+
+        Args:
+            socket_path: Unix socket of the sidecar (defaults to settings)
+            max_connections: Connections kept to the sidecar (defaults to settings)
+            connect_timeout: Seconds to wait for the sidecar in :meth:`start`
+                (defaults to settings)
+        """
+        self.socket_path = socket_path or settings.clip_sidecar_socket
+        self.max_connections = max_connections or settings.clip_sidecar_connections
+        if connect_timeout is None:
+            connect_timeout = settings.clip_sidecar_connect_timeout
+        self.connect_timeout = connect_timeout
+
+        self.preprocessor: Optional[ImagePreprocessor] = None
+        self._info: Dict[str, Any] = {}
+        self._idle: List[_Connection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def model_key(self) -> str:
+        """Identifier of the vectors the sidecar's embedder produces."""
+        return self._info["model_key"]
+
+    def get_embedding_dimension(self) -> int:
+        """Dimension of the sidecar's embedding vectors."""
+        return self._info["embedding_dim"]
+
+    async def start(self) -> None:
+        """
+        Connect to the sidecar, waiting while it is still loading the model.
+
+        Raises:
+            RuntimeError: If the sidecar does not accept connections in time
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.connect_timeout
+
+        while True:
+            try:
+                connection = await _Connection.open(self.socket_path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if loop.time() >= deadline:
+                    raise RuntimeError(
+                        f"Embedding sidecar not available at {self.socket_path}: {e}"
+                    ) from e
+                await asyncio.sleep(0.5)
+
+        self._info = connection.info
+        config = self._info["preprocessor"]
+        self.preprocessor = ImagePreprocessor(
+            size=config["size"],
+            crop_size=tuple(config["crop_size"]),
+            resample=config["resample"],
+            draft=config["draft"],
+        )
+        self._idle.append(connection)
+        self._slots = asyncio.Semaphore(self.max_connections)
+
+        logger.success(
+            f"✅ Connected to embedding sidecar {self.socket_path} "
+            f"({self.model_key}, device={self._info['device']})"
+        )
+
+    async def stop(self) -> None:
+        """Close idle connections."""
+        while self._idle:
+            self._idle.pop().close()
+
+    def load_image(self, image: ImageSource) -> np.ndarray:
+        """
+        Decode, resize and crop an image for the sidecar (blocking, run off the event loop).
+
+        Args:
+            image: Path to image file, encoded image bytes, binary file-like object
+                or decoded PIL image
+
+        Returns:
+            uint8 crop of shape (H, W, 3)
+        """
+        return self.preprocessor.resize_and_crop(self.preprocessor.load(image))
+
+    async def embed_image(self, image: np.ndarray) -> np.ndarray:
+        """
+        Generate normalized embedding for an image prepared by :meth:`load_image`.
+
+        A PIL image is accepted too, but is then resized on the event loop.
+
+        Raises:
+            InferenceQueueFull: If the sidecar is overloaded
+        """
+        if isinstance(image, Image.Image):
+            image = self.preprocessor.resize_and_crop(image)
+        return await self._query({"op": "pixels"}, pixels=image)
+
+    async def embed_text(self, text: str) -> np.ndarray:
+        """
+        Generate normalized embedding for a text query.
+
+        Raises:
+            InferenceQueueFull: If the sidecar is overloaded
+        """
+        return await self._query({"op": "text", "text": text})
+
+    async def embed_images(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        """Embed several images concurrently; the sidecar merges them into its batches."""
+        return list(await asyncio.gather(*(self.embed_image(image) for image in images)))
+
+    async def embed_texts(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed several text queries concurrently; the sidecar merges them into its batches."""
+        return list(await asyncio.gather(*(self.embed_text(text) for text in texts)))
+
+    async def _query(
+        self, message: Dict[str, Any], pixels: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Send one query over a free connection and read the embedding from its slot."""
+        if self._slots is None:
+            raise RuntimeError("Sidecar client is not started")
+
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await _Connection.open(self.socket_path)
+            try:
+                reply = await connection.request(message, pixels=pixels)
+                embedding = None
+                if "error" not in reply:
+                    embedding = _read_slot(connection.slot, (reply["dim"],), np.float32)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                connection.close()
+                raise RuntimeError(f"Embedding sidecar unavailable: {e}") from e
+            except BaseException:
+                # Cancelled mid-query: the reply would arrive on a reused connection
+                connection.close()
+                raise
+            self._idle.append(connection)
+
+        if "error" in reply:
+            if reply.get("overloaded"):
+                raise InferenceQueueFull(reply["error"])
+            raise RuntimeError(f"Embedding sidecar error: {reply['error']}")
+        return embedding
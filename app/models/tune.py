@@ -0,0 +1,370 @@
+"""
+Auto-tuner for the CLIP batch size, thread counts and backend.
+
+Benchmarks the forward pass of :class:`CLIPEmbedder` over a grid of backends,
+intra-op / inter-op thread counts and batch sizes, reports p50/p99 latency and
+throughput, and writes a tuning profile with two entries:
+
+* ``online`` -- backend and threads with the lowest single-query p99, and the
+  largest batch whose p99 stays within the latency budget (the micro-batching
+  limit of the API server);
+* ``offline`` -- the configuration with the highest images/sec (bulk indexing).
+
+:class:`CLIPEmbedder` applies one of the entries at startup (``CLIP_TUNING_MODE``)
+for every setting that is not set explicitly in the environment.
+
+Usage::
+
+    python -m app.models.tune --backends torch,onnx --batch-sizes 1,8,32
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+
+TUNING_MODES = ("online", "offline")
+
+# Keys of a profile entry mapped to the settings they replace
+PROFILE_SETTINGS = {
+    "backend": "clip_backend",
+    "num_threads": "clip_num_threads",
+    "interop_threads": "clip_interop_threads",
+    "batch_size": "clip_batch_size",
+    "max_batch_size": "clip_max_batch_size",
+}
+
+
+def benchmark_config(
+    embedder,
+    batch_size: int,
+    iterations: int = 20,
+    warmup: int = 3,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """
+    Time the forward pass of one batch size on random uint8 crops.
+
+    Decoding is left out: in bulk embedding it overlaps with the forward pass,
+    online it does not depend on the model configuration.
+
+    Args:
+        embedder: Loaded embedder (anything with ``preprocessor`` and ``encode_pixels``)
+        batch_size: Images per forward pass
+        iterations: Timed forward passes
+        warmup: Untimed forward passes before measuring
+
+    Returns:
+        Batch latency percentiles in ms and throughput in images/sec
+    """
+    height, width = embedder.preprocessor.crop_size
+    rng = np.random.default_rng(seed)
+    batch = rng.integers(0, 256, (batch_size, height, width, 3), dtype=np.uint8)
+
+    for _ in range(warmup):
+        embedder.encode_pixels(batch)
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        embedder.encode_pixels(batch)
+        latencies.append(time.perf_counter() - start)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "images_per_second": float(batch_size * iterations / sum(latencies)),
+    }
+
+
+def _benchmark_backend(
+    model_name: str,
+    device: str,
+    backend: str,
+    interop_threads: int,
+    thread_counts: Sequence[int],
+    batch_sizes: Sequence[int],
+    iterations: int,
+    warmup: int,
+) -> List[Dict[str, Any]]:
+    """
+    Benchmark one backend and inter-op thread count (runs in a fresh process).
+
+    Torch fixes the inter-op pool on first use, so each inter-op value needs its
+    own process; intra-op threads are set per embedder.
+    """
+    import torch
+
+    from app.models.clip_model import CLIPEmbedder
+
+    if interop_threads:
+        torch.set_num_interop_threads(interop_threads)
+
+    results = []
+    for num_threads in thread_counts:
+        embedder = CLIPEmbedder(
+            model_name=model_name,
+            device=device,
+            backend=backend,
+            num_threads=num_threads,
+            tuning_mode="none",
+            towers=("vision",),
+        )
+        for batch_size in batch_sizes:
+            stats = benchmark_config(embedder, batch_size, iterations=iterations, warmup=warmup)
+            result = {
+                "backend": backend,
+                "num_threads": num_threads,
+                "interop_threads": interop_threads,
+                "batch_size": batch_size,
+                **stats,
+            }
+            logger.info(
+                f"{backend:9} threads={num_threads:<3} interop={interop_threads:<2} "
+                f"batch={batch_size:<4} p50={stats['p50_ms']:8.1f}ms "
+                f"p99={stats['p99_ms']:8.1f}ms {stats['images_per_second']:8.1f} img/s"
+            )
+            results.append(result)
+        del embedder
+
+    return results
+
+
+def run_grid(
+    model_name: str,
+    device: str,
+    backends: Sequence[str],
+    thread_counts: Sequence[int],
+    interop_counts: Sequence[int],
+    batch_sizes: Sequence[int],
+    iterations: int = 20,
+    warmup: int = 3,
+) -> List[Dict[str, Any]]:
+    """
+    Benchmark the full grid, one process per (backend, inter-op threads) pair.
+
+    Returns:
+        One result per grid point (see :func:`benchmark_config`)
+    """
+    results: List[Dict[str, Any]] = []
+    for backend in backends:
+        for interop_threads in interop_counts:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                results.extend(
+                    pool.submit(
+                        _benchmark_backend,
+                        model_name,
+                        device,
+                        backend,
+                        interop_threads,
+                        thread_counts,
+                        batch_sizes,
+                        iterations,
+                        warmup,
+                    ).result()
+                )
+    return results
+
+
+def select_profiles(
+    results: List[Dict[str, Any]],
+    latency_budget_ms: Optional[float] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Choose the online and offline configuration from benchmark results.
+
+    Args:
+        results: Grid results
+        latency_budget_ms: Highest acceptable p99 of an online batch
+            (defaults to twice the best single-query p99)
+
+    Returns:
+        Profile entries keyed by tuning mode
+    """
+    if not results:
+        raise ValueError("No benchmark results to select from")
+
+    offline = max(results, key=lambda r: r["images_per_second"])
+
+    smallest = min(r["batch_size"] for r in results)
+    online = min(
+        (r for r in results if r["batch_size"] == smallest), key=lambda r: r["p99_ms"]
+    )
+    if latency_budget_ms is None:
+        latency_budget_ms = 2 * online["p99_ms"]
+
+    same_config = [
+        r
+        for r in results
+        if (r["backend"], r["num_threads"], r["interop_threads"])
+        == (online["backend"], online["num_threads"], online["interop_threads"])
+        and r["p99_ms"] <= latency_budget_ms
+    ]
+    max_batch_size = max((r["batch_size"] for r in same_config), default=smallest)
+
+    def entry(result: Dict[str, Any], **batching: Any) -> Dict[str, Any]:
+        return {
+            "backend": result["backend"],
+            "num_threads": result["num_threads"],
+            "interop_threads": result["interop_threads"],
+            **batching,
+            "p50_ms": result["p50_ms"],
+            "p99_ms": result["p99_ms"],
+            "images_per_second": result["images_per_second"],
+        }
+
+    # Online latencies are those of a single query, the batch size is the
+    # micro-batching limit; offline only the bulk batch size matters
+    return {
+        "online": entry(online, max_batch_size=max_batch_size, latency_budget_ms=latency_budget_ms),
+        "offline": entry(offline, batch_size=offline["batch_size"]),
+    }
+
+
+def save_profile(
+    path: str,
+    model_name: str,
+    device: str,
+    profiles: Dict[str, Dict[str, Any]],
+    results: List[Dict[str, Any]],
+) -> Path:
+    """
+    Write the tuning profile as JSON.
+
+    Returns:
+        Path of the written file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "model_name": model_name,
+        "device": device,
+        "cpu_count": os.cpu_count(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "profiles": profiles,
+        "results": results,
+    }
+    path.write_text(json.dumps(data, indent=2))
+    return path
+
+
+def load_tuning_profile(
+    model_name: str,
+    device: str,
+    mode: Optional[str] = None,
+    path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Load the settings of one tuning mode for this model, device and host.
+
+    A profile measured for another model, device or CPU count is ignored, as
+    are settings set explicitly in the environment.
+
+    Args:
+        model_name: HuggingFace model name
+        device: Device the embedder runs on
+        mode: 'online', 'offline' or 'none' (defaults to settings)
+        path: Profile file (defaults to settings)
+
+    Returns:
+        Setting values keyed by setting name (empty if nothing applies)
+    """
+    mode = mode or settings.clip_tuning_mode
+    path = Path(path or settings.clip_tuning_profile_path)
+    if mode not in TUNING_MODES or not path.exists():
+        return {}
+
+    try:
+        data = json.loads(path.read_text())
+        entry = data["profiles"][mode]
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable tuning profile {path}: {e}")
+        return {}
+
+    profile_for = (data.get("model_name"), data.get("device"), data.get("cpu_count"))
+    if profile_for != (model_name, device, os.cpu_count()):
+        logger.warning(
+            f"Ignoring tuning profile {path}: measured for model={profile_for[0]}, "
+            f"device={profile_for[1]}, cpu_count={profile_for[2]}"
+        )
+        return {}
+
+    values = {
+        setting: entry[key]
+        for key, setting in PROFILE_SETTINGS.items()
+        if key in entry and setting not in settings.model_fields_set
+    }
+    logger.info(f"Using {mode} tuning profile {path}: {values}")
+    return values
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    import argparse
+
+    cpu_count = os.cpu_count() or 1
+    default_threads = sorted({t for t in (1, 2, 4, 8, 16) if t < cpu_count} | {cpu_count})
+
+    parser = argparse.ArgumentParser(description="Tune CLIP batch size, threads and backend")
+    parser.add_argument("--model", default=settings.clip_model_name, help="Model name")
+    parser.add_argument("--device", default="cpu", help="Device to benchmark on")
+    parser.add_argument("--backends", default=settings.clip_backend, help="Comma-separated backends")
+    parser.add_argument(
+        "--batch-sizes", type=_int_list, default=[1, 2, 4, 8, 16, 32, 64], help="Comma-separated"
+    )
+    parser.add_argument(
+        "--threads", type=_int_list, default=default_threads, help="Intra-op thread counts"
+    )
+    parser.add_argument(
+        "--interop-threads", type=_int_list, default=[1], help="Inter-op thread counts"
+    )
+    parser.add_argument("--iterations", type=int, default=20, help="Timed passes per grid point")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed passes per grid point")
+    parser.add_argument(
+        "--latency-budget-ms", type=float, default=None,
+        help="Highest p99 of an online batch (default: 2x the best single-query p99)"
+    )
+    parser.add_argument(
+        "--output", default=settings.clip_tuning_profile_path, help="Profile file to write"
+    )
+    args = parser.parse_args(argv)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    results = run_grid(
+        args.model,
+        args.device,
+        backends,
+        args.threads,
+        args.interop_threads,
+        args.batch_sizes,
+        iterations=args.iterations,
+        warmup=args.warmup,
+    )
+    profiles = select_profiles(results, args.latency_budget_ms)
+    path = save_profile(args.output, args.model, args.device, profiles, results)
+
+    for mode, entry in profiles.items():
+        logger.success(
+            f"{mode}: backend={entry['backend']} threads={entry['num_threads']} "
+            f"interop={entry['interop_threads']} "
+            f"batch={entry.get('batch_size', entry.get('max_batch_size'))} "
+            f"p50={entry['p50_ms']:.1f}ms p99={entry['p99_ms']:.1f}ms "
+            f"{entry['images_per_second']:.1f} img/s"
+        )
+    logger.success(f"Tuning profile written to {path}")
+
+
+if __name__ == "__main__":
+    main()
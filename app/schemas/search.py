@@ -35,4 +35,30 @@ class TextSearchRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=500, description="Search query text")
     limit: int = Field(default=10, ge=1, le=50, description="Maximum number of results")
     min_similarity: float = Field(default=0.0, ge=0.0, le=1.0, description="Minimum similarity threshold")
+    oversampling: Optional[float] = Field(
+        default=None, ge=1.0, le=10.0, description="Quantized candidates per result (quantized collections)"
+    )
+    rescore: Optional[bool] = Field(default=None, description="Re-rank quantized candidates with original vectors")
+    hnsw_ef: Optional[int] = Field(
+        default=None, ge=4, le=4096, description="HNSW search beam size (lower = faster, less precise)"
+    )
+    exact: bool = Field(default=False, description="Exact full-scan search (slow; for offline jobs)")
+    category: Optional[List[str]] = Field(default=None, description="Only these categories")
+    min_price: Optional[float] = Field(default=None, ge=0.0, description="Minimum price (inclusive)")
+    max_price: Optional[float] = Field(default=None, ge=0.0, description="Maximum price (inclusive)")
+    source: Optional[str] = Field(default=None, description="Only products from this source")
 
+
+class BatchQueryResult(BaseModel):
+    """Результаты одного запроса из пакетного поиска."""
+    query_type: str = Field(..., description="Query type: 'text' or 'image'")
+    query: str = Field(..., description="Query text or uploaded file name")
+    results_count: int = Field(..., description="Number of results returned")
+    results: List[SearchResult] = Field(default=[], description="Search results")
+
+
+class BatchSearchResponse(BaseModel):
+    """Ответ API пакетного поиска."""
+    query_time_ms: int = Field(..., description="Query execution time in milliseconds")
+    queries_count: int = Field(..., description="Number of queries in the batch")
+    queries: List[BatchQueryResult] = Field(default=[], description="Per-query results, texts first, then images")
@@ -127,6 +127,31 @@ class BakaiS3Client:
             logger.error(f"❌ Failed to download {object_key}: {e}")
             return False
     
+    def get_object_bytes(
+        self,
+        bucket_name: str,
+        object_key: str
+    ) -> Optional[bytes]:
+        """
+        Download object content into memory (without writing to disk).
+
+        Args:
+            bucket_name: Name of the bucket
+            object_key: Object key (path in bucket)
+
+        Returns:
+            Object content or None
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=bucket_name, Key=object_key)
+            data = response['Body'].read()
+            logger.debug(f"✅ Downloaded to memory: {object_key} ({len(data)} bytes)")
+            return data
+
+        except ClientError as e:
+            logger.error(f"❌ Failed to download {object_key}: {e}")
+            return None
+
     def get_object_metadata(
         self,
         bucket_name: str,
@@ -219,3 +244,19 @@ def get_bakai_s3_client() -> BakaiS3Client:
     
     return _bakai_s3_client
 
+
+def fetch_object_bytes(bucket_name: str, object_key: str) -> Optional[bytes]:
+    """
+    Download object into memory with the process-wide client.
+
+    Module-level so it can be pickled into worker processes, e.g. as
+    ``functools.partial(fetch_object_bytes, bucket)`` loader of the embedding farm.
+
+    Args:
+        bucket_name: Name of the bucket
+        object_key: Object key (path in bucket)
+
+    Returns:
+        Object content or None
+    """
+    return get_bakai_s3_client().get_object_bytes(bucket_name, object_key)
@@ -1,15 +1,89 @@
 """
 Image processing utilities.
 """
+import functools
 import requests
 from PIL import Image
 from io import BytesIO
-from typing import Tuple
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional, Tuple, Union
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.config import settings
 
 
+# Anything an image can be embedded from: file path, encoded bytes,
+# binary file-like object, an already decoded PIL image, or a zero-argument
+# callable returning one of those (fetched lazily, e.g. an S3 download)
+ImageSource = Union[
+    str, Path, bytes, bytearray, BinaryIO, Image.Image, Callable[[], object]
+]
+
+
+def load_image(source: ImageSource, draft_size: Optional[int] = None) -> Image.Image:
+    """
+    Decode image source to RGB PIL image without touching the disk for in-memory sources.
+    
+    Args:
+        source: File path, encoded image bytes, binary file-like object, PIL image
+            or a callable returning one of those
+        draft_size: If set, JPEGs are decoded at the smallest power-of-two reduced
+            scale that keeps both sides >= draft_size (ignored for other formats)
+        
+    Returns:
+        RGB PIL Image object
+        
+    Raises:
+        FileNotFoundError: If source is a path that doesn't exist
+        ValueError: If a callable source returned nothing
+        Exception: If image cannot be decoded
+    """
+    if callable(source):
+        fetched = source()
+        if fetched is None:
+            raise ValueError(f"Image source returned no data: {describe_image_source(source)}")
+        return load_image(fetched, draft_size=draft_size)
+    
+    if isinstance(source, Image.Image):
+        return source if source.mode == "RGB" else source.convert("RGB")
+    
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    elif isinstance(source, (str, Path)):
+        path = Path(source)
+        if not path.exists():
+            raise FileNotFoundError(f"Image not found: {source}")
+        source = path
+    
+    image = Image.open(source)
+    if draft_size:
+        image.draft("RGB", (draft_size, draft_size))
+    return image.convert("RGB")
+
+
+def describe_image_source(source: ImageSource) -> str:
+    """
+    Short human-readable description of image source for logs.
+    
+    Args:
+        source: Image source
+        
+    Returns:
+        Path for files, size for bytes and decoded images
+    """
+    if isinstance(source, (str, Path)):
+        return str(source)
+    if isinstance(source, (bytes, bytearray)):
+        return f"<{len(source)} bytes>"
+    if isinstance(source, Image.Image):
+        return f"<image {source.size[0]}x{source.size[1]}>"
+    if isinstance(source, functools.partial):
+        return f"<{source.func.__name__}{source.args}>"
+    if callable(source):
+        return f"<{getattr(source, '__name__', type(source).__name__)}()>"
+    return f"<{type(source).__name__}>"
+
+
 @retry(
     stop=stop_after_attempt(settings.max_retries),
     wait=wait_exponential(multiplier=settings.retry_delay, max=10),
@@ -18,6 +18,17 @@ search_errors = Counter(
     ['error_type']
 )
 
+clip_inference_rejected = Counter(
+    'clip_inference_rejected_total',
+    'Inference jobs rejected because the inference queue was full'
+)
+
+embedding_cache_requests = Counter(
+    'embedding_cache_requests_total',
+    'Embedding cache lookups',
+    ['cache', 'result']  # result: hit, redis_hit, miss
+)
+
 products_added = Counter(
     'visual_search_products_added_total',
     'Total number of products added'
@@ -43,7 +54,52 @@ qdrant_search_duration = Histogram(
     buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5]
 )
 
+clip_batch_size = Histogram(
+    'clip_batch_size',
+    'Number of queries merged into one CLIP forward pass',
+    ['modality'],  # image, pixels, text
+    buckets=[1, 2, 4, 8, 16, 32, 64]
+)
+
+clip_pipeline_stage_duration = Histogram(
+    'clip_pipeline_stage_seconds',
+    'Time spent per stage of a bulk embedding run',
+    ['stage'],  # decode, decode_wait, forward
+    buckets=[0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0]
+)
+
+worker_model_load_duration = Histogram(
+    'celery_worker_model_load_seconds',
+    'Time to load the CLIP model in a Celery worker',
+    ['mode'],  # preload (parent before fork), process (per child), lazy (first task)
+    buckets=[0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0]
+)
+
+worker_task_duration = Histogram(
+    'celery_task_duration_seconds',
+    'Celery task duration',
+    ['task', 'state'],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0]
+)
+
 # Gauges
+clip_queue_depth = Gauge(
+    'clip_queue_depth',
+    'Number of queries waiting in the CLIP batching queue',
+    ['modality']
+)
+
+clip_inference_pending = Gauge(
+    'clip_inference_pending',
+    'Inference jobs running or waiting for an inference thread'
+)
+
+embedding_cache_entries = Gauge(
+    'embedding_cache_entries',
+    'Number of entries in the in-process embedding cache',
+    ['cache']
+)
+
 active_products = Gauge(
     'visual_search_active_products',
     'Number of active products in database'
@@ -70,7 +126,7 @@ def record_search(search_type: str, duration: float, success: bool = True) -> No
     Записать метрики поиска.
     
     Args:
-        search_type: Тип поиска (by-image, by-text, similar)
+        search_type: Тип поиска (by-image, by-text, batch, similar)
         duration: Длительность в секундах
         success: Успешность запроса
     """
@@ -95,6 +151,101 @@ def record_clip_inference(duration: float) -> None:
     logger.debug(f"CLIP inference: {duration:.3f}s")
 
 
+def record_clip_batch(modality: str, size: int) -> None:
+    """
+    Записать размер батча, собранного планировщиком CLIP.
+    
+    Args:
+        modality: Модальность (image, pixels, text)
+        size: Количество запросов в батче
+    """
+    clip_batch_size.labels(modality=modality).observe(size)
+    logger.debug(f"CLIP batch: modality={modality}, size={size}")
+
+
+def record_pipeline_stage(stage: str, duration: float) -> None:
+    """
+    Записать время стадии пакетной генерации эмбеддингов.
+    
+    Args:
+        stage: Стадия (decode, decode_wait, forward)
+        duration: Суммарная длительность стадии за прогон в секундах
+    """
+    clip_pipeline_stage_duration.labels(stage=stage).observe(duration)
+
+
+def set_clip_queue_depth(modality: str, depth: int) -> None:
+    """
+    Обновить глубину очереди планировщика CLIP.
+    
+    Args:
+        modality: Модальность (image, pixels, text)
+        depth: Количество ожидающих запросов
+    """
+    clip_queue_depth.labels(modality=modality).set(depth)
+
+
+def record_inference_rejected() -> None:
+    """Записать отклонённый из-за переполнения очереди inference запрос."""
+    clip_inference_rejected.inc()
+    logger.warning("CLIP inference queue is full, job rejected")
+
+
+def set_inference_pending(count: int) -> None:
+    """
+    Обновить количество задач в inference executor.
+    
+    Args:
+        count: Количество выполняющихся и ожидающих задач
+    """
+    clip_inference_pending.set(count)
+
+
+def record_embedding_cache(cache: str, result: str) -> None:
+    """
+    Записать обращение к кэшу эмбеддингов.
+    
+    Args:
+        cache: Имя кэша (text, image)
+        result: Результат (hit, redis_hit, miss)
+    """
+    embedding_cache_requests.labels(cache=cache, result=result).inc()
+
+
+def set_embedding_cache_size(cache: str, size: int) -> None:
+    """
+    Обновить количество записей в локальном кэше эмбеддингов.
+    
+    Args:
+        cache: Имя кэша (text, image)
+        size: Количество записей
+    """
+    embedding_cache_entries.labels(cache=cache).set(size)
+
+
+def record_worker_model_load(mode: str, duration: float) -> None:
+    """
+    Записать время загрузки CLIP модели в Celery воркере.
+    
+    Args:
+        mode: Режим загрузки (preload, process, lazy)
+        duration: Длительность в секундах
+    """
+    worker_model_load_duration.labels(mode=mode).observe(duration)
+
+
+def record_worker_task(task: str, state: str, duration: float) -> None:
+    """
+    Записать время выполнения Celery задачи.
+    
+    Args:
+        task: Имя задачи
+        state: Итоговое состояние (SUCCESS, FAILURE, RETRY)
+        duration: Длительность в секундах
+    """
+    worker_task_duration.labels(task=task, state=state).observe(duration)
+
+
 def record_qdrant_search(duration: float) -> None:
     """
     Записать время поиска в Qdrant.
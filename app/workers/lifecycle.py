@@ -0,0 +1,141 @@
+"""
+CLIP model lifecycle and task metrics for Celery worker processes.
+
+The embedder is loaded once per worker and reused by every task. With the
+prefork pool and ``celery_preload_model`` it is loaded in the parent on
+``worker_init``, before the pool forks, so all children share the weights
+copy-on-write; otherwise each child loads it on ``worker_process_init``.
+
+torch and the model are imported only when they are needed, because the API
+imports this module (through the webhook tasks) without running any model.
+"""
+import gc
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+
+from celery import signals
+from loguru import logger
+
+from app.config import settings
+from app.utils.metrics import record_worker_model_load, record_worker_task
+
+if TYPE_CHECKING:
+    from app.models.clip_model import CLIPEmbedder
+
+# Webhook workers only embed product images
+WORKER_TOWERS = ("vision",)
+
+_embedder: Optional["CLIPEmbedder"] = None
+_pool_concurrency: Optional[int] = None
+_task_started: Dict[str, float] = {}
+
+
+def load_worker_embedder(mode: str) -> "CLIPEmbedder":
+    """
+    Загрузить CLIP embedder процесса (если ещё не загружен).
+
+    Args:
+        mode: Режим для метрики (preload, process, lazy)
+
+    Returns:
+        Embedder процесса
+    """
+    global _embedder
+
+    if _embedder is None:
+        from app.models.clip_model import CLIPEmbedder
+
+        start = time.perf_counter()
+        _embedder = CLIPEmbedder(towers=WORKER_TOWERS)
+        duration = time.perf_counter() - start
+        record_worker_model_load(mode, duration)
+        logger.success(f"✅ Worker CLIP model loaded ({mode}) in {duration:.2f}s, pid={os.getpid()}")
+
+    return _embedder
+
+
+def get_worker_embedder() -> "CLIPEmbedder":
+    """
+    Получить CLIP embedder процесса.
+
+    Загружает модель при первом обращении, если сигналы воркера не сработали
+    (например, задача выполняется eager или вне Celery).
+    """
+    return load_worker_embedder("lazy")
+
+
+def _pin_child_threads() -> None:
+    """Разделить ядра между процессами пула, чтобы потоки torch не конкурировали."""
+    if settings.clip_num_threads or not _pool_concurrency:
+        return
+
+    import torch
+
+    threads = max(1, (os.cpu_count() or 1) // _pool_concurrency)
+    torch.set_num_threads(threads)
+    logger.info(f"Worker process {os.getpid()}: torch threads = {threads}")
+
+
+@signals.worker_init.connect
+def _on_worker_init(sender=None, **kwargs) -> None:
+    """Родительский процесс воркера: экспортер метрик и предзагрузка модели до fork."""
+    global _pool_concurrency
+
+    _pool_concurrency = getattr(sender, "concurrency", None)
+
+    if settings.celery_metrics_port:
+        _start_metrics_server(settings.celery_metrics_port)
+
+    if settings.celery_preload_model:
+        load_worker_embedder("preload")
+        # Объекты модели больше не трогаются сборщиком мусора, страницы остаются общими
+        gc.freeze()
+
+
+@signals.worker_process_init.connect
+def _on_worker_process_init(**kwargs) -> None:
+    """Дочерний процесс prefork пула: потоки torch и модель (если не предзагружена)."""
+    _pin_child_threads()
+    load_worker_embedder("process")
+
+
+@signals.worker_process_shutdown.connect
+def _on_worker_process_shutdown(pid=None, **kwargs) -> None:
+    """Удалить файлы метрик завершившегося процесса (multiprocess режим)."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+@signals.task_prerun.connect
+def _on_task_prerun(task_id=None, **kwargs) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+@signals.task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        record_worker_task(task.name, state or "UNKNOWN", time.perf_counter() - started)
+
+
+def _start_metrics_server(port: int) -> None:
+    """
+    Запустить HTTP экспортер Prometheus в родительском процессе воркера.
+
+    С prefork метрики дочерних процессов видны только в multiprocess режиме:
+    задайте PROMETHEUS_MULTIPROC_DIR до запуска воркера.
+    """
+    from prometheus_client import REGISTRY, CollectorRegistry, start_http_server
+
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+    start_http_server(port, registry=registry)
+    logger.info(f"📊 Worker metrics available on :{port}/metrics")
@@ -3,12 +3,12 @@ Celery tasks for webhook event processing.
 """
 import asyncio
 from typing import Dict, Any
-from pathlib import Path
-import tempfile
 
 from app.workers.celery_app import celery_app
-from app.models.clip_model import CLIPEmbedder
-from app.db.qdrant import QdrantManager
+from app.workers.lifecycle import get_worker_embedder
+from app.db.qdrant import product_payload
+from app.db.vector_store import VectorStore, create_vector_store
+from app.db.neighbors import refresh_neighbors
 from app.db.postgres import get_session, create_product, update_product, delete_product, get_product_by_external_id
 from app.utils.bakai_s3_client import BakaiS3Client
 from app.config import settings
@@ -51,79 +51,92 @@ async def _process_product_created_async(event_data: Dict[str, Any]) -> Dict[str
         logger.warning(f"⚠️  No image_key for product {product_id}")
         return {"status": "skipped", "reason": "no_image"}
     
-    # 1. Скачать изображение из S3
+    # 1. Скачать изображение из S3 (в память, без временного файла)
     s3_client = BakaiS3Client()
     
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-        success = s3_client.download_file(
-            bucket_name="product-images",
-            object_key=image_key,
-            local_path=temp_file.name
-        )
-        
-        if not success:
-            logger.error(f"❌ Failed to download image: {image_key}")
-            return {"status": "error", "reason": "download_failed"}
-        
-        temp_path = temp_file.name
+    image_data = s3_client.get_object_bytes(
+        bucket_name="product-images",
+        object_key=image_key
+    )
     
-    try:
-        # 2. Генерировать CLIP эмбеддинг
-        embedder = CLIPEmbedder()
-        embedding = await embedder.generate_embedding(temp_path)
-        
-        if embedding is None:
-            logger.error(f"❌ Failed to generate embedding for {product_id}")
-            return {"status": "error", "reason": "embedding_failed"}
-        
-        # 3. Сохранить в PostgreSQL
-        image_url = s3_client.generate_presigned_url(
-            bucket_name="product-images",
-            object_key=image_key,
-            expiration=31536000  # 1 год
-        )
-        
-        async with get_session() as session:
-            await create_product(session, {
-                "external_id": f"bakai_{product_id}",
-                "title": event_data.get("title", f"Product {product_id}"),
-                "description": event_data.get("description", ""),
-                "category": event_data.get("category", "bakai"),
-                "price": event_data.get("price"),
-                "currency": event_data.get("currency", "KGS"),
-                "image_url": image_url,
-                "product_metadata": {
-                    "source": "webhook",
-                    "product_id": product_id,
-                    "s3_key": image_key,
-                    **event_data.get("metadata", {})
-                }
-            })
-        
-        # 4. Сохранить в Qdrant
-        qdrant = QdrantManager()
+    if image_data is None:
+        logger.error(f"❌ Failed to download image: {image_key}")
+        return {"status": "error", "reason": "download_failed"}
+    
+    # 2. Генерировать CLIP эмбеддинг (модель загружена один раз на процесс воркера)
+    embedder = get_worker_embedder()
+    embedding = await embedder.generate_embedding(image_data)
+    
+    if embedding is None:
+        logger.error(f"❌ Failed to generate embedding for {product_id}")
+        return {"status": "error", "reason": "embedding_failed"}
+    
+    # 3. Сохранить в PostgreSQL
+    image_url = s3_client.generate_presigned_url(
+        bucket_name="product-images",
+        object_key=image_key,
+        expiration=31536000  # 1 год
+    )
+    
+    async with get_session() as session:
+        await create_product(session, {
+            "external_id": f"bakai_{product_id}",
+            "title": event_data.get("title", f"Product {product_id}"),
+            "description": event_data.get("description", ""),
+            "category": event_data.get("category", "bakai"),
+            "price": event_data.get("price"),
+            "currency": event_data.get("currency", "KGS"),
+            "image_url": image_url,
+            "product_metadata": {
+                "source": "webhook",
+                "product_id": product_id,
+                "s3_key": image_key,
+                **event_data.get("metadata", {})
+            }
+        })
+    
+    # 4. Сохранить в Qdrant
+    async with create_vector_store() as qdrant:
         await qdrant.upsert_vectors(
             product_ids=[f"bakai_{product_id}"],
             vectors=[embedding.tolist()],
-            payloads=[{
-                "product_id": f"bakai_{product_id}",
-                "source": "webhook",
-                "original_id": product_id
-            }]
+            payloads=[product_payload(
+                f"bakai_{product_id}",
+                category=event_data.get("category", "bakai"),
+                price=event_data.get("price"),
+                source="webhook",
+                original_id=product_id
+            )]
         )
         
-        return {
-            "status": "success",
-            "product_id": product_id,
-            "message": "Product created and indexed"
-        }
-        
-    finally:
-        # Удалить временный файл
-        try:
-            Path(temp_path).unlink()
-        except Exception as e:
-            logger.warning(f"⚠️  Failed to delete temp file: {e}")
+        # 5. Обновить предрасчитанных похожих товаров
+        await _refresh_similar_products(qdrant, f"bakai_{product_id}")
+    
+    return {
+        "status": "success",
+        "product_id": product_id,
+        "message": "Product created and indexed"
+    }
+
+
+async def _refresh_similar_products(qdrant: VectorStore, external_id: str) -> None:
+    """
+    Обновить записи таблицы похожих товаров, затронутые изменением товара.
+    
+    Ошибка не прерывает обработку события: товар уже проиндексирован,
+    а запись будет исправлена следующей полной пересборкой таблицы.
+    
+    Args:
+        qdrant: Векторное хранилище
+        external_id: Внешний ID изменённого товара
+    """
+    if not settings.similar_neighbors_enabled:
+        return
+    
+    try:
+        await refresh_neighbors(qdrant, [external_id])
+    except Exception as e:
+        logger.warning(f"⚠️  Failed to refresh similar products of {external_id}: {e}")
 
 
 @celery_app.task(name="process_product_updated", bind=True, max_retries=3)
@@ -190,6 +203,9 @@ async def _process_product_updated_async(event_data: Dict[str, Any]) -> Dict[str
             # Вызвать создание (переиндексацию)
             return await _process_product_created_async(event_data)
         
+        # Иначе обновить поля фильтров в payload Qdrant
+        await _update_filter_payload(external_id, update_data)
+        
         return {
             "status": "success",
             "product_id": product_id,
@@ -197,6 +213,33 @@ async def _process_product_updated_async(event_data: Dict[str, Any]) -> Dict[str
         }
 
 
+async def _update_filter_payload(external_id: str, update_data: Dict[str, Any]) -> None:
+    """
+    Перенести изменённые категорию и цену в payload точки Qdrant.
+    
+    Ошибка не прерывает обработку события: PostgreSQL уже обновлён,
+    а payload исправит scripts/backfill_payloads.py.
+    
+    Args:
+        external_id: Внешний ID товара
+        update_data: Изменённые поля товара
+    """
+    fields = product_payload(
+        external_id,
+        category=update_data.get("category"),
+        price=update_data.get("price")
+    )
+    fields.pop("product_id")
+    if not fields:
+        return
+    
+    try:
+        async with create_vector_store() as qdrant:
+            await qdrant.set_payloads({external_id: fields})
+    except Exception as e:
+        logger.warning(f"⚠️  Failed to update Qdrant payload of {external_id}: {e}")
+
+
 @celery_app.task(name="process_product_deleted", bind=True, max_retries=3)
 def process_product_deleted(self, event_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -236,11 +279,14 @@ async def _process_product_deleted_async(event_data: Dict[str, Any]) -> Dict[str
             logger.warning(f"⚠️  Product not found in PostgreSQL: {product_id}")
     
     # 2. Удалить из Qdrant
-    qdrant = QdrantManager()
-    try:
-        await qdrant.delete_vectors([external_id])
-    except Exception as e:
-        logger.warning(f"⚠️  Failed to delete from Qdrant: {e}")
+    async with create_vector_store() as qdrant:
+        try:
+            await qdrant.delete_vectors([external_id])
+        except Exception as e:
+            logger.warning(f"⚠️  Failed to delete from Qdrant: {e}")
+        
+        # 3. Убрать товар из предрасчитанных похожих товаров
+        await _refresh_similar_products(qdrant, external_id)
     
     return {
         "status": "success",
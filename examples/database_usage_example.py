@@ -134,7 +134,7 @@ async def example_3_qdrant_operations():
     print(f"✅ Collection: {info['name']}")
     print(f"   Vector size: {info['vector_size']}")
     print(f"   Distance: {info['distance']}")
-    print(f"   Vectors count: {info['vectors_count']}")
+    print(f"   Points count: {info['points_count']}")
     
     # Create sample embeddings (in real scenario, these would come from CLIP model)
     print("\n3. Adding sample embeddings...")
@@ -178,7 +178,7 @@ async def example_3_qdrant_operations():
         print(f"      Similarity: {result['score']:.4f}")
     
     # Close connection
-    qdrant.close()
+    await qdrant.close()
 
 
 async def example_4_search_logging():
@@ -271,7 +271,7 @@ async def example_5_complete_workflow():
         })
     print("✅ Search logged")
     
-    qdrant.close()
+    await qdrant.close()
 
 
 async def example_6_query_products():
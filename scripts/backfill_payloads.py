@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Дозаполнение payload существующих точек Qdrant полями фильтров.
+
+1. Создаёт индексы payload (category, price, source), если их нет.
+2. Проходит коллекцию без векторов и берёт категорию и цену товаров
+   из PostgreSQL; source — из payload точки или product_metadata.
+3. Дописывает поля в payload одним запросом на батч (вектор не трогается).
+
+Нужно один раз для коллекций, проиндексированных до появления фильтров;
+новые точки получают поля при upsert.
+
+Запуск:
+    python scripts/backfill_payloads.py --batch-size 1000
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from app.db.postgres import init_db, close_db, get_session, get_products_by_external_ids
+from app.db.qdrant import QdrantManager, product_payload
+
+
+async def main(batch_size: int):
+    """Основная функция."""
+    start = time.time()
+    updated = 0
+    missing = 0
+
+    await init_db()
+    try:
+        async with QdrantManager() as qdrant:
+            await qdrant.create_payload_indexes()
+
+            async for batch in qdrant.scroll_vectors(batch_size=batch_size, with_vectors=False):
+                ids = [point["payload"]["product_id"] for point in batch]
+                async with get_session() as session:
+                    products = await get_products_by_external_ids(session, ids)
+
+                payloads = {}
+                for point, product_id in zip(batch, ids):
+                    product = products.get(product_id)
+                    if product is None:
+                        missing += 1
+                        continue
+                    fields = product_payload(
+                        product_id,
+                        category=product.category,
+                        price=product.price,
+                        source=point["payload"].get("source") or (product.product_metadata or {}).get("source")
+                    )
+                    fields.pop("product_id")
+                    payloads[product_id] = fields
+
+                await qdrant.set_payloads(payloads)
+                updated += len(payloads)
+                logger.info(f"   Обновлено: {updated}")
+    finally:
+        await close_db()
+
+    logger.success(f"✅ Обновлено {updated} точек за {time.time() - start:.1f} с")
+    if missing:
+        logger.warning(f"⚠️  Нет в PostgreSQL: {missing} точек (поля фильтров не заполнены)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Дозаполнение payload Qdrant полями фильтров")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Точек за один запрос")
+    args = parser.parse_args()
+
+    asyncio.run(main(batch_size=args.batch_size))
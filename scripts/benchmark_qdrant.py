@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк транспорта Qdrant: REST против gRPC.
+
+1. Создаёт временную коллекцию <коллекция>_bench со случайными нормализованными векторами.
+2. Для каждого транспорта измеряет:
+   - задержку одиночного поиска (p50/p95/p99, запросы по одному);
+   - пропускную способность поиска при --concurrency параллельных запросах;
+   - скорость upsert батчами по --batch-size;
+   - скорость массовой загрузки NumPy матрицы (upload_vectors: параллельные
+     батчи с wait=False и итоговый барьер).
+3. Удаляет коллекцию (если не указан --keep).
+
+Запуск:
+    python scripts/benchmark_qdrant.py --points 20000 --queries 1000
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from app.config import settings
+from app.db.qdrant import QdrantManager
+
+
+TRANSPORTS = {"REST": False, "gRPC": True}
+
+
+def random_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    """Случайные нормализованные векторы."""
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def fill_collection(qdrant: QdrantManager, vectors: np.ndarray, batch_size: int) -> None:
+    """Создать коллекцию и загрузить векторы."""
+    await qdrant.delete_collection()
+    await qdrant.create_collection(vector_size=vectors.shape[1])
+    await qdrant.upload_vectors([f"bench_{i}" for i in range(len(vectors))], vectors, batch_size=batch_size)
+
+
+async def benchmark_transport(
+    qdrant: QdrantManager,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    top_k: int,
+    concurrency: int,
+    batch_size: int
+) -> dict:
+    """
+    Измерить поиск и upsert через один транспорт.
+
+    Args:
+        qdrant: Qdrant manager с выбранным транспортом
+        vectors: Векторы коллекции (перезаписываются при замере upsert)
+        queries: Векторы запросов
+        top_k: Результатов на запрос
+        concurrency: Параллельных запросов при замере пропускной способности
+        batch_size: Векторов в одном upsert / запросе загрузки
+
+    Returns:
+        Словарь с метриками
+    """
+    query_lists = queries.tolist()
+
+    # Прогрев: соединения пула и канал gRPC
+    for query in query_lists[:20]:
+        await qdrant.search_similar(query, top_k=top_k)
+
+    latencies = []
+    for query in query_lists:
+        start = time.perf_counter()
+        await qdrant.search_similar(query, top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def limited(query):
+        async with slots:
+            await qdrant.search_similar(query, top_k=top_k)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(query) for query in query_lists))
+    search_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch_size):
+        batch = vectors[offset:offset + batch_size]
+        await qdrant.upsert_vectors(
+            product_ids=[f"bench_{i}" for i in range(offset, offset + len(batch))],
+            vectors=batch.tolist()
+        )
+    upsert_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await qdrant.upload_vectors([f"bench_{i}" for i in range(len(vectors))], vectors, batch_size=batch_size)
+    upload_elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p95": float(np.percentile(latencies_ms, 95)),
+        "p99": float(np.percentile(latencies_ms, 99)),
+        "qps": len(query_lists) / search_elapsed,
+        "upsert_per_s": len(vectors) / upsert_elapsed,
+        "upload_per_s": len(vectors) / upload_elapsed,
+    }
+
+
+async def main(points: int, queries: int, top_k: int, concurrency: int, batch_size: int, keep: bool):
+    """Основная функция."""
+    print("\n" + "=" * 70)
+    print("  ⚡ БЕНЧМАРК QDRANT: REST vs gRPC")
+    print("=" * 70)
+
+    collection = f"{settings.qdrant_collection_name}_bench"
+    dim = settings.qdrant_vector_size
+    vectors = random_vectors(points, dim, seed=0)
+    query_vectors = random_vectors(queries, dim, seed=1)
+
+    print(f"\n📦 Коллекция: {collection} ({points} векторов, dim={dim})")
+    print(f"   REST: {settings.qdrant_host}:{settings.qdrant_port}, gRPC: {settings.qdrant_host}:{settings.qdrant_grpc_port}")
+
+    async with QdrantManager(collection_name=collection, prefer_grpc=False) as qdrant:
+        await fill_collection(qdrant, vectors, batch_size)
+
+    results = {}
+    try:
+        for name, prefer_grpc in TRANSPORTS.items():
+            print(f"\n⏱️  {name}...")
+            async with QdrantManager(collection_name=collection, prefer_grpc=prefer_grpc) as qdrant:
+                results[name] = await benchmark_transport(
+                    qdrant, vectors, query_vectors, top_k, concurrency, batch_size
+                )
+    finally:
+        if not keep:
+            async with QdrantManager(collection_name=collection, prefer_grpc=False) as qdrant:
+                await qdrant.delete_collection()
+
+    print("\n" + "=" * 70)
+    print(f"📊 РЕЗУЛЬТАТЫ (top_k={top_k}, {queries} запросов, concurrency={concurrency})")
+    print("=" * 70)
+    print(f"\n{'Транспорт':<10} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'поиск/с':>10} {'upsert/с':>10} {'upload/с':>10}")
+    for name, r in results.items():
+        print(
+            f"{name:<10} {r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f} "
+            f"{r['qps']:>10.0f} {r['upsert_per_s']:>10.0f} {r['upload_per_s']:>10.0f}"
+        )
+
+    if len(results) == 2:
+        speedup = results["REST"]["p50"] / results["gRPC"]["p50"]
+        if speedup > 1:
+            print(f"\n💡 gRPC p50 быстрее REST в {speedup:.2f}x; включить: QDRANT_PREFER_GRPC=true")
+        else:
+            print(f"\n💡 REST не медленнее gRPC ({1 / speedup:.2f}x) — QDRANT_PREFER_GRPC=false")
+    print("=" * 70 + "\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Бенчмарк Qdrant REST vs gRPC")
+    parser.add_argument("--points", type=int, default=20000, help="Векторов в тестовой коллекции")
+    parser.add_argument("--queries", type=int, default=1000, help="Поисковых запросов на транспорт")
+    parser.add_argument("--top-k", type=int, default=20, help="Результатов на запрос")
+    parser.add_argument("--concurrency", type=int, default=16, help="Параллельных запросов")
+    parser.add_argument("--batch-size", type=int, default=256, help="Векторов в одном upsert")
+    parser.add_argument("--keep", action="store_true", help="Не удалять тестовую коллекцию")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, format="<level>{message}</level>", level="WARNING")
+
+    asyncio.run(main(
+        points=args.points,
+        queries=args.queries,
+        top_k=args.top_k,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        keep=args.keep,
+    ))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Recall и задержка поиска Qdrant для разных параметров HNSW.
+
+1. Берёт --points векторов из коллекции (или случайные при --random)
+   и ещё --queries векторов как запросы, не входящие в индекс.
+2. Для каждой пары (m, ef_construct) создаёт временную коллекцию
+   <коллекция>_recall, строит HNSW граф и измеряет:
+   - точный поиск (exact=True) — эталон;
+   - recall@K и задержку (p50/p95) для каждого hnsw_ef.
+3. Удаляет временную коллекцию.
+
+Подходящие значения переносятся в QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT
+(новые коллекции) и QDRANT_SEARCH_HNSW_EF / параметр hnsw_ef запросов.
+
+Запуск:
+    python scripts/benchmark_recall.py --m 8 16 32 --ef-construct 100 200 --ef 16 32 64 128
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from qdrant_client.models import OptimizersConfigDiff
+
+from app.config import settings
+from app.db.qdrant import QdrantManager
+
+
+async def load_vectors(count: int, dim: int, random: bool) -> np.ndarray:
+    """Первые count векторов коллекции или случайные нормализованные векторы."""
+    if random:
+        vectors = np.random.default_rng(0).standard_normal((count, dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    vectors = []
+    async with QdrantManager() as qdrant:
+        async for batch in qdrant.scroll_vectors(batch_size=1000):
+            vectors.extend(point["vector"] for point in batch)
+            if len(vectors) >= count:
+                break
+
+    if len(vectors) < count:
+        raise ValueError(f"В коллекции только {len(vectors)} векторов, нужно {count}")
+    vectors = np.asarray(vectors[:count], dtype=np.float32)
+    return vectors[np.random.default_rng(0).permutation(count)]
+
+
+async def build_collection(
+    qdrant: QdrantManager,
+    vectors: np.ndarray,
+    m: int,
+    ef_construct: int,
+    timeout: float = 1800
+) -> None:
+    """Создать коллекцию с заданными m / ef_construct и дождаться построения графа."""
+    await qdrant.delete_collection()
+    await qdrant.create_collection(vector_size=vectors.shape[1], hnsw_m=m, hnsw_ef_construct=ef_construct)
+    # Строить HNSW граф даже для небольших сегментов
+    await qdrant.client.update_collection(
+        collection_name=qdrant.collection_name,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=1)
+    )
+
+    await qdrant.upload_vectors([f"recall_{i}" for i in range(len(vectors))], vectors)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = (await qdrant.get_collection_info())["status"]
+        if str(getattr(status, "value", status)) == "green":
+            return
+        await asyncio.sleep(1)
+    logger.warning(f"Построение индекса не завершилось за {timeout:.0f} с")
+
+
+async def run_queries(
+    qdrant: QdrantManager,
+    queries: np.ndarray,
+    top_k: int,
+    hnsw_ef: Optional[int] = None,
+    exact: bool = False
+) -> tuple[list[set], np.ndarray]:
+    """
+    Выполнить запросы по одному.
+
+    Returns:
+        Кортеж (множества ID результатов по запросам, задержки в мс)
+    """
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = await qdrant.search_similar(query.tolist(), top_k=top_k, hnsw_ef=hnsw_ef, exact=exact)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({hit["id"] for hit in hits})
+    return results, np.asarray(latencies)
+
+
+async def main(
+    points: int,
+    queries: int,
+    top_k: int,
+    m_values: list[int],
+    ef_construct_values: list[int],
+    ef_values: list[int],
+    random: bool
+):
+    """Основная функция."""
+    print("\n" + "=" * 70)
+    print("  🎯 RECALL ПОИСКА QDRANT ПО ПАРАМЕТРАМ HNSW")
+    print("=" * 70)
+
+    vectors = await load_vectors(points + queries, settings.qdrant_vector_size, random)
+    indexed, query_vectors = vectors[:points], vectors[points:]
+    source = "случайные" if random else settings.qdrant_collection_name
+    print(f"\n📦 {points} векторов ({source}, dim={vectors.shape[1]}), {queries} запросов, top_k={top_k}")
+
+    collection = f"{settings.qdrant_collection_name}_recall"
+    rows = []
+    async with QdrantManager(collection_name=collection) as qdrant:
+        try:
+            for m in m_values:
+                for ef_construct in ef_construct_values:
+                    print(f"\n⏱️  m={m}, ef_construct={ef_construct}...")
+                    await build_collection(qdrant, indexed, m, ef_construct)
+
+                    exact, exact_latencies = await run_queries(qdrant, query_vectors, top_k, exact=True)
+                    rows.append((m, ef_construct, "exact", 1.0, exact_latencies))
+
+                    for ef in ef_values:
+                        found, latencies = await run_queries(qdrant, query_vectors, top_k, hnsw_ef=ef)
+                        recall = np.mean([len(f & e) / max(len(e), 1) for f, e in zip(found, exact)])
+                        rows.append((m, ef_construct, ef, recall, latencies))
+        finally:
+            await qdrant.delete_collection()
+
+    print("\n" + "=" * 70)
+    print(f"📊 РЕЗУЛЬТАТЫ (recall@{top_k} относительно точного поиска)")
+    print("=" * 70)
+    print(f"\n{'m':>4} {'ef_constr':>10} {'hnsw_ef':>8} {'recall':>8} {'p50 мс':>8} {'p95 мс':>8}")
+    for m, ef_construct, ef, recall, latencies in rows:
+        print(
+            f"{m:>4} {ef_construct:>10} {ef:>8} {recall:>8.4f} "
+            f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f}"
+        )
+
+    good = [row for row in rows if row[2] != "exact" and row[3] >= 0.95]
+    if good:
+        m, ef_construct, ef, recall, latencies = min(good, key=lambda row: np.percentile(row[4], 50))
+        print(
+            f"\n💡 Самая быстрая конфигурация с recall >= 0.95: QDRANT_HNSW_M={m} "
+            f"QDRANT_HNSW_EF_CONSTRUCT={ef_construct} QDRANT_SEARCH_HNSW_EF={ef} (recall {recall:.4f})"
+        )
+    else:
+        print("\n💡 Ни одна конфигурация не достигла recall 0.95 — увеличьте --ef или --m")
+    print("=" * 70 + "\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recall поиска Qdrant по параметрам HNSW")
+    parser.add_argument("--points", type=int, default=20000, help="Векторов в тестовой коллекции")
+    parser.add_argument("--queries", type=int, default=200, help="Запросов (не входят в коллекцию)")
+    parser.add_argument("--top-k", type=int, default=10, help="Результатов на запрос")
+    parser.add_argument("--m", type=int, nargs="+", default=[settings.qdrant_hnsw_m], help="Значения m")
+    parser.add_argument(
+        "--ef-construct", type=int, nargs="+", default=[settings.qdrant_hnsw_ef_construct],
+        help="Значения ef_construct"
+    )
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128], help="Значения hnsw_ef")
+    parser.add_argument("--random", action="store_true", help="Случайные векторы вместо коллекции")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, format="<level>{message}</level>", level="WARNING")
+
+    asyncio.run(main(
+        points=args.points,
+        queries=args.queries,
+        top_k=args.top_k,
+        m_values=args.m,
+        ef_construct_values=args.ef_construct,
+        ef_values=args.ef,
+        random=args.random,
+    ))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Пересборка таблицы похожих товаров (product_neighbors).
+
+1. Загружает все векторы коллекции Qdrant.
+2. Находит top-K соседей каждого товара блочным умножением матриц в NumPy.
+3. Записывает результаты в PostgreSQL и удаляет записи товаров,
+   которых больше нет в коллекции.
+
+После сборки /api/v1/search/similar/{product_id} отвечает поиском по ключу
+(SIMILAR_NEIGHBORS_ENABLED=true). Вебхуки обновляют затронутые записи
+инкрементально; полную пересборку достаточно запускать по расписанию.
+
+Запуск:
+    python scripts/build_neighbor_table.py --top-k 50
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from app.config import settings
+from app.db.neighbors import build_neighbor_table
+from app.db.postgres import init_db, close_db
+from app.db.qdrant import QdrantManager
+
+
+async def main(top_k: int, block_size: int):
+    """Основная функция."""
+    logger.info(f"🔗 Сборка таблицы похожих товаров (top_k={top_k}, block_size={block_size})")
+    start = time.time()
+
+    await init_db()
+    try:
+        async with QdrantManager() as qdrant:
+            written = await build_neighbor_table(qdrant, top_k=top_k, block_size=block_size)
+    finally:
+        await close_db()
+
+    logger.success(f"✅ Записано {written} товаров за {time.time() - start:.1f} с")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Пересборка таблицы похожих товаров")
+    parser.add_argument(
+        "--top-k", type=int, default=settings.similar_neighbors_top_k,
+        help="Соседей на товар"
+    )
+    parser.add_argument(
+        "--block-size", type=int, default=settings.similar_neighbors_block_size,
+        help="Товаров в одном блоке умножения матриц"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(top_k=args.top_k, block_size=args.block_size))
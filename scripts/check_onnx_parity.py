@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Проверка ONNX бэкенда CLIP: совпадение эмбеддингов с PyTorch и сравнение скорости.
+
+Экспортирует (при необходимости) башни модели в ONNX, считает эмбеддинги
+изображений и текстов обоими бэкендами, проверяет косинусное сходство
+(по умолчанию > 0.99) и выводит задержку на одинаковых батчах.
+"""
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from app.config import settings
+from app.models.clip_model import CLIPEmbedder
+
+
+SAMPLE_TEXTS = [
+    "красное платье",
+    "a pair of running shoes",
+    "smartphone with black case",
+    "деревянный стол",
+]
+
+
+def load_images(images_dir: str, limit: int) -> List[Image.Image]:
+    """Загрузить изображения из директории или сгенерировать тестовые."""
+    if images_dir:
+        paths = sorted(
+            p for p in Path(images_dir).rglob("*")
+            if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp")
+        )[:limit]
+        if paths:
+            return [Image.open(p).convert("RGB") for p in paths]
+        logger.warning(f"⚠️  Изображения в {images_dir} не найдены, используются тестовые")
+
+    rng = np.random.default_rng(0)
+    return [
+        Image.fromarray(rng.integers(0, 255, (256, 256, 3), dtype=np.uint8))
+        for _ in range(limit)
+    ]
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Косинусное сходство построчно для уже нормализованных эмбеддингов."""
+    return np.sum(a * b, axis=-1)
+
+
+def measure(func: Callable[[], object], runs: int) -> float:
+    """Медианная задержка вызова в миллисекундах (после одного прогрева)."""
+    func()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main(backend: str, images_dir: str, limit: int, runs: int, threshold: float) -> int:
+    """Основная функция."""
+    print("\n" + "=" * 70)
+    print(f"  🔬 ПРОВЕРКА ONNX БЭКЕНДА: torch vs {backend}")
+    print("=" * 70)
+
+    images = load_images(images_dir, limit)
+    print(f"\n📷 Изображений: {len(images)}, текстов: {len(SAMPLE_TEXTS)}")
+
+    reference = CLIPEmbedder(model_name=settings.clip_model_name, device="cpu", backend="torch")
+    candidate = CLIPEmbedder(model_name=settings.clip_model_name, device="cpu", backend=backend)
+
+    # 1. Совпадение эмбеддингов
+    image_cos = cosine_rows(reference.encode_images(images), candidate.encode_images(images))
+    text_cos = cosine_rows(reference.encode_text(SAMPLE_TEXTS), candidate.encode_text(SAMPLE_TEXTS))
+
+    print("\n" + "=" * 70)
+    print("📐 КОСИНУСНОЕ СХОДСТВО С TORCH")
+    print("=" * 70)
+    print(f"   Изображения: min={image_cos.min():.5f}, mean={image_cos.mean():.5f}")
+    print(f"   Тексты:      min={text_cos.min():.5f}, mean={text_cos.mean():.5f}")
+
+    # 2. Задержка
+    print("\n" + "=" * 70)
+    print(f"⏱️  ЗАДЕРЖКА (медиана из {runs} прогонов, мс)")
+    print("=" * 70)
+    print(f"   {'':<28}{'torch':>10}{backend:>12}{'ускорение':>12}")
+
+    cases = [
+        ("1 изображение", lambda e: e.encode_images(images[:1])),
+        (f"батч {len(images)} изображений", lambda e: e.encode_images(images)),
+        ("1 текст", lambda e: e.encode_text(SAMPLE_TEXTS[0])),
+        (f"батч {len(SAMPLE_TEXTS)} текстов", lambda e: e.encode_text(SAMPLE_TEXTS)),
+    ]
+    for title, case in cases:
+        torch_ms = measure(lambda: case(reference), runs)
+        candidate_ms = measure(lambda: case(candidate), runs)
+        print(f"   {title:<28}{torch_ms:>10.1f}{candidate_ms:>12.1f}{torch_ms / candidate_ms:>11.2f}x")
+
+    passed = image_cos.min() > threshold and text_cos.min() > threshold
+
+    print("\n" + "=" * 70)
+    if passed:
+        print(f"✅ Паритет подтверждён: все сходства > {threshold}")
+    else:
+        print(f"❌ Паритет НЕ подтверждён: есть сходства <= {threshold}")
+    print("=" * 70 + "\n")
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Проверка ONNX бэкенда CLIP против PyTorch")
+    parser.add_argument(
+        "--backend",
+        choices=["onnx", "onnx-int8"],
+        default="onnx-int8",
+        help="Проверяемый бэкенд"
+    )
+    parser.add_argument(
+        "--images",
+        default="",
+        help="Директория с изображениями (по умолчанию - сгенерированные)"
+    )
+    parser.add_argument("--limit", type=int, default=16, help="Количество изображений")
+    parser.add_argument("--runs", type=int, default=10, help="Количество замеров задержки")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.99,
+        help="Минимальное допустимое косинусное сходство"
+    )
+
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, format="<level>{message}</level>", level="WARNING")
+
+    sys.exit(main(args.backend, args.images, args.limit, args.runs, args.threshold))
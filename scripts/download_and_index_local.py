@@ -15,13 +15,14 @@ from tqdm import tqdm
 import time
 from PIL import Image
 import io
+import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from loguru import logger
 from app.utils.bakai_s3_client import BakaiS3Client
 from app.models.clip_model import CLIPEmbedder, CLIPModel
-from app.db.qdrant import QdrantManager
+from app.db.qdrant import QdrantManager, product_payload
 from app.db import get_session, create_product
 from app.config import settings
 
@@ -241,7 +242,7 @@ async def download_all_images(s3_client: BakaiS3Client, limit: Optional[int] = N
 async def generate_embeddings(
     embedder: CLIPEmbedder,
     images: List[Tuple[str, Path]]
-) -> List[Tuple[str, list]]:
+) -> List[Tuple[str, np.ndarray]]:
     """Генерировать эмбеддинги из локальных файлов."""
     print("\n" + "=" * 70)
     print("🧠 ГЕНЕРАЦИЯ ЭМБЕДДИНГОВ")
@@ -263,7 +264,7 @@ async def generate_embeddings(
             # Добавить результаты
             for product_id, embedding in zip(batch_ids, batch_embeddings):
                 if embedding is not None:
-                    embeddings.append((product_id, embedding.tolist()))
+                    embeddings.append((product_id, embedding))
         except Exception as e:
             logger.error(f"Ошибка batch эмбеддинга: {e}")
             # Fallback: обработать по одному
@@ -271,7 +272,7 @@ async def generate_embeddings(
                 try:
                     embedding = await embedder.generate_embedding(str(img_path))
                     if embedding is not None:
-                        embeddings.append((product_id, embedding.tolist()))
+                        embeddings.append((product_id, embedding))
                 except Exception as e2:
                     logger.error(f"Ошибка эмбеддинга {product_id}: {e2}")
                     continue
@@ -282,7 +283,7 @@ async def generate_embeddings(
 
 async def save_to_databases(
     images: List[Tuple[str, Path]],
-    embeddings: List[Tuple[str, list]]
+    embeddings: List[Tuple[str, np.ndarray]]
 ):
     """Сохранить в PostgreSQL и Qdrant."""
     print("\n" + "=" * 70)
@@ -332,10 +333,13 @@ async def save_to_databases(
         qdrant_data.append({
             "id": f"bakai_{product_id}",
             "vector": embeddings_dict[product_id],
-            "payload": {
-                "external_id": f"bakai_{product_id}",
-                "original_id": product_id
-            }
+            "payload": product_payload(
+                f"bakai_{product_id}",
+                category="bakai",
+                source="s3",
+                external_id=f"bakai_{product_id}",
+                original_id=product_id
+            )
         })
     
     # Сохранить в PostgreSQL
@@ -369,17 +373,14 @@ async def save_to_databases(
     
     # Сохранить в Qdrant
     print("\n💾 Сохранение в Qdrant...")
-    qdrant = QdrantManager()  # Автоматически подключается в __init__
-    
-    for i in tqdm(range(0, len(qdrant_data), 1000), desc="Qdrant", unit="batch"):
-        batch = qdrant_data[i:i+1000]
-        
-        # Разделить на отдельные списки
-        product_ids = [item['id'] for item in batch]
-        vectors = [item['vector'] for item in batch]
-        payloads = [item['payload'] for item in batch]
-        
-        await qdrant.upsert_vectors(product_ids, vectors, payloads)
+    # Одна массовая загрузка матрицы: батчи параллельно, затем барьер
+    if qdrant_data:
+        async with QdrantManager() as qdrant:
+            await qdrant.upload_vectors(
+                product_ids=[item['id'] for item in qdrant_data],
+                vectors=np.stack([item['vector'] for item in qdrant_data]),
+                payloads=[item['payload'] for item in qdrant_data]
+            )
     
     print(f"✅ Qdrant: {len(qdrant_data)} векторов")
 
@@ -404,7 +405,7 @@ async def main():
     # Инициализация
     print("\n⚙️  Инициализация...")
     s3_client = BakaiS3Client()
-    embedder = CLIPEmbedder(device=settings.clip_device)
+    embedder = CLIPEmbedder(device=settings.clip_device, towers=("vision",))
     print("✅ Готово")
     
     # 1. Скачать изображения
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Экспорт коллекции Qdrant в локальное memmap хранилище.
+
+Копирует векторы и payload всех точек в VECTOR_STORE_PATH/<коллекция>
+(float32 матрица на диске). После экспорта API и воркеры работают без
+сервера Qdrant с VECTOR_STORE=memmap — для edge-развёртываний, CI и
+бенчмарков. С --ivf-lists > 0 строятся IVF разделы для быстрого
+приближённого поиска.
+
+Запуск:
+    python scripts/export_vector_store.py
+    python scripts/export_vector_store.py --ivf-lists 256 --probe
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from app.config import settings
+from app.db.memmap_store import MemmapVectorStore
+from app.db.qdrant import QdrantManager
+
+
+async def main(collection: str, path: str, ivf_lists: int, batch_size: int, probe: bool):
+    """Основная функция."""
+    start = time.time()
+
+    async with QdrantManager(collection_name=collection) as qdrant:
+        info = await qdrant.get_collection_info()
+        print(f"\n📦 Qdrant '{collection}': {info['points_count']} точек, dim={info['vector_size']}")
+
+        store = MemmapVectorStore(collection_name=collection, path=path, ivf_lists=ivf_lists)
+        await store.delete_collection()
+        await store.create_collection(vector_size=info["vector_size"], distance=info["distance"].capitalize())
+
+        exported = 0
+        async for batch in qdrant.scroll_vectors(batch_size=batch_size):
+            await store.upload_vectors(
+                product_ids=[point["payload"]["product_id"] for point in batch],
+                vectors=np.asarray([point["vector"] for point in batch], dtype=np.float32),
+                payloads=[point["payload"] for point in batch]
+            )
+            exported += len(batch)
+            logger.info(f"   Экспортировано: {exported}")
+
+        # Переобучить IVF на полной коллекции
+        await store.compact()
+        print(f"✅ Экспортировано {exported} точек в {store.root} за {time.time() - start:.1f} с")
+
+        if probe and exported:
+            query = batch[0]["vector"]
+            expected = [hit["id"] for hit in await qdrant.search_similar(query, top_k=10, exact=True)]
+            found = [hit["id"] for hit in await store.search_similar(query, top_k=10)]
+            print(f"🔎 Совпадение top-10 с точным поиском Qdrant: {len(set(expected) & set(found))}/10")
+
+        await store.close()
+
+    print(f"\n💡 Включить: VECTOR_STORE=memmap VECTOR_STORE_PATH={path} VECTOR_STORE_IVF_LISTS={ivf_lists}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Экспорт коллекции Qdrant в memmap хранилище")
+    parser.add_argument("--collection", default=settings.qdrant_collection_name, help="Коллекция (или алиас)")
+    parser.add_argument("--path", default=settings.vector_store_path, help="Каталог memmap хранилища")
+    parser.add_argument(
+        "--ivf-lists", type=int, default=settings.vector_store_ivf_lists,
+        help="IVF разделов (0 = только точный поиск)"
+    )
+    parser.add_argument("--batch-size", type=int, default=5000, help="Точек за один запрос к Qdrant")
+    parser.add_argument("--probe", action="store_true", help="Сравнить один запрос с точным поиском Qdrant")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, format="<level>{message}</level>", level="WARNING")
+
+    asyncio.run(main(
+        collection=args.collection,
+        path=args.path,
+        ivf_lists=args.ivf_lists,
+        batch_size=args.batch_size,
+        probe=args.probe,
+    ))
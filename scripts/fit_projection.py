@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Подбор PCA проекции эмбеддингов (512 → 128/256) по векторам коллекции Qdrant.
+
+1. Выгружает векторы коллекции (полной размерности).
+2. Обучает PCA для каждой размерности из --dims и считает recall@10
+   точного поиска по сжатым векторам относительно поиска по полным.
+3. С --apply DIM сохраняет проекцию в models/projection/<версия>.npy и
+   перепроецирует коллекцию в новую коллекцию (исходная не меняется).
+
+После этого включить проекцию в .env:
+    CLIP_PROJECTION_PATH=models/projection/<версия>.npy
+    QDRANT_COLLECTION_NAME=<новая коллекция>
+    QDRANT_VECTOR_SIZE=<DIM>
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from app.config import settings
+from app.db.qdrant import QdrantManager, embedding_model_key
+from app.models.projection import EmbeddingProjection, recall_at_k
+
+
+PROJECTION_DIR = Path("models/projection")
+QDRANT_BATCH_SIZE = 1000
+
+
+async def load_vectors(qdrant: QdrantManager, limit: int = None) -> np.ndarray:
+    """
+    Выгрузить векторы коллекции.
+
+    Args:
+        qdrant: Qdrant manager исходной коллекции
+        limit: Максимум векторов (None = все)
+
+    Returns:
+        float32 матрица (n, dim)
+    """
+    chunks = []
+    loaded = 0
+
+    async for points in qdrant.scroll_vectors(batch_size=QDRANT_BATCH_SIZE):
+        chunks.append(np.array([p["vector"] for p in points], dtype=np.float32))
+        loaded += len(points)
+        if limit and loaded >= limit:
+            break
+
+    if not chunks:
+        return np.empty((0, settings.qdrant_vector_size), dtype=np.float32)
+
+    vectors = np.concatenate(chunks)[:limit]
+    logger.success(f"✅ Выгружено {len(vectors)} векторов размерности {vectors.shape[1]}")
+    return vectors
+
+
+def evaluate(vectors: np.ndarray, dims: list, sample: int, queries: int, k: int = 10) -> dict:
+    """
+    Обучить PCA для каждой размерности и посчитать recall@k.
+
+    Args:
+        vectors: Полные нормализованные векторы
+        dims: Размерности проекции
+        sample: Векторов для обучения PCA
+        queries: Количество запросов для оценки recall
+        k: Глубина recall
+
+    Returns:
+        {dim: (projection, recall)}
+    """
+    rng = np.random.default_rng(0)
+    fit_rows = rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False)
+    query_rows = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+
+    results = {}
+    for dim in dims:
+        projection = EmbeddingProjection.fit(vectors[fit_rows], dim)
+        recall = recall_at_k(vectors, projection.apply(vectors), query_rows, k=k)
+        results[dim] = (projection, recall)
+
+    return results
+
+
+async def reproject_collection(
+    source: QdrantManager,
+    target: QdrantManager,
+    projection: EmbeddingProjection
+) -> int:
+    """
+    Перепроецировать все точки исходной коллекции в целевую.
+
+    Args:
+        source: Исходная коллекция (полная размерность)
+        target: Новая коллекция (размерность проекции)
+        projection: Проекция
+
+    Returns:
+        Количество загруженных векторов
+    """
+    await target.create_collection(vector_size=projection.output_dim)
+
+    total = await source.count_vectors()
+    progress = tqdm(total=total, desc=f"→ {target.collection_name}")
+    written = 0
+
+    async for points in source.scroll_vectors(batch_size=QDRANT_BATCH_SIZE):
+        vectors = projection.apply(np.array([p["vector"] for p in points], dtype=np.float32))
+        payloads = [p["payload"] or {} for p in points]
+
+        await target.upload_vectors(
+            product_ids=[payload.get("product_id", p["id"]) for p, payload in zip(points, payloads)],
+            vectors=vectors,
+            payloads=payloads,
+            wait=False
+        )
+        written += len(points)
+        progress.update(len(points))
+
+    progress.close()
+    await target.wait_for_updates()
+    return written
+
+
+async def main(dims: list, sample: int, queries: int, limit: int, apply_dim: int, target_name: str):
+    """Основная функция."""
+    start_time = time.time()
+
+    print("\n" + "=" * 70)
+    print("  📉 PCA ПРОЕКЦИЯ ЭМБЕДДИНГОВ")
+    print("=" * 70)
+
+    async with QdrantManager() as source:
+        print("\n" + "=" * 70)
+        print(f"📥 ШАГ 1: Выгрузка векторов из '{source.collection_name}'")
+        print("=" * 70)
+
+        vectors = await load_vectors(source, limit=limit)
+        if not len(vectors):
+            print("\n❌ Коллекция пуста!")
+            return
+
+        if apply_dim and apply_dim not in dims:
+            dims = sorted(dims + [apply_dim])
+
+        print("\n" + "=" * 70)
+        print("📊 ШАГ 2: Обучение PCA и recall@10")
+        print("=" * 70)
+
+        results = evaluate(vectors, dims, sample=sample, queries=queries)
+
+        print(f"\n{'Размерность':>12} {'recall@10':>10} {'RAM векторов':>14}")
+        print(f"{vectors.shape[1]:>12} {1.0:>10.3f} {vectors.nbytes / 1024**2:>12.1f}MB")
+        for dim, (_, recall) in results.items():
+            print(f"{dim:>12} {recall:>10.3f} {len(vectors) * dim * 4 / 1024**2:>12.1f}MB")
+
+        if apply_dim:
+            projection, recall = results[apply_dim]
+
+            print("\n" + "=" * 70)
+            print(f"💾 ШАГ 3: Перепроецирование в {apply_dim} измерений")
+            print("=" * 70)
+
+            path = projection.save(PROJECTION_DIR)
+            print(f"\n✅ Проекция сохранена: {path}")
+
+            target_name = target_name or f"{source.collection_name}_{projection.version}"
+            async with QdrantManager(
+                collection_name=target_name, model_key=embedding_model_key(projection.version)
+            ) as target:
+                written = await reproject_collection(source, target, projection)
+            print(f"✅ Загружено {written} векторов в '{target_name}'")
+
+            print("\n💡 Для включения проекции добавьте в .env:")
+            print(f"   CLIP_PROJECTION_PATH={path}")
+            print(f"   QDRANT_COLLECTION_NAME={target_name}")
+            print(f"   QDRANT_VECTOR_SIZE={apply_dim}")
+
+    elapsed = time.time() - start_time
+    print(f"\n⏱️  Время: {elapsed:.2f} секунд")
+    print("=" * 70 + "\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Подбор PCA проекции эмбеддингов")
+    parser.add_argument(
+        "--dims", default="64,128,256",
+        help="Размерности для оценки через запятую (по умолчанию: 64,128,256)"
+    )
+    parser.add_argument("--sample", type=int, default=50000, help="Векторов для обучения PCA")
+    parser.add_argument("--queries", type=int, default=1000, help="Запросов для оценки recall")
+    parser.add_argument("--limit", type=int, default=None, help="Выгрузить не больше N векторов")
+    parser.add_argument(
+        "--apply", type=int, default=None, metavar="DIM",
+        help="Сохранить проекцию DIM и перепроецировать коллекцию"
+    )
+    parser.add_argument(
+        "--target", default=None,
+        help="Имя новой коллекции (по умолчанию: <коллекция>_<версия проекции>)"
+    )
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, format="<level>{message}</level>", level="INFO")
+
+    asyncio.run(main(
+        dims=[int(d) for d in args.dims.split(",") if d.strip()],
+        sample=args.sample,
+        queries=args.queries,
+        limit=args.limit,
+        apply_dim=args.apply,
+        target_name=args.target,
+    ))
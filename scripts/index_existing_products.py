@@ -3,25 +3,31 @@
 Скрипт для индексации существующих товаров в Qdrant.
 
 Берет товары из PostgreSQL, генерирует эмбеддинги и загружает в Qdrant батчами.
+Изображения скачиваются в память, эмбеддинги сразу уходят в Qdrant (потоково).
+С --workers эмбеддинги считает пул процессов (app/models/embedding_farm.py) —
+для полной переиндексации на многоядерной машине.
 """
 import asyncio
+import functools
 import sys
+import tempfile
 from pathlib import Path
 from tqdm import tqdm
 import time
+import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from loguru import logger
 from app.db import get_session, get_products
 from app.models.clip_model import CLIPEmbedder
-from app.db.qdrant import QdrantManager
-from app.utils.bakai_s3_client import BakaiS3Client
+from app.db.qdrant import QdrantManager, product_payload
+from app.models.embedding_farm import embed_to_memmap
+from app.utils.bakai_s3_client import BakaiS3Client, fetch_object_bytes
 
 
 BATCH_SIZE = 32  # CLIP batch size
 QDRANT_BATCH_SIZE = 1000  # Qdrant batch size
-STORAGE_PATH = Path("/tmp/bakai_reindex")
 
 
 async def get_bakai_products():
@@ -55,147 +61,203 @@ async def get_bakai_products():
     return all_products
 
 
-async def download_and_generate_embeddings(products: list):
+def iter_image_sources(s3_client: BakaiS3Client, products: list):
     """
-    Скачать изображения и сгенерировать эмбеддинги.
+    Пары (original_id, источник изображения) для потоковой генерации эмбеддингов.
+    
+    Изображение скачивается из S3 в память лениво, в потоке декодирования.
     
     Args:
+        s3_client: S3 клиент
         products: Список Product объектов
+    """
+    for product in products:
+        # Извлечь S3 key из metadata
+        s3_key = (product.product_metadata or {}).get('s3_key')
         
-    Returns:
-        Список (product_id, embedding)
+        if not s3_key:
+            logger.warning(f"⚠️  Нет S3 key для {product.external_id}")
+            continue
+        
+        original_id = product.external_id.replace('bakai_', '')
+        yield original_id, functools.partial(s3_client.get_object_bytes, "product-images", s3_key)
+
+
+async def upsert_chunk(qdrant: QdrantManager, ids: list, vectors: np.ndarray, products: dict):
     """
-    logger.info(f"🧠 Генерация эмбеддингов для {len(products)} товаров...")
+    Загрузить накопленные векторы в Qdrant без ожидания применения.
     
-    # Создать директорию
-    STORAGE_PATH.mkdir(parents=True, exist_ok=True)
+    После последнего чанка нужен qdrant.wait_for_updates().
     
-    s3_client = BakaiS3Client()
-    embedder = CLIPEmbedder()
+    Args:
+        qdrant: Qdrant manager
+        ids: Оригинальные ID товаров
+        vectors: float32 матрица эмбеддингов
+        products: external_id -> Product (категория и цена для фильтров)
+    """
+    await qdrant.upload_vectors(
+        product_ids=[f"bakai_{pid}" for pid in ids],
+        vectors=vectors,
+        payloads=[
+            product_payload(
+                f"bakai_{pid}",
+                category=products[f"bakai_{pid}"].category,
+                price=products[f"bakai_{pid}"].price,
+                source="bakai_s3",
+                original_id=pid
+            )
+            for pid in ids
+        ],
+        wait=False
+    )
+
+
+async def index_products_streaming(products: list):
+    """
+    Скачать изображения, генерировать эмбеддинги и загружать в Qdrant потоком.
     
-    embeddings = []
-    failed = 0
+    Эмбеддинги не накапливаются: каждые QDRANT_BATCH_SIZE векторов сразу
+    отправляются в Qdrant, так что память не зависит от размера каталога.
     
-    # Обработка батчами
-    for i in tqdm(range(0, len(products), BATCH_SIZE), desc="CLIP обработка"):
-        batch = products[i:i + BATCH_SIZE]
+    Args:
+        products: Список Product объектов
         
-        batch_paths = []
-        batch_ids = []
+    Returns:
+        (загружено, неудачно)
+    """
+    logger.info(f"🧠 Генерация эмбеддингов для {len(products)} товаров...")
+    logger.info(f"   Размер batch Qdrant: {QDRANT_BATCH_SIZE}")
+    
+    s3_client = BakaiS3Client()
+    embedder = CLIPEmbedder(towers=("vision",))
+    async with QdrantManager() as qdrant:
+        by_id = {product.external_id: product for product in products}
         
-        # Скачать изображения для batch
-        for product in batch:
-            try:
-                # Извлечь оригинальный ID
-                original_id = product.external_id.replace('bakai_', '')
-                
-                # Извлечь S3 key из metadata
-                s3_key = product.product_metadata.get('s3_key')
-                
-                if not s3_key:
-                    logger.warning(f"⚠️  Нет S3 key для {product.external_id}")
-                    failed += 1
-                    continue
-                
-                # Локальный путь
-                local_path = STORAGE_PATH / f"{product.external_id}.jpg"
-                
-                # Скачать если еще не скачан
-                if not local_path.exists():
-                    success = s3_client.download_file(
-                        "product-images",
-                        s3_key,
-                        str(local_path)
-                    )
-                    
-                    if not success:
-                        logger.warning(f"⚠️  Не удалось скачать {s3_key}")
-                        failed += 1
-                        continue
-                
-                batch_paths.append(str(local_path))
-                batch_ids.append(original_id)
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка подготовки {product.external_id}: {e}")
-                failed += 1
-                continue
+        pending_ids, pending_vectors = [], []
+        indexed = 0
+        failed = 0
         
-        # Генерация эмбеддингов для batch
-        if batch_paths:
+        async def flush():
+            nonlocal indexed, failed
+            ids = [pid for chunk in pending_ids for pid in chunk]
+            vectors = np.concatenate(pending_vectors)
+            pending_ids.clear()
+            pending_vectors.clear()
+            
             try:
-                batch_embeddings = await embedder.generate_embeddings_batch(batch_paths)
-                
-                for product_id, embedding in zip(batch_ids, batch_embeddings):
-                    if embedding is not None:
-                        embeddings.append((product_id, embedding.tolist()))
-                    else:
-                        failed += 1
-                        
+                await upsert_chunk(qdrant, ids, vectors, by_id)
+                indexed += len(ids)
             except Exception as e:
-                logger.error(f"❌ Ошибка CLIP batch: {e}")
-                failed += len(batch_paths)
+                logger.error(f"❌ Ошибка загрузки batch в Qdrant: {e}")
+                failed += len(ids)
+        
+        progress = tqdm(total=len(products), desc="CLIP → Qdrant")
+        embedded = 0
+        
+        async for ids, vectors in embedder.iter_embeddings(
+            iter_image_sources(s3_client, products), batch_size=BATCH_SIZE
+        ):
+            pending_ids.append(ids)
+            pending_vectors.append(vectors)
+            embedded += len(ids)
+            progress.update(len(ids))
+            
+            if sum(len(chunk) for chunk in pending_ids) >= QDRANT_BATCH_SIZE:
+                await flush()
+        
+        if pending_ids:
+            await flush()
+        progress.close()
+        await qdrant.wait_for_updates()
+    
+    failed += len(products) - embedded
     
-    logger.success(f"✅ Сгенерировано: {len(embeddings)}/{len(products)}")
+    logger.success(f"✅ Успешно: {indexed}/{len(products)}")
     if failed > 0:
         logger.warning(f"⚠️  Неудачно: {failed}/{len(products)}")
     
-    return embeddings
+    return indexed, failed
 
 
-async def index_to_qdrant_batched(embeddings: list):
+async def index_products_farm(products: list, workers: int, threads: int):
     """
-    Загрузить эмбеддинги в Qdrant батчами.
+    Полная переиндексация через пул процессов (embedding farm).
+    
+    Эмбеддинги пишутся в .npy memmap рабочими процессами, затем
+    загружаются в Qdrant батчами по QDRANT_BATCH_SIZE.
     
     Args:
-        embeddings: Список (product_id, embedding)
+        products: Список Product объектов
+        workers: Количество процессов (0 = по числу ядер)
+        threads: Потоков torch на процесс (0 = из настроек)
+        
+    Returns:
+        (загружено, неудачно)
     """
-    logger.info(f"🔍 Индексация {len(embeddings)} векторов в Qdrant...")
-    logger.info(f"   Размер batch: {QDRANT_BATCH_SIZE}")
-    
-    qdrant = QdrantManager()
-    
-    total_batches = (len(embeddings) + QDRANT_BATCH_SIZE - 1) // QDRANT_BATCH_SIZE
-    successful = 0
-    failed = 0
-    
-    for i in tqdm(range(0, len(embeddings), QDRANT_BATCH_SIZE), desc="Qdrant batches", total=total_batches):
-        batch = embeddings[i:i + QDRANT_BATCH_SIZE]
+    keyed = [
+        (product.external_id.replace('bakai_', ''), (product.product_metadata or {}).get('s3_key'))
+        for product in products
+    ]
+    missing = sum(1 for _, key in keyed if not key)
+    if missing:
+        logger.warning(f"⚠️  Нет S3 key у {missing} товаров")
+    keyed = [(pid, key) for pid, key in keyed if key]
+    
+    async with QdrantManager() as qdrant:
+        by_id = {product.external_id: product for product in products}
+        indexed = 0
+        failed = missing
         
-        try:
-            # Подготовить данные
-            product_ids = [f"bakai_{pid}" for pid, _ in batch]
-            vectors = [emb for _, emb in batch]
-            payloads = [
-                {
-                    "product_id": f"bakai_{pid}",
-                    "source": "bakai_s3",
-                    "original_id": pid
-                }
-                for pid, _ in batch
-            ]
-            
-            # Загрузить batch
-            await qdrant.upsert_vectors(
-                product_ids=product_ids,
-                vectors=vectors,
-                payloads=payloads
+        with tempfile.TemporaryDirectory(prefix="embedding-farm-") as tmp_dir:
+            result = embed_to_memmap(
+                [key for _, key in keyed],
+                Path(tmp_dir) / "embeddings.npy",
+                loader=functools.partial(fetch_object_bytes, "product-images"),
+                num_workers=workers or None,
+                threads_per_worker=threads or None,
+                batch_size=BATCH_SIZE,
             )
+            failed += len(result.failed_rows)
+            print(f"\n⚡ Farm: {result.images_per_second:.1f} img/s, {result.elapsed:.1f} с")
             
-            successful += len(batch)
+            embeddings = np.load(result.output_path, mmap_mode="r")
+            failed_rows = set(result.failed_rows)
             
-        except Exception as e:
-            logger.error(f"❌ Ошибка загрузки batch {i//QDRANT_BATCH_SIZE + 1}: {e}")
-            failed += len(batch)
-            continue
+            for start in tqdm(range(0, len(keyed), QDRANT_BATCH_SIZE), desc="Qdrant upsert"):
+                rows = [
+                    row for row in range(start, min(start + QDRANT_BATCH_SIZE, len(keyed)))
+                    if row not in failed_rows
+                ]
+                if not rows:
+                    continue
+                
+                ids = [keyed[row][0] for row in rows]
+                try:
+                    await upsert_chunk(qdrant, ids, np.asarray(embeddings[rows]), by_id)
+                    indexed += len(ids)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка загрузки batch в Qdrant: {e}")
+                    failed += len(ids)
+            
+            del embeddings
+        
+        await qdrant.wait_for_updates()
     
-    logger.success(f"✅ Успешно: {successful}/{len(embeddings)}")
+    logger.success(f"✅ Успешно: {indexed}/{len(products)}")
     if failed > 0:
-        logger.warning(f"⚠️  Неудачно: {failed}/{len(embeddings)}")
+        logger.warning(f"⚠️  Неудачно: {failed}/{len(products)}")
+    
+    return indexed, failed
 
 
-async def main():
-    """Основная функция."""
+async def main(workers: int = None, threads: int = 0):
+    """
+    Основная функция.
+    
+    Args:
+        workers: Если задано, эмбеддинги считает пул процессов (0 = по числу ядер)
+        threads: Потоков torch на процесс для пула
+    """
     start_time = time.time()
     
     print("\n" + "=" * 70)
@@ -213,39 +275,35 @@ async def main():
         print("\n❌ Товары не найдены!")
         return
     
-    # 2. Скачать изображения и генерировать эмбеддинги
+    # 2. Генерировать эмбеддинги и загружать в Qdrant (потоково)
     print("\n" + "=" * 70)
-    print("🧠 ШАГ 2: Генерация CLIP эмбеддингов")
+    print("🧠 ШАГ 2: Генерация CLIP эмбеддингов и загрузка в Qdrant")
     print("=" * 70)
     
-    embeddings = await download_and_generate_embeddings(products)
+    if workers is None:
+        indexed, failed = await index_products_streaming(products)
+    else:
+        indexed, failed = await index_products_farm(products, workers, threads)
     
-    if not embeddings:
+    if not indexed:
         print("\n❌ Не удалось создать эмбеддинги!")
         return
     
-    # 3. Загрузить в Qdrant
-    print("\n" + "=" * 70)
-    print("🔍 ШАГ 3: Загрузка в Qdrant")
-    print("=" * 70)
-    
-    await index_to_qdrant_batched(embeddings)
-    
-    # 4. Проверить результат
+    # 3. Проверить результат
     print("\n" + "=" * 70)
     print("📊 ПРОВЕРКА")
     print("=" * 70)
     
-    qdrant = QdrantManager()
-    count = await qdrant.count_vectors()
+    async with QdrantManager() as qdrant:
+        count = await qdrant.count_vectors()
     
     print(f"\n✅ Векторов в Qdrant: {count}")
-    print(f"✅ Ожидалось: {len(embeddings)}")
+    print(f"✅ Ожидалось: {indexed}")
     
-    if count >= len(embeddings):
+    if count >= indexed:
         print("\n🎉 ВСЕ ВЕКТОРЫ ЗАГРУЖЕНЫ!")
     else:
-        print(f"\n⚠️  Загружено {count}/{len(embeddings)} ({count/len(embeddings)*100:.1f}%)")
+        print(f"\n⚠️  Загружено {count}/{indexed} ({count/indexed*100:.1f}%)")
     
     elapsed = time.time() - start_time
     print(f"\n⏱️  Время: {elapsed:.2f} секунд ({elapsed/60:.2f} минут)")
@@ -254,8 +312,21 @@ async def main():
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Индексация существующих товаров в Qdrant")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Полная переиндексация пулом процессов (0 = по числу ядер / threads)"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=0,
+        help="Потоков torch на процесс пула (по умолчанию EMBEDDING_FARM_THREADS)"
+    )
+    args = parser.parse_args()
+    
     logger.remove()
     logger.add(sys.stdout, format="<level>{message}</level>", level="INFO")
     
-    asyncio.run(main())
+    asyncio.run(main(workers=args.workers, threads=args.threads))
 
@@ -38,6 +38,16 @@ CREATE INDEX IF NOT EXISTS idx_search_logs_created_at ON search_logs(created_at)
 CREATE INDEX IF NOT EXISTS idx_search_logs_user_id ON search_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_search_logs_query_type ON search_logs(query_type);
 
+-- Create precomputed similar products table (scripts/build_neighbor_table.py)
+CREATE TABLE IF NOT EXISTS product_neighbors (
+    external_id VARCHAR(255) PRIMARY KEY,
+    neighbor_ids JSON NOT NULL,
+    scores JSON NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_neighbors_updated_at ON product_neighbors(updated_at);
+
 -- Create function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -17,7 +17,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from loguru import logger
 from app.config import settings
 from app.db.postgres import init_db, get_session, Product, SearchLog, close_db
-from app.db.qdrant import QdrantManager
+from app.db.qdrant import QdrantManager, versioned_collection_name
 
 
 async def init_postgresql() -> bool:
@@ -93,10 +93,15 @@ async def init_qdrant() -> bool:
         print(f"   Vector size: {settings.qdrant_vector_size}")
         print(f"   Distance metric: Cosine")
         
-        await qdrant.create_collection(
-            vector_size=settings.qdrant_vector_size,
-            distance="Cosine"
-        )
+        # Новая установка: версия коллекции за алиасом (для blue/green переиндексации)
+        if not await qdrant.collection_exists():
+            version = versioned_collection_name(qdrant.collection_name)
+            await qdrant.for_collection(version).create_collection(
+                vector_size=settings.qdrant_vector_size,
+                distance="Cosine"
+            )
+            await qdrant.switch_alias(version)
+            print(f"   Alias: {qdrant.collection_name} -> {version}")
         
         # Get collection info
         info = await qdrant.get_collection_info()
@@ -110,7 +115,7 @@ async def init_qdrant() -> bool:
         print(f"   • Status: {info['status']}")
         
         # Close connection
-        qdrant.close()
+        await qdrant.close()
         
         return True
         
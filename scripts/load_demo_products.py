@@ -18,7 +18,8 @@ from loguru import logger
 
 from app.models.clip_model import CLIPEmbedder
 from app.db.postgres import get_session, create_product, init_db
-from app.db.qdrant import QdrantManager
+from app.db.qdrant import product_payload
+from app.db.vector_store import VectorStore, create_vector_store
 from app.config import settings
 
 
@@ -148,7 +149,7 @@ def generate_product_data(image_path: Path) -> dict:
 async def process_image(
     image_path: Path,
     clip_embedder: CLIPEmbedder,
-    qdrant_manager: QdrantManager
+    qdrant_manager: VectorStore
 ) -> Tuple[bool, str, Optional[str]]:
     """
     Обработать одно изображение.
@@ -156,7 +157,7 @@ async def process_image(
     Args:
         image_path: Путь к изображению
         clip_embedder: CLIP embedder для генерации векторов
-        qdrant_manager: Менеджер Qdrant для хранения векторов
+        qdrant_manager: Векторное хранилище (Qdrant или memmap)
         
     Returns:
         (success: bool, message: str, category: Optional[str])
@@ -184,13 +185,14 @@ async def process_image(
             success = await qdrant_manager.upsert_vectors(
                 product_ids=[product.external_id],
                 vectors=[embedding.tolist()],
-                payloads=[{
-                    "product_id": product.external_id,
-                    "title": product.title,
-                    "category": product.category,
-                    "price": float(product.price),
-                    "image_url": product.image_url,
-                }]
+                payloads=[product_payload(
+                    product.external_id,
+                    category=product.category,
+                    price=product.price,
+                    source="demo",
+                    title=product.title,
+                    image_url=product.image_url
+                )]
             )
             
             if not success:
@@ -232,12 +234,8 @@ async def load_demo_products(images_dir: str):
         clip_embedder = CLIPEmbedder(device="auto")
         logger.info(f"CLIP embedder готов (device={clip_embedder.device})")
         
-        # Qdrant
-        qdrant_manager = QdrantManager(
-            host=settings.qdrant_host,
-            port=settings.qdrant_port,
-            collection_name=settings.qdrant_collection_name
-        )
+        # Векторное хранилище (VECTOR_STORE=qdrant или memmap)
+        qdrant_manager = create_vector_store(collection_name=settings.qdrant_collection_name)
         
         # Создание коллекции если не существует
         if not await qdrant_manager.collection_exists():
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Миграция существующей коллекции Qdrant на квантизированное хранение.
+
+1. Снимает эталон: точный поиск (без квантизации) для --queries векторов
+   из самой коллекции; сама точка запроса исключается из результатов,
+   иначе она всегда совпадает в обоих top-K и завышает recall.
+2. Включает квантизацию (int8 / binary) и, по желанию, переносит исходные
+   векторы на диск — на месте, без переиндексации; ждёт окончания оптимизации.
+3. Повторяет поиск с квантизацией (--oversampling, --rescore) и сообщает:
+   - оценку памяти под векторы до и после;
+   - recall@K относительно точного поиска и задержку запросов.
+
+Запуск:
+    python scripts/migrate_quantization.py --quantization int8 --on-disk
+    python scripts/migrate_quantization.py --quantization binary --on-disk --oversampling 3
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from qdrant_client.models import (
+    Filter,
+    HasIdCondition,
+    QuantizationSearchParams,
+    QueryRequest,
+    SearchParams,
+)
+
+from app.config import settings
+from app.db.qdrant import QdrantManager
+
+
+# Байт на измерение вектора в RAM для каждого вида хранения
+BYTES_PER_DIMENSION = {"none": 0.0, "int8": 1.0, "binary": 1 / 8}
+
+
+def estimate_ram(points: int, dim: int, quantization: str, on_disk: bool) -> float:
+    """
+    Оценка памяти под векторы (без HNSW графа и payload), МБ.
+
+    Args:
+        points: Количество точек
+        dim: Размерность векторов
+        quantization: "none", "int8" или "binary"
+        on_disk: Исходные float32 векторы на диске
+
+    Returns:
+        Объём в мегабайтах
+    """
+    original = 0.0 if on_disk else points * dim * 4.0
+    quantized = points * dim * BYTES_PER_DIMENSION[quantization]
+    return (original + quantized) / 1024 ** 2
+
+
+async def sample_queries(
+    qdrant: QdrantManager,
+    count: int,
+    pool: int = 10000
+) -> tuple[list[str], np.ndarray]:
+    """Случайные точки коллекции в качестве запросов (из первых pool точек): их ID и векторы."""
+    points = []
+    async for batch in qdrant.scroll_vectors(batch_size=1000):
+        points.extend(batch)
+        if len(points) >= pool:
+            break
+
+    rng = np.random.default_rng(0)
+    indices = rng.choice(len(points), size=min(count, len(points)), replace=False)
+    ids = [points[i]["id"] for i in indices]
+    return ids, np.asarray([points[i]["vector"] for i in indices], dtype=np.float32)
+
+
+async def run_queries(
+    qdrant: QdrantManager,
+    query_ids: list[str],
+    queries: np.ndarray,
+    top_k: int,
+    params: SearchParams,
+    batch_size: int = 64
+) -> tuple[list[set], float]:
+    """
+    Выполнить запросы пакетами, исключая из результатов саму точку запроса.
+
+    Returns:
+        Кортеж (множества ID результатов по запросам, мс на запрос)
+    """
+    results = []
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        responses = await qdrant.client.query_batch_points(
+            collection_name=qdrant.collection_name,
+            requests=[
+                QueryRequest(
+                    query=query.tolist(),
+                    filter=Filter(must_not=[HasIdCondition(has_id=[point_id])]),
+                    limit=top_k,
+                    params=params
+                )
+                for point_id, query in zip(
+                    query_ids[offset:offset + batch_size], queries[offset:offset + batch_size]
+                )
+            ]
+        )
+        results.extend({point.id for point in response.points} for response in responses)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return results, elapsed_ms / max(len(queries), 1)
+
+
+async def wait_until_optimized(qdrant: QdrantManager, timeout: float) -> str:
+    """Дождаться окончания фоновой перестройки сегментов (status green)."""
+    deadline = time.time() + timeout
+    while True:
+        info = await qdrant.get_collection_info()
+        status = str(getattr(info["status"], "value", info["status"]))
+        if status == "green" or time.time() > deadline:
+            return status
+        await asyncio.sleep(2)
+
+
+async def main(
+    collection: str,
+    quantization: str,
+    on_disk: Optional[bool],
+    queries: int,
+    top_k: int,
+    oversampling: float,
+    rescore: bool,
+    timeout: float
+):
+    """Основная функция."""
+    async with QdrantManager(collection_name=collection) as qdrant:
+        before = await qdrant.get_collection_info()
+        points, dim = before["points_count"] or 0, before["vector_size"]
+        target_on_disk = before["on_disk"] if on_disk is None else on_disk
+
+        print("\n" + "=" * 70)
+        print(f"  🗜️  МИГРАЦИЯ КОЛЛЕКЦИИ {collection}")
+        print("=" * 70)
+        print(f"\n📦 {points} точек, dim={dim}")
+        print(f"   Сейчас:  quantization={before['quantization']}, on_disk={before['on_disk']}")
+        print(f"   Станет:  quantization={quantization}, on_disk={target_on_disk}")
+
+        # 1. Эталон: точный поиск по исходным векторам
+        query_ids, query_vectors = await sample_queries(qdrant, queries)
+        exact_params = SearchParams(exact=True, quantization=QuantizationSearchParams(ignore=True))
+        exact, exact_ms = await run_queries(qdrant, query_ids, query_vectors, top_k, exact_params)
+
+        # 2. Миграция на месте
+        print("\n⏳ Применение конфигурации...")
+        await qdrant.update_quantization(quantization, on_disk=on_disk)
+        status = await wait_until_optimized(qdrant, timeout)
+        if status != "green":
+            print(f"⚠️  Оптимизация не завершилась за {timeout:.0f} с (status={status}), recall предварительный")
+
+        # 3. Поиск с квантизацией
+        approx_params = SearchParams(
+            quantization=QuantizationSearchParams(oversampling=oversampling, rescore=rescore)
+        )
+        approx, approx_ms = await run_queries(qdrant, query_ids, query_vectors, top_k, approx_params)
+
+    recall = np.mean([len(a & e) / max(len(e), 1) for a, e in zip(approx, exact)])
+    ram_before = estimate_ram(points, dim, before["quantization"], before["on_disk"])
+    ram_after = estimate_ram(points, dim, quantization, target_on_disk)
+
+    print("\n" + "=" * 70)
+    print(f"📊 РЕЗУЛЬТАТЫ ({len(query_vectors)} запросов, top_k={top_k}, "
+          f"oversampling={oversampling}, rescore={rescore})")
+    print("=" * 70)
+    print(f"\n   RAM под векторы:  {ram_before:,.1f} МБ -> {ram_after:,.1f} МБ "
+          f"(сэкономлено {ram_before - ram_after:,.1f} МБ)")
+    print(f"   Recall@{top_k}:        {recall:.4f}")
+    print(f"   Задержка:         точный {exact_ms:.2f} мс, с квантизацией {approx_ms:.2f} мс на запрос")
+    if recall < 0.95:
+        print("\n💡 Recall ниже 0.95 — увеличьте --oversampling или включите --rescore")
+    print(f"\n💡 Для новых коллекций: QDRANT_QUANTIZATION={quantization} "
+          f"QDRANT_ON_DISK_VECTORS={str(target_on_disk).lower()}")
+    print("=" * 70 + "\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Миграция коллекции Qdrant на квантизацию")
+    parser.add_argument("--collection", default=settings.qdrant_collection_name, help="Коллекция")
+    parser.add_argument(
+        "--quantization", choices=["none", "int8", "binary"], default="int8", help="Вид квантизации"
+    )
+    parser.add_argument(
+        "--on-disk", action=argparse.BooleanOptionalAction, default=None,
+        help="Исходные векторы на диске (--no-on-disk — в RAM; по умолчанию без изменений)"
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Запросов для оценки recall")
+    parser.add_argument("--top-k", type=int, default=10, help="Результатов на запрос")
+    parser.add_argument(
+        "--oversampling", type=float, default=settings.qdrant_search_oversampling,
+        help="Кандидатов из квантизированных векторов на результат"
+    )
+    parser.add_argument(
+        "--rescore", action=argparse.BooleanOptionalAction, default=settings.qdrant_search_rescore,
+        help="Переранжировать кандидатов по исходным векторам"
+    )
+    parser.add_argument("--timeout", type=float, default=600, help="Ожидание оптимизации, с")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, format="<level>{message}</level>", level="WARNING")
+
+    asyncio.run(main(
+        collection=args.collection,
+        quantization=args.quantization,
+        on_disk=args.on_disk,
+        queries=args.queries,
+        top_k=args.top_k,
+        oversampling=args.oversampling,
+        rescore=args.rescore,
+        timeout=args.timeout,
+    ))
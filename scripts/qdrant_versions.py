@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Управление версиями коллекции Qdrant за алиасом (blue/green).
+
+API и воркеры работают с алиасом QDRANT_COLLECTION_NAME; переиндексация
+(reindex_qdrant.py, quick_index_qdrant.py) строит новую версию
+<алиас>_v<время> и атомарно переключает на неё алиас.
+
+Запуск:
+    python scripts/qdrant_versions.py status
+    python scripts/qdrant_versions.py rollback
+    python scripts/qdrant_versions.py switch product_embeddings_v20250101120000
+    python scripts/qdrant_versions.py cleanup --keep 2
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from app.db.qdrant import QdrantManager
+
+
+async def status(live: QdrantManager):
+    """Показать версии и текущую цель алиаса."""
+    current = await live.get_alias_target()
+    versions = await live.list_versions()
+
+    if current is None and await live.collection_exists():
+        print(f"\n⚠️  '{live.collection_name}' — обычная коллекция, не алиас.")
+        print("   Первая переиндексация заменит её версией за алиасом.")
+    else:
+        print(f"\n🔀 Алиас '{live.collection_name}' -> {current}")
+
+    print(f"\n📦 Версии ({len(versions)}):")
+    for version in versions:
+        count = await live.for_collection(version).count_vectors()
+        marker = "  ← live" if version == current else ""
+        print(f"   {version}  {count:>10} векторов{marker}")
+
+
+async def main(command: str, collection: str, keep: int):
+    """Основная функция."""
+    async with QdrantManager() as live:
+        if command == "status":
+            await status(live)
+        elif command == "switch":
+            previous = await live.switch_alias(collection)
+            print(f"\n✅ '{live.collection_name}' -> '{collection}' (было: {previous})")
+        elif command == "rollback":
+            previous = await live.get_alias_target()
+            current = await live.rollback_alias()
+            print(f"\n✅ Откат: '{live.collection_name}' -> '{current}' (было: {previous})")
+        elif command == "cleanup":
+            deleted = await live.delete_old_versions(keep=keep)
+            print(f"\n🗑️  Удалено версий: {len(deleted)}")
+            for version in deleted:
+                print(f"   {version}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Версии коллекции Qdrant за алиасом")
+    parser.add_argument("command", choices=["status", "switch", "rollback", "cleanup"], help="Команда")
+    parser.add_argument("collection", nargs="?", help="Версия для switch")
+    parser.add_argument("--keep", type=int, default=2, help="Сколько новейших версий оставить при cleanup")
+    args = parser.parse_args()
+
+    if args.command == "switch" and not args.collection:
+        parser.error("switch требует имя версии")
+
+    logger.remove()
+    logger.add(sys.stdout, format="<level>{message}</level>", level="WARNING")
+
+    asyncio.run(main(args.command, args.collection, args.keep))
@@ -3,18 +3,25 @@
 Быстрая индексация в Qdrant из уже скачанных изображений.
 
 Использует изображения из /tmp/bakai_products для генерации эмбеддингов.
+
+Индексация идёт в новую версию коллекции (product_embeddings_v<время>),
+живой поиск её не видит. После проверки алиас product_embeddings атомарно
+переключается на новую версию; откат: python scripts/qdrant_versions.py rollback
 """
 import asyncio
 import sys
 from pathlib import Path
 from tqdm import tqdm
 import time
+import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from loguru import logger
 from app.models.clip_model import CLIPEmbedder
-from app.db.qdrant import QdrantManager
+from app.config import settings
+from app.db.postgres import get_session, get_products_by_external_ids
+from app.db.qdrant import QdrantManager, product_payload, versioned_collection_name
 
 
 STORAGE_PATH = Path("/tmp/bakai_products")
@@ -22,6 +29,32 @@ CLIP_BATCH_SIZE = 32
 QDRANT_BATCH_SIZE = 1000
 
 
+async def fetch_payloads(ids: list) -> list:
+    """
+    Payload точек с категорией и ценой товаров из PostgreSQL.
+    
+    Args:
+        ids: Оригинальные ID товаров
+        
+    Returns:
+        Payload для каждого ID (без категории и цены, если товара нет в БД)
+    """
+    async with get_session() as session:
+        products = await get_products_by_external_ids(session, [f"bakai_{pid}" for pid in ids])
+    
+    payloads = []
+    for pid in ids:
+        product = products.get(f"bakai_{pid}")
+        payloads.append(product_payload(
+            f"bakai_{pid}",
+            category=product.category if product else None,
+            price=product.price if product else None,
+            source="bakai_s3",
+            original_id=pid
+        ))
+    return payloads
+
+
 async def get_downloaded_images():
     """Получить список скачанных изображений."""
     logger.info(f"📂 Поиск изображений в {STORAGE_PATH}...")
@@ -52,101 +85,72 @@ async def get_downloaded_images():
     return result
 
 
-async def generate_embeddings(images: list):
+async def index_streaming(images: list, qdrant: QdrantManager):
     """
-    Генерировать CLIP эмбеддинги.
+    Генерировать CLIP эмбеддинги и загружать их в Qdrant потоком.
+    
+    Эмбеддинги не накапливаются: каждые QDRANT_BATCH_SIZE векторов
+    сразу отправляются в Qdrant массовой загрузкой без ожидания применения;
+    в конце — один барьер, после которого все векторы доступны для поиска.
     
     Args:
         images: Список (product_id, image_path)
+        qdrant: Менеджер целевой коллекции
         
     Returns:
-        Список (product_id, embedding)
+        Количество загруженных векторов
     """
     logger.info(f"🧠 Генерация CLIP эмбеддингов для {len(images)} изображений...")
+    logger.info(f"   Размер batch Qdrant: {QDRANT_BATCH_SIZE}")
     
-    embedder = CLIPEmbedder()
-    embeddings = []
-    
-    # Обработка батчами
-    for i in tqdm(range(0, len(images), CLIP_BATCH_SIZE), desc="CLIP обработка"):
-        batch = images[i:i + CLIP_BATCH_SIZE]
-        
-        batch_paths = [img[1] for img in batch]
-        batch_ids = [img[0] for img in batch]
-        
-        try:
-            # Генерация эмбеддингов батчем
-            batch_embeddings = await embedder.generate_embeddings_batch(batch_paths)
-            
-            # Сохранить результаты
-            for product_id, embedding in zip(batch_ids, batch_embeddings):
-                if embedding is not None:
-                    embeddings.append((product_id, embedding.tolist()))
-                else:
-                    logger.warning(f"⚠️  Не удалось создать эмбеддинг для товара {product_id}")
-                    
-        except Exception as e:
-            logger.error(f"❌ Ошибка обработки batch: {e}")
-            continue
-    
-    logger.success(f"✅ Сгенерировано эмбеддингов: {len(embeddings)}/{len(images)}")
-    
-    return embeddings
-
-
-async def index_to_qdrant(embeddings: list):
-    """
-    Загрузить эмбеддинги в Qdrant батчами.
-    
-    Args:
-        embeddings: Список (product_id, embedding)
-    """
-    logger.info(f"🔍 Индексация {len(embeddings)} векторов в Qdrant...")
-    logger.info(f"   Размер batch: {QDRANT_BATCH_SIZE}")
-    
-    qdrant = QdrantManager()
+    embedder = CLIPEmbedder(towers=("vision",))
     
+    pending_ids, pending_vectors = [], []
     successful = 0
     failed = 0
     
-    total_batches = (len(embeddings) + QDRANT_BATCH_SIZE - 1) // QDRANT_BATCH_SIZE
-    
-    for i in tqdm(range(0, len(embeddings), QDRANT_BATCH_SIZE), desc="Qdrant batches", total=total_batches):
-        batch = embeddings[i:i + QDRANT_BATCH_SIZE]
+    async def flush():
+        nonlocal successful, failed
+        ids = [pid for chunk in pending_ids for pid in chunk]
+        vectors = np.concatenate(pending_vectors)
+        pending_ids.clear()
+        pending_vectors.clear()
         
         try:
-            # Подготовить данные
-            product_ids = [f"bakai_{pid}" for pid, _ in batch]
-            vectors = [emb for _, emb in batch]
-            payloads = [
-                {
-                    "product_id": f"bakai_{pid}",
-                    "source": "bakai_s3",
-                    "original_id": pid
-                }
-                for pid, _ in batch
-            ]
-            
-            # Загрузить batch
-            await qdrant.upsert_vectors(
-                product_ids=product_ids,
+            await qdrant.upload_vectors(
+                product_ids=[f"bakai_{pid}" for pid in ids],
                 vectors=vectors,
-                payloads=payloads
+                payloads=await fetch_payloads(ids),
+                wait=False
             )
-            
-            successful += len(batch)
-            
+            successful += len(ids)
         except Exception as e:
-            logger.error(f"❌ Ошибка загрузки batch {i//QDRANT_BATCH_SIZE + 1}: {e}")
-            failed += len(batch)
-            continue
+            logger.error(f"❌ Ошибка загрузки batch: {e}")
+            failed += len(ids)
     
-    logger.success(f"✅ Успешно: {successful}/{len(embeddings)}")
+    progress = tqdm(total=len(images), desc="CLIP → Qdrant")
+    
+    async for ids, vectors in embedder.iter_embeddings(images, batch_size=CLIP_BATCH_SIZE):
+        pending_ids.append(ids)
+        pending_vectors.append(vectors)
+        progress.update(len(ids))
+        
+        if sum(len(chunk) for chunk in pending_ids) >= QDRANT_BATCH_SIZE:
+            await flush()
+    
+    if pending_ids:
+        await flush()
+    progress.close()
+    await qdrant.wait_for_updates()
+    
+    logger.success(f"✅ Успешно: {successful}/{len(images)}")
     if failed > 0:
-        logger.warning(f"⚠️  Неудачно: {failed}/{len(embeddings)}")
+        logger.warning(f"⚠️  Неудачно: {failed}/{len(images)}")
+    
+    return successful
 
 
-async def main():
+async def main(switch: bool, carry_over: bool):
     """Основная функция."""
     start_time = time.time()
     
@@ -166,43 +170,54 @@ async def main():
         print(f"   Проверьте директорию: {STORAGE_PATH}")
         return
     
-    # 2. Генерировать эмбеддинги
+    # 2. Генерировать эмбеддинги и загружать в Qdrant (потоково)
     print("\n" + "=" * 70)
-    print("🧠 ШАГ 2: Генерация CLIP эмбеддингов")
+    print("🧠 ШАГ 2: Генерация CLIP эмбеддингов и загрузка в Qdrant")
     print("=" * 70)
     
-    embeddings = await generate_embeddings(images)
-    
-    if not embeddings:
-        print("\n❌ Не удалось создать эмбеддинги!")
+    live = QdrantManager()
+    qdrant = live.for_collection(versioned_collection_name(live.collection_name))
+    if await qdrant.collection_exists():
+        # Не дописывать в чужую версию, запущенную одновременно
+        print(f"\n❌ Версия '{qdrant.collection_name}' уже существует, запустите повторно")
+        await live.close()
         return
+    await qdrant.create_collection(vector_size=settings.qdrant_vector_size)
     
-    # 3. Загрузить в Qdrant
-    print("\n" + "=" * 70)
-    print("🔍 ШАГ 3: Загрузка в Qdrant")
-    print("=" * 70)
+    indexed = await index_streaming(images, qdrant)
     
-    await index_to_qdrant(embeddings)
+    if not indexed:
+        print("\n❌ Не удалось создать эмбеддинги!")
+        return
     
-    # 4. Проверить результат
+    # 3. Проверить результат
     print("\n" + "=" * 70)
     print("📊 ПРОВЕРКА")
     print("=" * 70)
     
-    qdrant = QdrantManager()
     count = await qdrant.count_vectors()
     
-    print(f"\n✅ Векторов в Qdrant: {count}")
-    print(f"✅ Ожидалось: {len(embeddings)}")
+    print(f"\n✅ Векторов в '{qdrant.collection_name}': {count}")
+    print(f"✅ Ожидалось: {indexed}")
     
-    if count >= len(embeddings):
+    if count >= indexed:
         print("\n🎉 ВСЕ ВЕКТОРЫ ЗАГРУЖЕНЫ!")
     else:
-        print(f"\n⚠️  Загружено {count}/{len(embeddings)} ({count/len(embeddings)*100:.1f}%)")
+        print(f"\n⚠️  Загружено {count}/{indexed} ({count/indexed*100:.1f}%)")
+    
+    # 4. Переключить алиас на новую версию
+    if not switch or count < indexed:
+        print(f"\n⏸️  Версия не опубликована. Опубликовать: "
+              f"python scripts/qdrant_versions.py switch {qdrant.collection_name}")
+    else:
+        previous = await live.publish_version(qdrant.collection_name, carry_over=carry_over)
+        print(f"\n🔀 '{live.collection_name}' -> '{qdrant.collection_name}' (было: {previous})")
+        print("   Откат: python scripts/qdrant_versions.py rollback")
+    await live.close()
     
     elapsed = time.time() - start_time
     print(f"\n⏱️  Время: {elapsed:.2f} секунд ({elapsed/60:.2f} минут)")
-    print(f"📈 Скорость: {len(embeddings) / elapsed:.2f} товаров/сек")
+    print(f"📈 Скорость: {indexed / elapsed:.2f} товаров/сек")
     
     print("\n💡 Следующие шаги:")
     print("   1. Протестировать поиск: python scripts/test_search_api.py")
@@ -212,8 +227,19 @@ async def main():
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Быстрая индексация в новую версию коллекции Qdrant")
+    parser.add_argument("--no-switch", action="store_true", help="Не переключать алиас на новую версию")
+    parser.add_argument(
+        "--carry-over", action="store_true",
+        help="Перенести товары живой коллекции, которых нет в новой версии "
+             "(только при той же модели; иначе публикация отменяется)"
+    )
+    args = parser.parse_args()
+    
     logger.remove()
     logger.add(sys.stdout, format="<level>{message}</level>", level="INFO")
     
-    asyncio.run(main())
+    asyncio.run(main(switch=not args.no_switch, carry_over=args.carry_over))
 
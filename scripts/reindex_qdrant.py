@@ -3,23 +3,55 @@
 Скрипт для переиндексации векторов в Qdrant из локальных файлов.
 
 Загружает эмбеддинги батчами чтобы избежать timeout.
+
+Индексация идёт в новую версию коллекции (product_embeddings_v<время>),
+живой поиск её не видит. После проверки алиас product_embeddings атомарно
+переключается на новую версию; откат: python scripts/qdrant_versions.py rollback
 """
 import asyncio
 import sys
 import pickle
 from pathlib import Path
 from tqdm import tqdm
+import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from loguru import logger
-from app.db.qdrant import QdrantManager
+from app.db.postgres import get_session, get_products_by_external_ids
+from app.db.qdrant import QdrantManager, product_payload, versioned_collection_name
 
 
 EMBEDDINGS_DIR = Path("/tmp/bakai_products")
 BATCH_SIZE = 1000  # Загружать по 1000 векторов за раз
 
 
+async def fetch_payloads(ids: list) -> list:
+    """
+    Payload точек с категорией и ценой товаров из PostgreSQL.
+    
+    Args:
+        ids: Оригинальные ID товаров
+        
+    Returns:
+        Payload для каждого ID (без категории и цены, если товара нет в БД)
+    """
+    async with get_session() as session:
+        products = await get_products_by_external_ids(session, [f"bakai_{pid}" for pid in ids])
+    
+    payloads = []
+    for pid in ids:
+        product = products.get(f"bakai_{pid}")
+        payloads.append(product_payload(
+            f"bakai_{pid}",
+            category=product.category if product else None,
+            price=product.price if product else None,
+            source="bakai_s3",
+            original_id=pid
+        ))
+    return payloads
+
+
 async def load_embeddings_from_disk():
     """Загрузить эмбеддинги с диска."""
     logger.info("📂 Поиск сохраненных эмбеддингов...")
@@ -42,18 +74,20 @@ async def load_embeddings_from_disk():
     return embeddings
 
 
-async def index_to_qdrant_batched(embeddings: list):
+async def index_to_qdrant_batched(embeddings: list, qdrant: QdrantManager):
     """
     Загрузить эмбеддинги в Qdrant батчами.
     
+    Батчи отправляются массовой загрузкой без ожидания применения;
+    в конце — один барьер, после которого все векторы доступны для поиска.
+    
     Args:
         embeddings: Список (product_id, embedding)
+        qdrant: Менеджер целевой коллекции
     """
-    logger.info(f"🔍 Индексация {len(embeddings)} векторов в Qdrant...")
+    logger.info(f"🔍 Индексация {len(embeddings)} векторов в '{qdrant.collection_name}'...")
     logger.info(f"   Размер batch: {BATCH_SIZE}")
     
-    qdrant = QdrantManager()
-    
     total_batches = (len(embeddings) + BATCH_SIZE - 1) // BATCH_SIZE
     successful = 0
     failed = 0
@@ -64,21 +98,15 @@ async def index_to_qdrant_batched(embeddings: list):
         try:
             # Подготовить данные
             product_ids = [f"bakai_{pid}" for pid, _ in batch]
-            vectors = [emb for _, emb in batch]
-            payloads = [
-                {
-                    "product_id": f"bakai_{pid}",
-                    "source": "bakai_s3",
-                    "original_id": pid
-                }
-                for pid, _ in batch
-            ]
+            vectors = np.asarray([emb for _, emb in batch], dtype=np.float32)
+            payloads = await fetch_payloads([pid for pid, _ in batch])
             
             # Загрузить batch
-            await qdrant.upsert_vectors(
+            await qdrant.upload_vectors(
                 product_ids=product_ids,
                 vectors=vectors,
-                payloads=payloads
+                payloads=payloads,
+                wait=False
             )
             
             successful += len(batch)
@@ -88,12 +116,14 @@ async def index_to_qdrant_batched(embeddings: list):
             failed += len(batch)
             continue
     
+    await qdrant.wait_for_updates()
+    
     logger.success(f"✅ Успешно: {successful}/{len(embeddings)}")
     if failed > 0:
         logger.warning(f"⚠️  Неудачно: {failed}/{len(embeddings)}")
 
 
-async def main():
+async def main(switch: bool, carry_over: bool):
     """Основная функция."""
     print("\n" + "=" * 70)
     print("  🔄 ПЕРЕИНДЕКСАЦИЯ QDRANT")
@@ -106,18 +136,26 @@ async def main():
         print("\n❌ Эмбеддинги не найдены!")
         return
     
-    # Загрузить в Qdrant
-    await index_to_qdrant_batched(embeddings)
+    # Загрузить в новую версию коллекции
+    live = QdrantManager()
+    qdrant = live.for_collection(versioned_collection_name(live.collection_name))
+    if await qdrant.collection_exists():
+        # Не дописывать в чужую версию, запущенную одновременно
+        print(f"\n❌ Версия '{qdrant.collection_name}' уже существует, запустите повторно")
+        await live.close()
+        return
+    await qdrant.create_collection(vector_size=len(embeddings[0][1]))
+    
+    await index_to_qdrant_batched(embeddings, qdrant)
     
     # Проверить результат
     print("\n" + "=" * 70)
     print("📊 ПРОВЕРКА")
     print("=" * 70)
     
-    qdrant = QdrantManager()
     count = await qdrant.count_vectors()
     
-    print(f"\n✅ Векторов в Qdrant: {count}")
+    print(f"\n✅ Векторов в '{qdrant.collection_name}': {count}")
     print(f"✅ Ожидалось: {len(embeddings)}")
     
     if count == len(embeddings):
@@ -125,12 +163,33 @@ async def main():
     else:
         print(f"\n⚠️  Загружено {count}/{len(embeddings)} ({count/len(embeddings)*100:.1f}%)")
     
+    # Переключить алиас на новую версию
+    if not switch or count < len(embeddings):
+        print(f"\n⏸️  Версия не опубликована. Опубликовать: "
+              f"python scripts/qdrant_versions.py switch {qdrant.collection_name}")
+    else:
+        previous = await live.publish_version(qdrant.collection_name, carry_over=carry_over)
+        print(f"\n🔀 '{live.collection_name}' -> '{qdrant.collection_name}' (было: {previous})")
+        print("   Откат: python scripts/qdrant_versions.py rollback")
+    
+    await live.close()
     print("=" * 70 + "\n")
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Переиндексация Qdrant в новую версию коллекции")
+    parser.add_argument("--no-switch", action="store_true", help="Не переключать алиас на новую версию")
+    parser.add_argument(
+        "--carry-over", action="store_true",
+        help="Перенести товары живой коллекции, которых нет в новой версии "
+             "(только при той же модели; иначе публикация отменяется)"
+    )
+    args = parser.parse_args()
+    
     logger.remove()
     logger.add(sys.stdout, format="<level>{message}</level>", level="INFO")
     
-    asyncio.run(main())
+    asyncio.run(main(switch=not args.no_switch, carry_over=args.carry_over))
 
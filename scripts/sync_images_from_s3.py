@@ -5,26 +5,28 @@
 Загружает изображения, генерирует CLIP эмбеддинги и индексирует в Qdrant.
 """
 import asyncio
+import functools
 import sys
 from pathlib import Path
 from typing import List, Dict, Tuple
 from tqdm import tqdm
 import time
+import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from loguru import logger
 from app.utils.bakai_s3_client import BakaiS3Client
 from app.models.clip_model import CLIPEmbedder
-from app.db.qdrant import QdrantManager
+from app.db.qdrant import QdrantManager, product_payload
 from app.db import get_session, create_product
 from app.config import settings
 
 
 # Настройки
 BUCKET_NAME = "product-images"
-STORAGE_PATH = Path("/tmp/bakai_products")  # Временное хранилище
 BATCH_SIZE = 32  # Размер batch для CLIP
+QDRANT_BATCH_SIZE = 1000  # Загружать по 1000 векторов
 
 
 def extract_product_id(object_key: str) -> str:
@@ -151,138 +153,84 @@ async def get_all_product_images(
     return main_images
 
 
-async def download_images(
+async def sync_streaming(
     s3_client: BakaiS3Client,
+    embedder: CLIPEmbedder,
     images: List[Dict]
-) -> List[Tuple[str, str]]:
-    """
-    Скачать изображения из S3.
-    
-    Args:
-        s3_client: S3 клиент
-        images: Список изображений для скачивания
-        
-    Returns:
-        Список кортежей (product_id, local_path)
+) -> int:
     """
-    logger.info(f"📥 Скачивание {len(images)} изображений...")
-    
-    # Создать директорию для хранения
-    STORAGE_PATH.mkdir(parents=True, exist_ok=True)
+    Скачать изображения, генерировать CLIP эмбеддинги и сохранять их потоком.
     
-    downloaded = []
-    
-    for img in tqdm(images, desc="Скачивание"):
-        product_id = img['product_id']
-        key = img['key']
-        
-        # Локальный путь
-        filename = Path(key).name
-        local_path = STORAGE_PATH / f"{product_id}_{filename}"
-        
-        # Скачать
-        success = s3_client.download_file(BUCKET_NAME, key, str(local_path))
-        
-        if success:
-            downloaded.append((product_id, str(local_path)))
-        else:
-            logger.warning(f"⚠️  Не удалось скачать: {key}")
-    
-    logger.success(f"✅ Скачано: {len(downloaded)}/{len(images)} изображений")
-    
-    return downloaded
-
-
-async def generate_embeddings(
-    embedder: CLIPEmbedder,
-    images: List[Tuple[str, str]]
-) -> List[Tuple[str, List[float]]]:
-    """
-    Генерировать CLIP эмбеддинги для изображений.
+    Изображения скачиваются в память в потоках декодирования, каждые
+    QDRANT_BATCH_SIZE эмбеддингов сразу сохраняются в PostgreSQL и Qdrant,
+    поэтому память не растёт с размером каталога.
     
     Args:
+        s3_client: S3 клиент
         embedder: CLIP embedder
-        images: Список кортежей (product_id, image_path)
+        images: Список изображений
         
     Returns:
-        Список кортежей (product_id, embedding)
+        Количество сохранённых товаров
     """
     logger.info(f"🧠 Генерация CLIP эмбеддингов для {len(images)} изображений...")
     
-    embeddings = []
+    source = (
+        (
+            (img['product_id'], img['key']),
+            functools.partial(s3_client.get_object_bytes, BUCKET_NAME, img['key'])
+        )
+        for img in images
+    )
     
-    # Обработка батчами
-    for i in tqdm(range(0, len(images), BATCH_SIZE), desc="CLIP обработка"):
-        batch = images[i:i + BATCH_SIZE]
-        
-        batch_paths = [img[1] for img in batch]
-        batch_ids = [img[0] for img in batch]
+    pending = []
+    processed = 0
+    progress = tqdm(total=len(images), desc="CLIP обработка")
+    
+    async for ids, vectors in embedder.iter_embeddings(source, batch_size=BATCH_SIZE):
+        pending.extend((pid, key, vector) for (pid, key), vector in zip(ids, vectors))
+        progress.update(len(ids))
         
-        try:
-            # Генерация эмбеддингов батчем
-            batch_embeddings = await embedder.generate_embeddings_batch(batch_paths)
-            
-            # Сохранить результаты
-            for product_id, embedding in zip(batch_ids, batch_embeddings):
-                if embedding is not None:
-                    embeddings.append((product_id, embedding.tolist()))
-                else:
-                    logger.warning(f"⚠️  Не удалось создать эмбеддинг для товара {product_id}")
-                    
-        except Exception as e:
-            logger.error(f"❌ Ошибка обработки batch: {e}")
-            continue
+        if len(pending) >= QDRANT_BATCH_SIZE:
+            await save_to_databases(pending)
+            processed += len(pending)
+            pending = []
+    
+    if pending:
+        await save_to_databases(pending)
+        processed += len(pending)
+    progress.close()
     
-    logger.success(f"✅ Сгенерировано эмбеддингов: {len(embeddings)}/{len(images)}")
+    logger.success(f"✅ Сгенерировано эмбеддингов: {processed}/{len(images)}")
     
-    return embeddings
+    return processed
 
 
 async def save_to_databases(
-    embeddings: List[Tuple[str, List[float]]],
-    images: List[Tuple[str, str]]
+    embeddings: List[Tuple[str, str, np.ndarray]]
 ):
     """
-    Сохранить данные в PostgreSQL и Qdrant.
+    Сохранить порцию данных в PostgreSQL и Qdrant.
     
     Args:
-        embeddings: Список (product_id, embedding)
-        images: Список (product_id, image_path)
+        embeddings: Список (product_id, key, embedding)
     """
     logger.info(f"💾 Сохранение в базы данных...")
     
-    # Создать маппинг product_id -> image_path
-    image_map = {pid: path for pid, path in images}
-    
     # 1. Сохранить в PostgreSQL
     logger.info("   PostgreSQL...")
     saved_pg = 0
+    s3_client = BakaiS3Client()
     
     async with get_session() as session:
-        for product_id, embedding in tqdm(embeddings, desc="PostgreSQL"):
+        for product_id, image_key, _ in tqdm(embeddings, desc="PostgreSQL"):
             try:
-                # Генерируем presigned URL для изображения
-                s3_client = BakaiS3Client()
-                image_key = None
-                
-                # Найти ключ изображения в S3
-                for img in images:
-                    if img[0] == product_id:
-                        # Извлечь оригинальный ключ из пути
-                        filename = Path(img[1]).name
-                        # Убрать префикс product_id_
-                        original_name = filename[len(product_id) + 1:]
-                        image_key = f"{product_id}/{original_name}"
-                        break
-                
                 # Создать presigned URL
-                image_url = None
-                if image_key:
-                    image_url = s3_client.generate_presigned_url(
-                        BUCKET_NAME,
-                        image_key,
-                        expiration=31536000  # 1 год
-                    )
+                image_url = s3_client.generate_presigned_url(
+                    BUCKET_NAME,
+                    image_key,
+                    expiration=31536000  # 1 год
+                )
                 
                 # Сохранить в БД
                 await create_product(session, {
@@ -310,43 +258,40 @@ async def save_to_databases(
     # 2. Сохранить в Qdrant (батчами чтобы избежать timeout)
     logger.info("   Qdrant...")
     
-    QDRANT_BATCH_SIZE = 1000  # Загружать по 1000 векторов
-    qdrant = QdrantManager()
-    
-    successful = 0
-    failed = 0
-    
-    total_batches = (len(embeddings) + QDRANT_BATCH_SIZE - 1) // QDRANT_BATCH_SIZE
-    
-    for i in tqdm(range(0, len(embeddings), QDRANT_BATCH_SIZE), desc="Qdrant", total=total_batches):
-        batch = embeddings[i:i + QDRANT_BATCH_SIZE]
+    async with QdrantManager() as qdrant:
+        successful = 0
+        failed = 0
         
-        try:
-            # Подготовить данные для batch
-            product_ids = [f"bakai_{pid}" for pid, _ in batch]
-            vectors = [emb for _, emb in batch]
-            payloads = [
-                {
-                    "product_id": f"bakai_{pid}",
-                    "source": "bakai_s3",
-                    "original_id": pid
-                }
-                for pid, _ in batch
-            ]
-            
-            # Сохранить batch
-            await qdrant.upsert_vectors(
-                product_ids=product_ids,
-                vectors=vectors,
-                payloads=payloads
-            )
-            
-            successful += len(batch)
+        total_batches = (len(embeddings) + QDRANT_BATCH_SIZE - 1) // QDRANT_BATCH_SIZE
+        
+        for i in tqdm(range(0, len(embeddings), QDRANT_BATCH_SIZE), desc="Qdrant", total=total_batches):
+            batch = embeddings[i:i + QDRANT_BATCH_SIZE]
             
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения batch {i//QDRANT_BATCH_SIZE + 1} в Qdrant: {e}")
-            failed += len(batch)
-            continue
+            try:
+                # Подготовить данные для batch
+                product_ids = [f"bakai_{pid}" for pid, _, _ in batch]
+                vectors = np.stack([emb for _, _, emb in batch])
+                payloads = [
+                    product_payload(f"bakai_{pid}", category="bakai", source="bakai_s3", original_id=pid)
+                    for pid, _, _ in batch
+                ]
+                
+                # Сохранить batch (без ожидания применения, барьер в конце)
+                await qdrant.upload_vectors(
+                    product_ids=product_ids,
+                    vectors=vectors,
+                    payloads=payloads,
+                    wait=False
+                )
+                
+                successful += len(batch)
+                
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения batch {i//QDRANT_BATCH_SIZE + 1} в Qdrant: {e}")
+                failed += len(batch)
+                continue
+        
+        await qdrant.wait_for_updates()
     
     logger.success(f"✅ Qdrant: сохранено {successful}/{len(embeddings)} векторов")
     if failed > 0:
@@ -383,36 +328,18 @@ async def main(max_products: int = None):
         print("\n❌ Изображения не найдены!")
         return
     
-    # 2. Скачать изображения
-    print("\n" + "=" * 70)
-    print("📥 ШАГ 2: Скачивание изображений")
-    print("=" * 70)
-    
-    downloaded = await download_images(s3_client, images)
-    
-    if not downloaded:
-        print("\n❌ Не удалось скачать изображения!")
-        return
-    
-    # 3. Генерировать эмбеддинги
+    # 2. Скачать, закодировать и сохранить в базы данных (потоково)
     print("\n" + "=" * 70)
-    print("🧠 ШАГ 3: Генерация CLIP эмбеддингов")
+    print("🧠 ШАГ 2: Генерация CLIP эмбеддингов и сохранение в базы данных")
     print("=" * 70)
     
-    embedder = CLIPEmbedder()
-    embeddings = await generate_embeddings(embedder, downloaded)
+    embedder = CLIPEmbedder(towers=("vision",))
+    processed = await sync_streaming(s3_client, embedder, images)
     
-    if not embeddings:
+    if not processed:
         print("\n❌ Не удалось создать эмбеддинги!")
         return
     
-    # 4. Сохранить в базы данных
-    print("\n" + "=" * 70)
-    print("💾 ШАГ 4: Сохранение в базы данных")
-    print("=" * 70)
-    
-    await save_to_databases(embeddings, downloaded)
-    
     # Итоги
     elapsed = time.time() - start_time
     
@@ -420,9 +347,9 @@ async def main(max_products: int = None):
     print("📊 ИТОГИ")
     print("=" * 70)
     
-    print(f"\n✅ Обработано товаров: {len(embeddings)}")
+    print(f"\n✅ Обработано товаров: {processed}")
     print(f"⏱️  Время выполнения: {elapsed:.2f} секунд ({elapsed/60:.2f} минут)")
-    print(f"📈 Скорость: {len(embeddings) / elapsed:.2f} товаров/сек")
+    print(f"📈 Скорость: {processed / elapsed:.2f} товаров/сек")
     
     print("\n💡 Следующие шаги:")
     print("   1. Протестировать поиск: python scripts/test_search_api.py")
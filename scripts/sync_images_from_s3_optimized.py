@@ -4,12 +4,13 @@
 
 Улучшения:
 - Валидация качества изображений
-- Удаление файлов после обработки (экономия места)
+- Обработка в памяти, без временных файлов на диске
 - Проверка на дубликаты
 - Лучшая обработка ошибок
 - Прогресс-бар с ETA
 """
 import asyncio
+import functools
 import sys
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
@@ -17,13 +18,14 @@ from tqdm import tqdm
 import time
 from PIL import Image
 import io
+import numpy as np
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from loguru import logger
 from app.utils.bakai_s3_client import BakaiS3Client
 from app.models.clip_model import CLIPEmbedder
-from app.db.qdrant import QdrantManager
+from app.db.qdrant import QdrantManager, product_payload
 from app.db import get_session, create_product
 from app.config import settings
 from sqlalchemy import select, text
@@ -32,7 +34,6 @@ from app.db.postgres import Product
 
 # Настройки
 BUCKET_NAME = "product-images"
-STORAGE_PATH = Path("/tmp/bakai_products")
 BATCH_SIZE = 32  # Размер batch для CLIP
 QDRANT_BATCH_SIZE = 1000  # Размер batch для Qdrant
 MIN_IMAGE_SIZE = 50  # Минимальный размер изображения (px)
@@ -230,145 +231,93 @@ async def get_all_product_images(
     return main_images
 
 
-async def download_and_validate_images(
+def fetch_and_validate(
     s3_client: BakaiS3Client,
-    images: List[Dict]
-) -> List[Tuple[str, str]]:
+    key: str,
+    product_id: str
+) -> Optional[Image.Image]:
     """
-    Скачать и валидировать изображения из S3.
+    Скачать изображение в память и валидировать (выполняется в потоке декодирования).
     
     Returns:
-        Список кортежей (product_id, local_path) только для валидных изображений
+        PIL Image если валидно, None если нет
     """
-    logger.info(f"📥 Скачивание и валидация {len(images)} изображений...")
-    
-    STORAGE_PATH.mkdir(parents=True, exist_ok=True)
-    
-    downloaded = []
-    invalid = 0
-    
-    for img in tqdm(images, desc="Скачивание"):
-        product_id = img['product_id']
-        key = img['key']
-        
-        try:
-            # Скачать в память
-            response = s3_client.s3_client.get_object(Bucket=BUCKET_NAME, Key=key)
-            image_data = response['Body'].read()
-            
-            # Валидировать
-            validated_img = validate_image(image_data, product_id)
-            
-            if validated_img is None:
-                invalid += 1
-                continue
-            
-            # Сохранить локально (всегда как JPEG для единообразия)
-            filename = Path(key).stem  # Без расширения
-            local_path = STORAGE_PATH / f"{product_id}_{filename}.jpg"
-            
-            # Сохранить как JPEG
-            validated_img.save(local_path, 'JPEG', quality=95)
-            
-            downloaded.append((product_id, str(local_path)))
-            
-        except Exception as e:
-            logger.warning(f"⚠️  Ошибка загрузки {key}: {e}")
-            invalid += 1
-            continue
+    image_data = s3_client.get_object_bytes(BUCKET_NAME, key)
     
-    logger.success(f"✅ Скачано и валидировано: {len(downloaded)}/{len(images)} изображений")
-    if invalid > 0:
-        logger.warning(f"⚠️  Невалидных изображений: {invalid}")
+    if image_data is None:
+        return None
     
-    return downloaded
+    return validate_image(image_data, product_id)
 
 
-async def generate_embeddings_with_cleanup(
+async def sync_streaming(
+    s3_client: BakaiS3Client,
     embedder: CLIPEmbedder,
-    images: List[Tuple[str, str]]
-) -> List[Tuple[str, List[float]]]:
+    images: List[Dict]
+) -> int:
     """
-    Генерировать CLIP эмбеддинги и удалять файлы после обработки.
+    Скачать, валидировать, закодировать и сохранить изображения потоком.
+    
+    Изображения не сохраняются на диск и не накапливаются: каждые
+    QDRANT_BATCH_SIZE эмбеддингов сразу сохраняются в PostgreSQL и Qdrant.
     
     Returns:
-        Список кортежей (product_id, embedding)
+        Количество сохранённых товаров
     """
     logger.info(f"🧠 Генерация CLIP эмбеддингов для {len(images)} изображений...")
     
-    embeddings = []
+    source = (
+        (
+            (img['product_id'], img['key']),
+            functools.partial(fetch_and_validate, s3_client, img['key'], img['product_id'])
+        )
+        for img in images
+    )
     
-    # Обработка батчами
-    for i in tqdm(range(0, len(images), BATCH_SIZE), desc="CLIP обработка"):
-        batch = images[i:i + BATCH_SIZE]
-        
-        batch_paths = [img[1] for img in batch]
-        batch_ids = [img[0] for img in batch]
-        
-        try:
-            # Генерация эмбеддингов батчем
-            batch_embeddings = await embedder.generate_embeddings_batch(batch_paths)
-            
-            # Сохранить результаты
-            for product_id, embedding, img_path in zip(batch_ids, batch_embeddings, batch_paths):
-                if embedding is not None:
-                    embeddings.append((product_id, embedding.tolist()))
-                else:
-                    logger.warning(f"⚠️  Не удалось создать эмбеддинг для товара {product_id}")
-                
-                # Удалить файл после обработки (экономия места)
-                try:
-                    Path(img_path).unlink()
-                except Exception as e:
-                    logger.warning(f"⚠️  Не удалось удалить {img_path}: {e}")
-                    
-        except Exception as e:
-            logger.error(f"❌ Ошибка обработки batch: {e}")
-            continue
+    pending = []
+    processed = 0
+    progress = tqdm(total=len(images), desc="CLIP обработка")
     
-    logger.success(f"✅ Сгенерировано эмбеддингов: {len(embeddings)}/{len(images)}")
+    async for ids, vectors in embedder.iter_embeddings(source, batch_size=BATCH_SIZE):
+        pending.extend((pid, key, vector) for (pid, key), vector in zip(ids, vectors))
+        progress.update(len(ids))
+        
+        if len(pending) >= QDRANT_BATCH_SIZE:
+            await save_to_databases(pending)
+            processed += len(pending)
+            pending = []
+    
+    if pending:
+        await save_to_databases(pending)
+        processed += len(pending)
+    progress.close()
+    
+    invalid = len(images) - processed
+    logger.success(f"✅ Сгенерировано эмбеддингов: {processed}/{len(images)}")
+    if invalid > 0:
+        logger.warning(f"⚠️  Невалидных изображений: {invalid}")
     
-    return embeddings
+    return processed
 
 
 async def save_to_databases(
-    embeddings: List[Tuple[str, List[float]]],
-    images: List[Tuple[str, str]]
+    embeddings: List[Tuple[str, str, np.ndarray]]
 ):
-    """Сохранить данные в PostgreSQL и Qdrant."""
+    """Сохранить порцию данных в PostgreSQL и Qdrant."""
     logger.info(f"💾 Сохранение в базы данных...")
     
-    # Создать маппинг product_id -> image info
-    image_map = {}
-    for img in images:
-        product_id = img[0]
-        image_path = img[1]
-        filename = Path(image_path).name
-        original_name = filename[len(product_id) + 1:]
-        image_key = f"{product_id}/{original_name}"
-        
-        image_map[product_id] = {
-            'path': image_path,
-            'key': image_key
-        }
-    
     # 1. Сохранить в PostgreSQL
     logger.info("   PostgreSQL...")
     saved_pg = 0
     s3_client = BakaiS3Client()
     
     async with get_session() as session:
-        for product_id, embedding in tqdm(embeddings, desc="PostgreSQL"):
+        for product_id, image_key, _ in tqdm(embeddings, desc="PostgreSQL"):
             try:
-                # Получить информацию об изображении
-                img_info = image_map.get(product_id)
-                if not img_info:
-                    continue
-                
                 # Создать presigned URL
                 image_url = s3_client.generate_presigned_url(
                     BUCKET_NAME,
-                    img_info['key'],
+                    image_key,
                     expiration=31536000  # 1 год
                 )
                 
@@ -378,12 +327,12 @@ async def save_to_databases(
                     "title": f"Product {product_id}",
                     "description": f"BakaiMarket product ID: {product_id}",
                     "category": "bakai",
-                    "image_url": image_url or f"s3://{BUCKET_NAME}/{img_info['key']}",
+                    "image_url": image_url or f"s3://{BUCKET_NAME}/{image_key}",
                     "product_metadata": {
                         "source": "bakai_s3",
                         "product_id": product_id,
                         "s3_bucket": BUCKET_NAME,
-                        "s3_key": img_info['key']
+                        "s3_key": image_key
                     }
                 })
                 
@@ -398,41 +347,40 @@ async def save_to_databases(
     # 2. Сохранить в Qdrant (батчами)
     logger.info("   Qdrant...")
     
-    qdrant = QdrantManager()
-    successful = 0
-    failed = 0
-    
-    total_batches = (len(embeddings) + QDRANT_BATCH_SIZE - 1) // QDRANT_BATCH_SIZE
-    
-    for i in tqdm(range(0, len(embeddings), QDRANT_BATCH_SIZE), desc="Qdrant", total=total_batches):
-        batch = embeddings[i:i + QDRANT_BATCH_SIZE]
+    async with QdrantManager() as qdrant:
+        successful = 0
+        failed = 0
         
-        try:
-            # Подготовить данные для batch
-            product_ids = [f"bakai_{pid}" for pid, _ in batch]
-            vectors = [emb for _, emb in batch]
-            payloads = [
-                {
-                    "product_id": f"bakai_{pid}",
-                    "source": "bakai_s3",
-                    "original_id": pid
-                }
-                for pid, _ in batch
-            ]
-            
-            # Сохранить batch
-            await qdrant.upsert_vectors(
-                product_ids=product_ids,
-                vectors=vectors,
-                payloads=payloads
-            )
-            
-            successful += len(batch)
+        total_batches = (len(embeddings) + QDRANT_BATCH_SIZE - 1) // QDRANT_BATCH_SIZE
+        
+        for i in tqdm(range(0, len(embeddings), QDRANT_BATCH_SIZE), desc="Qdrant", total=total_batches):
+            batch = embeddings[i:i + QDRANT_BATCH_SIZE]
             
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения batch {i//QDRANT_BATCH_SIZE + 1} в Qdrant: {e}")
-            failed += len(batch)
-            continue
+            try:
+                # Подготовить данные для batch
+                product_ids = [f"bakai_{pid}" for pid, _, _ in batch]
+                vectors = np.stack([emb for _, _, emb in batch])
+                payloads = [
+                    product_payload(f"bakai_{pid}", category="bakai", source="bakai_s3", original_id=pid)
+                    for pid, _, _ in batch
+                ]
+                
+                # Сохранить batch (без ожидания применения, барьер в конце)
+                await qdrant.upload_vectors(
+                    product_ids=product_ids,
+                    vectors=vectors,
+                    payloads=payloads,
+                    wait=False
+                )
+                
+                successful += len(batch)
+                
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения batch {i//QDRANT_BATCH_SIZE + 1} в Qdrant: {e}")
+                failed += len(batch)
+                continue
+        
+        await qdrant.wait_for_updates()
     
     logger.success(f"✅ Qdrant: сохранено {successful}/{len(embeddings)} векторов")
     if failed > 0:
@@ -472,36 +420,18 @@ async def main(max_products: int = None, skip_existing: bool = True):
         print("\n✅ Нет новых изображений для загрузки!")
         return
     
-    # 2. Скачать и валидировать изображения
+    # 2. Скачать, валидировать, закодировать и сохранить (в памяти, потоково)
     print("\n" + "=" * 70)
-    print("📥 ШАГ 2: Скачивание и валидация изображений")
+    print("🧠 ШАГ 2: Генерация CLIP эмбеддингов и сохранение в базы данных")
     print("=" * 70)
     
-    downloaded = await download_and_validate_images(s3_client, images)
-    
-    if not downloaded:
-        print("\n❌ Не удалось скачать валидные изображения!")
-        return
+    embedder = CLIPEmbedder(towers=("vision",))
+    processed = await sync_streaming(s3_client, embedder, images)
     
-    # 3. Генерировать эмбеддинги (с удалением файлов)
-    print("\n" + "=" * 70)
-    print("🧠 ШАГ 3: Генерация CLIP эмбеддингов")
-    print("=" * 70)
-    
-    embedder = CLIPEmbedder()
-    embeddings = await generate_embeddings_with_cleanup(embedder, downloaded)
-    
-    if not embeddings:
+    if not processed:
         print("\n❌ Не удалось создать эмбеддинги!")
         return
     
-    # 4. Сохранить в базы данных
-    print("\n" + "=" * 70)
-    print("💾 ШАГ 4: Сохранение в базы данных")
-    print("=" * 70)
-    
-    await save_to_databases(embeddings, downloaded)
-    
     # Итоги
     elapsed = time.time() - start_time
     
@@ -509,15 +439,15 @@ async def main(max_products: int = None, skip_existing: bool = True):
     print("📊 ИТОГИ")
     print("=" * 70)
     
-    print(f"\n✅ Обработано товаров: {len(embeddings)}")
+    print(f"\n✅ Обработано товаров: {processed}")
     print(f"⏱️  Время выполнения: {elapsed:.2f} секунд ({elapsed/60:.2f} минут)")
     
     if elapsed > 0:
-        print(f"📈 Скорость: {len(embeddings) / elapsed:.2f} товаров/сек")
+        print(f"📈 Скорость: {processed / elapsed:.2f} товаров/сек")
         
         # Оценка времени для всех товаров
         if max_products and max_products < 85337:
-            estimated_total = (85337 / len(embeddings)) * elapsed
+            estimated_total = (85337 / processed) * elapsed
             print(f"⏱️  Оценка для всех 85,337 товаров: {estimated_total/3600:.2f} часов")
     
     print("\n💡 Следующие шаги:")
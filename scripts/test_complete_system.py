@@ -71,9 +71,9 @@ class SystemTester:
         
         # Qdrant
         try:
-            qdrant = QdrantManager()
-            info = await qdrant.get_collection_info()
-            count = info.get("vectors_count", 0)
+            async with QdrantManager() as qdrant:
+                info = await qdrant.get_collection_info()
+            count = info.get("points_count", 0)
             self.mark_test("infrastructure", "qdrant", True, f"{count} vectors in collection")
         except Exception as e:
             self.mark_test("infrastructure", "qdrant", False, str(e))
@@ -0,0 +1,49 @@
+"""
+Stand-in embedders shared by the embedding pipeline and farm tests.
+
+The embedder is assembled around a mean-colour backend, so the pipeline and
+the farm can run without downloading model weights. Factories are module-level
+functions so that spawned farm workers can unpickle them.
+"""
+import io
+import time
+
+from PIL import Image
+
+from app.models.clip_model import CLIPEmbedder
+from app.models.preprocessing import ImagePreprocessor
+
+
+class MeanColorBackend:
+    """Backend whose 'embedding' is the mean pixel value per channel."""
+
+    embedding_dim = 3
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batch_sizes = []
+
+    def image_features(self, pixel_values):
+        time.sleep(self.delay)
+        self.batch_sizes.append(len(pixel_values))
+        return pixel_values.mean(axis=(2, 3)) + 10.0
+
+
+def make_embedder(backend) -> CLIPEmbedder:
+    embedder = CLIPEmbedder.__new__(CLIPEmbedder)
+    embedder.preprocessor = ImagePreprocessor()
+    embedder.backend = backend
+    embedder.batch_size = 32
+    embedder._embedding_dim = backend.embedding_dim
+    return embedder
+
+
+def mean_color_embedder(num_threads: int) -> CLIPEmbedder:
+    """Picklable farm factory run in each worker process."""
+    return make_embedder(MeanColorBackend())
+
+
+def png_bytes(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color=color).save(buffer, format="PNG")
+    return buffer.getvalue()
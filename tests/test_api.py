@@ -62,3 +62,266 @@ def test_search_by_text_with_query():
         assert "results" in data
         assert isinstance(data["results"], list)
 
+
+
+def test_search_batch_requires_queries():
+    """Batch search without any query is rejected."""
+    response = client.post("/api/v1/search/batch")
+    
+    assert response.status_code == 400
+
+
+def test_search_batch_mixes_texts_and_images(monkeypatch):
+    """Texts and images are embedded in groups, searched and hydrated once."""
+    from contextlib import asynccontextmanager
+    from types import SimpleNamespace
+    
+    import numpy as np
+    
+    from app.api.routes import search
+    
+    calls = []
+    
+    class Embedder:
+        def load_image(self, data):
+            return data
+    
+    class Scheduler:
+        async def embed_texts(self, texts):
+            calls.append(("embed_texts", list(texts)))
+            return [np.full(4, len(text), dtype=np.float32) for text in texts]
+        
+        async def embed_images(self, images):
+            calls.append(("embed_images", len(images)))
+            return [np.full(4, 9, dtype=np.float32) for _ in images]
+    
+    class Qdrant:
+        async def search_similar_batch(self, query_vectors, top_k, score_threshold, **params):
+            calls.append(("search_similar_batch", len(query_vectors)))
+            return [[{"id": f"p{int(vector[0])}", "score": 0.9}] for vector in query_vectors]
+    
+    def product(external_id):
+        return SimpleNamespace(
+            id=1, external_id=external_id, title=external_id, description=None,
+            category=None, price=None, currency=None, image_url=None
+        )
+    
+    async def get_products_by_external_ids(session, external_ids):
+        calls.append(("get_products_by_external_ids", list(external_ids)))
+        return {i: product(i) for i in external_ids if i in ("p3", "p5")}
+    
+    @asynccontextmanager
+    async def get_session():
+        yield None
+    
+    monkeypatch.setattr(search, "clip_embedder", Embedder())
+    monkeypatch.setattr(search, "inference_scheduler", Scheduler())
+    monkeypatch.setattr(search, "qdrant_manager", Qdrant())
+    monkeypatch.setattr(search, "text_embedding_cache", None)
+    monkeypatch.setattr(search, "image_embedding_cache", None)
+    monkeypatch.setattr(search, "get_session", get_session)
+    monkeypatch.setattr(search, "get_products_by_external_ids", get_products_by_external_ids)
+    
+    response = client.post(
+        "/api/v1/search/batch?limit=5",
+        data={"texts": ["red", "shoes"]},
+        files=[("images", ("photo.jpg", b"jpeg bytes", "image/jpeg"))],
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["queries_count"] == 3
+    assert [(q["query_type"], q["query"], q["results_count"]) for q in data["queries"]] == [
+        ("text", "red", 1),
+        ("text", "shoes", 1),
+        ("image", "photo.jpg", 0),  # p9 is not in PostgreSQL
+    ]
+    assert data["queries"][1]["results"][0]["external_id"] == "p5"
+    assert sorted(calls, key=str) == sorted([
+        ("embed_texts", ["red", "shoes"]),
+        ("embed_images", 1),
+        ("search_similar_batch", 3),
+        ("get_products_by_external_ids", ["p3", "p5", "p9"]),
+    ], key=str)
+
+
+def test_search_by_text_loads_products_in_one_query(monkeypatch):
+    """All hits of a single-query search are looked up in one PostgreSQL query."""
+    from contextlib import asynccontextmanager
+    from types import SimpleNamespace
+    
+    import numpy as np
+    
+    from app.api.routes import search
+    
+    lookups = []
+    
+    class Scheduler:
+        async def embed_text(self, text):
+            return np.ones(4, dtype=np.float32)
+    
+    class Qdrant:
+        async def search_similar(self, query_vector, top_k, score_threshold, **params):
+            return [{"id": "p2", "score": 0.9}, {"id": "p7", "score": 0.8}, {"id": "p1", "score": 0.7}]
+    
+    async def get_products_by_external_ids(session, external_ids):
+        lookups.append(list(external_ids))
+        return {
+            i: SimpleNamespace(
+                id=1, external_id=i, title=i, description=None,
+                category=None, price=None, currency=None, image_url=None
+            )
+            for i in external_ids if i != "p7"
+        }
+    
+    @asynccontextmanager
+    async def get_session():
+        yield None
+    
+    monkeypatch.setattr(search, "inference_scheduler", Scheduler())
+    monkeypatch.setattr(search, "qdrant_manager", Qdrant())
+    monkeypatch.setattr(search, "text_embedding_cache", None)
+    monkeypatch.setattr(search, "get_session", get_session)
+    monkeypatch.setattr(search, "get_products_by_external_ids", get_products_by_external_ids)
+    
+    response = client.post("/api/v1/search/by-text", json={"query": "red shoes", "limit": 3})
+    
+    assert response.status_code == 200
+    # Qdrant order is kept; products missing from PostgreSQL are skipped
+    assert [r["external_id"] for r in response.json()["results"]] == ["p2", "p1"]
+    assert lookups == [["p2", "p7", "p1"]]
+
+
+def test_search_similar_uses_stored_vector(monkeypatch):
+    """Similar products are searched by stored vector, without CLIP."""
+    from contextlib import asynccontextmanager
+    from types import SimpleNamespace
+    
+    from app.api.routes import search
+    
+    class Qdrant:
+        async def search_similar_to_product(self, product_id, top_k, score_threshold, **params):
+            if product_id != "p1":
+                return None
+            return [{"id": "p2", "score": 0.8}, {"id": "p3", "score": 0.7}]
+    
+    async def get_products_by_external_ids(session, external_ids):
+        return {
+            i: SimpleNamespace(
+                id=2, external_id=i, title=i, description=None,
+                category=None, price=None, currency=None, image_url="/images/p2.jpg"
+            )
+            for i in external_ids if i == "p2"
+        }
+    
+    @asynccontextmanager
+    async def get_session():
+        yield None
+    
+    monkeypatch.setattr(search, "clip_embedder", None)
+    monkeypatch.setattr(search, "qdrant_manager", Qdrant())
+    monkeypatch.setattr(search, "get_session", get_session)
+    monkeypatch.setattr(search, "get_products_by_external_ids", get_products_by_external_ids)
+    
+    response = client.get("/api/v1/search/similar/p1?limit=5")
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["results_count"] == 1
+    assert data["results"][0]["external_id"] == "p2"
+    assert data["results"][0]["image_url"].endswith("/images/p2.jpg")
+    
+    assert client.get("/api/v1/search/similar/unknown").status_code == 404
+
+
+def test_search_similar_uses_neighbor_table(monkeypatch):
+    """With the table enabled, a stored entry is served without Qdrant."""
+    from contextlib import asynccontextmanager
+    from types import SimpleNamespace
+    
+    from app.api.routes import search
+    
+    searched = []
+    
+    class Qdrant:
+        async def search_similar_to_product(self, product_id, top_k, score_threshold, **params):
+            searched.append(params)
+            return [{"id": "p2", "score": 0.8}]
+    
+    async def get_product_neighbors(session, external_ids):
+        return {"p1": SimpleNamespace(neighbor_ids=["p3", "p2", "p4"], scores=[0.9, 0.8, 0.0])}
+    
+    async def get_products_by_external_ids(session, external_ids):
+        return {
+            i: SimpleNamespace(
+                id=3, external_id=i, title=i, description=None,
+                category=None, price=None, currency=None, image_url=None
+            )
+            for i in external_ids
+        }
+    
+    @asynccontextmanager
+    async def get_session():
+        yield None
+    
+    monkeypatch.setattr(search.settings, "similar_neighbors_enabled", True)
+    monkeypatch.setattr(search, "qdrant_manager", Qdrant())
+    monkeypatch.setattr(search, "get_session", get_session)
+    monkeypatch.setattr(search, "get_product_neighbors", get_product_neighbors)
+    monkeypatch.setattr(search, "get_products_by_external_ids", get_products_by_external_ids)
+    
+    response = client.get("/api/v1/search/similar/p1?limit=1")
+    
+    assert response.status_code == 200
+    assert [r["external_id"] for r in response.json()["results"]] == ["p3"]
+    
+    # Stored scores get the same threshold as live results (exclusive, like Qdrant)
+    response = client.get("/api/v1/search/similar/p1?limit=3")
+    assert [r["external_id"] for r in response.json()["results"]] == ["p3", "p2"]
+    assert searched == []
+    
+    # Search tuning cannot be honoured by the table and goes to Qdrant
+    for query in ("exact=true", "hnsw_ef=64", "oversampling=2", "rescore=false"):
+        response = client.get(f"/api/v1/search/similar/p1?{query}")
+        assert [r["external_id"] for r in response.json()["results"]] == ["p2"]
+    assert len(searched) == 4
+    assert searched[0]["exact"] is True
+
+
+def test_search_similar_filters_pushed_to_qdrant(monkeypatch):
+    """Filters go into the Qdrant query and bypass the neighbour table."""
+    from contextlib import asynccontextmanager
+    
+    from app.api.routes import search
+    
+    filters = []
+    
+    class Qdrant:
+        async def search_similar_to_product(self, product_id, top_k, score_threshold, query_filter=None, **params):
+            filters.append(query_filter)
+            return []
+    
+    async def get_product_neighbors(session, external_ids):
+        raise AssertionError("neighbour table must not serve filtered requests")
+    
+    async def get_products_by_external_ids(session, external_ids):
+        return {}
+    
+    @asynccontextmanager
+    async def get_session():
+        yield None
+    
+    monkeypatch.setattr(search.settings, "similar_neighbors_enabled", True)
+    monkeypatch.setattr(search, "qdrant_manager", Qdrant())
+    monkeypatch.setattr(search, "get_session", get_session)
+    monkeypatch.setattr(search, "get_product_neighbors", get_product_neighbors)
+    monkeypatch.setattr(search, "get_products_by_external_ids", get_products_by_external_ids)
+    
+    response = client.get("/api/v1/search/similar/p1?category=shoes&category=bags&max_price=500")
+    
+    assert response.status_code == 200
+    conditions = {condition.key: condition for condition in filters[0].must}
+    assert conditions["category"].match.any == ["shoes", "bags"]
+    assert conditions["price"].range.lte == 500
+    assert conditions["price"].range.gte is None
+    assert "source" not in conditions
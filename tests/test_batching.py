@@ -0,0 +1,262 @@
+"""
+Tests for the dynamic micro-batching inference scheduler and inference executor.
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+from pydantic import ValidationError
+
+from app.config import Settings
+from app.models.batching import InferenceScheduler
+from app.models.executor import InferenceExecutor, InferenceQueueFull
+
+
+class RecordingEmbedder:
+    """Stand-in embedder that records the size of every forward pass."""
+
+    def __init__(self, dim: int = 4):
+        self.dim = dim
+        self.image_batches = []
+        self.text_batches = []
+
+    def encode_images(self, images):
+        self.image_batches.append(len(images))
+        # Encode the red channel of each image so results can be matched to queries
+        return np.array(
+            [[image.getpixel((0, 0))[0]] * self.dim for image in images], dtype=np.float32
+        )
+
+    def encode_text(self, texts):
+        self.text_batches.append(len(texts))
+        return np.array([[len(text)] * self.dim for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+async def scheduler_factory():
+    """Create schedulers and make sure they are stopped after the test."""
+    schedulers = []
+
+    async def factory(embedder, **kwargs):
+        kwargs.setdefault("executor", InferenceExecutor(max_workers=1, max_queue_size=8))
+        scheduler = InferenceScheduler(embedder, **kwargs)
+        await scheduler.start()
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield factory
+
+    for scheduler in schedulers:
+        await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_text_queries_share_forward_pass(scheduler_factory):
+    """Queries arriving within the wait window are merged into one batch."""
+    embedder = RecordingEmbedder()
+    scheduler = await scheduler_factory(embedder, max_batch_size=8, max_wait_ms=50)
+
+    queries = ["a", "bb", "ccc", "dddd"]
+    results = await asyncio.gather(*(scheduler.embed_text(q) for q in queries))
+
+    assert embedder.text_batches == [4]
+    for query, embedding in zip(queries, results):
+        assert embedding.shape == (4,)
+        assert embedding[0] == len(query)
+
+
+@pytest.mark.asyncio
+async def test_query_group_shares_one_forward_pass(scheduler_factory):
+    """A group submitted together is one batch without waiting for the window."""
+    embedder = RecordingEmbedder()
+    scheduler = await scheduler_factory(embedder, max_batch_size=8, max_wait_ms=10_000)
+
+    queries = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff", "ggggggg", "hhhhhhhh"]
+    results = await asyncio.wait_for(scheduler.embed_texts(queries), timeout=5)
+
+    assert embedder.text_batches == [8]
+    assert [int(r[0]) for r in results] == [len(q) for q in queries]
+
+
+@pytest.mark.asyncio
+async def test_query_group_larger_than_queue_is_rejected(scheduler_factory):
+    embedder = RecordingEmbedder()
+    scheduler = await scheduler_factory(embedder, max_batch_size=8, max_queue_size=3)
+
+    with pytest.raises(InferenceQueueFull):
+        await scheduler.embed_texts(["a", "b", "c", "d"])
+    assert embedder.text_batches == []
+
+
+@pytest.mark.asyncio
+async def test_batch_size_is_capped(scheduler_factory):
+    """No forward pass exceeds max_batch_size."""
+    embedder = RecordingEmbedder()
+    scheduler = await scheduler_factory(embedder, max_batch_size=3, max_wait_ms=50)
+
+    images = [Image.new("RGB", (8, 8), color=(i, 0, 0)) for i in range(7)]
+    results = await asyncio.gather(*(scheduler.embed_image(image) for image in images))
+
+    assert sum(embedder.image_batches) == 7
+    assert max(embedder.image_batches) <= 3
+    assert [int(r[0]) for r in results] == list(range(7))
+
+
+@pytest.mark.asyncio
+async def test_modalities_are_batched_separately(scheduler_factory):
+    """Image and text queries never end up in the same forward pass."""
+    embedder = RecordingEmbedder()
+    scheduler = await scheduler_factory(embedder, max_batch_size=8, max_wait_ms=20)
+
+    image = Image.new("RGB", (8, 8), color=(7, 0, 0))
+    image_embedding, text_embedding = await asyncio.gather(
+        scheduler.embed_image(image), scheduler.embed_text("query")
+    )
+
+    assert embedder.image_batches == [1]
+    assert embedder.text_batches == [1]
+    assert image_embedding[0] == 7
+    assert text_embedding[0] == 5
+
+
+@pytest.mark.asyncio
+async def test_forward_error_is_propagated(scheduler_factory):
+    """A failing forward pass fails every query of that batch."""
+
+    class BrokenEmbedder(RecordingEmbedder):
+        def encode_text(self, texts):
+            raise ValueError("boom")
+
+    scheduler = await scheduler_factory(BrokenEmbedder(), max_batch_size=4, max_wait_ms=10)
+
+    results = await asyncio.gather(
+        scheduler.embed_text("a"), scheduler.embed_text("b"), return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_submit_requires_running_scheduler():
+    """Queries are rejected before start() and after stop()."""
+    scheduler = InferenceScheduler(
+        RecordingEmbedder(),
+        max_batch_size=4,
+        max_wait_ms=1,
+        executor=InferenceExecutor(max_workers=1, max_queue_size=1),
+    )
+
+    with pytest.raises(RuntimeError):
+        await scheduler.embed_text("a")
+
+    await scheduler.start()
+    assert (await scheduler.embed_text("abc"))[0] == 3
+    await scheduler.stop()
+
+    with pytest.raises(RuntimeError):
+        await scheduler.embed_text("a")
+
+
+@pytest.mark.asyncio
+async def test_scheduler_sheds_load_when_queue_is_full(scheduler_factory):
+    """Queries beyond max_queue_size are rejected instead of queued."""
+    release = threading.Event()
+
+    class SlowEmbedder(RecordingEmbedder):
+        def encode_text(self, texts):
+            release.wait(timeout=5)
+            return super().encode_text(texts)
+
+    scheduler = await scheduler_factory(
+        SlowEmbedder(), max_batch_size=1, max_wait_ms=0, max_queue_size=2
+    )
+
+    # The first query occupies the only inference thread, the next two wait
+    running = [asyncio.ensure_future(scheduler.embed_text("x"))]
+    await asyncio.sleep(0.05)
+    running += [asyncio.ensure_future(scheduler.embed_text("x" * i)) for i in (2, 3)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(InferenceQueueFull):
+        await scheduler.embed_text("rejected")
+
+    release.set()
+    results = await asyncio.gather(*running)
+    assert [int(r[0]) for r in results] == [1, 2, 3]
+
+
+def test_batch_request_must_fit_inference_queue():
+    """A /search/batch limit above the queue size would reject every full batch."""
+    assert Settings(search_batch_max_queries=64, clip_inference_queue_size=64).search_batch_max_queries == 64
+    with pytest.raises(ValidationError, match="clip_inference_queue_size"):
+        Settings(search_batch_max_queries=65, clip_inference_queue_size=64)
+
+
+@pytest.mark.asyncio
+async def test_executor_keeps_event_loop_responsive():
+    """Blocking work runs on inference threads, not on the event loop."""
+    executor = InferenceExecutor(max_workers=1, max_queue_size=0)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker_task = asyncio.ensure_future(ticker())
+    try:
+        result = await executor.run(lambda: time.sleep(0.2) or "done")
+    finally:
+        ticker_task.cancel()
+        executor.shutdown()
+
+    assert result == "done"
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_executor_rejects_when_saturated():
+    """Jobs beyond workers + queue size fail fast with InferenceQueueFull."""
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    jobs = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    assert executor.pending == 2
+
+    with pytest.raises(InferenceQueueFull):
+        await executor.run(lambda: None)
+
+    release.set()
+    assert await asyncio.gather(*jobs) == [True, True]
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_executor_cancelled_caller_keeps_slot_until_job_finishes():
+    """Cancelling the awaiting request does not free capacity for running work."""
+    executor = InferenceExecutor(max_workers=1, max_queue_size=0)
+    release = threading.Event()
+
+    job = asyncio.ensure_future(executor.run(release.wait, 5))
+    await asyncio.sleep(0.05)
+    job.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await job
+
+    assert executor.pending == 1
+    with pytest.raises(InferenceQueueFull):
+        await executor.run(lambda: None)
+
+    release.set()
+    for _ in range(50):
+        if executor.pending == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert executor.pending == 0
+    executor.shutdown()
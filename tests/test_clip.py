@@ -122,6 +122,27 @@ class TestSingleImageEmbedding:
         
         assert np.allclose(embedding1, embedding2, atol=1e-6)
 
+    @pytest.mark.asyncio
+    async def test_in_memory_sources_match_file(self, clip_embedder, sample_image_path):
+        """Test that bytes, file objects and PIL images embed like the file itself."""
+        from_path = await clip_embedder.generate_embedding(sample_image_path)
+        image_bytes = Path(sample_image_path).read_bytes()
+        
+        with open(sample_image_path, "rb") as f:
+            from_file_object = await clip_embedder.generate_embedding(f)
+        from_bytes = await clip_embedder.generate_embedding(image_bytes)
+        from_pil = await clip_embedder.generate_embedding(Image.open(sample_image_path))
+        
+        for embedding in (from_bytes, from_file_object, from_pil):
+            assert np.allclose(from_path, embedding, atol=1e-6)
+
+    @pytest.mark.asyncio
+    async def test_generate_embedding_corrupted_bytes(self, clip_embedder):
+        """Test embedding generation with bytes that are not an image."""
+        embedding = await clip_embedder.generate_embedding(b"not an image")
+        
+        assert embedding is None
+
 
 class TestBatchEmbedding:
     """Tests for batch embedding generation."""
@@ -0,0 +1,129 @@
+"""
+Tests for CLIP inference backends (torch vs ONNX Runtime parity).
+
+A small randomly initialised CLIP model is used so the export path can be
+checked without downloading weights; scripts/check_onnx_parity.py runs the
+same comparison against the configured model.
+"""
+import json
+
+import numpy as np
+import pytest
+import torch
+from transformers import CLIPConfig
+from transformers import CLIPModel as HFCLIPModel
+
+from app.models.backends import CLIPBackend, OnnxBackend, TorchBackend, create_backend
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+
+@pytest.fixture(scope="module")
+def tiny_clip():
+    """Small random CLIP model with the same architecture as ViT-B/32."""
+    torch.manual_seed(0)
+    config = CLIPConfig(
+        text_config={
+            "hidden_size": 64,
+            "intermediate_size": 128,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+            "vocab_size": 1000,
+        },
+        vision_config={
+            "hidden_size": 64,
+            "intermediate_size": 128,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+            "image_size": 224,
+            "patch_size": 32,
+        },
+        projection_dim=32,
+    )
+    return HFCLIPModel(config).eval()
+
+
+@pytest.fixture
+def inputs():
+    """Random preprocessed image batch and token batch."""
+    rng = np.random.default_rng(0)
+    pixel_values = rng.standard_normal((3, 3, 224, 224)).astype(np.float32)
+    input_ids = rng.integers(0, 1000, (2, 12))
+    attention_mask = np.ones_like(input_ids)
+    attention_mask[1, 8:] = 0
+    return pixel_values, input_ids, attention_mask
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=-1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=-1, keepdims=True)
+    return np.sum(a * b, axis=-1)
+
+
+@pytest.mark.parametrize("quantize", [False, True], ids=["onnx", "onnx-int8"])
+def test_onnx_matches_torch(tiny_clip, inputs, tmp_path, quantize):
+    """Both exported towers stay above 0.99 cosine similarity to torch."""
+    pixel_values, input_ids, attention_mask = inputs
+    reference = TorchBackend(tiny_clip, "cpu")
+    backend = OnnxBackend("tiny/clip", quantize=quantize, cache_dir=str(tmp_path), model=tiny_clip)
+
+    assert backend.embedding_dim == reference.embedding_dim == 32
+
+    image_cos = _cosine(
+        reference.image_features(pixel_values), backend.image_features(pixel_values)
+    )
+    text_cos = _cosine(
+        reference.text_features(input_ids, attention_mask),
+        backend.text_features(input_ids, attention_mask),
+    )
+
+    assert image_cos.min() > 0.99
+    assert text_cos.min() > 0.99
+
+
+def test_onnx_export_is_cached(tiny_clip, tmp_path):
+    """Exported files are reused instead of exporting again."""
+    OnnxBackend("tiny/clip", quantize=True, cache_dir=str(tmp_path), model=tiny_clip)
+
+    model_dir = tmp_path / "tiny--clip"
+    exported = sorted(p.name for p in model_dir.iterdir())
+    assert exported == [
+        "export.json", "text.int8.onnx", "text.onnx", "vision.int8.onnx", "vision.onnx"
+    ]
+
+    mtimes = {p.name: p.stat().st_mtime_ns for p in model_dir.iterdir()}
+    # No model given: a cache miss would have to download weights
+    OnnxBackend("tiny/clip", quantize=True, cache_dir=str(tmp_path))
+    assert {p.name: p.stat().st_mtime_ns for p in model_dir.iterdir()} == mtimes
+
+
+def test_onnx_export_from_other_version_is_replaced(tiny_clip, tmp_path):
+    """Exports written by another opset or torch version are not reused."""
+    OnnxBackend("tiny/clip", cache_dir=str(tmp_path), model=tiny_clip)
+
+    metadata_path = tmp_path / "tiny--clip" / "export.json"
+    metadata = json.loads(metadata_path.read_text())
+    metadata_path.write_text(json.dumps({**metadata, "opset": metadata["opset"] - 1}))
+    vision_path = tmp_path / "tiny--clip" / "vision.onnx"
+    stale_mtime = vision_path.stat().st_mtime_ns
+
+    OnnxBackend("tiny/clip", cache_dir=str(tmp_path), model=tiny_clip)
+    assert vision_path.stat().st_mtime_ns != stale_mtime
+    assert json.loads(metadata_path.read_text()) == metadata
+
+
+def test_unknown_backend_rejected(tiny_clip):
+    """Unknown backend names fail loudly."""
+    with pytest.raises(ValueError):
+        create_backend("tensorrt", "tiny/clip", "cpu", model=tiny_clip)
+
+
+def test_incomplete_backend_rejected():
+    """A backend without both towers fails when it is constructed."""
+    class VisionOnly(CLIPBackend):
+        def image_features(self, pixel_values):
+            return pixel_values
+
+    with pytest.raises(TypeError):
+        VisionOnly()
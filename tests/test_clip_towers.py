@@ -0,0 +1,112 @@
+"""
+Tests for loading the CLIP vision and text towers independently.
+
+A small randomly initialised CLIP checkpoint with a toy tokenizer is saved to a
+temporary directory, so the loading paths run without downloading weights.
+"""
+import json
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from transformers import CLIPConfig, CLIPImageProcessor, CLIPProcessor, CLIPTokenizer
+from transformers import CLIPModel as HFCLIPModel
+
+from app.config import settings
+from app.models.clip_model import CLIPEmbedder
+
+TEXTS = ["red dress", "black shoes"]
+
+
+@pytest.fixture(scope="module")
+def checkpoint(tmp_path_factory):
+    """Directory with a tiny CLIP model and processor."""
+    path = tmp_path_factory.mktemp("tiny-clip")
+    torch.manual_seed(0)
+    config = CLIPConfig(
+        text_config={
+            "hidden_size": 64,
+            "intermediate_size": 128,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+            "vocab_size": 100,
+        },
+        vision_config={
+            "hidden_size": 64,
+            "intermediate_size": 128,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+            "image_size": 224,
+            "patch_size": 32,
+        },
+        projection_dim=32,
+    )
+    HFCLIPModel(config).save_pretrained(path)
+
+    letters = [chr(c) for c in range(ord("a"), ord("z") + 1)]
+    vocab = {token: i for i, token in enumerate(letters + [f"{c}</w>" for c in letters])}
+    vocab.update({"<|startoftext|>": len(vocab), "<|endoftext|>": len(vocab) + 1})
+    (path / "vocab.json").write_text(json.dumps(vocab))
+    (path / "merges.txt").write_text("#version: 0.2\n")
+    tokenizer = CLIPTokenizer(str(path / "vocab.json"), str(path / "merges.txt"))
+    CLIPProcessor(image_processor=CLIPImageProcessor(), tokenizer=tokenizer).save_pretrained(path)
+    return str(path)
+
+
+@pytest.fixture
+def images():
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)) for _ in range(3)]
+
+
+def _embedder(checkpoint, **kwargs) -> CLIPEmbedder:
+    return CLIPEmbedder(checkpoint, device="cpu", tuning_mode="none", **kwargs)
+
+
+@pytest.fixture(scope="module")
+def full(checkpoint):
+    return _embedder(checkpoint, backend="torch")
+
+
+def test_vision_only(checkpoint, full, images):
+    embedder = _embedder(checkpoint, backend="torch", towers=("vision",))
+
+    assert embedder.model is None and embedder.tokenizer is None
+    assert embedder.backend.text_model is None
+    assert embedder.get_embedding_dimension() == 32
+    np.testing.assert_allclose(embedder.encode_images(images), full.encode_images(images), atol=1e-5)
+
+    with pytest.raises(RuntimeError, match="text tower"):
+        embedder.encode_text(TEXTS)
+
+
+def test_text_only(checkpoint, full, images):
+    embedder = _embedder(checkpoint, backend="torch", towers=("text",))
+
+    assert embedder.preprocessor is None
+    assert embedder.backend.vision_model is None
+    np.testing.assert_allclose(embedder.encode_text(TEXTS), full.encode_text(TEXTS), atol=1e-5)
+
+    with pytest.raises(RuntimeError, match="vision tower"):
+        embedder.encode_images(images)
+    with pytest.raises(RuntimeError, match="vision tower"):
+        embedder.load_image(images[0])
+
+
+def test_onnx_exports_only_requested_tower(checkpoint, full, images, tmp_path, monkeypatch):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    monkeypatch.setattr(settings, "clip_onnx_cache_dir", str(tmp_path))
+
+    embedder = _embedder(checkpoint, backend="onnx", towers=("vision",))
+
+    exported = sorted(p.name for p in tmp_path.rglob("*.onnx"))
+    assert exported == ["vision.onnx"]
+    assert embedder.backend.text_session is None
+    np.testing.assert_allclose(embedder.encode_images(images), full.encode_images(images), atol=1e-4)
+
+
+def test_invalid_towers(checkpoint):
+    with pytest.raises(ValueError):
+        _embedder(checkpoint, towers=("audio",))
@@ -0,0 +1,156 @@
+"""
+Tests for the two-tier query embedding cache.
+"""
+import numpy as np
+import pytest
+
+from app.models.embedding_cache import EmbeddingCache, content_key, normalize_query
+
+
+class FakeRedis:
+    """In-memory stand-in for the async Redis client (get/set with ex)."""
+
+    def __init__(self, fail: bool = False):
+        self.data = {}
+        self.ttl = {}
+        self.fail = fail
+
+    async def get(self, key):
+        if self.fail:
+            raise ConnectionError("redis down")
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.data[key] = value
+        self.ttl[key] = ex
+
+    async def aclose(self):
+        pass
+
+
+def _vector(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_normalize_query():
+    """Case, spacing and Unicode compatibility forms map to one key."""
+    assert normalize_query("  Красное   ПЛАТЬЕ\n") == "красное платье"
+    assert normalize_query("ｓｈｏｅｓ") == normalize_query("Shoes")
+
+
+@pytest.mark.asyncio
+async def test_hit_after_set():
+    cache = EmbeddingCache("test", "model@torch", max_size=10, ttl_seconds=60)
+
+    assert await cache.get("shoes") is None
+    await cache.set("shoes", _vector(1.0))
+
+    cached = await cache.get("shoes")
+    np.testing.assert_array_equal(cached, _vector(1.0))
+    assert not cached.flags.writeable
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    """The least recently used entry is evicted when the cache is full."""
+    cache = EmbeddingCache("test", "model@torch", max_size=2, ttl_seconds=60)
+
+    await cache.set("a", _vector(1.0))
+    await cache.set("b", _vector(2.0))
+    await cache.get("a")  # "b" becomes least recently used
+    await cache.set("c", _vector(3.0))
+
+    assert len(cache) == 2
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+    assert await cache.get("c") is not None
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry(monkeypatch):
+    cache = EmbeddingCache("test", "model@torch", max_size=10, ttl_seconds=5)
+    now = [1000.0]
+    monkeypatch.setattr("app.models.embedding_cache.time.monotonic", lambda: now[0])
+
+    await cache.set("a", _vector(1.0))
+    now[0] += 4
+    assert await cache.get("a") is not None
+    now[0] += 2
+    assert await cache.get("a") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_model_key_isolates_entries():
+    """Vectors of one model are never served for another."""
+    redis = FakeRedis()
+    old = EmbeddingCache("text", "clip-b32@torch", max_size=10, ttl_seconds=60, redis_client=redis)
+    new = EmbeddingCache("text", "clip-l14@torch", max_size=10, ttl_seconds=60, redis_client=redis)
+
+    await old.set("shoes", _vector(1.0))
+
+    assert old.make_key("shoes") != new.make_key("shoes")
+    assert await new.get("shoes") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_is_shared_between_workers():
+    """An entry written by one worker is found by another through Redis."""
+    redis = FakeRedis()
+    worker_a = EmbeddingCache("text", "m", max_size=10, ttl_seconds=30, redis_client=redis)
+    worker_b = EmbeddingCache("text", "m", max_size=10, ttl_seconds=30, redis_client=redis)
+
+    await worker_a.set("shoes", _vector(0.5))
+    assert redis.ttl[worker_a.make_key("shoes")] == 30
+
+    cached = await worker_b.get("shoes")
+    np.testing.assert_array_equal(cached, _vector(0.5))
+    # Promoted into worker_b's local tier
+    assert len(worker_b) == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_are_misses():
+    cache = EmbeddingCache("text", "m", max_size=10, ttl_seconds=30, redis_client=FakeRedis(fail=True))
+
+    await cache.set("shoes", _vector(1.0))  # local tier still works
+    assert await cache.get("shoes") is not None
+    assert await cache.get("boots") is None
+
+
+def test_content_key():
+    assert content_key(b"photo") == content_key(bytes(bytearray(b"photo")))
+    assert content_key(b"photo") != content_key(b"photo2")
+
+
+@pytest.mark.asyncio
+async def test_duplicate_upload_skips_decode_and_inference(monkeypatch):
+    """A repeated upload is served from the image cache."""
+    from app.api.routes import search
+
+    calls = {"decode": 0, "embed": 0}
+
+    class Embedder:
+        def load_image(self, data):
+            calls["decode"] += 1
+            return data
+
+    class Scheduler:
+        async def embed_image(self, image):
+            calls["embed"] += 1
+            return _vector(float(len(image)))
+
+    monkeypatch.setattr(search, "clip_embedder", Embedder())
+    monkeypatch.setattr(search, "inference_scheduler", Scheduler())
+    monkeypatch.setattr(
+        search, "image_embedding_cache", EmbeddingCache("image", "m", max_size=10, ttl_seconds=60)
+    )
+
+    first = await search.embed_query_image(b"same photo")
+    second = await search.embed_query_image(b"same photo")
+    await search.embed_query_image(b"other photo")
+
+    np.testing.assert_array_equal(first, second)
+    assert calls == {"decode": 2, "embed": 2}
@@ -0,0 +1,99 @@
+"""
+Tests for the multi-process embedding farm.
+
+Workers build a stand-in embedder around a mean-colour backend, so the farm
+runs real processes without model weights.
+"""
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.models.clip_model import CLIPEmbedder
+from app.models.embedding_farm import embed_to_memmap
+from tests.helpers import mean_color_embedder, png_bytes
+
+
+def broken_embedder(num_threads: int) -> CLIPEmbedder:
+    """Factory of a worker whose model cannot be loaded."""
+    raise OSError("model weights not found")
+
+
+def exit_on_marker(item):
+    """Loader that kills its worker process for one item."""
+    if item == "crash":
+        os._exit(3)
+    return item
+
+
+def test_rows_match_inputs_and_failures_are_nan(tmp_path):
+    items = [png_bytes((i * 10, 255 - i * 10, 0)) for i in range(11)]
+    items[3] = b"not an image"
+
+    result = embed_to_memmap(
+        items,
+        tmp_path / "embeddings.npy",
+        num_workers=2,
+        threads_per_worker=1,
+        batch_size=2,
+        chunk_size=4,
+        embedder_factory=mean_color_embedder,
+        show_progress=False,
+    )
+
+    assert result.total == 11
+    assert result.failed_rows == [3]
+    assert result.succeeded == 10
+
+    embeddings = np.load(result.output_path)
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (11, 3)
+    assert np.isnan(embeddings[3]).all()
+
+    ok = [i for i in range(11) if i != 3]
+    expected = mean_color_embedder(1).encode_images(
+        [Image.new("RGB", (64, 48), color=(i * 10, 255 - i * 10, 0)) for i in ok]
+    )
+    np.testing.assert_allclose(embeddings[ok], expected, atol=1e-6)
+
+
+def test_dead_worker_fails_its_chunk(tmp_path):
+    """A crashed worker loses only its chunk; the others finish the rest."""
+    items = [png_bytes((i, i, i)) for i in range(8)]
+    items[5] = "crash"
+
+    result = embed_to_memmap(
+        items,
+        tmp_path / "embeddings.npy",
+        loader=exit_on_marker,
+        num_workers=2,
+        threads_per_worker=1,
+        batch_size=2,
+        chunk_size=2,
+        decode_workers=1,
+        dim=3,
+        embedder_factory=mean_color_embedder,
+        show_progress=False,
+    )
+
+    assert result.failed_rows == [4, 5]
+    embeddings = np.load(result.output_path)
+    assert np.isnan(embeddings[[4, 5]]).all()
+    assert not np.isnan(np.delete(embeddings, [4, 5], axis=0)).any()
+
+
+def test_startup_failures_raise(tmp_path):
+    """A worker that cannot load its embedder, or has the wrong width, stops the run."""
+    items = [png_bytes((i, i, i)) for i in range(4)]
+    options = dict(num_workers=2, threads_per_worker=1, chunk_size=2, show_progress=False)
+
+    with pytest.raises(RuntimeError, match="expected 512"):
+        embed_to_memmap(
+            items, tmp_path / "wrong_dim.npy", dim=512, embedder_factory=mean_color_embedder, **options
+        )
+
+    with pytest.raises(RuntimeError, match="weights not found"):
+        embed_to_memmap(
+            items, tmp_path / "broken.npy", embedder_factory=broken_embedder, **options
+        )
@@ -0,0 +1,98 @@
+"""
+Tests for the decode/forward pipeline of CLIPEmbedder.generate_embeddings_batch.
+
+The embedder is assembled around a stand-in backend so the pipeline can be
+tested without downloading model weights.
+"""
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from tests.helpers import MeanColorBackend, make_embedder, png_bytes
+
+
+@pytest.mark.asyncio
+async def test_results_keep_input_order_and_mark_failures(tmp_path):
+    backend = MeanColorBackend()
+    embedder = make_embedder(backend)
+
+    colors = [(i * 20, 0, 0) for i in range(7)]
+    sources = [png_bytes(c) for c in colors]
+    sources[2] = b"not an image"
+    sources[5] = str(tmp_path / "missing.jpg")
+
+    embeddings = await embedder.generate_embeddings_batch(
+        sources, batch_size=3, show_progress=False, prefetch_batches=1, decode_workers=2
+    )
+
+    assert len(embeddings) == 7
+    assert embeddings[2] is None and embeddings[5] is None
+    assert backend.batch_sizes == [2, 2, 1]
+
+    valid = [i for i in range(7) if i not in (2, 5)]
+    expected = embedder.encode_images([Image.new("RGB", (64, 48), color=colors[i]) for i in valid])
+    actual = np.stack([embeddings[i] for i in valid])
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+@pytest.mark.asyncio
+async def test_decode_overlaps_forward(monkeypatch):
+    """Decoding the next batch runs while the current one is in the model."""
+    delay = 0.1
+    embedder = make_embedder(MeanColorBackend(delay=delay))
+
+    original = embedder.preprocessor.resize_and_crop
+
+    def slow_resize_and_crop(image):
+        time.sleep(delay)
+        return original(image)
+
+    monkeypatch.setattr(embedder.preprocessor, "resize_and_crop", slow_resize_and_crop)
+
+    sources = [png_bytes((i, i, i)) for i in range(4)]
+    start = time.perf_counter()
+    embeddings = await embedder.generate_embeddings_batch(
+        sources, batch_size=1, show_progress=False, prefetch_batches=1, decode_workers=1
+    )
+    elapsed = time.perf_counter() - start
+
+    assert all(e is not None for e in embeddings)
+    # Serial decode + forward would take 8 * delay, the pipeline about 5 * delay
+    assert elapsed < 7 * delay
+
+
+@pytest.mark.asyncio
+async def test_empty_input():
+    embedder = make_embedder(MeanColorBackend())
+
+    assert await embedder.generate_embeddings_batch([], show_progress=False) == []
+
+
+@pytest.mark.asyncio
+async def test_iter_embeddings_streams_chunks():
+    """Chunks are float32, skip failures and arrive before the source is exhausted."""
+    embedder = make_embedder(MeanColorBackend())
+    pulled = []
+
+    def catalog(n):
+        for i in range(n):
+            pulled.append(i)
+            # Lazily fetched source, called on a decode thread
+            yield f"item-{i}", (lambda i=i: None if i == 4 else png_bytes((i, 0, 0)))
+
+    chunks = []
+    async for ids, vectors in embedder.iter_embeddings(
+        catalog(20), batch_size=4, prefetch_batches=1, decode_workers=2
+    ):
+        if not chunks:
+            # Only the running batch and one prefetched batch have been read
+            assert len(pulled) <= 3 * 4
+        chunks.append((ids, vectors))
+
+    assert [len(ids) for ids, _ in chunks] == [4, 3, 4, 4, 4]
+    assert chunks[1][0] == ["item-5", "item-6", "item-7"]
+    for ids, vectors in chunks:
+        assert vectors.dtype == np.float32
+        assert vectors.shape == (len(ids), 3)
@@ -0,0 +1,131 @@
+"""
+Tests for the precomputed nearest-neighbour table.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from qdrant_client import AsyncQdrantClient
+
+from app.db import neighbors
+from app.db.qdrant import QdrantManager
+
+
+def normalized(count: int, dim: int = 16) -> np.ndarray:
+    vectors = np.random.default_rng(0).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_top_k_neighbors_matches_brute_force():
+    """Blocks that do not divide N give the same answer as the full matrix."""
+    vectors = normalized(50)
+    similarities = vectors @ vectors.T
+    np.fill_diagonal(similarities, -np.inf)
+    expected = np.argsort(-similarities, axis=1)[:, :5]
+
+    indices, scores = neighbors.top_k_neighbors(vectors, top_k=5, block_size=7)
+
+    np.testing.assert_array_equal(indices, expected)
+    np.testing.assert_allclose(scores, np.take_along_axis(similarities, expected, axis=1), rtol=1e-5)
+    assert not (indices == np.arange(50)[:, None]).any()
+
+
+def test_top_k_neighbors_small_collection():
+    """K is capped at N - 1; a single product has no neighbours."""
+    indices, _ = neighbors.top_k_neighbors(normalized(3), top_k=10)
+    assert indices.shape == (3, 2)
+    assert neighbors.top_k_neighbors(normalized(1), top_k=10)[0].shape == (1, 0)
+
+
+@pytest.fixture
+async def qdrant():
+    """Manager backed by an in-memory async Qdrant with four products."""
+    manager = QdrantManager.__new__(QdrantManager)
+    manager.collection_name = "test_neighbors"
+    manager.client = AsyncQdrantClient(":memory:")
+    async with manager:
+        await manager.create_collection(vector_size=4)
+        await manager.upsert_vectors(
+            [f"p{i}" for i in range(4)],
+            [[1, 0, 0, 0], [0.9, 0.1, 0, 0], [0.5, 0.5, 0, 0], [-0.6, 0, 0.8, 0]]
+        )
+        yield manager
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """In-memory stand-in for the product_neighbors table."""
+    rows = {}
+
+    @asynccontextmanager
+    async def get_session():
+        yield None
+
+    async def get_product_neighbors(session, external_ids):
+        return {
+            i: SimpleNamespace(neighbor_ids=[n for n, _ in rows[i]], scores=[s for _, s in rows[i]])
+            for i in external_ids if i in rows
+        }
+
+    async def upsert_product_neighbors(session, entries):
+        rows.update(entries)
+        return len(entries)
+
+    async def delete_product_neighbors(session, external_ids=None, updated_before=None):
+        stale = external_ids if updated_before is None else []
+        for i in stale:
+            rows.pop(i, None)
+        return len(stale)
+
+    monkeypatch.setattr(neighbors, "get_session", get_session)
+    monkeypatch.setattr(neighbors, "get_product_neighbors", get_product_neighbors)
+    monkeypatch.setattr(neighbors, "upsert_product_neighbors", upsert_product_neighbors)
+    monkeypatch.setattr(neighbors, "delete_product_neighbors", delete_product_neighbors)
+    return rows
+
+
+async def test_build_neighbor_table(qdrant, table):
+    assert await neighbors.build_neighbor_table(qdrant, top_k=2, write_batch_size=3) == 4
+
+    assert [n for n, _ in table["p0"]] == ["p1", "p2"]
+    assert table["p3"] == []  # dissimilar products are not neighbours
+
+
+async def test_refresh_neighbors_after_delete(qdrant, table):
+    """A deleted product leaves the table and the lists of its neighbours."""
+    await neighbors.build_neighbor_table(qdrant, top_k=2)
+
+    # Recreated rather than deleted: local mode still finds deleted points by id
+    await qdrant.delete_collection()
+    await qdrant.create_collection(vector_size=4)
+    await qdrant.upsert_vectors(["p0", "p2", "p3"], [[1, 0, 0, 0], [0.5, 0.5, 0, 0], [-0.6, 0, 0.8, 0]])
+    await neighbors.refresh_neighbors(qdrant, ["p1"], top_k=2)
+
+    assert "p1" not in table
+    assert all("p1" not in [n for n, _ in hits] for hits in table.values())
+    assert [n for n, _ in table["p0"]] == ["p2"]
+
+
+async def test_refresh_neighbors_bounds_concurrent_queries(qdrant, table, monkeypatch):
+    """Refreshing many products never has more than `concurrency` queries in flight."""
+    await neighbors.build_neighbor_table(qdrant, top_k=3)
+
+    query = qdrant.search_similar_to_product
+    in_flight = peak = 0
+
+    async def counting_query(product_id, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await query(product_id, **kwargs)
+        finally:
+            in_flight -= 1
+
+    monkeypatch.setattr(qdrant, "search_similar_to_product", counting_query)
+    await neighbors.refresh_neighbors(qdrant, ["p0", "p1", "p2"], top_k=3, concurrency=2)
+
+    assert peak == 2
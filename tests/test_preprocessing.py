@@ -0,0 +1,95 @@
+"""
+Tests for vectorized CLIP image preprocessing.
+"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+from transformers import CLIPImageProcessor
+
+from app.models.preprocessing import ImagePreprocessor
+
+
+@pytest.fixture(scope="module")
+def image_processor():
+    """Reference HuggingFace processor with the ViT-B/32 defaults."""
+    return CLIPImageProcessor()
+
+
+@pytest.fixture(scope="module")
+def preprocessor(image_processor):
+    return ImagePreprocessor.from_image_processor(image_processor)
+
+
+def _random_image(width: int, height: int, seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+def _jpeg_bytes(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    "size",
+    [(224, 224), (640, 480), (300, 1000), (225, 224), (1920, 1080), (100, 80)],
+)
+def test_matches_clip_image_processor(image_processor, preprocessor, size):
+    """Pixel values match CLIPImageProcessor for landscape, portrait, up- and downscaling."""
+    image = _random_image(*size, seed=sum(size))
+
+    expected = image_processor(images=[image], return_tensors="np")["pixel_values"]
+    actual = preprocessor([image])
+
+    assert actual.shape == expected.shape == (1, 3, 224, 224)
+    assert actual.dtype == np.float32
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+
+def test_batch_matches_clip_image_processor(image_processor, preprocessor):
+    """A mixed-size batch is preprocessed in one call with the same result."""
+    images = [_random_image(w, h, seed=i) for i, (w, h) in enumerate([(320, 240), (240, 320), (512, 512)])]
+
+    expected = image_processor(images=images, return_tensors="np")["pixel_values"]
+    actual = preprocessor(images)
+
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+
+def test_stack_returns_uint8_crops(preprocessor):
+    """The intermediate batch stays uint8 until normalization."""
+    batch = preprocessor.stack([_random_image(400, 300, seed=1), _random_image(300, 400, seed=2)])
+
+    assert batch.dtype == np.uint8
+    assert batch.shape == (2, 224, 224, 3)
+
+
+def test_draft_decodes_large_jpeg_at_reduced_scale(preprocessor):
+    """Large JPEGs are decoded at a reduced scale that still covers the crop."""
+    photo = _random_image(200, 150, seed=3).resize((2000, 1500))
+    data = _jpeg_bytes(photo)
+
+    drafted = preprocessor.load(data)
+    full = ImagePreprocessor(draft=False).load(data)
+
+    assert full.size == (2000, 1500)
+    # 1500 / 224 -> largest power-of-two scale that fits is 1/4
+    assert drafted.size == (500, 375)
+    assert min(drafted.size) >= preprocessor.size
+
+    # Both paths end up close after resize and crop
+    diff = np.abs(preprocessor([drafted]) - preprocessor([full]))
+    assert diff.mean() < 0.05
+
+
+def test_draft_ignores_small_and_non_jpeg_images(preprocessor):
+    """Images that cannot be reduced are decoded at full size."""
+    small = _jpeg_bytes(_random_image(300, 300, seed=4))
+    assert preprocessor.load(small).size == (300, 300)
+
+    buffer = io.BytesIO()
+    _random_image(1000, 1000, seed=5).save(buffer, format="PNG")
+    assert preprocessor.load(buffer.getvalue()).size == (1000, 1000)
@@ -0,0 +1,88 @@
+"""
+Tests for the PCA embedding projection.
+"""
+import numpy as np
+import pytest
+
+from app.models.clip_model import CLIPEmbedder
+from app.models.preprocessing import ImagePreprocessor
+from app.models.projection import EmbeddingProjection, recall_at_k
+
+
+@pytest.fixture(scope="module")
+def embeddings():
+    """Normalized 64-d vectors that mostly live in a 16-d subspace."""
+    rng = np.random.default_rng(0)
+    basis = rng.standard_normal((16, 64))
+    vectors = rng.standard_normal((600, 16)) @ basis + 0.05 * rng.standard_normal((600, 64))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_apply_reduces_and_normalizes(embeddings):
+    projection = EmbeddingProjection.fit(embeddings, 16)
+
+    reduced = projection.apply(embeddings)
+    assert reduced.shape == (600, 16)
+    assert reduced.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+
+    # Single vectors as well (text queries)
+    np.testing.assert_allclose(projection.apply(embeddings[0]), reduced[0], atol=1e-6)
+
+
+def test_save_load_roundtrip(tmp_path, embeddings):
+    projection = EmbeddingProjection.fit(embeddings, 8)
+
+    path = projection.save(tmp_path)
+    loaded = EmbeddingProjection.load(path)
+
+    assert path.name == f"{projection.version}.npy"
+    assert projection.version.startswith("pca8-")
+    assert (loaded.input_dim, loaded.output_dim) == (64, 8)
+    assert loaded.version == projection.version
+    np.testing.assert_allclose(loaded.apply(embeddings), projection.apply(embeddings), atol=1e-6)
+
+
+def test_recall_follows_retained_variance(embeddings):
+    """Keeping the informative subspace preserves neighbours, cutting into it loses them."""
+    queries = np.arange(0, 600, 7)
+
+    full_rank = recall_at_k(embeddings, EmbeddingProjection.fit(embeddings, 16).apply(embeddings), queries)
+    truncated = recall_at_k(embeddings, EmbeddingProjection.fit(embeddings, 4).apply(embeddings), queries)
+
+    assert recall_at_k(embeddings, embeddings, queries) == 1.0
+    assert full_rank > 0.9
+    assert truncated < full_rank
+
+
+def test_recall_on_collection_smaller_than_k(embeddings):
+    """k is capped at n - 1, so tiny collections compare every other vector."""
+    small = embeddings[:5]
+    assert recall_at_k(small, small, np.arange(5), k=10) == 1.0
+    with pytest.raises(ValueError):
+        recall_at_k(small[:1], small[:1], np.arange(1))
+
+
+def test_fit_needs_enough_vectors(embeddings):
+    with pytest.raises(ValueError):
+        EmbeddingProjection.fit(embeddings[:8], 16)
+
+
+def test_embedder_applies_projection(embeddings):
+    """Image vectors come out projected and the model key carries the version."""
+    class FixedBackend:
+        def image_features(self, pixel_values):
+            return embeddings[: len(pixel_values)] * 3.0
+
+    projection = EmbeddingProjection.fit(embeddings, 8)
+    embedder = CLIPEmbedder.__new__(CLIPEmbedder)
+    embedder.model_name, embedder.backend_name = "clip-test", "torch"
+    embedder.preprocessor = ImagePreprocessor()
+    embedder.backend = FixedBackend()
+    embedder.projection = projection
+
+    batch = np.zeros((3, 224, 224, 3), dtype=np.uint8)
+    np.testing.assert_allclose(
+        embedder.encode_pixels(batch), projection.apply(embeddings[:3]), atol=1e-6
+    )
+    assert embedder.model_key == f"clip-test@torch+{projection.version}"
@@ -0,0 +1,368 @@
+"""
+Tests for QdrantManager on the async Qdrant client (in-memory, no server needed).
+"""
+import time
+
+import numpy as np
+import pytest
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import BinaryQuantization, FilterSelector, ScalarType
+
+from app.config import settings
+from app.db.qdrant import QdrantManager, versioned_collection_name
+
+
+@pytest.fixture
+async def qdrant():
+    """Manager backed by an in-memory async Qdrant."""
+    manager = QdrantManager.__new__(QdrantManager)
+    manager.collection_name = "test_async"
+    manager.client = AsyncQdrantClient(":memory:")
+    async with manager:
+        yield manager
+
+
+def test_client_configuration():
+    """Transport and connection pool come from the arguments and settings."""
+    manager = QdrantManager(host="qdrant.internal", prefer_grpc=True, grpc_port=16334)
+
+    options = manager.client.init_options
+    assert isinstance(manager.client, AsyncQdrantClient)
+    assert options["prefer_grpc"] is True
+    assert options["grpc_port"] == 16334
+    # Keep-alive pool instead of a new connection per request
+    assert options["limits"].max_keepalive_connections == settings.qdrant_pool_size
+
+
+async def test_upsert_search_scroll_delete(qdrant):
+    await qdrant.create_collection(vector_size=8)
+    assert await qdrant.collection_exists()
+
+    vectors = np.eye(8, dtype=np.float32)[:4]
+    product_ids = [f"p{i}" for i in range(4)]
+    await qdrant.upsert_vectors(product_ids, vectors.tolist(), [{"title": f"#{i}"} for i in range(4)])
+
+    results = await qdrant.search_similar(vectors[2].tolist(), top_k=2)
+    assert results[0]["id"] == "p2"
+    assert results[0]["payload"]["title"] == "#2"
+    assert results[0]["score"] == pytest.approx(1.0)
+
+    assert await qdrant.count_vectors() == 4
+    scrolled = [p async for batch in qdrant.scroll_vectors(batch_size=3) for p in batch]
+    assert sorted(p["payload"]["product_id"] for p in scrolled) == product_ids
+
+    await qdrant.delete_vectors(["p0", "p1"])
+    assert await qdrant.count_vectors() == 2
+
+    await qdrant.delete_collection()
+    assert not await qdrant.collection_exists()
+
+
+async def test_search_similar_batch(qdrant):
+    """One request returns a result list per query, in query order."""
+    await qdrant.create_collection(vector_size=8)
+    vectors = np.eye(8, dtype=np.float32)
+    await qdrant.upsert_vectors([f"p{i}" for i in range(8)], vectors.tolist())
+
+    results = await qdrant.search_similar_batch(
+        [vectors[5].tolist(), vectors[1].tolist(), (vectors[2] + vectors[3]).tolist()], top_k=2
+    )
+
+    assert [hits[0]["id"] for hits in results[:2]] == ["p5", "p1"]
+    assert sorted(hit["id"] for hit in results[2]) == ["p2", "p3"]
+    assert await qdrant.search_similar_batch([]) == []
+
+
+async def test_get_collection_info(qdrant):
+    """Counts come from points_count; the client no longer reports vectors_count."""
+    await qdrant.create_collection(vector_size=4)
+    await qdrant.upsert_vectors(["p0", "p1"], [[1, 0, 0, 0], [0, 1, 0, 0]])
+
+    info = await qdrant.get_collection_info()
+
+    assert info["points_count"] == info["vectors_count"] == 2
+    assert (info["vector_size"], info["distance"]) == (4, "COSINE")
+
+
+async def test_search_similar_to_product(qdrant):
+    """Neighbours come from the stored vector; the product itself is excluded."""
+    await qdrant.create_collection(vector_size=4)
+    vectors = [[1, 0, 0, 0], [0.9, 0.1, 0, 0], [0.5, 0.5, 0, 0], [0, 0, 1, 0]]
+    await qdrant.upsert_vectors([f"p{i}" for i in range(4)], vectors)
+
+    results = await qdrant.search_similar_to_product("p0", top_k=10, score_threshold=None)
+
+    assert [hit["id"] for hit in results] == ["p1", "p2", "p3"]
+    assert await qdrant.search_similar_to_product("missing") is None
+
+
+async def test_score_threshold_is_exclusive(qdrant):
+    """A hit scoring exactly the threshold is dropped; None keeps every hit."""
+    await qdrant.create_collection(vector_size=4)
+    await qdrant.upsert_vectors(["p0", "p1", "p2"], [[1, 0, 0, 0], [0.5, 0.5, 0, 0], [0, 0, 1, 0]])
+
+    def ids(hits):
+        return [hit["id"] for hit in hits]
+
+    # p2 is orthogonal to p0: its score is exactly 0.0
+    assert ids(await qdrant.search_similar_to_product("p0", score_threshold=0.0)) == ["p1"]
+    assert ids(await qdrant.search_similar_to_product("p0", score_threshold=None)) == ["p1", "p2"]
+    assert ids(await qdrant.search_similar([1, 0, 0, 0], score_threshold=0.0)) == ["p0", "p1"]
+
+
+async def test_search_similar_to_product_keeps_original_error(qdrant, monkeypatch):
+    """Only a missing point means "not indexed"; other failures surface unchanged."""
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("Qdrant is down")
+
+    async def unexpected_retrieve(*args, **kwargs):
+        raise AssertionError("retrieve must not be called")
+
+    monkeypatch.setattr(qdrant.client, "query_points", unavailable)
+    monkeypatch.setattr(qdrant.client, "retrieve", unexpected_retrieve)
+
+    with pytest.raises(ConnectionError, match="Qdrant is down"):
+        await qdrant.search_similar_to_product("p0")
+
+
+async def test_quantization_config_and_search_params(qdrant, monkeypatch):
+    """Quantization and per-request oversampling/rescore reach Qdrant."""
+    calls = {}
+
+    def spy(name):
+        method = getattr(qdrant.client, name)
+
+        async def wrapper(*args, **kwargs):
+            calls[name] = kwargs
+            return await method(*args, **kwargs)
+        return wrapper
+
+    for name in ("create_collection", "update_collection", "query_points"):
+        monkeypatch.setattr(qdrant.client, name, spy(name))
+
+    await qdrant.create_collection(vector_size=4, quantization="int8", on_disk=True)
+    config = calls["create_collection"]
+    assert config["quantization_config"].scalar.type == ScalarType.INT8
+    assert config["vectors_config"].on_disk is True
+
+    await qdrant.upsert_vectors(["p0"], [[1, 0, 0, 0]])
+    await qdrant.search_similar([1, 0, 0, 0], oversampling=3.0, rescore=False)
+    params = calls["query_points"]["search_params"].quantization
+    assert (params.oversampling, params.rescore) == (3.0, False)
+
+    await qdrant.update_quantization("binary", on_disk=False)
+    update = calls["update_collection"]
+    assert isinstance(update["quantization_config"], BinaryQuantization)
+    assert update["vectors_config"][""].on_disk is False
+
+    with pytest.raises(ValueError):
+        await qdrant.update_quantization("int4")
+
+
+async def test_hnsw_config_and_precision_params(qdrant, monkeypatch):
+    """HNSW build settings and per-request hnsw_ef / exact reach Qdrant."""
+    calls = {}
+    create_collection, query_points = qdrant.client.create_collection, qdrant.client.query_points
+
+    async def create_spy(*args, **kwargs):
+        calls["create"] = kwargs
+        return await create_collection(*args, **kwargs)
+
+    async def query_spy(*args, **kwargs):
+        calls["query"] = kwargs["search_params"]
+        return await query_points(*args, **kwargs)
+
+    monkeypatch.setattr(qdrant.client, "create_collection", create_spy)
+    monkeypatch.setattr(qdrant.client, "query_points", query_spy)
+
+    await qdrant.create_collection(vector_size=4, hnsw_m=32)
+    hnsw = calls["create"]["hnsw_config"]
+    assert (hnsw.m, hnsw.ef_construct) == (32, settings.qdrant_hnsw_ef_construct)
+
+    await qdrant.upsert_vectors(["p0"], [[1, 0, 0, 0]])
+    await qdrant.search_similar([1, 0, 0, 0], hnsw_ef=16)
+    assert (calls["query"].hnsw_ef, calls["query"].exact) == (16, False)
+
+    results = await qdrant.search_similar([1, 0, 0, 0], exact=True)
+    assert calls["query"].exact and calls["query"].quantization.ignore
+    assert results[0]["id"] == "p0"
+
+
+async def test_blue_green_alias(qdrant):
+    """Versions are published and rolled back by switching the alias."""
+    live = qdrant.for_collection("products")
+    for version, vector in (("products_v1", [1, 0, 0, 0]), ("products_v2", [0, 1, 0, 0])):
+        target = qdrant.for_collection(version)
+        await target.create_collection(vector_size=4)
+        await target.upsert_vectors(["p0"], [vector])
+
+    assert await live.switch_alias("products_v1") is None
+    assert await live.switch_alias("products_v2") == "products_v1"
+    assert (await live.search_similar([0, 1, 0, 0], top_k=1))[0]["score"] == pytest.approx(1.0)
+    assert await live.list_versions() == ["products_v1", "products_v2"]
+    assert await live.collection_exists()
+
+    assert await live.rollback_alias() == "products_v1"
+    assert await live.get_alias_target() == "products_v1"
+    with pytest.raises(ValueError):
+        await live.rollback_alias()
+    with pytest.raises(ValueError):
+        await live.delete_collection()
+
+    # The live version is never deleted, even when it is not among the newest
+    assert await live.delete_old_versions(keep=0) == ["products_v2"]
+
+
+def test_versioned_collection_names_are_distinct_and_ordered():
+    """Versions started within the same second get different names that sort chronologically."""
+    names = []
+    for _ in range(3):
+        names.append(versioned_collection_name("products"))
+        time.sleep(0.001)
+    assert len(set(names)) == 3
+    assert names == sorted(names)
+    assert all(name[len("products_v"):].isdigit() for name in names)
+
+
+async def test_switch_alias_replaces_plain_collection(qdrant):
+    """A pre-alias plain collection is replaced only on request."""
+    legacy = qdrant.for_collection("products")
+    await legacy.create_collection(vector_size=4)
+    await legacy.upsert_vectors(["p0", "p1"], [[1, 0, 0, 0], [0, 1, 0, 0]])
+
+    target = qdrant.for_collection("products_v1")
+    await target.create_collection(vector_size=4)
+    await target.upsert_vectors(["p0"], [[1, 0, 0, 0]])
+
+    # Carry over products the new version lacks
+    assert await target.copy_missing_from("products") == 1
+    assert await target.count_vectors() == 2
+
+    with pytest.raises(ValueError):
+        await legacy.switch_alias("products_v1")
+    assert await legacy.switch_alias("products_v1", replace_collection=True) is None
+    assert await legacy.get_alias_target() == "products_v1"
+
+
+async def test_publish_version_carries_over_only_on_request(qdrant):
+    """Products missing from the new version stay out unless carry_over is set."""
+    live = qdrant.for_collection("products")
+    await live.for_collection("products_v1").create_collection(vector_size=4)
+    await live.for_collection("products_v1").upsert_vectors(["p0", "p1"], [[1, 0, 0, 0], [0, 1, 0, 0]])
+    await live.publish_version("products_v1")
+
+    for version in ("products_v2", "products_v3"):
+        await live.for_collection(version).create_collection(vector_size=4)
+        await live.for_collection(version).upsert_vectors(["p0"], [[1, 0, 0, 0]])
+
+    await live.publish_version("products_v2")
+    assert await live.count_vectors() == 1
+
+    await live.publish_version("products_v3", carry_over=True)
+    assert await live.count_vectors() == 1  # p1 was dropped from products_v2, not carried over from it
+
+    await live.switch_alias("products_v1")
+    await live.publish_version("products_v3", carry_over=True)
+    assert await live.count_vectors() == 2
+
+
+async def test_carry_over_refuses_other_model_or_size(qdrant):
+    """Vectors of another model or dimension are never copied into a version."""
+    live = qdrant.for_collection("products")
+    old_model = live.for_collection("products")
+    old_model._model_key = "old-clip"
+    await old_model.create_collection(vector_size=4)
+    await old_model.upsert_vectors(["p0", "p1"], [[1, 0, 0, 0], [0, 1, 0, 0]])
+
+    same_size = live.for_collection("products_v1")
+    await same_size.create_collection(vector_size=4)
+    await same_size.upsert_vectors(["p0"], [[1, 0, 0, 0]])
+    with pytest.raises(ValueError, match="old-clip"):
+        await live.publish_version("products_v1", carry_over=True)
+    assert await same_size.count_vectors() == 1
+    assert await live.get_alias_target() is None
+
+    other_size = live.for_collection("products_v2")
+    await other_size.create_collection(vector_size=8)
+    with pytest.raises(ValueError):
+        await other_size.copy_missing_from("products")
+    assert await other_size.count_vectors() == 0
+
+
+async def test_payload_filters(qdrant):
+    """Category, price and source filters run inside Qdrant; set_payloads merges fields."""
+    from app.db.qdrant import build_filter, product_payload
+
+    await qdrant.create_collection(vector_size=4)
+    vectors = [[1, 0, 0, 0], [0.9, 0.1, 0, 0], [0.8, 0.2, 0, 0], [0.7, 0.3, 0, 0]]
+    payloads = [
+        product_payload("p0", category="shoes", price=100, source="webhook"),
+        product_payload("p1", category="shoes", price=900, source="bakai_s3"),
+        product_payload("p2", category="bags", price=300, source="bakai_s3"),
+        product_payload("p3", source="bakai_s3"),
+    ]
+    await qdrant.upsert_vectors([f"p{i}" for i in range(4)], vectors, payloads)
+
+    async def ids(**filters):
+        hits = await qdrant.search_similar([1, 0, 0, 0], top_k=10, query_filter=build_filter(**filters))
+        return [hit["id"] for hit in hits]
+
+    assert build_filter() is None
+    assert await ids() == ["p0", "p1", "p2", "p3"]
+    assert await ids(categories=["shoes"]) == ["p0", "p1"]
+    assert await ids(min_price=200, max_price=1000) == ["p1", "p2"]
+    assert await ids(categories=["shoes", "bags"], source="bakai_s3") == ["p1", "p2"]
+
+    similar = await qdrant.search_similar_to_product("p0", query_filter=build_filter(categories=["shoes"]))
+    assert [hit["id"] for hit in similar] == ["p1"]
+
+    await qdrant.set_payloads({"p3": {"category": "bags", "price": 50.0}})
+    assert await ids(categories=["bags"], max_price=100) == ["p3"]
+    scrolled = [p async for batch in qdrant.scroll_vectors(with_vectors=False) for p in batch]
+    p3 = next(p for p in scrolled if p["payload"]["product_id"] == "p3")
+    assert p3["vector"] is None
+    assert p3["payload"]["source"] == "bakai_s3"
+
+
+async def test_upload_vectors(qdrant):
+    """A float32 matrix is uploaded without tolist(); the barrier makes it searchable."""
+    await qdrant.create_collection(vector_size=8)
+    vectors = np.eye(8, dtype=np.float32)[:6]
+    product_ids = [f"p{i}" for i in range(6)]
+
+    uploaded = await qdrant.upload_vectors(
+        product_ids, vectors, [{"title": f"#{i}"} for i in range(6)], batch_size=4, wait=False
+    )
+    await qdrant.upload_vectors(["p6"], np.eye(8, dtype=np.float64)[6:7], batch_size=4, wait=False)
+    await qdrant.wait_for_updates()
+
+    assert uploaded == 6
+    assert await qdrant.count_vectors() == 7
+    results = await qdrant.search_similar(vectors[3].tolist(), top_k=1)
+    assert results[0]["id"] == "p3"
+    assert results[0]["payload"]["title"] == "#3"
+    assert await qdrant.upload_vectors([], np.empty((0, 8), dtype=np.float32)) == 0
+
+    with pytest.raises(ValueError):
+        await qdrant.upload_vectors(["a", "b"], vectors[:3])
+    with pytest.raises(ValueError):
+        await qdrant.upload_vectors(["a"], vectors[0])
+
+
+async def test_write_barrier_reaches_every_shard(qdrant, monkeypatch):
+    """The barrier deletes by filter (sent to all shards), not by ID (one shard), and deletes nothing."""
+    await qdrant.create_collection(vector_size=4)
+    await qdrant.upsert_vectors(["p0", "p1"], [[1, 0, 0, 0], [0, 1, 0, 0]])
+
+    selectors = []
+    delete = qdrant.client.delete
+
+    async def recording_delete(**kwargs):
+        selectors.append(kwargs["points_selector"])
+        return await delete(**kwargs)
+
+    monkeypatch.setattr(qdrant.client, "delete", recording_delete)
+    await qdrant.wait_for_updates()
+
+    assert isinstance(selectors[0], FilterSelector)
+    assert await qdrant.count_vectors() == 2
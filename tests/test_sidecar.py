@@ -0,0 +1,137 @@
+"""
+Tests for the embedding sidecar and its client.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.models.batching import InferenceScheduler
+from app.models.executor import InferenceExecutor, InferenceQueueFull
+from app.models.preprocessing import ImagePreprocessor
+from app.models.sidecar import EmbeddingSidecar
+from app.models.sidecar_client import SidecarClient
+
+
+class FakeEmbedder:
+    """Stand-in for a loaded CLIPEmbedder that records forward passes."""
+
+    model_key = "clip-test@torch"
+    device = "cpu"
+    max_batch_size = 8
+
+    def __init__(self, dim: int = 4):
+        self.dim = dim
+        self.preprocessor = ImagePreprocessor(size=32, crop_size=(32, 32))
+        self.pixel_batches = []
+
+    def get_embedding_dimension(self):
+        return self.dim
+
+    def encode_images(self, images):
+        return self.encode_pixels(self.preprocessor.stack(images))
+
+    def encode_pixels(self, batch):
+        self.pixel_batches.append(len(batch))
+        # Mean red value of each crop, so results can be matched to queries
+        return np.array(
+            [[crop[..., 0].mean()] * self.dim for crop in batch], dtype=np.float32
+        )
+
+    def encode_text(self, texts):
+        return np.array([[len(text)] * self.dim for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+async def sidecar(tmp_path):
+    """Running sidecar with a fake embedder and a client connected to it."""
+    embedder = FakeEmbedder()
+    scheduler = InferenceScheduler(
+        embedder,
+        max_wait_ms=20,
+        max_queue_size=4,
+        executor=InferenceExecutor(max_workers=1, max_queue_size=8),
+    )
+    await scheduler.start()
+
+    server = EmbeddingSidecar(embedder, scheduler, socket_path=str(tmp_path / "clip.sock"))
+    await server.start()
+
+    client = SidecarClient(server.socket_path, max_connections=4, connect_timeout=1)
+    await client.start()
+
+    yield embedder, server, client
+
+    await client.stop()
+    await server.stop()
+    await scheduler.stop()
+
+
+async def test_client_describes_sidecar_model(sidecar):
+    embedder, _, client = sidecar
+
+    assert client.model_key == embedder.model_key
+    assert client.get_embedding_dimension() == embedder.dim
+
+    # Crops are prepared locally exactly as the sidecar's preprocessor would
+    crop = client.load_image(Image.new("RGB", (64, 48), color=(10, 20, 30)))
+    assert crop.shape == (32, 32, 3)
+
+
+async def test_queries_from_one_worker_share_sidecar_batches(sidecar):
+    embedder, _, client = sidecar
+
+    images = [Image.new("RGB", (40, 40), color=(i * 10, 0, 0)) for i in range(6)]
+    crops = [client.load_image(image) for image in images]
+    results = await asyncio.gather(*(client.embed_image(crop) for crop in crops))
+
+    assert [int(r[0]) for r in results] == [i * 10 for i in range(6)]
+    assert all(r.dtype == np.float32 and r.shape == (4,) for r in results)
+    # Four connections in flight, merged by the sidecar's scheduler
+    assert sum(embedder.pixel_batches) == 6
+    assert max(embedder.pixel_batches) > 1
+
+    text = await client.embed_text("red shoes")
+    assert text[0] == len("red shoes")
+
+
+async def test_overloaded_sidecar_raises_queue_full(sidecar):
+    _, server, client = sidecar
+    server.scheduler.max_queue_size = 0
+
+    with pytest.raises(InferenceQueueFull):
+        await client.embed_text("anything")
+
+    # The connection stays usable after an error reply
+    server.scheduler.max_queue_size = 4
+    assert (await client.embed_text("ok"))[0] == 2
+
+
+async def test_slots_released_when_client_disconnects(sidecar):
+    _, server, client = sidecar
+    await client.embed_text("warm up")
+    slots = [connection.slot.name for connection in client._idle]
+
+    await client.stop()
+    await asyncio.sleep(0.05)
+
+    for name in slots:
+        assert not os.path.exists(f"/dev/shm/{name}")
+
+
+def test_api_worker_with_sidecar_does_not_import_torch(tmp_path):
+    """An API worker that talks to the sidecar starts without the model libraries."""
+    code = (
+        "import sys, app.api.main; "
+        "loaded = [m for m in ('torch', 'transformers') if m in sys.modules]; "
+        "assert not loaded, loaded"
+    )
+    env = {**os.environ, "CLIP_SIDECAR_SOCKET": str(tmp_path / "clip.sock")}
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
@@ -0,0 +1,124 @@
+"""
+Tests for the CLIP auto-tuner: measurement, selection and profile loading.
+"""
+import json
+
+import pytest
+
+from app.config import Settings
+from app.models.preprocessing import ImagePreprocessor
+from app.models.tune import benchmark_config, load_tuning_profile, save_profile, select_profiles
+
+
+class SumEmbedder:
+    """Stand-in with the preprocessor and encode_pixels of CLIPEmbedder."""
+
+    def __init__(self):
+        self.preprocessor = ImagePreprocessor()
+        self.batch_sizes = []
+
+    def encode_pixels(self, batch):
+        self.batch_sizes.append(len(batch))
+        return self.preprocessor.normalize(batch).sum(axis=(2, 3))
+
+
+def _result(backend, threads, batch_size, p99_ms, images_per_second):
+    return {
+        "backend": backend,
+        "num_threads": threads,
+        "interop_threads": 1,
+        "batch_size": batch_size,
+        "p50_ms": p99_ms / 2,
+        "p99_ms": p99_ms,
+        "images_per_second": images_per_second,
+    }
+
+
+RESULTS = [
+    _result("torch", 4, 1, 20.0, 50.0),
+    _result("torch", 4, 8, 35.0, 230.0),
+    _result("torch", 4, 32, 120.0, 270.0),
+    _result("onnx", 2, 1, 12.0, 83.0),
+    _result("onnx", 2, 8, 22.0, 360.0),
+    _result("onnx", 2, 32, 70.0, 450.0),
+]
+
+
+def test_benchmark_config_times_forward_passes():
+    embedder = SumEmbedder()
+
+    stats = benchmark_config(embedder, batch_size=4, iterations=5, warmup=2)
+
+    assert embedder.batch_sizes == [4] * 7
+    assert 0 < stats["p50_ms"] <= stats["p99_ms"]
+    assert stats["images_per_second"] > 0
+
+
+def test_select_profiles():
+    """Online: lowest single-query p99, largest batch within budget; offline: max throughput."""
+    profiles = select_profiles(RESULTS)
+
+    online, offline = profiles["online"], profiles["offline"]
+    assert (online["backend"], online["num_threads"]) == ("onnx", 2)
+    assert online["latency_budget_ms"] == 24.0
+    assert online["max_batch_size"] == 8
+    assert "batch_size" not in online
+
+    assert (offline["backend"], offline["batch_size"]) == ("onnx", 32)
+    assert "max_batch_size" not in offline
+
+
+def test_select_profiles_with_tight_budget():
+    assert select_profiles(RESULTS, latency_budget_ms=5.0)["online"]["max_batch_size"] == 1
+
+
+def test_load_profile_for_matching_host(tmp_path):
+    path = tmp_path / "clip_tuning.json"
+    save_profile(path, "clip-test", "cpu", select_profiles(RESULTS), RESULTS)
+
+    online = load_tuning_profile("clip-test", "cpu", mode="online", path=path)
+    assert online == {
+        "clip_backend": "onnx",
+        "clip_num_threads": 2,
+        "clip_interop_threads": 1,
+        "clip_max_batch_size": 8,
+    }
+
+    offline = load_tuning_profile("clip-test", "cpu", mode="offline", path=path)
+    assert offline["clip_batch_size"] == 32
+
+    assert load_tuning_profile("clip-test", "cpu", mode="none", path=path) == {}
+
+
+@pytest.mark.parametrize(
+    "model_name, device, cpu_count",
+    [("other-model", "cpu", None), ("clip-test", "cuda", None), ("clip-test", "cpu", 1024)],
+)
+def test_profile_of_other_model_device_or_host_is_ignored(tmp_path, model_name, device, cpu_count):
+    path = tmp_path / "clip_tuning.json"
+    save_profile(path, "clip-test", "cpu", select_profiles(RESULTS), RESULTS)
+    if cpu_count:
+        data = json.loads(path.read_text())
+        data["cpu_count"] = cpu_count
+        path.write_text(json.dumps(data))
+
+    assert load_tuning_profile(model_name, device, mode="online", path=path) == {}
+
+
+def test_explicit_settings_win_over_profile(tmp_path, monkeypatch):
+    path = tmp_path / "clip_tuning.json"
+    save_profile(path, "clip-test", "cpu", select_profiles(RESULTS), RESULTS)
+    monkeypatch.setattr("app.models.tune.settings", Settings(clip_backend="torch"))
+
+    online = load_tuning_profile("clip-test", "cpu", mode="online", path=path)
+
+    assert "clip_backend" not in online
+    assert online["clip_num_threads"] == 2
+
+
+def test_missing_or_corrupt_profile(tmp_path):
+    assert load_tuning_profile("clip-test", "cpu", mode="online", path=tmp_path / "none.json") == {}
+
+    path = tmp_path / "broken.json"
+    path.write_text("{not json")
+    assert load_tuning_profile("clip-test", "cpu", mode="online", path=path) == {}
@@ -0,0 +1,230 @@
+"""
+Tests for the VectorStore interface and the memory-mapped implementation.
+"""
+import numpy as np
+import pytest
+
+from qdrant_client.models import FieldCondition, Filter, HasIdCondition, MatchValue, Range
+
+from app.db.memmap_store import MemmapVectorStore, PayloadColumns, exact_top_k
+from app.db.qdrant import QdrantManager, _product_id_to_uuid, build_filter, product_payload
+from app.db.vector_store import VectorStore, create_vector_store
+
+
+@pytest.fixture
+async def store(tmp_path):
+    """Exact memmap store with a fresh collection."""
+    async with MemmapVectorStore("test", path=str(tmp_path), compact_ratio=0.5) as store:
+        await store.create_collection(vector_size=4)
+        yield store
+
+
+def test_factory_and_protocol(tmp_path, monkeypatch):
+    """Both backends implement VectorStore and are selected by settings."""
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "vector_store_path", str(tmp_path))
+    assert isinstance(create_vector_store(backend="qdrant"), QdrantManager)
+
+    monkeypatch.setattr(settings, "vector_store", "memmap")
+    store = create_vector_store(collection_name="edge")
+    assert isinstance(store, MemmapVectorStore)
+    assert isinstance(store, VectorStore)
+    assert store.root == tmp_path / "edge"
+
+    with pytest.raises(ValueError):
+        create_vector_store(backend="faiss")
+
+
+def test_exact_top_k_blocks_match_full_scan():
+    """Blocked search with a mask equals a sort of the full score matrix."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((1000, 16)).astype(np.float32)
+    queries = rng.standard_normal((3, 16)).astype(np.float32)
+    allowed = rng.random(1000) > 0.3
+
+    rows, scores = exact_top_k(vectors, queries, top_k=10, block_size=64, allowed=allowed)
+
+    full = queries @ vectors.T
+    full[:, ~allowed] = -np.inf
+    expected = np.argsort(-full, axis=1)[:, :10]
+    np.testing.assert_array_equal(rows, expected)
+    np.testing.assert_allclose(scores, np.take_along_axis(full, expected, axis=1), rtol=1e-5)
+
+
+def test_payload_columns_filters():
+    """Filter masks from cached columns, extended by rows appended later."""
+    ids = ["a", "b", "c", "d"]
+    payloads = [
+        {"category": "shoes", "price": 100},
+        {"category": "shoes", "price": "n/a", "source": "feed"},
+        {"category": "bags", "price": 300.5, "tags": ["x"]},
+        {"category": "bags"},
+    ]
+    columns = PayloadColumns(ids, payloads)
+
+    def mask(point_filter, rows=None):
+        return columns.mask(point_filter, len(ids) if rows is None else rows).tolist()
+
+    assert mask(build_filter(categories=["bags", "hats"])) == [False, False, True, True]
+    assert mask(build_filter(max_price=200)) == [True, False, False, False]
+    assert mask(build_filter(categories=["shoes"], source="feed")) == [False, True, False, False]
+    assert mask(Filter(must=[FieldCondition(key="category", match=MatchValue(value="hats"))])) == [False] * 4
+    assert mask(Filter(must=[FieldCondition(key="tags", match=MatchValue(value="x"))])) == [False] * 4
+    assert mask(Filter(
+        should=[
+            FieldCondition(key="price", range=Range(gt=200)),
+            Filter(must=[FieldCondition(key="category", match=MatchValue(value="shoes"))]),
+        ],
+        must_not=[HasIdCondition(has_id=[_product_id_to_uuid("b")])],
+    )) == [True, False, True, False]
+
+    # Appended rows extend the cached columns; a shorter snapshot ignores them
+    ids.append("e")
+    payloads.append({"category": "bags", "price": 10})
+    assert mask(build_filter(categories=["bags"], max_price=100)) == [False, False, False, False, True]
+    assert mask(build_filter(categories=["bags"]), rows=4) == [False, False, True, True]
+    assert mask(Filter(must=[HasIdCondition(has_id=[_product_id_to_uuid("e")])])) == [False] * 4 + [True]
+
+    with pytest.raises(ValueError):
+        mask(Filter(must=[FieldCondition(key="category")]))
+
+
+async def test_upsert_search_delete(store):
+    vectors = [[1, 0, 0, 0], [0.9, 0.1, 0, 0], [0.5, 0.5, 0, 0], [0, 0, 1, 0]]
+    payloads = [
+        product_payload("p0", category="shoes", price=100),
+        product_payload("p1", category="shoes", price=900),
+        product_payload("p2", category="bags", price=300),
+        product_payload("p3", category="bags", price=50),
+    ]
+    await store.upsert_vectors([f"p{i}" for i in range(4)], vectors, payloads)
+
+    results = await store.search_similar([2, 0, 0, 0], top_k=2)
+    assert [hit["id"] for hit in results] == ["p0", "p1"]
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert results[0]["payload"]["category"] == "shoes"
+
+    similar = await store.search_similar_to_product("p0", top_k=10, score_threshold=None)
+    assert [hit["id"] for hit in similar] == ["p1", "p2", "p3"]
+    assert await store.search_similar_to_product("missing") is None
+
+    filtered = await store.search_similar(
+        [1, 0, 0, 0], score_threshold=None, query_filter=build_filter(categories=["bags"], max_price=500)
+    )
+    assert [hit["id"] for hit in filtered] == ["p2", "p3"]
+
+    batch = await store.search_similar_batch([[0, 0, 1, 0], [1, 0, 0, 0]], top_k=1)
+    assert [hits[0]["id"] for hits in batch] == ["p3", "p0"]
+
+    await store.delete_vectors(["p0"])
+    assert await store.count_vectors() == 3
+    assert (await store.search_similar([1, 0, 0, 0], top_k=1))[0]["id"] == "p1"
+    assert await store.search_similar_to_product("p0") is None
+
+
+async def test_score_threshold_is_exclusive(store):
+    """Same boundary as Qdrant: a score equal to the threshold is dropped."""
+    await store.upsert_vectors(["p0", "p1", "p2"], [[1, 0, 0, 0], [0.5, 0.5, 0, 0], [0, 0, 1, 0]])
+
+    def ids(hits):
+        return [hit["id"] for hit in hits]
+
+    assert ids(await store.search_similar_to_product("p0", score_threshold=0.0)) == ["p1"]
+    assert ids(await store.search_similar_to_product("p0", score_threshold=None)) == ["p1", "p2"]
+    assert ids((await store.search_similar_batch([[1, 0, 0, 0]], score_threshold=0.0))[0]) == ["p0", "p1"]
+
+
+async def test_similar_to_product_deleted_by_another_instance(store, tmp_path):
+    """A product deleted elsewhere after the reader loaded it is 'not found', not an error."""
+    reader = MemmapVectorStore("test", path=str(tmp_path))
+    await store.upsert_vectors(["a", "b"], [[1, 0, 0, 0], [0, 1, 0, 0]])
+    assert [hit["id"] for hit in await reader.search_similar_to_product("a", score_threshold=None)] == ["b"]
+
+    await store.delete_vectors(["a"])
+    assert "a" in reader._rows
+    assert reader._search(None, 10, 0.0, False, None, exclude="a") is None
+    assert await reader.search_similar_to_product("a") is None
+
+
+async def test_tombstones_compaction_and_other_instances(store, tmp_path):
+    """Replacements and deletes append tombstones; compaction starts a new generation."""
+    reader = MemmapVectorStore("test", path=str(tmp_path))
+    vectors = np.eye(4, dtype=np.float32)
+    await store.upload_vectors(["a", "b", "c", "d"], vectors)
+
+    await store.upsert_vectors(["a"], [[0, 0, 0, 1]], [{"title": "new"}])
+    await store.set_payloads({"b": {"price": 10.0}})
+    info = await store.get_collection_info()
+    assert info["points_count"] == 4
+    assert info["tombstones"] == 2
+
+    # Another instance (e.g. the API process) sees the appended rows
+    hits = await reader.search_similar([0, 0, 0, 1], top_k=2)
+    assert {hit["id"] for hit in hits} == {"a", "d"}
+    assert (await reader.search_similar([0, 1, 0, 0], top_k=1))[0]["payload"]["price"] == 10.0
+
+    # Tombstones reach compact_ratio=0.5 of the rows -> new generation
+    await store.delete_vectors(["c", "d"])
+    assert (await store.get_collection_info())["tombstones"] == 0
+    assert sorted(p.name for p in (tmp_path / "test").glob("g*")) == ["g0", "g1"]
+
+    assert await reader.count_vectors() == 2
+    scrolled = [p async for batch in reader.scroll_vectors(batch_size=1) for p in batch]
+    assert sorted(p["payload"]["product_id"] for p in scrolled) == ["a", "b"]
+    assert scrolled[0]["vector"] is not None
+
+    with pytest.raises(ValueError):
+        await store.set_payloads({"c": {"price": 1.0}})
+
+    await store.delete_collection()
+    assert not await reader.collection_exists()
+
+
+async def test_failed_append_leaves_collection_intact(store, tmp_path):
+    """A write that fails midway must not shift later rows against their ids."""
+    await store.upsert_vectors(["a"], [[1, 0, 0, 0]])
+
+    with pytest.raises(TypeError):
+        await store.upsert_vectors(["b", "c"], [[0, 1, 0, 0], [0, 0, 1, 0]], [{"price": np.float32(2)}] * 2)
+    with pytest.raises(ValueError):
+        await store.upsert_vectors(["b"], [[0, 1, 0]])
+
+    # Bytes of a write that crashed before meta.json was updated
+    generation = tmp_path / "test" / "g0"
+    for name in ("vectors.f32", "rows.jsonl", "tombstones.i64"):
+        with open(generation / name, "ab") as f:
+            f.write(b"\x01" * 13)
+
+    await store.upsert_vectors(["d"], [[0, 0, 0, 1]])
+    await store.delete_vectors(["a"])
+
+    reader = MemmapVectorStore("test", path=str(tmp_path))
+    hits = await reader.search_similar([0, 0, 0, 1], top_k=5)
+    assert [(hit["id"], hit["score"]) for hit in hits] == [("d", pytest.approx(1.0))]
+    assert (generation / "vectors.f32").stat().st_size == 2 * 4 * 4
+
+
+async def test_ivf_partitions(tmp_path):
+    """IVF search scans a few partitions and keeps recall; exact=True scans all rows."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((8, 32)).astype(np.float32)
+    vectors = np.repeat(centers, 100, axis=0) + 0.1 * rng.standard_normal((800, 32)).astype(np.float32)
+    ids = [f"v{i}" for i in range(800)]
+
+    async with MemmapVectorStore("ivf", path=str(tmp_path), ivf_lists=8, ivf_probes=2) as store:
+        await store.create_collection(vector_size=32)
+        await store.upload_vectors(ids[:400], vectors[:400])
+        assert (await store.get_collection_info())["ivf_lists"] == 8
+
+        # Rows appended after training are assigned to their closest partition
+        await store.upload_vectors(ids[400:], vectors[400:])
+
+        queries = vectors[::50] + 0.05
+        approx = await store.search_similar_batch(queries.tolist(), top_k=10)
+        exact = await store.search_similar_batch(queries.tolist(), top_k=10, exact=True)
+
+    recall = np.mean([
+        len({hit["id"] for hit in a} & {hit["id"] for hit in e}) / 10 for a, e in zip(approx, exact)
+    ])
+    assert recall >= 0.9
@@ -0,0 +1,77 @@
+"""
+Tests for the per-process CLIP model lifecycle of Celery workers.
+"""
+import pytest
+import torch
+
+from app.models import clip_model
+from app.utils import metrics
+from app.workers import lifecycle
+
+
+class CountingEmbedder:
+    """Stands in for CLIPEmbedder and counts how often it is constructed."""
+
+    instances = 0
+
+    def __init__(self, **kwargs):
+        type(self).instances += 1
+        self.kwargs = kwargs
+
+
+@pytest.fixture
+def fresh_lifecycle(monkeypatch):
+    CountingEmbedder.instances = 0
+    monkeypatch.setattr(clip_model, "CLIPEmbedder", CountingEmbedder)
+    monkeypatch.setattr(lifecycle, "_embedder", None)
+    monkeypatch.setattr(lifecycle, "_pool_concurrency", None)
+    monkeypatch.setattr(lifecycle.gc, "freeze", lambda: None)
+    monkeypatch.setattr(torch, "set_num_threads", lambda n: None)
+    return lifecycle
+
+
+def test_model_loaded_once_per_process(fresh_lifecycle):
+    first = fresh_lifecycle.get_worker_embedder()
+    second = fresh_lifecycle.get_worker_embedder()
+
+    assert first is second
+    assert CountingEmbedder.instances == 1
+    assert first.kwargs == {"towers": ("vision",)}
+
+
+def test_preloaded_model_survives_process_init(fresh_lifecycle, monkeypatch):
+    """With preloading the forked child reuses the parent's model instead of reloading."""
+    monkeypatch.setattr(lifecycle.settings, "celery_preload_model", True)
+    monkeypatch.setattr(lifecycle.settings, "celery_metrics_port", 0)
+
+    class Worker:
+        concurrency = 4
+
+    fresh_lifecycle._on_worker_init(sender=Worker())
+    fresh_lifecycle._on_worker_process_init()
+    embedder = fresh_lifecycle.get_worker_embedder()
+
+    assert CountingEmbedder.instances == 1
+    assert embedder is fresh_lifecycle._embedder
+
+
+def test_task_duration_recorded(fresh_lifecycle, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(
+        lifecycle, "record_worker_task", lambda *args: recorded.append(args)
+    )
+
+    class Task:
+        name = "webhook.process_product_created"
+
+    fresh_lifecycle._on_task_prerun(task_id="t1")
+    fresh_lifecycle._on_task_postrun(task_id="t1", task=Task(), state="SUCCESS")
+
+    assert len(recorded) == 1
+    name, state, duration = recorded[0]
+    assert (name, state) == ("webhook.process_product_created", "SUCCESS")
+    assert duration >= 0
+    assert "t1" not in fresh_lifecycle._task_started
+
+    # Labels must be accepted by the real histogram
+    metrics.record_worker_task(name, state, duration)